@@ -4,11 +4,18 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -41,34 +48,100 @@ def summarize_tree(root: Path, max_depth: int = 6) -> dict[str, Any]:
 
 
 def tail_lines(path: Path, limit: int = 2000) -> list[str]:
-    if not path.exists():
-        return []
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
-    return lines[-limit:]
+    return event_log.tail_lines(path, limit)
+
+
+def line_epoch(line: str) -> float | None:
+    if not line.strip():
+        return None
+    try:
+        payload = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    ts = str(payload.get("ts_utc", "")).strip()
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
 
 
 def count_recent_jsonl(path: Path, since_epoch: float) -> int:
-    rows = tail_lines(path, 4000)
     count = 0
-    for line in rows:
-        if not line.strip():
-            continue
-        try:
-            payload = json.loads(line)
-        except json.JSONDecodeError:
-            continue
-        ts = str(payload.get("ts_utc", "")).strip()
-        if not ts:
-            continue
-        try:
-            dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-        except ValueError:
-            continue
-        if dt.timestamp() >= since_epoch:
+    for line in tail_lines(path, 4000):
+        epoch = line_epoch(line)
+        if epoch is not None and epoch >= since_epoch:
             count += 1
     return count
 
 
+class RecentCounter:
+    """Per-second event counts over a rolling ``horizon_sec`` window."""
+
+    def __init__(self, horizon_sec: float, buckets: dict[int, int] | None = None) -> None:
+        self.horizon_sec = float(horizon_sec)
+        self.buckets: dict[int, int] = dict(buckets or {})
+
+    def add(self, epoch: float) -> None:
+        sec = int(epoch)
+        self.buckets[sec] = self.buckets.get(sec, 0) + 1
+
+    def prune(self, now: float) -> None:
+        floor = int(now - self.horizon_sec)
+        for sec in [s for s in self.buckets if s < floor]:
+            del self.buckets[sec]
+
+    def count_since(self, epoch: float) -> int:
+        floor = int(epoch)
+        return sum(n for sec, n in self.buckets.items() if sec >= floor)
+
+    def state(self) -> dict[str, int]:
+        return {str(sec): n for sec, n in sorted(self.buckets.items())}
+
+    @classmethod
+    def from_state(cls, horizon_sec: float, state: Any) -> RecentCounter:
+        buckets: dict[int, int] = {}
+        if isinstance(state, dict):
+            for sec, n in state.items():
+                try:
+                    buckets[int(sec)] = int(n)
+                except (TypeError, ValueError):
+                    continue
+        return cls(horizon_sec, buckets)
+
+
+class StreamActivity:
+    """Incremental recent-event counter for one JSONL stream.
+
+    Only lines appended since the previous tick are parsed; the first tick
+    (or a tick after the cursor state was lost) seeds from the last
+    ``backfill_lines`` lines like the old full-tail scan did.
+    """
+
+    def __init__(self, path: Path, horizon_sec: float, state: Any = None, backfill_lines: int = 4000) -> None:
+        state = state if isinstance(state, dict) else {}
+        self.path = path
+        self.backfill_lines = backfill_lines
+        self.cursor = event_log.StreamCursor.from_state(path, state.get("cursor"))
+        self.counter = RecentCounter.from_state(horizon_sec, state.get("buckets") if self.cursor.positioned else None)
+        self.parsed_lines = 0
+
+    def update(self, now: float) -> None:
+        lines = self.cursor.read_new() if self.cursor.positioned else self.cursor.seek_tail(self.backfill_lines)
+        self.parsed_lines = len(lines)
+        for line in lines:
+            epoch = line_epoch(line)
+            if epoch is not None:
+                self.counter.add(epoch)
+        self.counter.prune(now)
+
+    def state(self) -> dict[str, Any]:
+        return {"cursor": self.cursor.state(), "buckets": self.counter.state()}
+
+
 def find_db_files(repo_root: Path, limit: int = 80) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for p in repo_root.rglob("*"):
@@ -97,6 +170,7 @@ class ActivityTelemetry:
         self.state_file = self.hub_root / "activity_telemetry_state.json"
         self.timeline_file = self.hub_root / "activity_telemetry_timeline.jsonl"
         self.audit_stream_file = self.hub_root / "security_audit_stream.jsonl"
+        self.cursor_file = self.hub_root / "activity_telemetry_cursors.json"
 
         self.bridge_events = self.bridge_root / "events.jsonl"
         self.bridge_commands = self.bridge_root / "commands.jsonl"
@@ -110,20 +184,43 @@ class ActivityTelemetry:
             "chronolog": repo_root / "chronolog",
             "journal": repo_root / "journal",
         }
+        self._streams: dict[str, StreamActivity] | None = None
 
-    def collect(self) -> dict[str, Any]:
-        now = time.time()
+    def _load_streams(self) -> dict[str, StreamActivity]:
+        if self._streams is None:
+            try:
+                saved = json.loads(self.cursor_file.read_text(encoding="utf-8")).get("streams", {})
+            except (OSError, ValueError, AttributeError):
+                saved = {}
+            paths = {
+                "bridge_events": self.bridge_events,
+                "bridge_commands": self.bridge_commands,
+                "routing_events": self.routing_events,
+                "runtime_log": self.runtime_log,
+                "bg_errors": self.bg_errors,
+            }
+            self._streams = {name: StreamActivity(path, 3600, saved.get(name)) for name, path in paths.items()}
+        return self._streams
+
+    def _recent_activity(self, now: float) -> dict[str, Any]:
+        streams = self._load_streams()
+        for stream in streams.values():
+            stream.update(now)
+        state_store.write_json(self.cursor_file, {"version": 1, "streams": {name: s.state() for name, s in streams.items()}})
         last_5m = now - 300
         last_60m = now - 3600
-
-        activity = {
-            "bridge_events_5m": count_recent_jsonl(self.bridge_events, last_5m),
-            "bridge_commands_5m": count_recent_jsonl(self.bridge_commands, last_5m),
-            "routing_events_60m": count_recent_jsonl(self.routing_events, last_60m),
-            "runtime_events_60m": count_recent_jsonl(self.runtime_log, last_60m),
-            "background_errors_60m": count_recent_jsonl(self.bg_errors, last_60m),
+        return {
+            "bridge_events_5m": streams["bridge_events"].counter.count_since(last_5m),
+            "bridge_commands_5m": streams["bridge_commands"].counter.count_since(last_5m),
+            "routing_events_60m": streams["routing_events"].counter.count_since(last_60m),
+            "runtime_events_60m": streams["runtime_log"].counter.count_since(last_60m),
+            "background_errors_60m": streams["bg_errors"].counter.count_since(last_60m),
         }
 
+    def collect(self) -> dict[str, Any]:
+        now = time.time()
+        activity = self._recent_activity(now)
+
         archives = {name: summarize_tree(path) for name, path in self.archive_roots.items()}
         db_files = find_db_files(self.repo_root)
         db_total = sum(int(x.get("bytes", 0)) for x in db_files)
@@ -135,6 +232,7 @@ class ActivityTelemetry:
             "db_bytes_total": db_total,
             "bridge_events_staleness_sec": int(max(0, now - safe_stat_mtime(self.bridge_events))),
             "runtime_log_staleness_sec": int(max(0, now - safe_stat_mtime(self.runtime_log))),
+            "lines_parsed_tick": sum(s.parsed_lines for s in self._load_streams().values()),
         }
 
         return {
@@ -147,17 +245,13 @@ class ActivityTelemetry:
 
     def run_once(self) -> dict[str, Any]:
         payload = self.collect()
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         with self.timeline_file.open("a", encoding="utf-8") as fh:
             fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-        with self.audit_stream_file.open("a", encoding="utf-8") as fh:
-            fh.write(
-                json.dumps(
-                    {"ts_utc": payload["ts_utc"], "source": "activity_telemetry", "event": "activity_snapshot", "payload": payload},
-                    ensure_ascii=True,
-                )
-                + "\n"
-            )
+        event_log.append_jsonl(
+            self.audit_stream_file,
+            {"ts_utc": payload["ts_utc"], "source": "activity_telemetry", "event": "activity_snapshot", "payload": payload},
+        )
         return payload
 
 
@@ -5,11 +5,18 @@ import argparse
 import hashlib
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -84,7 +91,7 @@ class AmbientLightBridge:
 
         if not vector and not grid:
             summary = {"ts_utc": utc_now(), "status": "no_vector_or_grid", "dispatched": 0}
-            self.state_file.write_text(json.dumps(summary, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.state_file, summary)
             return summary
 
         # Calculate hash for deduplication
@@ -140,9 +147,9 @@ class AmbientLightBridge:
             
             # High-fidelity single message
             msg_file = outbox_dir / f"light_{int(now * 1000)}.json"
-            msg_file.write_text(json.dumps(event, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(msg_file, event)
             
-            self._append_jsonl(self.events_file, {
+            event_log.append_jsonl(self.events_file, {
                 "ts_utc": event["ts_utc"], 
                 "event": "ambient_light_dispatched", 
                 "device_id": device_id, 
@@ -166,7 +173,7 @@ class AmbientLightBridge:
             "last_sent": last_sent,
             "last_summary": summary
         }
-        self.state_file.write_text(json.dumps(state_payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, state_payload)
         
         return summary
 
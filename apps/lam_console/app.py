@@ -10,6 +10,12 @@ import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    from apps.lam_console import event_log
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log
+
 # Paths
 ROOT = Path(os.getenv("LAM_REPO_ROOT", Path(__file__).resolve().parents[2]))
 EVENTS_FILE = ROOT / ".gateway" / "bridge" / "captain" / "events.jsonl"
@@ -46,10 +52,9 @@ class RadriloniumaOS:
     def _read_logs(self):
         if EVENTS_FILE.exists():
             try:
-                lines = EVENTS_FILE.read_text(encoding="utf-8").strip().splitlines()
-                # Get last 20 lines
+                lines = event_log.tail_lines(EVENTS_FILE, 20)
                 self.logs = []
-                for line in lines[-20:]:
+                for line in lines:
                     try:
                         data = json.loads(line)
                         ts = data.get("ts_utc", "")[11:19]
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
-import contextlib
 import hashlib
 import importlib.util
-import io
 import json
 import os
 import shlex
+import sys
+import time
 import urllib.error
 import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
-from types import SimpleNamespace
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+    from apps.lam_console.model_spool import ModelSpool
+    from apps.lam_console.status_sources import SourceCache, stamp
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+    from apps.lam_console.model_spool import ModelSpool
+    from apps.lam_console.status_sources import SourceCache, stamp
+
 
 def _utc_now() -> str:
     from datetime import datetime, timezone
@@ -44,7 +53,7 @@ class LocalHubCore:
     def __init__(self, repo_root: Path) -> None:
         self.repo_root = repo_root
         self.gateway = _load_lam_gateway_module(repo_root)
-        self.gateway.ensure_state()
+        self.gateway_service = self.gateway.GatewayService()
         self.hub_root = Path(os.getenv("LAM_HUB_ROOT", str(repo_root / ".gateway" / "hub")))
         self.inbox_dir = self.hub_root / "inbox"
         self.outbox_dir = self.hub_root / "outbox"
@@ -76,16 +85,21 @@ class LocalHubCore:
         self.rootkey_gate_state_file = self.hub_root / "rootkey_gate_state.json"
         self.failsafe_state_file = self.hub_root / "failsafe_guard_state.json"
         self.feedback_gateway_state_file = self.hub_root / "feedback_gateway_state.json"
+        self.status_sources = SourceCache()
+        self.status_latency = self.gateway.LatencyRecorder()
+        self._status_digest = ""
+        self._status_stamp: tuple[int, int, int] | None = None
+        self._status_writes = {"written": 0, "skipped": 0}
 
         self.inbox_dir.mkdir(parents=True, exist_ok=True)
         self.outbox_dir.mkdir(parents=True, exist_ok=True)
-        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.model_spool = ModelSpool(self.spool_dir)
         self.bridge_root.mkdir(parents=True, exist_ok=True)
         self.gates_dir.mkdir(parents=True, exist_ok=True)
         self.device_inbox_dir.mkdir(parents=True, exist_ok=True)
         self.device_outbox_dir.mkdir(parents=True, exist_ok=True)
         if not self.devices_file.exists():
-            self.devices_file.write_text(json.dumps({"devices": []}, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.devices_file, {"devices": []})
 
     def known_agents(self) -> list[str]:
         env_agents = [x.strip() for x in os.getenv("LAM_CONSOLE_AGENTS", "").split(",") if x.strip()]
@@ -102,29 +116,10 @@ class LocalHubCore:
         with path.open("a", encoding="utf-8") as fh:
             fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
 
-    def _gateway_cmd_json(self, func_name: str, **kwargs: Any) -> dict[str, Any]:
-        func = getattr(self.gateway, func_name)
-        stream = io.StringIO()
-        with contextlib.redirect_stdout(stream):
-            rc = func(SimpleNamespace(**kwargs))
-        raw = stream.getvalue().strip()
-        payload: dict[str, Any] = {"rc": rc}
-        if raw.startswith("{") and raw.endswith("}"):
-            try:
-                payload = json.loads(raw)
-            except json.JSONDecodeError:
-                payload["raw"] = raw
-        elif raw:
-            payload["raw"] = raw
-        return payload
-
     @staticmethod
     def _tail_jsonl(path: Path, limit: int = 40) -> list[dict[str, Any]]:
-        if not path.exists():
-            return []
-        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
         out: list[dict[str, Any]] = []
-        for line in lines[-limit:]:
+        for line in event_log.tail_lines(path, limit):
             line = line.strip()
             if not line:
                 continue
@@ -137,32 +132,27 @@ class LocalHubCore:
         return out
 
     def health(self) -> CommandResult:
-        payload = self._gateway_cmd_json("cmd_health", json=True)
+        payload = self.gateway_service.health()
         return CommandResult(ok=True, title="health", payload=payload)
 
     def route(self, data_class: str, size_bytes: int | None = None) -> CommandResult:
-        payload = self._gateway_cmd_json("cmd_route", data_class=data_class, size_bytes=size_bytes)
+        payload = self.gateway_service.route(data_class, size_bytes)
         return CommandResult(ok=True, title="route", payload=payload)
 
     def enqueue_put(self, src: str, data_class: str = "generic") -> CommandResult:
-        payload = self._gateway_cmd_json(
-            "cmd_enqueue_put",
-            src=str(Path(src).resolve()),
-            data_class=data_class,
-            provider="",
-            name="",
-        )
+        payload = self.gateway_service.enqueue_put(str(Path(src).resolve()), data_class=data_class)
         ok = bool(payload.get("status") == "ok")
-        self._append_jsonl(
+        event_log.append_jsonl(
             self.bridge_events,
             {"ts_utc": _utc_now(), "event": "enqueue_put", "ok": ok, "payload": payload},
         )
         return CommandResult(ok=ok, title="enqueue-put", payload=payload)
 
     def run_queue(self, max_jobs: int = 20) -> CommandResult:
-        payload = self._gateway_cmd_json("cmd_run_queue", max_jobs=max_jobs)
+        payload = self.gateway_service.run_queue(max_jobs=max_jobs)
+        self.gateway_service.flush()
         ok = bool(payload.get("status") == "ok")
-        self._append_jsonl(
+        event_log.append_jsonl(
             self.bridge_events,
             {"ts_utc": _utc_now(), "event": "run_queue", "ok": ok, "payload": payload},
         )
@@ -175,7 +165,7 @@ class LocalHubCore:
         target = self.inbox_dir / f"{agent}.jsonl"
         self._append_jsonl(target, line)
         self._append_jsonl(self.bridge_commands, {"ts_utc": _utc_now(), "type": "agent_send", "target": agent, "message": message})
-        self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "agent_message_queued", "agent": agent})
+        event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "agent_message_queued", "agent": agent})
         return CommandResult(ok=True, title="send", payload={"status": "queued", "file": str(target), "event": line})
 
     def send_model(self, provider: str, message: str, timeout_sec: int = 30) -> CommandResult:
@@ -198,9 +188,8 @@ class LocalHubCore:
 
         if not endpoint:
             envelope["status"] = "spooled_no_endpoint"
-            target = self.spool_dir / f"{provider}.jsonl"
-            self._append_jsonl(target, envelope)
-            self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_spooled", "provider": provider, "reason": "endpoint_not_configured"})
+            target = self.model_spool.append(provider, envelope)
+            event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_spooled", "provider": provider, "reason": "endpoint_not_configured"})
             return CommandResult(ok=False, title="model", payload={"error": "endpoint_not_configured", "spooled": str(target)})
 
         body = json.dumps({"id": envelope["id"], "input": message}).encode("utf-8")
@@ -216,97 +205,106 @@ class LocalHubCore:
                     except json.JSONDecodeError:
                         pass
                 out = {"provider": provider, "response": parsed}
-                self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_sent", "provider": provider, "ok": True})
+                event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_sent", "provider": provider, "ok": True})
                 return CommandResult(ok=True, title="model", payload=out)
         except urllib.error.URLError as exc:
             envelope["status"] = "spooled_transport_error"
             envelope["error"] = str(exc)
-            target = self.spool_dir / f"{provider}.jsonl"
-            self._append_jsonl(target, envelope)
-            self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_spooled", "provider": provider, "reason": str(exc)})
+            target = self.model_spool.append(provider, envelope)
+            event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "model_spooled", "provider": provider, "reason": str(exc)})
             return CommandResult(ok=False, title="model", payload={"provider": provider, "error": str(exc), "spooled": str(target)})
 
+    def _status_state_files(self) -> dict[str, Path]:
+        return {
+            "worker": self.worker_state_file,
+            "mcp_watchdog": self.mcp_watchdog_state_file,
+            "gws_bridge": self.gws_bridge_state_file,
+            "security_telemetry": self.security_telemetry_state_file,
+            "role_orchestrator": self.role_orchestrator_state_file,
+            "power_fabric": self.power_fabric_state_file,
+            "device_mesh": self.device_mesh_state_file,
+            "activity_telemetry": self.activity_telemetry_state_file,
+            "ambient_light": self.ambient_light_state_file,
+            "io_spectral": self.io_spectral_state_file,
+            "governance_autopilot": self.governance_autopilot_state_file,
+            "media_sync": self.media_sync_state_file,
+            "rootkey_gate": self.rootkey_gate_state_file,
+            "failsafe_guard": self.failsafe_state_file,
+            "feedback_gateway": self.feedback_gateway_state_file,
+        }
+
+    def _status_agents(self) -> list[str]:
+        return self.status_sources.derive(
+            "agents", [self.inbox_dir, self.outbox_dir], self.known_agents, extra=os.getenv("LAM_CONSOLE_AGENTS", "")
+        )
+
+    def _status_gates(self) -> list[dict[str, Any]]:
+        def parse(path: Path) -> dict[str, Any] | None:
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                return None
+            return payload if isinstance(payload, dict) else None
+
+        out: list[dict[str, Any]] = []
+        for name in self.status_sources.listing(self.gates_dir, "*.json"):
+            gate = self.status_sources.load(self.gates_dir / name, parse, kind="gate")
+            if gate is not None:
+                out.append(gate)
+        return out
+
+    def _status_devices(self) -> list[dict[str, Any]]:
+        return self.status_sources.load(self.devices_file, lambda _path: self.list_devices(), default=[], kind="devices")
+
+    @property
+    def status_version(self) -> str:
+        """Digest of the last aggregated status (timestamps and metrics excluded); moves only when a source changed."""
+        return self._status_digest[:16]
+
     def bridge_status(self) -> CommandResult:
-        queue = self._gateway_cmd_json("cmd_queue_list")
-        worker = {}
-        if self.worker_state_file.exists():
-            worker = json.loads(self.worker_state_file.read_text(encoding="utf-8"))
-        mcp = {}
-        if self.mcp_watchdog_state_file.exists():
-            mcp = json.loads(self.mcp_watchdog_state_file.read_text(encoding="utf-8"))
-        gws = {}
-        if self.gws_bridge_state_file.exists():
-            gws = json.loads(self.gws_bridge_state_file.read_text(encoding="utf-8"))
-        security = {}
-        if self.security_telemetry_state_file.exists():
-            security = json.loads(self.security_telemetry_state_file.read_text(encoding="utf-8"))
-        roles = {}
-        if self.role_orchestrator_state_file.exists():
-            roles = json.loads(self.role_orchestrator_state_file.read_text(encoding="utf-8"))
-        power = {}
-        if self.power_fabric_state_file.exists():
-            power = json.loads(self.power_fabric_state_file.read_text(encoding="utf-8"))
-        mesh = {}
-        if self.device_mesh_state_file.exists():
-            mesh = json.loads(self.device_mesh_state_file.read_text(encoding="utf-8"))
-        activity = {}
-        if self.activity_telemetry_state_file.exists():
-            activity = json.loads(self.activity_telemetry_state_file.read_text(encoding="utf-8"))
-        ambient = {}
-        if self.ambient_light_state_file.exists():
-            ambient = json.loads(self.ambient_light_state_file.read_text(encoding="utf-8"))
-        io_spectral = {}
-        if self.io_spectral_state_file.exists():
-            io_spectral = json.loads(self.io_spectral_state_file.read_text(encoding="utf-8"))
-        governance_autopilot = {}
-        if self.governance_autopilot_state_file.exists():
-            governance_autopilot = json.loads(self.governance_autopilot_state_file.read_text(encoding="utf-8"))
-        media_sync = {}
-        if self.media_sync_state_file.exists():
-            media_sync = json.loads(self.media_sync_state_file.read_text(encoding="utf-8"))
-        rootkey_gate = {}
-        if self.rootkey_gate_state_file.exists():
-            rootkey_gate = json.loads(self.rootkey_gate_state_file.read_text(encoding="utf-8"))
-        failsafe = {}
-        if self.failsafe_state_file.exists():
-            failsafe = json.loads(self.failsafe_state_file.read_text(encoding="utf-8"))
-        feedback_gateway = {}
-        if self.feedback_gateway_state_file.exists():
-            feedback_gateway = json.loads(self.feedback_gateway_state_file.read_text(encoding="utf-8"))
-        payload = {
-            "ts_utc": _utc_now(),
-            "agents": self.known_agents(),
-            "spool_files": sorted(str(p.name) for p in self.spool_dir.glob("*.jsonl")),
-            "gates": self.list_gates(),
-            "devices": self.list_devices(),
-            "dead_letter_exists": self.dead_letter_file.exists(),
-            "queue_items": len(queue.get("items", [])) if isinstance(queue, dict) else 0,
-            "bridge_events_tail": self._tail_jsonl(self.bridge_events, limit=12),
-            "worker": worker,
-            "mcp_watchdog": mcp,
-            "gws_bridge": gws,
-            "security_telemetry": security,
-            "security_lockdown": self.security_lockdown_file.exists(),
-            "role_orchestrator": roles,
-            "power_fabric": power,
-            "device_mesh": mesh,
-            "activity_telemetry": activity,
-            "ambient_light": ambient,
-            "io_spectral": io_spectral,
-            "governance_autopilot": governance_autopilot,
-            "media_sync": media_sync,
-            "rootkey_gate": rootkey_gate,
-            "failsafe_guard": failsafe,
-            "feedback_gateway": feedback_gateway,
+        """Aggregate hub/bridge state into ``status.json``.
+
+        Every source is memoized on its ``(inode, mtime_ns, size)`` stamp, so a
+        call re-parses only the files that changed since the last one, and
+        ``status.json`` is rewritten only when the aggregate differs from what
+        was last written. The returned payload adds ``status_latency_ms`` and
+        ``status_cache`` (hit ratio, skipped writes); those are not persisted.
+        """
+        started = time.perf_counter()
+        sources = self.status_sources
+        content: dict[str, Any] = {
+            "agents": self._status_agents(),
+            "spool_files": sources.listing(self.spool_dir, "*.jsonl"),
+            "gates": self._status_gates(),
+            "devices": self._status_devices(),
+            "dead_letter_exists": stamp(self.dead_letter_file) is not None,
+            "queue_items": self.gateway_service.queue.count(),
+            "bridge_events_tail": sources.load(
+                self.bridge_events, lambda p: self._tail_jsonl(p, limit=12), kind="tail", parse_missing=True
+            ),
+            "security_lockdown": stamp(self.security_lockdown_file) is not None,
         }
-        self.bridge_status_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        for key, path in self._status_state_files().items():
+            content[key] = sources.json(path)
+        payload = {"ts_utc": _utc_now(), **content}
+        digest = hashlib.sha256(json.dumps(content, ensure_ascii=True, sort_keys=True).encode("utf-8")).hexdigest()
+        if digest != self._status_digest or stamp(self.bridge_status_file) != self._status_stamp:
+            state_store.write_json(self.bridge_status_file, payload)
+            self._status_digest = digest
+            self._status_stamp = stamp(self.bridge_status_file)
+            self._status_writes["written"] += 1
+        else:
+            self._status_writes["skipped"] += 1
+        self.status_latency.record((time.perf_counter() - started) * 1000.0)
+        payload["status_latency_ms"] = self.status_latency.summary()
+        payload["status_cache"] = {**sources.stats(), "writes": dict(self._status_writes)}
         return CommandResult(ok=True, title="bridge-status", payload=payload)
 
     def queue_gws(self, op: str, **kwargs: Any) -> CommandResult:
         payload: dict[str, Any] = {"id": f"gws_{hashlib.sha256(f'{_utc_now()}:{op}:{kwargs}'.encode('utf-8')).hexdigest()[:12]}", "op": op}
         payload.update(kwargs)
         self._append_jsonl(self.gws_requests_file, payload)
-        self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "gws_request_queued", "op": op, "id": payload["id"]})
+        event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "gws_request_queued", "op": op, "id": payload["id"]})
         return CommandResult(ok=True, title="gws", payload={"status": "queued", "request": payload, "requests_file": str(self.gws_requests_file)})
 
     def pane_snapshot(self, pane: str) -> list[str]:
@@ -317,8 +315,7 @@ class LocalHubCore:
                 lines = ["(no agents discovered)"]
             return lines
         if pane == "QUEUE":
-            queue = self._gateway_cmd_json("cmd_queue_list")
-            items = queue.get("items", []) if isinstance(queue, dict) else []
+            items = self.gateway_service.queue_list()["items"]
             out = [f"queue_items={len(items)}"]
             for item in items[-30:]:
                 out.append(
@@ -327,9 +324,10 @@ class LocalHubCore:
             return out or ["(queue empty)"]
         if pane == "MODELS":
             out = []
-            for file in sorted(self.spool_dir.glob("*.jsonl")):
-                count = len(file.read_text(encoding="utf-8", errors="replace").splitlines())
-                out.append(f"{file.name}: pending={count}")
+            for provider, backlog in self.model_spool.backlog().items():
+                out.append(
+                    "{}: pending={pending} retrying={retrying} unread_bytes={unread_bytes} segments={segments}".format(provider, **backlog)
+                )
             if self.dead_letter_file.exists():
                 dead = len(self.dead_letter_file.read_text(encoding="utf-8", errors="replace").splitlines())
                 out.append(f"dead_letter: {dead}")
@@ -572,8 +570,8 @@ class LocalHubCore:
             "spool_dir": str(self.spool_dir),
         }
         file = self.gates_dir / f"{gate_name}.json"
-        file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-        self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "gate_opened", "target_os": target, "endpoint": endpoint})
+        state_store.write_json(file, payload)
+        event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "gate_opened", "target_os": target, "endpoint": endpoint})
         return CommandResult(ok=True, title="open-gate", payload=payload)
 
     def list_devices(self) -> list[dict[str, Any]]:
@@ -619,8 +617,8 @@ class LocalHubCore:
                 }
             )
             action = "registered"
-        self.devices_file.write_text(json.dumps({"devices": devices}, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-        self._append_jsonl(self.bridge_events, {"ts_utc": now, "event": "device_registered", "device_id": device_id, "platform": platform})
+        state_store.write_json(self.devices_file, {"devices": devices})
+        event_log.append_jsonl(self.bridge_events, {"ts_utc": now, "event": "device_registered", "device_id": device_id, "platform": platform})
         return CommandResult(ok=True, title="register-device", payload={"status": action, "device_id": device_id})
 
     def send_device(self, device_id: str, message: str) -> CommandResult:
@@ -641,7 +639,7 @@ class LocalHubCore:
             "status": "queued",
         }
         self._append_jsonl(self.device_outbox_dir / f"{device_id}.jsonl", envelope)
-        self._append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "device_message_queued", "device_id": device_id})
+        event_log.append_jsonl(self.bridge_events, {"ts_utc": _utc_now(), "event": "device_message_queued", "device_id": device_id})
         return CommandResult(ok=True, title="send-device", payload={"status": "queued", "device_id": device_id})
 
     def execute(self, line: str) -> CommandResult:
@@ -5,10 +5,17 @@ import argparse
 import importlib.util
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -44,9 +51,8 @@ def run_once(repo_root: Path, direction: str) -> dict:
     state = {"ts_utc": utc_now(), "direction": direction, **result}
     hub_root.mkdir(parents=True, exist_ok=True)
     bridge_root.mkdir(parents=True, exist_ok=True)
-    state_file.write_text(json.dumps(state, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-    with events_file.open("a", encoding="utf-8") as fh:
-        fh.write(json.dumps({"ts_utc": utc_now(), "event": "device_mesh_daemon_cycle", "state": state}, ensure_ascii=True) + "\n")
+    state_store.write_json(state_file, state)
+    event_log.append_jsonl(events_file, {"ts_utc": utc_now(), "event": "device_mesh_daemon_cycle", "state": state})
     return state
 
 
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+
+CODECS = ("none", "gzip", "zstd")
+READ_BLOCK = 64 * 1024
+
+
+def _segment_pattern(name: str) -> re.Pattern[str]:
+    return re.compile(rf"^{re.escape(name)}\.(\d{{8}}T\d{{6}}Z-\d{{9}})(\.gz|\.zst)?$")
+
+
+def sealed_segments(path: Path) -> list[Path]:
+    """Sealed segments of ``path``, oldest first."""
+    pattern = _segment_pattern(path.name)
+    try:
+        names = [e.name for e in os.scandir(path.parent) if pattern.match(e.name)]
+    except OSError:
+        return []
+    return [path.parent / n for n in sorted(names)]
+
+
+def reverse_lines(path: Path, block_size: int = READ_BLOCK, *, end: int | None = None) -> Iterator[bytes]:
+    """Yield the lines of ``path`` last to first, reading fixed blocks from the end.
+
+    Cost is proportional to the bytes actually consumed, not the file size.
+    ``end`` bounds the read to the first ``end`` bytes.
+    """
+    try:
+        fh = path.open("rb")
+    except OSError:
+        return
+    with fh:
+        pos = fh.seek(0, os.SEEK_END)
+        if end is not None:
+            pos = min(pos, end)
+        rest = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            fh.seek(pos)
+            chunk = fh.read(step) + rest
+            lines = chunk.split(b"\n")
+            rest = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if rest:
+            yield rest
+
+
+def _read_segment_lines(path: Path) -> list[bytes]:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as fh:
+            data = fh.read()
+    elif path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        with path.open("rb") as fh:
+            data = zstandard.ZstdDecompressor().stream_reader(fh).read()
+    else:
+        return list(reverse_lines(path))[::-1]
+    return [line for line in data.split(b"\n") if line]
+
+
+def tail_lines(path: Path, limit: int, *, end: int | None = None) -> list[str]:
+    """Last ``limit`` lines of the log at ``path`` (oldest first), spanning sealed segments."""
+    if limit <= 0:
+        return []
+    out: list[bytes] = []
+    for line in reverse_lines(path, end=end):
+        out.append(line)
+        if len(out) >= limit:
+            break
+    if len(out) < limit:
+        for segment in reversed(sealed_segments(path)):
+            try:
+                lines = _read_segment_lines(segment)
+            except (OSError, EOFError):
+                continue
+            need = limit - len(out)
+            out.extend(reversed(lines[-need:]))
+            if len(out) >= limit:
+                break
+    return [line.decode("utf-8", errors="replace") for line in reversed(out)]
+
+
+def tail_jsonl(path: Path, limit: int) -> list[dict[str, Any]]:
+    """Last ``limit`` lines parsed as JSON objects; undecodable lines are dropped."""
+    return parse_jsonl(tail_lines(path, limit))
+
+
+def parse_jsonl(lines: list[str]) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict):
+            out.append(obj)
+    return out
+
+
+def _first_ts_epoch(path: Path) -> float | None:
+    try:
+        with path.open("rb") as fh:
+            head = fh.readline(READ_BLOCK)
+    except OSError:
+        return None
+    try:
+        ts = str(json.loads(head).get("ts_utc", "")).strip()
+        return datetime.fromisoformat(ts).timestamp()
+    except (ValueError, AttributeError):
+        return None
+
+
+class StreamCursor:
+    """Byte offset + inode position in a JSONL stream, surviving EventLog rotation.
+
+    ``read_new`` returns only complete lines appended since the last call.
+    When the active file's inode changes, the rest of the old inode is read
+    from the newest sealed segment (kept uncompressed by EventLog) before
+    starting the new file at offset 0; a shrinking file with the same inode
+    is treated as truncated and re-read from the start.
+    """
+
+    def __init__(self, path: Path, *, ino: int | None = None, offset: int = 0, positioned: bool = False) -> None:
+        self.path = Path(path)
+        self.ino = ino
+        self.offset = int(offset)
+        # False until seek_tail/read_new has run; a missing stream still counts as positioned at 0.
+        self.positioned = positioned or ino is not None
+        self.rotations = 0
+
+    @classmethod
+    def from_state(cls, path: Path, state: Any) -> StreamCursor:
+        if not isinstance(state, dict) or state.get("path") != str(path):
+            return cls(path)
+        ino = state.get("ino")
+        return cls(
+            path,
+            ino=int(ino) if ino is not None else None,
+            offset=int(state.get("offset", 0)),
+            positioned=bool(state.get("positioned", False)),
+        )
+
+    def state(self) -> dict[str, Any]:
+        return {"path": str(self.path), "ino": self.ino, "offset": self.offset, "positioned": self.positioned}
+
+    def seek_tail(self, limit: int) -> list[str]:
+        """Position at the end of the stream and return (up to) its last ``limit`` lines."""
+        self.positioned = True
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.ino, self.offset = None, 0
+            return []
+        end = self._complete_end(self.path, st.st_size)
+        self.ino, self.offset = st.st_ino, end
+        return tail_lines(self.path, limit, end=end)
+
+    @staticmethod
+    def _complete_end(path: Path, size: int) -> int:
+        """Offset just past the last newline at or before ``size``."""
+        pos = size
+        try:
+            with path.open("rb") as fh:
+                while pos > 0:
+                    step = min(READ_BLOCK, pos)
+                    fh.seek(pos - step)
+                    idx = fh.read(step).rfind(b"\n")
+                    if idx >= 0:
+                        return pos - step + idx + 1
+                    pos -= step
+        except OSError:
+            return 0
+        return 0
+
+    @staticmethod
+    def _read_from(fh: Any, offset: int) -> tuple[list[str], int]:
+        fh.seek(offset)
+        data = fh.read()
+        cut = data.rfind(b"\n") + 1
+        lines = [line.decode("utf-8", errors="replace") for line in data[:cut].split(b"\n") if line]
+        return lines, offset + cut
+
+    def _rotated_segment(self, ino: int) -> Path | None:
+        for segment in reversed(sealed_segments(self.path)):
+            if segment.suffix in (".gz", ".zst"):
+                continue
+            try:
+                if segment.stat().st_ino == ino:
+                    return segment
+            except OSError:
+                continue
+        return None
+
+    def read_new(self) -> list[str]:
+        self.positioned = True
+        out: list[str] = []
+        try:
+            fh = self.path.open("rb")
+        except FileNotFoundError:
+            return out
+        with fh:
+            st = os.fstat(fh.fileno())
+            if self.ino is not None and st.st_ino != self.ino:
+                segment = self._rotated_segment(self.ino)
+                if segment is not None:
+                    with segment.open("rb") as old:
+                        out.extend(self._read_from(old, self.offset)[0])
+                self.offset = 0
+                self.rotations += 1
+            elif st.st_size < self.offset:
+                self.offset = 0
+                self.rotations += 1
+            self.ino = st.st_ino
+            lines, self.offset = self._read_from(fh, self.offset)
+            out.extend(lines)
+        return out
+
+
+class EventLog:
+    """Append-only JSONL log split into rotating segments.
+
+    The active segment keeps the configured name so existing readers and
+    appenders keep working. When it grows past ``max_bytes`` or its first
+    record is older than ``max_age_sec`` it is renamed to
+    ``<name>.<UTC stamp>-<ns>`` and a fresh file starts. Sealed segments
+    other than the newest one are compressed (a writer that opened the file
+    just before the rename may still append to the newest), and only the
+    last ``keep_segments`` are retained. Rotation is serialized across
+    processes with a lock file next to the log.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_age_sec: float = 0.0,
+        compress: str = "gzip",
+        keep_segments: int = 16,
+    ) -> None:
+        if compress not in CODECS:
+            raise RuntimeError(f"unsupported event log codec: {compress}")
+        if compress == "zstd" and zstandard is None:
+            compress = "gzip"
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.max_age_sec = float(max_age_sec)
+        self.compress = compress
+        self.keep_segments = int(keep_segments)
+        self._lock = threading.Lock()
+        self._started: tuple[int, float | None] | None = None
+
+    @classmethod
+    def from_env(cls, path: Path) -> EventLog:
+        return cls(
+            path,
+            max_bytes=int(os.getenv("LAM_EVENT_LOG_MAX_BYTES", str(32 * 1024 * 1024))),
+            max_age_sec=float(os.getenv("LAM_EVENT_LOG_MAX_AGE_SEC", "0")),
+            compress=os.getenv("LAM_EVENT_LOG_COMPRESS", "gzip").strip().lower() or "none",
+            keep_segments=int(os.getenv("LAM_EVENT_LOG_KEEP_SEGMENTS", "16")),
+        )
+
+    def append(self, payload: dict[str, Any]) -> None:
+        self.append_line(json.dumps(payload, ensure_ascii=True))
+
+    def append_many(self, payloads: list[dict[str, Any]]) -> None:
+        """Append several records with a single write (one syscall, one rotation check)."""
+        if payloads:
+            self._append_bytes("".join(json.dumps(p, ensure_ascii=True) + "\n" for p in payloads).encode("utf-8"))
+
+    def append_line(self, line: str) -> None:
+        self._append_bytes((line.rstrip("\n") + "\n").encode("utf-8"))
+
+    def _append_bytes(self, data: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                st = os.fstat(fd)
+            finally:
+                os.close(fd)
+            if self._due(st):
+                self.rotate(only_if_due=True)
+
+    def _due(self, st: os.stat_result) -> bool:
+        if self.max_bytes > 0 and st.st_size >= self.max_bytes:
+            return True
+        if self.max_age_sec <= 0:
+            return False
+        if self._started is None or self._started[0] != st.st_ino:
+            self._started = (st.st_ino, _first_ts_epoch(self.path))
+        started = self._started[1]
+        return started is not None and time.time() - started >= self.max_age_sec
+
+    def tail(self, limit: int) -> list[str]:
+        return tail_lines(self.path, limit)
+
+    def segments(self) -> list[Path]:
+        """Sealed segments (oldest first) followed by the active file."""
+        return sealed_segments(self.path) + ([self.path] if self.path.exists() else [])
+
+    def rotate(self, *, only_if_due: bool = False) -> Path | None:
+        """Seal the active segment; returns the sealed path or None if nothing was sealed."""
+        lock_path = self.path.with_name(f".{self.path.name}.lock")
+        with lock_path.open("a") as lock_fh:
+            if fcntl is not None:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    st = self.path.stat()
+                except FileNotFoundError:
+                    return None
+                if st.st_size == 0:
+                    return None
+                if only_if_due and not self._due(st):
+                    # Another process rotated between our append and the lock.
+                    return None
+                now = time.time_ns()
+                stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(now / 1e9))
+                sealed = self.path.with_name(f"{self.path.name}.{stamp}-{now % 1_000_000_000:09d}")
+                os.rename(self.path, sealed)
+                self._started = None
+                self._compress_older(sealed)
+                self._prune()
+                return sealed
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def _compress_older(self, newest: Path) -> None:
+        if self.compress == "none":
+            return
+        for segment in sealed_segments(self.path):
+            if segment == newest or segment.suffix in (".gz", ".zst"):
+                continue
+            suffix = ".zst" if self.compress == "zstd" else ".gz"
+            target = segment.with_name(segment.name + suffix)
+            tmp = target.with_name(f".{target.name}.tmp")
+            with segment.open("rb") as src:
+                if self.compress == "zstd":
+                    with tmp.open("wb") as raw:
+                        zstandard.ZstdCompressor().copy_stream(src, raw)
+                else:
+                    with gzip.open(tmp, "wb") as dst:
+                        while True:
+                            chunk = src.read(READ_BLOCK)
+                            if not chunk:
+                                break
+                            dst.write(chunk)
+            os.replace(tmp, target)
+            segment.unlink()
+
+    def _prune(self) -> None:
+        if self.keep_segments <= 0:
+            return
+        sealed = sealed_segments(self.path)
+        for segment in sealed[: max(0, len(sealed) - self.keep_segments)]:
+            segment.unlink(missing_ok=True)
+
+
+_LOGS: dict[Path, EventLog] = {}
+_LOGS_LOCK = threading.Lock()
+
+
+def event_log(path: Path) -> EventLog:
+    """Process-wide EventLog for ``path`` configured from the environment."""
+    path = Path(path)
+    with _LOGS_LOCK:
+        log = _LOGS.get(path)
+        if log is None:
+            log = _LOGS[path] = EventLog.from_env(path)
+        return log
+
+
+def append_jsonl(path: Path, payload: dict[str, Any]) -> None:
+    event_log(path).append(payload)
+
+
+def append_many_jsonl(path: Path, payloads: list[dict[str, Any]]) -> None:
+    event_log(path).append_many(payloads)
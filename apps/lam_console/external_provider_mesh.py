@@ -7,11 +7,18 @@ import os
 import shutil
 import socket
 import subprocess
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -45,11 +52,6 @@ class ExternalProviderMesh:
         self.audit_stream_file = self.hub_root / "security_audit_stream.jsonl"
         self.devices_file = self.bridge_root / "devices.json"
 
-    @staticmethod
-    def _append_jsonl(path: Path, payload: dict[str, Any]) -> None:
-        with path.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-
     def _provider_github(self) -> dict[str, Any]:
         rc, out, _ = run(["git", "-C", str(self.repo_root), "remote", "-v"])
         has_origin = "origin" in out
@@ -189,10 +191,10 @@ class ExternalProviderMesh:
             "providers": providers,
             "signals": {"status": "ok" if ready == len(providers) else "degraded"},
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         ev = {"ts_utc": payload["ts_utc"], "event": "external_provider_mesh_cycle", "ready": ready, "total": len(providers)}
-        self._append_jsonl(self.events_file, ev)
-        self._append_jsonl(self.audit_stream_file, {"ts_utc": payload["ts_utc"], "source": "external_provider_mesh", "payload": payload})
+        event_log.append_jsonl(self.events_file, ev)
+        event_log.append_jsonl(self.audit_stream_file, {"ts_utc": payload["ts_utc"], "source": "external_provider_mesh", "payload": payload})
         return payload
 
 
@@ -4,11 +4,18 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -24,8 +31,7 @@ def load_json(path: Path, fallback: Any) -> Any:
 
 
 def write_json(path: Path, payload: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+    state_store.write_json(path, payload)
 
 
 class FailsafeGuard:
@@ -67,16 +73,10 @@ class FailsafeGuard:
         self.max_iowait_pct = float(os.getenv("LAM_FAILSAFE_MAX_IOWAIT_PCT", "25"))
         self.max_gpu_temp_c = float(os.getenv("LAM_FAILSAFE_MAX_GPU_TEMP_C", "90"))
 
-    @staticmethod
-    def _append_jsonl(path: Path, payload: dict[str, Any]) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-
     def _emit_event(self, event: str, payload: dict[str, Any]) -> None:
         row = {"ts_utc": utc_now(), "event": event, **payload}
-        self._append_jsonl(self.events_file, row)
-        self._append_jsonl(self.audit_stream_file, {"ts_utc": row["ts_utc"], "source": "failsafe_guard", "payload": row})
+        event_log.append_jsonl(self.events_file, row)
+        event_log.append_jsonl(self.audit_stream_file, {"ts_utc": row["ts_utc"], "source": "failsafe_guard", "payload": row})
 
     def _set_circulation_killswitch(self, on: bool) -> bool:
         policy = load_json(self.gateway_policy_file, {})
@@ -3,11 +3,18 @@ from __future__ import annotations
 
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -36,7 +43,7 @@ class FeedbackEngine:
             "profile": "per_key_feedback",
             "grid": self.grid
         }
-        self.grid_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.grid_file, payload)
 
     def process_event(self, event: dict[str, Any]) -> None:
         evt_type = event.get("event", "unknown")
@@ -5,11 +5,18 @@ import argparse
 import hashlib
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -218,9 +225,9 @@ class FeedbackGateway:
                 "feedback_pressure": round(float(spooled_total) / max(1, len(queue)), 4),
             },
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-        self._append_jsonl(self.events_file, {"ts_utc": payload["ts_utc"], "event": "feedback_gateway_cycle", "sent": sent_total, "spooled": spooled_total})
-        self._append_jsonl(self.audit_stream_file, {"ts_utc": payload["ts_utc"], "source": "feedback_gateway", "payload": payload})
+        state_store.write_json(self.state_file, payload)
+        event_log.append_jsonl(self.events_file, {"ts_utc": payload["ts_utc"], "event": "feedback_gateway_cycle", "sent": sent_total, "spooled": spooled_total})
+        event_log.append_jsonl(self.audit_stream_file, {"ts_utc": payload["ts_utc"], "source": "feedback_gateway", "payload": payload})
         return payload
 
 
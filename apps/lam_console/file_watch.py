@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify() -> ctypes.CDLL | None:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not (hasattr(libc, "inotify_init1") and hasattr(libc, "inotify_add_watch")):
+        return None
+    return libc
+
+
+class DirWatcher:
+    """Blocks until something changes in a set of directories.
+
+    Uses inotify when the kernel provides it (waiting costs no CPU); otherwise,
+    or with ``force_poll``, compares ``(inode, mtime_ns, size)`` of the
+    directory entries every ``poll_sec``. ``wait`` returns the changed paths,
+    or None when changes may have been missed (inotify queue overflow) and the
+    caller should assume everything changed.
+    """
+
+    def __init__(self, dirs: list[Path], *, poll_sec: float = 1.0, force_poll: bool = False) -> None:
+        self.dirs = [Path(d) for d in dict.fromkeys(dirs)]
+        self.poll_sec = max(0.01, float(poll_sec))
+        self._fd = -1
+        self._wds: dict[int, Path] = {}
+        libc = None if force_poll else _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                for directory in self.dirs:
+                    wd = libc.inotify_add_watch(fd, os.fsencode(str(directory)), WATCH_MASK)
+                    if wd < 0:
+                        os.close(fd)
+                        self._fd = -1
+                        self._wds = {}
+                        break
+                    self._wds[wd] = directory
+        self._stamps = self._scan() if self._fd < 0 else {}
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._fd >= 0 else "poll"
+
+    def _scan(self) -> dict[Path, tuple[int, int, int]]:
+        out: dict[Path, tuple[int, int, int]] = {}
+        for directory in self.dirs:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        out[Path(entry.path)] = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return out
+
+    def wait(self, timeout: float) -> set[Path] | None:
+        """Changed paths (possibly empty on timeout), or None when the change set is unknown."""
+        changed: set[Path] = set()
+        if self._fd < 0:
+            deadline = time.monotonic() + max(0.0, timeout)
+            while True:
+                time.sleep(max(0.0, min(self.poll_sec, deadline - time.monotonic())))
+                current = self._scan()
+                changed = {p for p in current.keys() | self._stamps.keys() if current.get(p) != self._stamps.get(p)}
+                self._stamps = current
+                if changed or time.monotonic() >= deadline:
+                    return changed
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return changed
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+                name = data[pos + EVENT_HEADER.size : pos + EVENT_HEADER.size + length].rstrip(b"\0")
+                pos += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif wd in self._wds:
+                    changed.add(self._wds[wd] / os.fsdecode(name) if name else self._wds[wd])
+        return None if overflow else changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
@@ -4,11 +4,18 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -194,7 +201,7 @@ class GovernanceAutopilot:
                 "autopilot_status": "ok" if degraded == 0 else "degraded",
             },
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         with self.timeline_file.open("a", encoding="utf-8") as fh:
             fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
         event = {
@@ -203,10 +210,8 @@ class GovernanceAutopilot:
             "domains_degraded": degraded,
             "governance_pressure": payload["signals"]["governance_pressure"],
         }
-        with self.events_file.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(event, ensure_ascii=True) + "\n")
-        with self.audit_stream_file.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps({"ts_utc": payload["ts_utc"], "source": "governance_autopilot", "event": "snapshot", "payload": payload}, ensure_ascii=True) + "\n")
+        event_log.append_jsonl(self.events_file, event)
+        event_log.append_jsonl(self.audit_stream_file, {"ts_utc": payload["ts_utc"], "source": "governance_autopilot", "event": "snapshot", "payload": payload})
         return payload
 
 
@@ -6,11 +6,18 @@ import json
 import os
 import shutil
 import subprocess
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -146,11 +153,11 @@ class GWSBridge:
             res = self.handle(req)
             envelope = {"id": req_id, "ts_utc": utc_now(), "request": req, "response": res}
             self._append_jsonl(self.results_file, envelope)
-            self._append_jsonl(self.events_file, {"ts_utc": utc_now(), "event": "gws_bridge_request", "id": req_id, "ok": bool(res.get("ok"))})
+            event_log.append_jsonl(self.events_file, {"ts_utc": utc_now(), "event": "gws_bridge_request", "id": req_id, "ok": bool(res.get("ok"))})
             processed += 1
 
         state = {"ts_utc": utc_now(), "processed": processed, "health": self.health()}
-        self.state_file.write_text(json.dumps(state, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, state)
         return state
 
 
@@ -5,11 +5,19 @@ import argparse
 import json
 import os
 import statistics
+import sys
 import time
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -26,20 +34,7 @@ def parse_ts_utc(raw: str) -> float | None:
 
 
 def tail_jsonl(path: Path, limit: int = 8000) -> list[dict[str, Any]]:
-    if not path.exists():
-        return []
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()[-limit:]
-    out: list[dict[str, Any]] = []
-    for line in lines:
-        if not line.strip():
-            continue
-        try:
-            obj = json.loads(line)
-        except json.JSONDecodeError:
-            continue
-        if isinstance(obj, dict):
-            out.append(obj)
-    return out
+    return event_log.tail_jsonl(path, limit)
 
 
 def classify_domain(event: dict[str, Any]) -> str:
@@ -80,42 +75,166 @@ def extract_ms_values(obj: Any, out: list[float], depth: int = 0) -> None:
             extract_ms_values(item, out, depth + 1)
 
 
+FREQ_BANDS = (
+    "ultra_low_0_0_5hz",
+    "low_0_5_2hz",
+    "mid_2_8hz",
+    "high_8_32hz",
+    "ultra_high_32hz_plus",
+)
+
+
+def freq_band_index(f: float) -> int:
+    if f < 0.5:
+        return 0
+    if f < 2:
+        return 1
+    if f < 8:
+        return 2
+    if f < 32:
+        return 3
+    return 4
+
+
 def compute_freq_bands(freq_hz: list[float]) -> dict[str, int]:
-    bands = {
-        "ultra_low_0_0_5hz": 0,
-        "low_0_5_2hz": 0,
-        "mid_2_8hz": 0,
-        "high_8_32hz": 0,
-        "ultra_high_32hz_plus": 0,
-    }
+    bands = dict.fromkeys(FREQ_BANDS, 0)
     for f in freq_hz:
-        if f < 0.5:
-            bands["ultra_low_0_0_5hz"] += 1
-        elif f < 2:
-            bands["low_0_5_2hz"] += 1
-        elif f < 8:
-            bands["mid_2_8hz"] += 1
-        elif f < 32:
-            bands["high_8_32hz"] += 1
-        else:
-            bands["ultra_high_32hz_plus"] += 1
+        bands[FREQ_BANDS[freq_band_index(f)]] += 1
     return bands
 
 
 def compute_io_vector(freq_bands: dict[str, int]) -> dict[str, float]:
-    keys = [
-        "ultra_low_0_0_5hz",
-        "low_0_5_2hz",
-        "mid_2_8hz",
-        "high_8_32hz",
-        "ultra_high_32hz_plus",
-    ]
+    keys = list(FREQ_BANDS)
     total = float(sum(int(freq_bands.get(k, 0)) for k in keys))
     if total <= 0:
         return {k: 0.0 for k in keys}
     return {k: round(float(freq_bands.get(k, 0)) / total, 4) for k in keys}
 
 
+class SpectralWindow:
+    """Rolling per-second aggregates of classified IO rows fed incrementally from JSONL cursors.
+
+    Each tick parses only lines appended since the previous one. A row is
+    classified once on ingest and folded into its second: per-domain event
+    counts, frequency-band counts of the gap to that domain's previous event,
+    and latency sample count and max. The last ``max_samples`` latency values
+    are kept for percentiles. Only cursors and these aggregates are persisted,
+    so the saved state is bounded by the window length, not the event rate.
+    """
+
+    def __init__(self, paths: list[Path], state: Any = None, backfill_lines: int = 12000, max_samples: int = 1024) -> None:
+        state = state if isinstance(state, dict) else {}
+        saved = state.get("cursors", {}) if isinstance(state.get("cursors"), dict) else {}
+        self.backfill_lines = backfill_lines
+        self.cursors = [event_log.StreamCursor.from_state(p, saved.get(str(p))) for p in paths]
+        # second -> domain -> [events, band 0 .. band 4]
+        self.buckets: dict[int, dict[str, list[int]]] = {}
+        # second -> [latency samples, max ms]
+        self.latency: dict[int, list[float]] = {}
+        self.samples: deque[tuple[float, float]] = deque(maxlen=max_samples)
+        self.last_ts: dict[str, float] = {}
+        if state.get("version") == 2 and all(c.positioned for c in self.cursors):
+            self._restore(state)
+        else:
+            self.cursors = [event_log.StreamCursor(p) for p in paths]
+        self.parsed_lines = 0
+
+    def _restore(self, state: dict[str, Any]) -> None:
+        for sec, domains in dict(state.get("buckets", {})).items():
+            try:
+                self.buckets[int(sec)] = {str(d): [int(n) for n in row] for d, row in dict(domains).items()}
+            except (TypeError, ValueError):
+                continue
+        for sec, row in dict(state.get("latency", {})).items():
+            try:
+                self.latency[int(sec)] = [float(row[0]), float(row[1])]
+            except (TypeError, ValueError, IndexError):
+                continue
+        for item in state.get("samples", []):
+            try:
+                self.samples.append((float(item[0]), float(item[1])))
+            except (TypeError, ValueError, IndexError):
+                continue
+        for domain, ts in dict(state.get("last_ts", {})).items():
+            try:
+                self.last_ts[str(domain)] = float(ts)
+            except (TypeError, ValueError):
+                continue
+
+    def _add(self, ts: float, domain: str, ms_values: list[float]) -> None:
+        sec = int(ts)
+        row = self.buckets.setdefault(sec, {}).setdefault(domain, [0] * (1 + len(FREQ_BANDS)))
+        row[0] += 1
+        prev = self.last_ts.get(domain)
+        if prev is not None and ts - prev > 0.001:
+            row[1 + freq_band_index(1.0 / (ts - prev))] += 1
+        self.last_ts[domain] = max(ts, prev) if prev is not None else ts
+        if ms_values:
+            lat = self.latency.setdefault(sec, [0.0, 0.0])
+            lat[0] += len(ms_values)
+            lat[1] = max(lat[1], max(ms_values))
+            self.samples.extend((ts, ms) for ms in ms_values)
+
+    def update(self, since: float) -> None:
+        fresh: list[tuple[float, str, list[float]]] = []
+        self.parsed_lines = 0
+        for cursor in self.cursors:
+            lines = cursor.read_new() if cursor.positioned else cursor.seek_tail(self.backfill_lines)
+            self.parsed_lines += len(lines)
+            for row in event_log.parse_jsonl(lines):
+                ts = parse_ts_utc(str(row.get("ts_utc", "")))
+                if ts is None or ts < since:
+                    continue
+                ms_values: list[float] = []
+                extract_ms_values(row, ms_values)
+                fresh.append((ts, classify_domain(row), ms_values))
+        for ts, domain, ms_values in sorted(fresh, key=lambda x: x[0]):
+            self._add(ts, domain, ms_values)
+        floor = int(since)
+        for sec in [sec for sec in self.buckets if sec < floor]:
+            del self.buckets[sec]
+        for sec in [sec for sec in self.latency if sec < floor]:
+            del self.latency[sec]
+        while self.samples and self.samples[0][0] < since:
+            self.samples.popleft()
+        for domain in [d for d, ts in self.last_ts.items() if ts < since]:
+            del self.last_ts[domain]
+
+    def counts(self) -> dict[str, int]:
+        out: dict[str, int] = {}
+        for domains in self.buckets.values():
+            for domain, row in domains.items():
+                out[domain] = out.get(domain, 0) + row[0]
+        return out
+
+    def frequency_bands(self) -> dict[str, int]:
+        bands = dict.fromkeys(FREQ_BANDS, 0)
+        for domains in self.buckets.values():
+            for row in domains.values():
+                for i, key in enumerate(FREQ_BANDS):
+                    bands[key] += row[1 + i]
+        return bands
+
+    def latency_summary(self) -> dict[str, Any]:
+        values = [ms for _, ms in self.samples]
+        return {
+            "sample_count": int(sum(row[0] for row in self.latency.values())),
+            "p50_ms": round(statistics.median(values), 3) if values else 0.0,
+            "p95_ms": round(statistics.quantiles(values, n=20)[18], 3) if len(values) >= 20 else (round(max(values), 3) if values else 0.0),
+            "max_ms": round(max((row[1] for row in self.latency.values()), default=0.0), 3),
+        }
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "version": 2,
+            "cursors": {str(c.path): c.state() for c in self.cursors},
+            "buckets": {str(sec): domains for sec, domains in sorted(self.buckets.items())},
+            "latency": {str(sec): row for sec, row in sorted(self.latency.items())},
+            "samples": [[ts, ms] for ts, ms in self.samples],
+            "last_ts": self.last_ts,
+        }
+
+
 class IOSpectralAnalyzer:
     def __init__(self, repo_root: Path) -> None:
         self.repo_root = repo_root
@@ -130,50 +249,31 @@ class IOSpectralAnalyzer:
 
         self.bridge_events = self.bridge_root / "events.jsonl"
         self.bridge_commands = self.bridge_root / "commands.jsonl"
+        self.cursor_file = self.hub_root / "io_spectral_cursors.json"
+        self._window: SpectralWindow | None = None
+
+    def _load_window(self) -> SpectralWindow:
+        if self._window is None:
+            try:
+                saved = json.loads(self.cursor_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                saved = None
+            self._window = SpectralWindow([self.bridge_events, self.bridge_commands], saved)
+        return self._window
 
     def collect(self) -> dict[str, Any]:
         now = time.time()
         window_sec = int(os.getenv("LAM_IO_SPECTRAL_WINDOW_SEC", "600"))
         since = now - window_sec
 
-        rows = tail_jsonl(self.bridge_events, limit=12000) + tail_jsonl(self.bridge_commands, limit=12000)
-        rows.sort(key=lambda x: str(x.get("ts_utc", "")))
-
-        ts_rows: list[tuple[float, dict[str, Any]]] = []
-        for row in rows:
-            ts = parse_ts_utc(str(row.get("ts_utc", "")))
-            if ts is None or ts < since:
-                continue
-            ts_rows.append((ts, row))
-
-        domain_counts: dict[str, int] = {}
-        domain_ts: dict[str, list[float]] = {}
-        ms_values: list[float] = []
-        for ts, row in ts_rows:
-            domain = classify_domain(row)
-            domain_counts[domain] = domain_counts.get(domain, 0) + 1
-            domain_ts.setdefault(domain, []).append(ts)
-            extract_ms_values(row, ms_values)
-
-        freq_samples: list[float] = []
-        for values in domain_ts.values():
-            if len(values) < 2:
-                continue
-            for i in range(1, len(values)):
-                dt = values[i] - values[i - 1]
-                if dt <= 0.001:
-                    continue
-                freq_samples.append(1.0 / dt)
+        window = self._load_window()
+        window.update(since)
+        state_store.write_json(self.cursor_file, window.state())
 
-        freq_bands = compute_freq_bands(freq_samples)
+        domain_counts = window.counts()
+        freq_bands = window.frequency_bands()
         io_vector = compute_io_vector(freq_bands)
-
-        latency = {
-            "sample_count": len(ms_values),
-            "p50_ms": round(statistics.median(ms_values), 3) if ms_values else 0.0,
-            "p95_ms": round(statistics.quantiles(ms_values, n=20)[18], 3) if len(ms_values) >= 20 else (round(max(ms_values), 3) if ms_values else 0.0),
-            "max_ms": round(max(ms_values), 3) if ms_values else 0.0,
-        }
+        latency = window.latency_summary()
         top_domain = ""
         if domain_counts:
             top_domain = max(domain_counts.items(), key=lambda kv: kv[1])[0]
@@ -185,7 +285,8 @@ class IOSpectralAnalyzer:
                 4,
             ),
             "dominant_domain": top_domain,
-            "io_event_count_window": len(ts_rows),
+            "io_event_count_window": sum(domain_counts.values()),
+            "lines_parsed_tick": window.parsed_lines,
             "window_sec": window_sec,
         }
         return {
@@ -201,17 +302,13 @@ class IOSpectralAnalyzer:
 
     def run_once(self) -> dict[str, Any]:
         payload = self.collect()
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         with self.timeline_file.open("a", encoding="utf-8") as fh:
             fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-        with self.audit_stream_file.open("a", encoding="utf-8") as fh:
-            fh.write(
-                json.dumps(
-                    {"ts_utc": payload["ts_utc"], "source": "io_spectral", "event": "io_spectral_snapshot", "payload": payload},
-                    ensure_ascii=True,
-                )
-                + "\n"
-            )
+        event_log.append_jsonl(
+            self.audit_stream_file,
+            {"ts_utc": payload["ts_utc"], "source": "io_spectral", "event": "io_spectral_snapshot", "payload": payload},
+        )
         return payload
 
 
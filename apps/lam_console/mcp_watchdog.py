@@ -6,11 +6,18 @@ import json
 import os
 import shutil
 import subprocess
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -38,8 +45,7 @@ class MCPWatchdog:
             return 99, "", str(exc)
 
     def _append_event(self, payload: dict[str, Any]) -> None:
-        with self.events_file.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
+        event_log.append_jsonl(self.events_file, payload)
 
     def _transport_check(self) -> dict[str, Any]:
         ext_dir = Path.home() / ".gemini" / "extensions" / "google-workspace"
@@ -136,7 +142,7 @@ class MCPWatchdog:
         elif should_heal:
             result["heal_skipped"] = "cooldown"
 
-        self.state_file.write_text(json.dumps(result, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, result)
         self._append_event({"ts_utc": utc_now(), "event": "mcp_watchdog", "ok": bool(result.get("health", {}).get("overall_ok")), "heal_attempted": result.get("heal_attempted", False)})
         return result
 
@@ -5,11 +5,18 @@ import argparse
 import json
 import os
 import shutil
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -319,13 +326,13 @@ class MediaStreamSync:
                 "status": "ok" if conflicts == 0 else "degraded",
             },
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         self._append_jsonl(self.timeline_file, payload)
-        self._append_jsonl(
+        event_log.append_jsonl(
             self.events_file,
             {"ts_utc": payload["ts_utc"], "event": "media_stream_sync_tick", "planned": planned, "applied": applied, "conflicts": conflicts},
         )
-        self._append_jsonl(
+        event_log.append_jsonl(
             self.audit_stream_file,
             {"ts_utc": payload["ts_utc"], "source": "media_stream_sync", "event": "snapshot", "payload": payload},
         )
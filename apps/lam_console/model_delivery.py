@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import http.client
+import json
+import ssl
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+from urllib.parse import urlsplit
+
+DEFAULT_CONCURRENCY = 8
+# Errors meaning the server dropped an idle keep-alive connection before reading the request.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class DeliveryError(RuntimeError):
+    """The endpoint answered with a non-2xx status."""
+
+
+def parse_concurrency(raw: str, default: int) -> dict[str, int]:
+    """``"codex=16,gemini=4"`` -> per-provider in-flight limits (bad entries are ignored)."""
+    out: dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        if name.strip():
+            out[name.strip().lower()] = max(1, limit)
+    return {"*": max(1, int(default)), **out}
+
+
+def decode_response(raw: str) -> dict[str, Any]:
+    if raw.startswith("{") and raw.endswith("}"):
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            pass
+    return {"raw": raw}
+
+
+class EndpointPool:
+    """Persistent HTTP/1.1 connections to one endpoint, at most ``size`` of them.
+
+    Connections are reused most-recently-released first; a request that fails
+    because the server closed an idle reused connection is retried once on a
+    fresh one.
+    """
+
+    def __init__(self, endpoint: str, *, size: int, timeout_sec: float) -> None:
+        parts = urlsplit(endpoint)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise RuntimeError(f"unsupported model endpoint: {endpoint}")
+        self.endpoint = endpoint
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout_sec = float(timeout_sec)
+        self._idle: list[http.client.HTTPConnection] = []
+        self._slots = threading.BoundedSemaphore(max(1, int(size)))
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout_sec, context=ssl.create_default_context())
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout_sec)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def post_json(self, payload: dict[str, Any]) -> dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        with self._slots:
+            conn, reused = self._acquire()
+            while True:
+                try:
+                    conn.request("POST", self.path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    raw = resp.read().decode("utf-8", errors="replace")
+                except STALE_CONNECTION_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    conn, reused = self._connect(), False
+                    continue
+                except BaseException:
+                    conn.close()
+                    raise
+                break
+            if resp.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        if not 200 <= resp.status < 300:
+            raise DeliveryError(f"HTTP Error {resp.status}: {resp.reason}")
+        return decode_response(raw)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class DeliveryEngine:
+    """Concurrent sender over pooled keep-alive connections, one pool per endpoint.
+
+    ``deliver`` keeps at most the provider's concurrency limit of requests in
+    flight and yields ``(index, response, error)`` as each finishes.
+    ``admit`` is consulted before every submission, so a caller-side breaker
+    that opens mid-batch stops further sends while in-flight requests finish.
+    """
+
+    def __init__(self, *, concurrency: dict[str, int], timeout_sec: float) -> None:
+        self.concurrency = dict(concurrency)
+        self.timeout_sec = float(timeout_sec)
+        self._pools: dict[str, EndpointPool] = {}
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+
+    def limit(self, provider: str) -> int:
+        return int(self.concurrency.get(provider, self.concurrency.get("*", DEFAULT_CONCURRENCY)))
+
+    def pool(self, provider: str, endpoint: str) -> EndpointPool:
+        pool = self._pools.get(endpoint)
+        if pool is None:
+            pool = self._pools[endpoint] = EndpointPool(endpoint, size=self.limit(provider), timeout_sec=self.timeout_sec)
+        return pool
+
+    def _executor(self, provider: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(provider)
+        if executor is None:
+            executor = self._executors[provider] = ThreadPoolExecutor(
+                max_workers=self.limit(provider), thread_name_prefix=f"deliver-{provider}"
+            )
+        return executor
+
+    def deliver(
+        self,
+        provider: str,
+        endpoint: str,
+        payloads: list[dict[str, Any]],
+        *,
+        admit: Callable[[], bool] = lambda: True,
+    ) -> Iterator[tuple[int, dict[str, Any] | None, BaseException | None]]:
+        pool = self.pool(provider, endpoint)
+        executor = self._executor(provider)
+        window = self.limit(provider)
+        inflight: dict[Future[dict[str, Any]], int] = {}
+        pending = iter(enumerate(payloads))
+        admitting = True
+        while True:
+            while admitting and len(inflight) < window:
+                nxt = next(pending, None) if admit() else None
+                if nxt is None:
+                    admitting = False
+                    break
+                inflight[executor.submit(pool.post_json, nxt[1])] = nxt[0]
+            if not inflight:
+                return
+            done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = inflight.pop(future)
+                error = future.exception()
+                yield index, (None if error is not None else future.result()), error
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            pool.endpoint: {"opened": pool.opened, "reused": pool.reused, "idle": len(pool._idle)}
+            for pool in self._pools.values()
+        }
+
+    def close(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors.clear()
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
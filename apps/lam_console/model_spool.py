@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console import event_log
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log
+
+
+DEFAULT_BUSY_TIMEOUT_SEC = 30.0
+DEFAULT_WINDOW = 4096
+DEFAULT_SEAL_BYTES = 4 * 1024 * 1024
+# A producer that opened the active segment just before it was sealed may still
+# append to the sealed file for a moment; sealed segments outlive this first.
+DEFAULT_RETIRE_GRACE_SEC = 5.0
+INDEX_NAME = "spool_index.sqlite3"
+_SEGMENT = re.compile(r"^(?P<provider>[^.]+)\.jsonl(?P<sealed>\.\d{8}T\d{6}Z-\d{9})?$")
+
+
+@dataclass(frozen=True)
+class SpoolEntry:
+    """A spooled record that was read but not yet acknowledged, with its retry metadata."""
+
+    ino: int
+    offset: int
+    length: int
+    attempts: int
+    next_retry_epoch: int
+    last_error: str
+
+
+@dataclass
+class _Segment:
+    """A segment row of the side index, plus the file size seen on this pass."""
+
+    ino: int
+    seq: int
+    name: str
+    read_offset: int
+    sealed_epoch: float
+    size: int = 0
+
+
+class ModelSpool:
+    """Append-only model spool: ``<provider>.jsonl`` segments plus a SQLite side index.
+
+    Producers only append to the active ``<provider>.jsonl``. The consumer
+    reads every segment forward from a persisted byte offset into a bounded
+    window of ``entries`` (record location, attempts, next retry), and
+    acknowledges a record by deleting its entry and counting it against its
+    segment -- segments are never rewritten. Segments are keyed by inode, so
+    sealing (EventLog rotation to ``<provider>.jsonl.<stamp>``) keeps their
+    read offset. A sealed segment whose records are all read and acknowledged
+    is deleted once ``retire_grace_sec`` has passed. Cursor moves and acks each
+    commit in one transaction, so a crash redelivers at most the batch that
+    was in flight.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path,
+        *,
+        window: int = DEFAULT_WINDOW,
+        seal_bytes: int = DEFAULT_SEAL_BYTES,
+        retire_grace_sec: float = DEFAULT_RETIRE_GRACE_SEC,
+        busy_timeout_sec: float = DEFAULT_BUSY_TIMEOUT_SEC,
+    ) -> None:
+        self.spool_dir = Path(spool_dir)
+        self.window = max(1, int(window))
+        self.seal_bytes = int(seal_bytes)
+        self.retire_grace_sec = float(retire_grace_sec)
+        self.busy_timeout_sec = busy_timeout_sec
+        self.path = self.spool_dir / INDEX_NAME
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS segments (
+                    provider TEXT NOT NULL,
+                    ino INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    read_offset INTEGER NOT NULL DEFAULT 0,
+                    records INTEGER NOT NULL DEFAULT 0,
+                    acked INTEGER NOT NULL DEFAULT 0,
+                    sealed_epoch REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (provider, ino)
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    provider TEXT NOT NULL,
+                    ino INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_retry_epoch INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (provider, ino, offset)
+                );
+                CREATE INDEX IF NOT EXISTS entries_due ON entries(provider, next_retry_epoch, seq, offset);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def active_path(self, provider: str) -> Path:
+        return self.spool_dir / f"{provider}.jsonl"
+
+    def append(self, provider: str, record: dict[str, Any]) -> Path:
+        """Enqueue one record with a single ``O_APPEND`` write to the active segment."""
+        target = self.active_path(provider)
+        data = (json.dumps(record, ensure_ascii=True) + "\n").encode("utf-8")
+        fd = os.open(target, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        return target
+
+    def _files(self) -> dict[str, list[Path]]:
+        """Segment files per provider, oldest first: sealed segments by stamp, then the active one."""
+        out: dict[str, list[Path]] = {}
+        try:
+            names = sorted(e.name for e in os.scandir(self.spool_dir))
+        except OSError:
+            return out
+        for name in names:
+            match = _SEGMENT.match(name)
+            if match:
+                out.setdefault(match.group("provider"), []).append(self.spool_dir / name)
+        for files in out.values():
+            files.sort(key=lambda p: (p.name.endswith(".jsonl"), p.name))
+        return out
+
+    def _indexed(self, conn: sqlite3.Connection) -> set[str]:
+        return {str(row[0]) for row in conn.execute("SELECT DISTINCT provider FROM segments")}
+
+    def providers(self) -> list[str]:
+        with closing(self._connect()) as conn:
+            indexed = self._indexed(conn)
+        return sorted(indexed | set(self._files()))
+
+    def _sync_segments(self, conn: sqlite3.Connection, provider: str, files: list[Path]) -> list[_Segment]:
+        rows = {
+            int(r[0]): _Segment(int(r[0]), int(r[1]), str(r[2]), int(r[3]), float(r[4]))
+            for r in conn.execute("SELECT ino, seq, name, read_offset, sealed_epoch FROM segments WHERE provider = ?", (provider,))
+        }
+        next_seq = max((r.seq for r in rows.values()), default=0) + 1
+        now = time.time()
+        live: list[_Segment] = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            sealed = not path.name.endswith(".jsonl")
+            row = rows.pop(st.st_ino, None)
+            if row is not None and (st.st_size < row.read_offset or (row.name != path.name and not row.name.endswith(".jsonl"))):
+                # Truncated, or a recycled inode: sealed segments are never renamed.
+                self._forget(conn, provider, row.ino)
+                row = None
+            if row is None:
+                row = _Segment(st.st_ino, next_seq, path.name, 0, now if sealed else 0.0)
+                next_seq += 1
+                conn.execute(
+                    "INSERT INTO segments (provider, ino, seq, name, sealed_epoch) VALUES (?, ?, ?, ?, ?)",
+                    (provider, row.ino, row.seq, row.name, row.sealed_epoch),
+                )
+            elif row.name != path.name:
+                row.name = path.name
+                row.sealed_epoch = now
+                conn.execute(
+                    "UPDATE segments SET name = ?, sealed_epoch = ? WHERE provider = ? AND ino = ?",
+                    (row.name, row.sealed_epoch, provider, row.ino),
+                )
+            row.size = st.st_size
+            live.append(row)
+        for row in rows.values():
+            # Removed behind our back: whatever it still held cannot be read any more.
+            self._forget(conn, provider, row.ino)
+        return sorted(live, key=lambda r: r.seq)
+
+    @staticmethod
+    def _forget(conn: sqlite3.Connection, provider: str, ino: int) -> None:
+        conn.execute("DELETE FROM entries WHERE provider = ? AND ino = ?", (provider, ino))
+        conn.execute("DELETE FROM segments WHERE provider = ? AND ino = ?", (provider, ino))
+
+    def ingest(self, provider: str) -> int:
+        """Index records appended since the last call, keeping at most ``window`` unacknowledged; returns how many."""
+        files = self._files().get(provider, [])
+        added = 0
+        now = time.time()
+        with self._transaction() as conn:
+            segments = self._sync_segments(conn, provider, files)
+            outstanding = conn.execute("SELECT COUNT(*) FROM entries WHERE provider = ?", (provider,)).fetchone()[0]
+            room = self.window - int(outstanding)
+            for seg in segments:
+                if room <= 0:
+                    break
+                if seg.size <= seg.read_offset:
+                    continue
+                # Past the grace period nothing will complete a torn last line of a sealed segment.
+                final = bool(seg.sealed_epoch) and now - seg.sealed_epoch >= self.retire_grace_sec
+                offset = seg.read_offset
+                records = malformed = 0
+                with (self.spool_dir / seg.name).open("rb") as fh:
+                    fh.seek(offset)
+                    while room > 0:
+                        line = fh.readline()
+                        if not line or (not line.endswith(b"\n") and not final):
+                            break
+                        start, offset = offset, offset + len(line)
+                        records += 1
+                        try:
+                            rec = json.loads(line)
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            rec = None
+                        if not isinstance(rec, dict):
+                            malformed += 1  # acknowledged on sight
+                            continue
+                        conn.execute(
+                            "INSERT OR IGNORE INTO entries (provider, ino, seq, offset, length, next_retry_epoch) VALUES (?, ?, ?, ?, ?, ?)",
+                            (provider, seg.ino, seg.seq, start, len(line), int(rec.get("next_retry_epoch", 0) or 0)),
+                        )
+                        room -= 1
+                        added += 1
+                conn.execute(
+                    "UPDATE segments SET read_offset = ?, records = records + ?, acked = acked + ? WHERE provider = ? AND ino = ?",
+                    (offset, records, malformed, provider, seg.ino),
+                )
+        return added
+
+    def due(self, provider: str, now: int, limit: int = 0) -> list[tuple[SpoolEntry, dict[str, Any]]]:
+        """Indexed entries whose retry time has come, oldest first, with their records read back by offset."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT e.ino, e.offset, e.length, e.attempts, e.next_retry_epoch, e.last_error, s.name "
+                "FROM entries e JOIN segments s ON s.provider = e.provider AND s.ino = e.ino "
+                "WHERE e.provider = ? AND e.next_retry_epoch <= ? ORDER BY e.seq, e.offset LIMIT ?",
+                (provider, int(now), limit if limit > 0 else self.window),
+            ).fetchall()
+        out: list[tuple[SpoolEntry, dict[str, Any]]] = []
+        handles: dict[str, Any] = {}
+        try:
+            for ino, offset, length, attempts, next_retry, last_error, name in rows:
+                fh = handles.get(name)
+                if fh is None:
+                    fh = handles[name] = (self.spool_dir / name).open("rb")
+                fh.seek(int(offset))
+                entry = SpoolEntry(int(ino), int(offset), int(length), int(attempts), int(next_retry), str(last_error))
+                out.append((entry, json.loads(fh.read(int(length)))))
+        finally:
+            for fh in handles.values():
+                fh.close()
+        return out
+
+    def settle(
+        self,
+        provider: str,
+        *,
+        acked: Sequence[SpoolEntry] = (),
+        retries: Sequence[tuple[SpoolEntry, int, int, str]] = (),
+    ) -> None:
+        """Acknowledge ``acked`` and store ``(entry, attempts, next_retry_epoch, last_error)`` retries in one transaction."""
+        if not acked and not retries:
+            return
+        per_segment: dict[int, int] = {}
+        for entry in acked:
+            per_segment[entry.ino] = per_segment.get(entry.ino, 0) + 1
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM entries WHERE provider = ? AND ino = ? AND offset = ?",
+                [(provider, e.ino, e.offset) for e in acked],
+            )
+            conn.executemany(
+                "UPDATE segments SET acked = acked + ? WHERE provider = ? AND ino = ?",
+                [(count, provider, ino) for ino, count in per_segment.items()],
+            )
+            conn.executemany(
+                "UPDATE entries SET attempts = ?, next_retry_epoch = ?, last_error = ? WHERE provider = ? AND ino = ? AND offset = ?",
+                [(attempts, next_retry, error, provider, e.ino, e.offset) for e, attempts, next_retry, error in retries],
+            )
+
+    def retire(self, provider: str) -> int:
+        """Seal the drained (or oversized, fully read) active segment and delete settled sealed ones; returns deletions."""
+        active = self.active_path(provider)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT ino, name, read_offset, records, acked, sealed_epoch FROM segments WHERE provider = ?", (provider,)
+            ).fetchall()
+        removed = 0
+        now = time.time()
+        for ino, name, read_offset, records, acked, sealed_epoch in rows:
+            path = self.spool_dir / str(name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if st.st_ino != int(ino) or st.st_size != int(read_offset):
+                continue
+            settled = int(acked) >= int(records)
+            if path == active:
+                if st.st_size and (settled or 0 < self.seal_bytes <= st.st_size):
+                    sealed = event_log.EventLog(active, max_bytes=0, compress="none", keep_segments=0).rotate()
+                    if sealed is not None:
+                        with self._transaction() as tx:
+                            tx.execute(
+                                "UPDATE segments SET name = ?, sealed_epoch = ? WHERE provider = ? AND ino = ?",
+                                (sealed.name, time.time(), provider, int(ino)),
+                            )
+            elif settled and now - float(sealed_epoch) >= self.retire_grace_sec:
+                path.unlink()
+                with self._transaction() as tx:
+                    self._forget(tx, provider, int(ino))
+                removed += 1
+        return removed
+
+    def backlog(self) -> dict[str, dict[str, int]]:
+        """Per provider: indexed records still unacknowledged, how many of those are backing off, and unread bytes."""
+        files = self._files()
+        out: dict[str, dict[str, int]] = {}
+        with closing(self._connect()) as conn:
+            for provider in sorted(set(files) | self._indexed(conn)):
+                pending, retrying = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(attempts > 0 OR next_retry_epoch > 0), 0) FROM entries WHERE provider = ?",
+                    (provider,),
+                ).fetchone()
+                offsets = dict(conn.execute("SELECT ino, read_offset FROM segments WHERE provider = ?", (provider,)).fetchall())
+                unread = 0
+                for path in files.get(provider, []):
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    unread += max(0, st.st_size - int(offsets.get(st.st_ino, 0)))
+                out[provider] = {
+                    "pending": int(pending),
+                    "retrying": int(retrying),
+                    "unread_bytes": unread,
+                    "segments": len(files.get(provider, [])),
+                }
+        return out
@@ -2,14 +2,48 @@
 from __future__ import annotations
 
 import argparse
+import http.client
 import json
 import os
+import sys
 import time
-import urllib.error
-import urllib.request
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import state_store
+    from apps.lam_console.model_delivery import (
+        DEFAULT_CONCURRENCY,
+        DeliveryEngine,
+        DeliveryError,
+        parse_concurrency,
+    )
+    from apps.lam_console.model_spool import (
+        DEFAULT_SEAL_BYTES,
+        DEFAULT_WINDOW,
+        ModelSpool,
+        SpoolEntry,
+    )
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import state_store
+    from apps.lam_console.model_delivery import (
+        DEFAULT_CONCURRENCY,
+        DeliveryEngine,
+        DeliveryError,
+        parse_concurrency,
+    )
+    from apps.lam_console.model_spool import (
+        DEFAULT_SEAL_BYTES,
+        DEFAULT_WINDOW,
+        ModelSpool,
+        SpoolEntry,
+    )
+
+
+# What a failed delivery can raise: transport errors (incl. timeouts), protocol errors and non-2xx answers.
+DELIVERY_ERRORS = (OSError, http.client.HTTPException, DeliveryError)
+
 
 def utc_now() -> str:
     from datetime import datetime, timezone
@@ -44,8 +78,17 @@ class ModelDeliveryWorker:
         self.breaker_threshold = int(os.getenv("LAM_MODEL_WORKER_BREAKER_THRESHOLD", "3"))
         self.breaker_cooldown_sec = int(os.getenv("LAM_MODEL_WORKER_BREAKER_COOLDOWN_SEC", "120"))
         self.timeout_sec = int(os.getenv("LAM_MODEL_WORKER_TIMEOUT_SEC", "30"))
+        self.concurrency = parse_concurrency(
+            os.getenv("LAM_MODEL_WORKER_PROVIDER_CONCURRENCY", ""),
+            int(os.getenv("LAM_MODEL_WORKER_CONCURRENCY", str(DEFAULT_CONCURRENCY))),
+        )
+        self.engine = DeliveryEngine(concurrency=self.concurrency, timeout_sec=self.timeout_sec)
+        self.spool = ModelSpool(
+            self.spool_dir,
+            window=int(os.getenv("LAM_MODEL_SPOOL_WINDOW", str(DEFAULT_WINDOW))),
+            seal_bytes=int(os.getenv("LAM_MODEL_SPOOL_SEAL_BYTES", str(DEFAULT_SEAL_BYTES))),
+        )
 
-        self.spool_dir.mkdir(parents=True, exist_ok=True)
         self.outbox_dir.mkdir(parents=True, exist_ok=True)
         self.bridge_root.mkdir(parents=True, exist_ok=True)
 
@@ -61,20 +104,10 @@ class ModelDeliveryWorker:
 
     def save_state(self, state: dict[str, Any]) -> None:
         state["last_run_utc"] = utc_now()
-        self.state_file.write_text(json.dumps(state, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-
-    def _send(self, endpoint: str, payload: dict[str, Any]) -> dict[str, Any]:
-        body = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(endpoint, data=body, method="POST")
-        req.add_header("Content-Type", "application/json")
-        with urllib.request.urlopen(req, timeout=self.timeout_sec) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-        if raw.startswith("{") and raw.endswith("}"):
-            try:
-                return json.loads(raw)
-            except json.JSONDecodeError:
-                pass
-        return {"raw": raw}
+        state_store.write_json(self.state_file, state)
+
+    def close(self) -> None:
+        self.engine.close()
 
     def _breaker_open(self, state: dict[str, Any], provider: str) -> bool:
         breaker = state.setdefault("breakers", {}).setdefault(provider, {"failures": 0, "open_until_epoch": 0})
@@ -98,91 +131,136 @@ class ModelDeliveryWorker:
     def _next_backoff(self, attempt: int) -> int:
         return min(self.backoff_cap_sec, self.backoff_base_sec * (2 ** max(0, attempt - 1)))
 
-    def run_once(self) -> dict[str, Any]:
-        state = self.load_state()
-        attempts = state.setdefault("attempts", {})
-        totals = {"processed": 0, "sent": 0, "failed": 0, "dead": 0, "skipped": 0}
-
-        for spool_file in sorted(self.spool_dir.glob("*.jsonl")):
-            provider = spool_file.stem.lower()
-            endpoint = self.endpoints.get(provider, "")
-            unresolved: list[dict[str, Any]] = []
-
-            raw_lines = spool_file.read_text(encoding="utf-8", errors="replace").splitlines()
-            for line in raw_lines:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    rec = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-
-                next_retry = int(rec.get("next_retry_epoch", 0))
-                if next_retry and next_retry > epoch_now():
-                    unresolved.append(rec)
-                    continue
-
-                totals["processed"] += 1
-                if self._breaker_open(state, provider):
-                    totals["skipped"] += 1
-                    rec["next_retry_epoch"] = epoch_now() + self._next_backoff(1)
-                    unresolved.append(rec)
-                    continue
-                if not endpoint:
-                    totals["skipped"] += 1
-                    unresolved.append(rec)
+    def _delivered(self, state: dict[str, Any], provider: str, rec: dict[str, Any], response: dict[str, Any]) -> None:
+        append_jsonl(
+            self.outbox_dir / f"{provider}_model_outbox.jsonl",
+            {
+                "ts_utc": utc_now(),
+                "provider": provider,
+                "request_id": rec.get("id", ""),
+                "response": response,
+            },
+        )
+        self._breaker_ok(state, provider)
+        state["attempts"].pop(self._attempt_key(rec), None)
+        append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_sent", "provider": provider})
+
+    def _failed(
+        self, state: dict[str, Any], provider: str, entry: SpoolEntry, rec: dict[str, Any], exc: BaseException
+    ) -> tuple[SpoolEntry, int, int, str] | None:
+        """Count one failed attempt; returns the retry to record, or None once the record is dead-lettered."""
+        # Attempts counted before the spool index existed live in the worker state.
+        cur = max(entry.attempts, int(state["attempts"].pop(self._attempt_key(rec), 0))) + 1
+        self._breaker_fail(state, provider)
+        if cur >= self.max_attempts:
+            append_jsonl(
+                self.dead_letter_file,
+                {
+                    "ts_utc": utc_now(),
+                    "provider": provider,
+                    "record": {**rec, "last_error": entry.last_error} if entry.last_error else rec,
+                    "error": str(exc),
+                    "attempts": cur,
+                },
+            )
+            append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_dead_letter", "provider": provider})
+            return None
+        append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_retry", "provider": provider, "attempt": cur})
+        return entry, cur, epoch_now() + self._next_backoff(cur), str(exc)
+
+    def _drain(self, state: dict[str, Any], provider: str, totals: dict[str, int]) -> dict[str, Any] | None:
+        """Deliver one provider's due records; returns its delivery stats when anything was sent.
+
+        Records come from the spool index in windows, so a pass costs the
+        records it touches rather than the size of the backlog; acks and
+        retry metadata for a window are committed together.
+        """
+        endpoint = self.endpoints.get(provider.lower(), "")
+        seen: set[tuple[int, int]] = set()
+        attempted = sent = 0
+        started = time.perf_counter()
+        while True:
+            self.spool.ingest(provider)
+            batch = [(entry, rec) for entry, rec in self.spool.due(provider, epoch_now()) if (entry.ino, entry.offset) not in seen]
+            if not batch:
+                break
+            seen.update((entry.ino, entry.offset) for entry, _ in batch)
+            totals["processed"] += len(batch)
+            acked: list[SpoolEntry] = []
+            retries: list[tuple[SpoolEntry, int, int, str]] = []
+            submitted: set[int] = set()
+            if endpoint and not self._breaker_open(state, provider):
+                payloads = [{"id": rec.get("id"), "input": rec.get("message", "")} for _, rec in batch]
+                results = self.engine.deliver(provider, endpoint, payloads, admit=lambda: not self._breaker_open(state, provider))
+                for pos, response, error in results:
+                    submitted.add(pos)
+                    entry, rec = batch[pos]
+                    if error is None:
+                        self._delivered(state, provider, rec, response or {})
+                        acked.append(entry)
+                        totals["sent"] += 1
+                        sent += 1
+                    elif isinstance(error, DELIVERY_ERRORS):
+                        totals["failed"] += 1
+                        retry = self._failed(state, provider, entry, rec, error)
+                        if retry is None:
+                            acked.append(entry)
+                            totals["dead"] += 1
+                        else:
+                            retries.append(retry)
+                    else:
+                        self.spool.settle(provider, acked=acked, retries=retries)
+                        raise error
+            attempted += len(submitted)
+            for pos, (entry, _) in enumerate(batch):
+                if pos in submitted:
                     continue
+                totals["skipped"] += 1
+                if endpoint:
+                    # Breaker open: hold the record back instead of hammering the endpoint.
+                    retries.append((entry, entry.attempts, epoch_now() + self._next_backoff(1), entry.last_error))
+            self.spool.settle(provider, acked=acked, retries=retries)
+            if len(submitted) < len(batch):
+                break
+        self.spool.retire(provider)
+        if not attempted:
+            return None
+        elapsed = time.perf_counter() - started
+        return {
+            "sent": sent,
+            "attempted": attempted,
+            "concurrency": self.engine.limit(provider),
+            "elapsed_sec": round(elapsed, 3),
+            "msgs_per_sec": round(sent / elapsed, 2) if elapsed > 0 else 0.0,
+        }
 
-                key = self._attempt_key(rec)
-                try:
-                    response = self._send(endpoint, {"id": rec.get("id"), "input": rec.get("message", "")})
-                    append_jsonl(
-                        self.outbox_dir / f"{provider}_model_outbox.jsonl",
-                        {
-                            "ts_utc": utc_now(),
-                            "provider": provider,
-                            "request_id": rec.get("id", ""),
-                            "response": response,
-                        },
-                    )
-                    self._breaker_ok(state, provider)
-                    attempts.pop(key, None)
-                    totals["sent"] += 1
-                    append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_sent", "provider": provider})
-                except (urllib.error.URLError, TimeoutError) as exc:
-                    prev = int(attempts.get(key, 0))
-                    cur = prev + 1
-                    attempts[key] = cur
-                    self._breaker_fail(state, provider)
-                    totals["failed"] += 1
-                    if cur >= self.max_attempts:
-                        append_jsonl(
-                            self.dead_letter_file,
-                            {
-                                "ts_utc": utc_now(),
-                                "provider": provider,
-                                "record": rec,
-                                "error": str(exc),
-                                "attempts": cur,
-                            },
-                        )
-                        attempts.pop(key, None)
-                        totals["dead"] += 1
-                        append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_dead_letter", "provider": provider})
-                    else:
-                        rec["last_error"] = str(exc)
-                        rec["next_retry_epoch"] = epoch_now() + self._next_backoff(cur)
-                        unresolved.append(rec)
-                        append_jsonl(self.bridge_events, {"ts_utc": utc_now(), "event": "worker_retry", "provider": provider, "attempt": cur})
-
-            spool_file.write_text(
-                "".join(json.dumps(item, ensure_ascii=True) + "\n" for item in unresolved),
-                encoding="utf-8",
-            )
+    def run_once(self) -> dict[str, Any]:
+        """Deliver every due spooled record, up to the provider's concurrency limit in flight.
 
+        Responses are handled on this thread as they complete, so breaker,
+        attempt and dead-letter bookkeeping is the same as a sequential pass:
+        once the breaker opens, records not yet sent are skipped with a backoff
+        while the requests already in flight finish.
+        """
+        state = self.load_state()
+        state.setdefault("attempts", {})
+        totals = {"processed": 0, "sent": 0, "failed": 0, "dead": 0, "skipped": 0}
+        delivery: dict[str, dict[str, Any]] = {}
+        for provider in self.spool.providers():
+            stats = self._drain(state, provider, totals)
+            if stats is not None:
+                delivery[provider] = stats
         self.save_state(state)
-        return {"status": "ok", "ts_utc": utc_now(), **totals}
+        send_sec = sum(float(stats["elapsed_sec"]) for stats in delivery.values())
+        return {
+            "status": "ok",
+            "ts_utc": utc_now(),
+            **totals,
+            "msgs_per_sec": round(totals["sent"] / send_sec, 2) if send_sec > 0 else 0.0,
+            "delivery": delivery,
+            "connections": self.engine.stats(),
+            "spool": self.spool.backlog(),
+        }
 
 
 def run_loop(worker: ModelDeliveryWorker, interval_sec: int) -> None:
@@ -204,7 +282,10 @@ def main() -> int:
     repo_root = Path(__file__).resolve().parents[2]
     worker = ModelDeliveryWorker(repo_root)
     if args.once:
-        print(json.dumps(worker.run_once(), ensure_ascii=True, indent=2))
+        try:
+            print(json.dumps(worker.run_once(), ensure_ascii=True, indent=2))
+        finally:
+            worker.close()
         return 0
     run_loop(worker, args.interval_sec)
     return 0
@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+try:
+    from apps.lam_console import event_log
+    from apps.lam_console.core import LocalHubCore
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log
+    from apps.lam_console.core import LocalHubCore
+
+
+GZIP_MIN_BYTES = 1024
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+SUBSCRIBER_QUEUE = 256
+# Payload keys that change on every aggregation and say nothing about hub state.
+VOLATILE_KEYS = frozenset({"ts_utc", "status_latency_ms", "status_cache"})
+
+
+def raise_nofile_limit(target: int) -> int:
+    """Lift the soft open-file limit towards ``target`` (capped at the hard limit); returns the new soft limit."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - non-POSIX hosts
+        return 0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = target if hard == resource.RLIM_INFINITY else min(target, hard)
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+            soft = wanted
+        except (ValueError, OSError):
+            pass
+    return int(soft)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Weak If-None-Match comparison against ``etag``."""
+    if not header:
+        return False
+    bare = etag.removeprefix("W/")
+    return any(tag.strip() == "*" or tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def sse_message(event: str, data: Any, *, event_id: str = "") -> bytes:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=True, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Body:
+    """Encoded response body; the gzip variant is built once on first use."""
+
+    def __init__(self, raw: bytes, *, etag: str, content_type: str = "application/json") -> None:
+        self.raw = raw
+        self.etag = etag
+        self.content_type = content_type
+        self._gzip: bytes | None = None
+
+    def encoded(self, accept_encoding: str) -> tuple[bytes, str]:
+        if len(self.raw) < GZIP_MIN_BYTES or "gzip" not in accept_encoding.lower():
+            return self.raw, ""
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.raw, compresslevel=6, mtime=0)
+        return self._gzip, "gzip"
+
+
+def json_body(payload: dict[str, Any], *, etag: str = "") -> Body:
+    raw = json.dumps(payload, ensure_ascii=True).encode("utf-8")
+    return Body(raw, etag=etag or f'"{hashlib.sha256(raw).hexdigest()[:16]}"')
+
+
+class StatusSnapshot:
+    def __init__(self, payload: dict[str, Any], version: str) -> None:
+        self.payload = payload
+        self.version = version
+        self.content = {k: v for k, v in payload.items() if k not in VOLATILE_KEYS}
+        self.taken = time.monotonic()
+        # The tag follows the status version, not the bytes: ts_utc and metrics move on every aggregation.
+        self.body = json_body({"ok": True, "payload": payload}, etag=f'W/"{version}"')
+
+
+class AsyncPortal:
+    """asyncio HTTP/1.1 front for LocalHubCore.
+
+    - keep-alive connections, each idling at the cost of one coroutine;
+    - ``/api/status`` is aggregated at most once per ``status_ttl_sec`` for all
+      clients and carries an ETag of the status version, so pollers get 304s
+      until a source changes; panes are tagged by content;
+    - bodies over ``GZIP_MIN_BYTES`` are gzipped for clients that accept it;
+    - ``/api/events`` is a Server-Sent Events stream: one ``status`` event on
+      connect, then ``bridge`` events for new bridge event lines and ``delta``
+      events with the status keys that changed, fed by one shared poller.
+
+    The hub is synchronous and not thread-safe, so every hub call runs on a
+    single worker thread.
+    """
+
+    def __init__(
+        self,
+        hub: LocalHubCore,
+        *,
+        html: str = "",
+        interval_sec: float = 1.0,
+        status_ttl_sec: float = 1.0,
+        keepalive_sec: float = 120.0,
+        heartbeat_sec: float = 15.0,
+    ) -> None:
+        self.hub = hub
+        self.html = Body(html.encode("utf-8"), etag="", content_type="text/html; charset=utf-8")
+        self.interval_sec = float(interval_sec)
+        self.status_ttl_sec = float(status_ttl_sec)
+        self.keepalive_sec = float(keepalive_sec)
+        self.heartbeat_sec = float(heartbeat_sec)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="portal-hub")
+        self.snapshot: StatusSnapshot | None = None
+        self._refresh_lock: asyncio.Lock | None = None
+        self.subscribers: set[asyncio.Queue[bytes | None]] = set()
+        self.cursor = event_log.StreamCursor(hub.bridge_events)
+        self.counters = {
+            "connections": 0,
+            "requests": 0,
+            "not_modified": 0,
+            "gzip_responses": 0,
+            "bytes_sent": 0,
+            "sse_dropped": 0,
+            "sse_messages": 0,
+            "poll_errors": 0,
+        }
+        self.server: asyncio.AbstractServer | None = None
+        self._poller: asyncio.Task[None] | None = None
+
+    async def _hub(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _aggregate(self) -> StatusSnapshot:
+        payload = self.hub.bridge_status().payload
+        return StatusSnapshot(payload, self.hub.status_version)
+
+    async def status(self, *, max_age_sec: float | None = None) -> StatusSnapshot:
+        """Current snapshot, re-aggregated when older than ``max_age_sec`` (default ``status_ttl_sec``)."""
+        max_age = self.status_ttl_sec if max_age_sec is None else max_age_sec
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            snap = self.snapshot
+            if snap is None or time.monotonic() - snap.taken >= max_age:
+                snap = self.snapshot = await self._hub(self._aggregate)
+        return snap
+
+    def stats(self) -> dict[str, Any]:
+        snap = self.snapshot
+        return {
+            **self.counters,
+            "sse_clients": len(self.subscribers),
+            "status_version": snap.version if snap else "",
+        }
+
+    async def start(self, host: str, port: int, *, backlog: int = 2048) -> tuple[str, int]:
+        self.cursor.seek_tail(0)
+        self.server = await asyncio.start_server(self._serve, host, port, backlog=backlog, limit=MAX_HEADER_BYTES)
+        self._poller = asyncio.create_task(self._poll_loop())
+        sock = self.server.sockets[0].getsockname()
+        return str(sock[0]), int(sock[1])
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+        for queue in list(self.subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        await self.start(host, port)
+        assert self.server is not None
+        async with self.server:
+            await self.server.serve_forever()
+
+    def publish(self, message: bytes) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A client that stopped reading is cut off rather than buffered without bound.
+                self.subscribers.discard(queue)
+                self.counters["sse_dropped"] += 1
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _poll_loop(self) -> None:
+        last_beat = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval_sec)
+            if not self.subscribers:
+                continue
+            previous = self.snapshot
+            try:
+                snap = await self.status(max_age_sec=0.0)
+                lines = await self._hub(self.cursor.read_new)
+            except Exception as exc:  # noqa: BLE001
+                # A half-written state file must not end the stream for every client; retry next tick.
+                self.counters["poll_errors"] += 1
+                print(f"portal status poll failed: {exc}", file=sys.stderr)
+                continue
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    event = {"raw": line}
+                self.publish(sse_message("bridge", event))
+            if previous is not None and snap.version != previous.version:
+                changed = {k: v for k, v in snap.content.items() if previous.content.get(k) != v}
+                removed = sorted(k for k in previous.content if k not in snap.content)
+                self.publish(
+                    sse_message("delta", {"version": snap.version, "changed": changed, "removed": removed}, event_id=snap.version)
+                )
+            now = time.monotonic()
+            if now - last_beat >= self.heartbeat_sec:
+                self.publish(b": ping\n\n")
+                last_beat = now
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, headers: dict[str, str]) -> None:
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        snap = await self.status()
+        head = (
+            "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\nX-Accel-Buffering: no\r\n\r\n"
+        ).encode("ascii")
+        writer.write(head + b"retry: 3000\n\n")
+        if headers.get("last-event-id", "") != snap.version:
+            writer.write(sse_message("status", snap.content, event_id=snap.version))
+        self.subscribers.add(queue)
+        try:
+            await writer.drain()
+            while (message := await queue.get()) is not None:
+                writer.write(message)
+                self.counters["sse_messages"] += 1
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(queue)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.counters["connections"] += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_sec)
+                except (TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, json_body({"ok": False, "error": "bad_request"}), close=True)
+                    return
+                headers: dict[str, str] = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, json_body({"ok": False, "error": "bad_content_length"}), close=True)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, json_body({"ok": False, "error": "too_large"}), close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                connection = headers.get("connection", "").lower()
+                close = connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive")
+                self.counters["requests"] += 1
+                path = urlparse(target).path
+                if method == "GET" and path == "/api/events":
+                    await self._stream_events(writer, headers)
+                    return
+                status, response = await self._dispatch(method, path, body)
+                await self._send(writer, status, response, headers=headers, close=close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple[int, Body]:
+        if method == "GET":
+            if path == "/":
+                return HTTPStatus.OK, self.html
+            if path == "/api/status":
+                return HTTPStatus.OK, (await self.status()).body
+            if path == "/api/portal/stats":
+                return HTTPStatus.OK, json_body({"ok": True, "stats": self.stats()})
+            if path == "/api/devices":
+                return HTTPStatus.OK, json_body({"ok": True, "devices": await self._hub(self.hub.list_devices)})
+            if path.startswith("/api/pane/"):
+                pane = path.split("/")[-1].upper()
+                lines = await self._hub(self.hub.pane_snapshot, pane)
+                return HTTPStatus.OK, json_body({"ok": True, "pane": pane, "lines": lines})
+            return HTTPStatus.NOT_FOUND, json_body({"ok": False, "error": "not_found"})
+        if method != "POST" or path not in ("/api/command", "/api/device/send"):
+            return HTTPStatus.NOT_FOUND, json_body({"ok": False, "error": "not_found"})
+        try:
+            payload = json.loads(body.decode("utf-8", errors="replace")) if body else {}
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, json_body({"ok": False, "error": "invalid_json"})
+        if path == "/api/device/send":
+            device_id = str(payload.get("device_id", "")).strip()
+            message = str(payload.get("message", "")).strip()
+            result = await self._hub(self.hub.send_device, device_id, message)
+        else:
+            cmd = str(payload.get("command", "")).strip()
+            if not cmd:
+                return HTTPStatus.BAD_REQUEST, json_body({"ok": False, "error": "missing_command"})
+            result = await self._hub(self.hub.execute, cmd)
+        # Commands usually move hub state; the next status read re-aggregates.
+        self.snapshot = None
+        return HTTPStatus.OK, json_body({"ok": result.ok, "title": result.title, "payload": result.payload})
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: Body,
+        *,
+        headers: dict[str, str] | None = None,
+        close: bool = False,
+    ) -> None:
+        headers = headers or {}
+        lines = [f"HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}"]
+        if body.etag:
+            lines.append(f"ETag: {body.etag}")
+            lines.append("Cache-Control: no-cache")
+        if body.etag and status == HTTPStatus.OK and etag_matches(headers.get("if-none-match", ""), body.etag):
+            self.counters["not_modified"] += 1
+            lines[0] = f"HTTP/1.1 {int(HTTPStatus.NOT_MODIFIED)} Not Modified"
+            data, encoding = b"", ""
+        else:
+            data, encoding = body.encoded(headers.get("accept-encoding", ""))
+            lines.append(f"Content-Type: {body.content_type}")
+            lines.append(f"Content-Length: {len(data)}")
+            if body.etag:
+                lines.append("Vary: Accept-Encoding")
+            if encoding:
+                lines.append(f"Content-Encoding: {encoding}")
+                self.counters["gzip_responses"] += 1
+        lines.append("Connection: close" if close else f"Keep-Alive: timeout={int(self.keepalive_sec)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        self.counters["bytes_sent"] += len(data)
+        await writer.drain()
+
+
+def run_async_gateway(hub: LocalHubCore, host: str, port: int, *, html: str = "", interval_sec: float = 1.0) -> int:
+    raise_nofile_limit(4096)
+    portal = AsyncPortal(hub, html=html, interval_sec=interval_sec, status_ttl_sec=interval_sec)
+    try:
+        asyncio.run(portal.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+    return 0
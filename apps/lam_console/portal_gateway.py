@@ -3,7 +3,9 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 import time
+from datetime import UTC, datetime
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
@@ -11,6 +13,15 @@ from typing import Any
 from urllib.parse import urlparse
 
 from apps.lam_console.core import LocalHubCore
+from apps.lam_console.portal_async import run_async_gateway
+
+try:
+    from apps.lam_console import event_log, state_store
+    from apps.lam_console.file_watch import DirWatcher
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+    from apps.lam_console.file_watch import DirWatcher
 
 
 HTML = """<!doctype html>
@@ -22,6 +33,7 @@ HTML = """<!doctype html>
 <ul>
   <li>GET /api/status</li>
   <li>GET /api/pane/AGENTS|QUEUE|MODELS|BRIDGE|GATES</li>
+  <li>GET /api/events (Server-Sent Events, --mode async)</li>
   <li>POST /api/command {"command":"bridge-status"}</li>
 </ul>
 </body></html>
@@ -104,52 +116,157 @@ class GatewayHandler(BaseHTTPRequestHandler):
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="LAM portal gateway daemon for cross-OS interface translation.")
-    parser.add_argument("--mode", choices=["auto", "http", "file"], default="auto")
+    parser.add_argument("--mode", choices=["auto", "http", "async", "file"], default="auto")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8765)
     parser.add_argument("--interval-sec", type=int, default=2)
     return parser
 
 
+def _utc_now() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FileGateway:
+    """Incremental consumer of ``portal_commands.jsonl`` for the file bridge bus.
+
+    Commands are read from a persisted byte offset + inode cursor
+    (``portal_commands.cursor.json``), so each tick executes only lines
+    appended since the last one and never truncates under a writer. Results
+    of one batch land in ``portal_results.jsonl`` with a single append, and
+    the cursor is saved after that (a crash re-runs the batch rather than
+    losing it). The loop sleeps in a ``DirWatcher`` (inotify, or stat polling
+    every ``interval_sec``), and ``portal_status.json`` is re-aggregated only
+    when a watched directory changed, a command ran, or ``status_max_age_sec``
+    passed; it is rewritten only when the status version moved.
+    """
+
+    def __init__(
+        self,
+        hub: LocalHubCore,
+        *,
+        interval_sec: float = 2.0,
+        status_max_age_sec: float = 10.0,
+        compact_bytes: int = 1024 * 1024,
+        force_poll: bool = False,
+    ) -> None:
+        self.hub = hub
+        self.status_file = hub.bridge_root / "portal_status.json"
+        self.commands_file = hub.bridge_root / "portal_commands.jsonl"
+        self.results_file = hub.bridge_root / "portal_results.jsonl"
+        self.cursor_file = hub.bridge_root / "portal_commands.cursor.json"
+        self.status_max_age_sec = float(status_max_age_sec)
+        self.compact_bytes = int(compact_bytes)
+        # Files this loop writes itself; changes to them must not wake a status rebuild.
+        self.own_files = {self.status_file, self.results_file, self.cursor_file, hub.bridge_status_file}
+        try:
+            saved = json.loads(self.cursor_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            saved = {}
+        self.cursor = event_log.StreamCursor.from_state(self.commands_file, saved.get("cursor") if isinstance(saved, dict) else None)
+        # The gateway state dir is not watched: merely reading queue.sqlite3 touches its WAL files, which
+        # would wake the loop on its own reads. Queue counts are picked up by the max-age refresh instead.
+        watched = [hub.bridge_root, hub.hub_root, hub.gates_dir, hub.spool_dir, hub.inbox_dir, hub.outbox_dir]
+        self.watcher = DirWatcher([d for d in watched if d.is_dir()], poll_sec=interval_sec, force_poll=force_poll)
+        self.pickup = hub.gateway.LatencyRecorder()
+        self.status_version = ""
+        self.status_at = 0.0
+        self.stats = {"commands": 0, "batches": 0, "status_rebuilds": 0, "status_writes": 0, "wakeups": 0}
+
+    def _save_cursor(self) -> None:
+        state_store.write_json(
+            self.cursor_file,
+            {
+                "cursor": self.cursor.state(),
+                "watch_mode": self.watcher.mode,
+                "stats": self.stats,
+                "pickup_ms": self.pickup.summary(),
+            },
+        )
+
+    def consume(self) -> int:
+        """Execute commands appended since the cursor; returns how many ran."""
+        lines = self.cursor.read_new()
+        if not lines:
+            return 0
+        try:
+            written_ns = self.commands_file.stat().st_mtime_ns
+        except OSError:
+            written_ns = 0
+        results: list[dict[str, Any]] = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            cmd = str(payload.get("command", "")).strip() if isinstance(payload, dict) else ""
+            if not cmd:
+                continue
+            if written_ns:
+                self.pickup.record(max(0.0, (time.time_ns() - written_ns) / 1e6))
+            result = self.hub.execute(cmd)
+            results.append(
+                {"ts_utc": _utc_now(), "command": cmd, "ok": result.ok, "title": result.title, "payload": result.payload}
+            )
+        event_log.append_many_jsonl(self.results_file, results)
+        self.stats["commands"] += len(results)
+        self.stats["batches"] += 1
+        self._compact()
+        self._save_cursor()
+        return len(results)
+
+    def _compact(self) -> None:
+        """Seal a fully consumed commands file once it is large; the cursor drains late appends from the sealed copy."""
+        try:
+            size = self.commands_file.stat().st_size
+        except OSError:
+            return
+        if self.compact_bytes > 0 and size >= self.compact_bytes and self.cursor.offset >= size:
+            event_log.EventLog(self.commands_file, max_bytes=0, compress="none", keep_segments=2).rotate()
+
+    def refresh_status(self) -> bool:
+        """Re-aggregate status; returns True when ``portal_status.json`` was rewritten."""
+        status = self.hub.bridge_status().payload
+        self.status_at = time.monotonic()
+        self.stats["status_rebuilds"] += 1
+        if self.hub.status_version == self.status_version and self.status_file.exists():
+            return False
+        state_store.write_json(self.status_file, status)
+        self.status_version = self.hub.status_version
+        self.stats["status_writes"] += 1
+        return True
+
+    def _touches_dependency(self, changed: set[Path]) -> bool:
+        own = tuple(f.name for f in self.own_files)
+        return any(not p.name.startswith(own) and not p.name.startswith(".") for p in changed)
+
+    def step(self, changed: set[Path] | None) -> dict[str, Any]:
+        """Handle one wakeup; ``changed`` None means "assume everything changed"."""
+        commands = 0
+        if changed is None or any(p.name.startswith(self.commands_file.name) for p in changed):
+            commands = self.consume()
+        stale = time.monotonic() - self.status_at >= self.status_max_age_sec
+        rebuilt = False
+        if changed is None or commands or stale or self._touches_dependency(changed):
+            rebuilt = self.refresh_status()
+        return {"commands": commands, "status_written": rebuilt}
+
+    def run(self) -> int:
+        self.step(None)
+        try:
+            while True:
+                changed = self.watcher.wait(self.status_max_age_sec)
+                self.stats["wakeups"] += 1
+                self.step(changed)
+        finally:
+            self.watcher.close()
+
+
 def run_file_gateway(hub: LocalHubCore, interval_sec: int) -> int:
-    status_file = hub.bridge_root / "portal_status.json"
-    commands_file = hub.bridge_root / "portal_commands.jsonl"
-    results_file = hub.bridge_root / "portal_results.jsonl"
-
-    while True:
-        status = hub.bridge_status().payload
-        status_file.write_text(json.dumps(status, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-
-        if commands_file.exists():
-            lines = commands_file.read_text(encoding="utf-8", errors="replace").splitlines()
-            commands_file.write_text("", encoding="utf-8")
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    payload = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                cmd = str(payload.get("command", "")).strip()
-                if not cmd:
-                    continue
-                result = hub.execute(cmd)
-                with results_file.open("a", encoding="utf-8") as fh:
-                    fh.write(
-                        json.dumps(
-                            {
-                                "ts_utc": status.get("ts_utc", ""),
-                                "command": cmd,
-                                "ok": result.ok,
-                                "title": result.title,
-                                "payload": result.payload,
-                            },
-                            ensure_ascii=True,
-                        )
-                        + "\n"
-                    )
-        time.sleep(interval_sec)
+    return FileGateway(hub, interval_sec=interval_sec).run()
 
 
 def main() -> int:
@@ -161,6 +278,10 @@ def main() -> int:
         print(json.dumps({"status": "ok", "gateway_mode": "file", "bridge_root": str(hub.bridge_root)}, ensure_ascii=True))
         return run_file_gateway(hub, args.interval_sec)
 
+    if args.mode == "async":
+        print(json.dumps({"status": "ok", "gateway": f"http://{args.host}:{args.port}", "mode": "async"}, ensure_ascii=True))
+        return run_async_gateway(hub, args.host, args.port, html=HTML, interval_sec=args.interval_sec)
+
     if args.mode == "http":
         with ThreadingHTTPServer((args.host, args.port), GatewayHandler) as srv:
             print(json.dumps({"status": "ok", "gateway": f"http://{args.host}:{args.port}"}, ensure_ascii=True))
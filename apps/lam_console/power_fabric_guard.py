@@ -6,11 +6,18 @@ import json
 import os
 import shutil
 import subprocess
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -167,11 +174,6 @@ class PowerFabricGuard:
         self.turbo_iowait_pct = float(os.getenv("LAM_TURBO_IOWAIT_PCT", "12"))
         self.enforce_noise_guard = os.getenv("LAM_ENFORCE_NOISE_GUARD", "1") in {"1", "true", "True"}
 
-    @staticmethod
-    def _append_jsonl(path: Path, payload: dict[str, Any]) -> None:
-        with path.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-
     def _manual_profile(self) -> str:
         env_override = os.getenv("LAM_POWER_PROFILE_OVERRIDE", "").strip().lower()
         if env_override in {"auto", "turbo", "balanced", "quiet"}:
@@ -275,15 +277,15 @@ class PowerFabricGuard:
 
     def run_once(self) -> dict[str, Any]:
         payload = self.collect()
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         event = {
             "ts_utc": payload["ts_utc"],
             "event": "power_fabric_guard",
             "mode": payload["mode"],
             "reason_codes": payload["reason_codes"],
         }
-        self._append_jsonl(self.events_file, event)
-        self._append_jsonl(
+        event_log.append_jsonl(self.events_file, event)
+        event_log.append_jsonl(
             self.audit_stream_file,
             {"ts_utc": payload["ts_utc"], "source": "power_fabric_guard", "event": "power_fabric_guard", "payload": payload},
         )
@@ -292,7 +294,7 @@ class PowerFabricGuard:
         fan_rpm = payload.get("telemetry", {}).get("fan_rpm_max")
         noisy = isinstance(fan_rpm, int) and fan_rpm > self.quiet_fan_rpm_max
         if self.enforce_noise_guard and quiet_active and noisy:
-            self.noise_guard_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.noise_guard_file, payload)
         elif self.noise_guard_file.exists():
             self.noise_guard_file.unlink(missing_ok=True)
         return payload
@@ -11,9 +11,11 @@ from pathlib import Path
 from typing import Any
 
 try:
+    from apps.lam_console import event_log, state_store
     from apps.lam_console.core import LocalHubCore
 except ModuleNotFoundError:
     sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
     from apps.lam_console.core import LocalHubCore
 
 
@@ -61,7 +63,7 @@ class RoleOrchestrator:
 
     def _emit_audit(self, payload: dict[str, Any]) -> None:
         event = {"ts_utc": utc_now(), "source": "role_orchestrator", **payload}
-        self._append_jsonl(self.audit_stream_file, event)
+        event_log.append_jsonl(self.audit_stream_file, event)
 
     def ensure_registry(self) -> None:
         if self.registry_file.exists():
@@ -74,7 +76,7 @@ class RoleOrchestrator:
                 {"role": "model_dispatcher", "agent": "codex-agent", "priority": "p1"},
             ]
         }
-        self.registry_file.write_text(json.dumps(default_registry, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.registry_file, default_registry)
 
     def ensure_profiles(self) -> None:
         if self.profiles_file.exists():
@@ -97,7 +99,7 @@ class RoleOrchestrator:
                 },
             },
         }
-        self.profiles_file.write_text(json.dumps(defaults, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.profiles_file, defaults)
 
     def ensure_selector(self) -> None:
         if self.selector_file.exists():
@@ -111,7 +113,7 @@ class RoleOrchestrator:
                 {"match": {"hostname_regex": ".*laptop.*"}, "profile": "portable_core"},
             ],
         }
-        self.selector_file.write_text(json.dumps(defaults, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.selector_file, defaults)
 
     def load_registry(self) -> dict[str, Any]:
         try:
@@ -302,7 +304,7 @@ class RoleOrchestrator:
         return out
 
     def _save_counters(self, counters: dict[str, int]) -> None:
-        self.counters_file.write_text(json.dumps(counters, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.counters_file, counters)
 
     def apply_runbooks(self, wake_event: dict[str, Any]) -> dict[str, Any]:
         reasons = wake_event.get("reason_codes", [])
@@ -336,7 +338,7 @@ class RoleOrchestrator:
                 "counters": counters,
             }
             was_active = self.hold_file.exists()
-            self.hold_file.write_text(json.dumps(hold_payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.hold_file, hold_payload)
             if not was_active:
                 msg = (
                     f"role-orchestrator hold activated; reason={trigger_reason}; "
@@ -424,7 +426,7 @@ class RoleOrchestrator:
         }
         runbook = self.apply_runbooks(event)
         self._append_jsonl(self.wake_events_file, event)
-        self._append_jsonl(self.events_file, event)
+        event_log.append_jsonl(self.events_file, event)
         self._emit_audit({"event": "device_wake_detected", "wake": event, "runbook": runbook})
 
         out = {
@@ -438,7 +440,7 @@ class RoleOrchestrator:
                 "security_lockdown": bridge.get("security_lockdown", False),
             },
         }
-        self.state_file.write_text(json.dumps(out, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, out)
         return out
 
     def run_cycle(self, monotonic_now: float | None = None) -> dict[str, Any]:
@@ -451,7 +453,7 @@ class RoleOrchestrator:
             "wake_detected": False,
             "gap_sec": round(gap, 3),
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         return payload
 
 
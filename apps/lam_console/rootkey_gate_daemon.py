@@ -6,11 +6,18 @@ import hashlib
 import json
 import os
 import secrets
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import event_log, state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import event_log, state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -74,10 +81,6 @@ class RootKeyGate:
         self.lockdown_file = self.hub_root / "security_lockdown.flag"
         self.security_state_file = self.hub_root / "security_telemetry_state.json"
 
-    def _append_jsonl(self, path: Path, payload: dict[str, Any]) -> None:
-        with path.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(payload, ensure_ascii=True) + "\n")
-
     def _secure_posture_ok(self) -> bool:
         payload = load_json(self.security_state_file, {})
         checks = payload.get("checks", {}) if isinstance(payload, dict) else {}
@@ -148,7 +151,7 @@ class RootKeyGate:
             return False, "challenge_response_mismatch"
         payload["used"] = True
         payload["used_utc"] = utc_now()
-        self.challenge_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.challenge_file, payload)
         return True, "ok"
 
     def _rotate_challenge_if_needed(self) -> None:
@@ -176,7 +179,7 @@ class RootKeyGate:
             "used": False,
             "rotation": "auto",
         }
-        self.challenge_file.write_text(json.dumps(rotated, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.challenge_file, rotated)
 
     def _update_fail_guard(self, challenge_reason: str, active: bool) -> dict[str, Any]:
         counters = load_json(self.challenge_counters_file, {"mismatch_count": 0, "last_reason": "", "updated_utc": ""})
@@ -195,11 +198,11 @@ class RootKeyGate:
                     "reason": "challenge_response_mismatch",
                     "fail_count": mismatch_count,
                 }
-                self.challenge_ban_file.write_text(json.dumps(ban_payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+                state_store.write_json(self.challenge_ban_file, ban_payload)
         counters["mismatch_count"] = mismatch_count
         counters["last_reason"] = challenge_reason
         counters["updated_utc"] = utc_now()
-        self.challenge_counters_file.write_text(json.dumps(counters, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.challenge_counters_file, counters)
         return counters
 
     def run_once(self) -> dict[str, Any]:
@@ -211,7 +214,7 @@ class RootKeyGate:
                 "active": False,
                 "reason": "rootkey_disabled",
             }
-            self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.state_file, payload)
             self.active_flag.unlink(missing_ok=True)
             self.seed_flag.unlink(missing_ok=True)
             return payload
@@ -275,8 +278,8 @@ class RootKeyGate:
             "secure_posture_ok": secure_ok,
             "lockdown": self.lockdown_file.exists(),
         }
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
-        self._append_jsonl(
+        state_store.write_json(self.state_file, payload)
+        event_log.append_jsonl(
             self.events_file,
             {
                 "ts_utc": ts,
@@ -286,7 +289,7 @@ class RootKeyGate:
                 "reason": reason,
             },
         )
-        self._append_jsonl(
+        event_log.append_jsonl(
             self.audit_stream_file,
             {
                 "ts_utc": ts,
@@ -5,11 +5,18 @@ import argparse
 import json
 import os
 import shutil
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+try:
+    from apps.lam_console import state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from apps.lam_console import state_store
+
 
 def utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -112,7 +119,7 @@ class SecurityTelemetryGuard:
 
     def run_once(self) -> dict[str, Any]:
         payload = self.collect()
-        self.state_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+        state_store.write_json(self.state_file, payload)
         event = {
             "ts_utc": payload["ts_utc"],
             "event": "security_telemetry_guard",
@@ -126,7 +133,7 @@ class SecurityTelemetryGuard:
         )
 
         if self.enforce and not payload["overall_ok"]:
-            self.lockdown_file.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+            state_store.write_json(self.lockdown_file, payload)
         elif self.lockdown_file.exists():
             self.lockdown_file.unlink(missing_ok=True)
 
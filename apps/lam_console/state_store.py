@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+FSYNC_MODES = ("off", "batch", "always")
+
+
+def dump_json(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=True, indent=2) + "\n"
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: Path, data: bytes, *, fsync: bool = False) -> None:
+    """Write ``data`` to a sibling temp file and rename it over ``path``.
+
+    Readers see either the old or the new document, never a truncated one.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    try:
+        with tmp.open("wb") as fh:
+            fh.write(data)
+            if fsync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def atomic_write_text(path: Path, text: str, *, fsync: bool = False) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync)
+
+
+class StateStore:
+    """Process-wide writer for small JSON/text state files.
+
+    - every write is atomic (temp file + rename);
+    - a write whose bytes match what is already on disk is skipped;
+    - with ``coalesce_sec > 0`` repeated writes to one path inside that window
+      are held in memory and only the latest is written (on the next write
+      after the window, ``flush()`` or interpreter exit);
+    - ``fsync="batch"`` fsyncs written files and their directories once per
+      ``fsync_interval_sec`` instead of on every write; ``"always"`` syncs
+      each write.
+    """
+
+    def __init__(
+        self,
+        *,
+        fsync: str = "off",
+        fsync_interval_sec: float = 5.0,
+        coalesce_sec: float = 0.0,
+    ) -> None:
+        if fsync not in FSYNC_MODES:
+            raise RuntimeError(f"unsupported fsync mode: {fsync}")
+        self.fsync = fsync
+        self.fsync_interval_sec = float(fsync_interval_sec)
+        self.coalesce_sec = float(coalesce_sec)
+        self._lock = threading.Lock()
+        # path -> (bytes written, monotonic time, (mtime_ns, size) after the write)
+        self._last: dict[Path, tuple[bytes, float, tuple[int, int]]] = {}
+        self._pending: dict[Path, bytes] = {}
+        self._unsynced: set[Path] = set()
+        self._last_sync = time.monotonic()
+        self.stats = {"written": 0, "unchanged": 0, "coalesced": 0, "fsyncs": 0}
+
+    @classmethod
+    def from_env(cls) -> StateStore:
+        return cls(
+            fsync=os.getenv("LAM_STATE_FSYNC", "off").strip().lower() or "off",
+            fsync_interval_sec=float(os.getenv("LAM_STATE_FSYNC_INTERVAL_SEC", "5")),
+            coalesce_sec=float(os.getenv("LAM_STATE_COALESCE_SEC", "0")),
+        )
+
+    def _same_on_disk(self, path: Path, data: bytes) -> bool:
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        if st.st_size != len(data):
+            return False
+        last = self._last.get(path)
+        if last is not None and last[2] == (st.st_mtime_ns, st.st_size):
+            return last[0] == data
+        try:
+            return path.read_bytes() == data
+        except OSError:
+            return False
+
+    def _write_locked(self, path: Path, data: bytes) -> None:
+        atomic_write_bytes(path, data, fsync=self.fsync == "always")
+        st = path.stat()
+        self._last[path] = (data, time.monotonic(), (st.st_mtime_ns, st.st_size))
+        self.stats["written"] += 1
+        if self.fsync == "always":
+            self.stats["fsyncs"] += 1
+        elif self.fsync == "batch":
+            self._unsynced.add(path)
+            if time.monotonic() - self._last_sync >= self.fsync_interval_sec:
+                self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        dirs: set[Path] = set()
+        for path in self._unsynced:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            dirs.add(path.parent)
+        for directory in dirs:
+            _fsync_dir(directory)
+        if self._unsynced:
+            self.stats["fsyncs"] += 1
+        self._unsynced.clear()
+        self._last_sync = time.monotonic()
+
+    def write_bytes(self, path: Path, data: bytes, *, force: bool = False) -> bool:
+        """Persist ``data`` to ``path``; returns False when skipped or deferred."""
+        path = Path(path)
+        with self._lock:
+            if not force and self._same_on_disk(path, data):
+                self._pending.pop(path, None)
+                self.stats["unchanged"] += 1
+                return False
+            last = self._last.get(path)
+            if (
+                not force
+                and self.coalesce_sec > 0
+                and last is not None
+                and time.monotonic() - last[1] < self.coalesce_sec
+            ):
+                self._pending[path] = data
+                self.stats["coalesced"] += 1
+                return False
+            self._pending.pop(path, None)
+            self._write_locked(path, data)
+            return True
+
+    def write_text(self, path: Path, text: str, *, force: bool = False) -> bool:
+        return self.write_bytes(path, text.encode("utf-8"), force=force)
+
+    def write_json(self, path: Path, payload: Any, *, force: bool = False) -> bool:
+        return self.write_bytes(path, dump_json(payload).encode("utf-8"), force=force)
+
+    def flush(self) -> int:
+        """Write every deferred document and fsync anything still unsynced."""
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+            for path, data in pending:
+                self._write_locked(path, data)
+            if self._unsynced:
+                self._sync_locked()
+            return len(pending)
+
+
+_DEFAULT_STORE: StateStore | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_store() -> StateStore:
+    global _DEFAULT_STORE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_STORE is None:
+            _DEFAULT_STORE = StateStore.from_env()
+            atexit.register(_DEFAULT_STORE.flush)
+        return _DEFAULT_STORE
+
+
+def write_json(path: Path, payload: Any, *, force: bool = False) -> bool:
+    return default_store().write_json(path, payload, force=force)
+
+
+def write_text(path: Path, text: str, *, force: bool = False) -> bool:
+    return default_store().write_text(path, text, force=force)
+
+
+def flush() -> int:
+    return default_store().flush()
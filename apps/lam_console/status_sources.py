@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import threading
+from collections.abc import Callable, Hashable, Sequence
+from pathlib import Path
+from typing import Any
+
+Stamp = tuple[int, int, int]
+
+
+def stamp(path: Path) -> Stamp | None:
+    """``(inode, mtime_ns, size)`` of ``path``, or None when it does not exist.
+
+    Atomic state writes rename a fresh temp file into place, so the inode
+    changes even when a rewrite lands in the same mtime tick with the same size.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def read_json(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+class SourceCache:
+    """Memo of parsed status sources keyed on their ``stamp``.
+
+    A source is re-read only when its stamp changed since the last read;
+    directory listings are keyed on the directory's own stamp, which moves
+    whenever an entry is created, removed or renamed. Cached values are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, str], tuple[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(
+        self,
+        path: Path,
+        parse: Callable[[Path], Any],
+        *,
+        default: Any = None,
+        kind: str = "",
+        parse_missing: bool = False,
+    ) -> Any:
+        """``parse(path)`` memoized on the file stamp; ``default`` while the file is missing unless ``parse_missing``."""
+        current = stamp(path)
+        return self._memo(
+            (kind, str(path)), current, lambda: default if current is None and not parse_missing else parse(path)
+        )
+
+    def derive(self, kind: str, paths: Sequence[Path], compute: Callable[[], Any], *, extra: Hashable = None) -> Any:
+        """``compute()`` memoized on the stamps of all ``paths`` plus ``extra``, for a value read from several sources."""
+        current = (tuple(stamp(p) for p in paths), extra)
+        return self._memo((kind, os.pathsep.join(str(p) for p in paths)), current, compute)
+
+    def _memo(self, key: tuple[str, str], current: Hashable, produce: Callable[[], Any]) -> Any:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == current:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        value = produce()
+        with self._lock:
+            self._entries[key] = (current, value)
+        return value
+
+    def json(self, path: Path, default: Any = None) -> Any:
+        return self.load(path, read_json, default={} if default is None else default, kind="json")
+
+    def listing(self, directory: Path, pattern: str) -> list[str]:
+        """Sorted names in ``directory`` matching ``pattern``."""
+
+        def scan(path: Path) -> list[str]:
+            with os.scandir(path) as entries:
+                return sorted(e.name for e in entries if fnmatch.fnmatchcase(e.name, pattern))
+
+        return self.load(directory, scan, default=[], kind=f"listing:{pattern}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 6) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
@@ -2,17 +2,99 @@
 from __future__ import annotations
 
 import argparse
-import contextlib
 import hashlib
-import io
 import json
 import os
+import secrets
 import shutil
+import signal
 import sys
+import threading
 import time
+import urllib.error
+import urllib.request
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Self
+
+try:
+    from apps.lam_console import event_log, state_store
+    from scripts.lam_gateway_cache import ReadCache
+    from scripts.lam_gateway_health import LatencyRecorder, ProviderHealthCache
+    from scripts.lam_gateway_index import ObjectIndex, migrate_json_index, open_object_index
+    from scripts.lam_gateway_objects import (
+        ObjectCatalog,
+        ObjectStore,
+        encoded_blob_kind,
+        is_tree_path,
+        kind_codec,
+        object_rel_path,
+    )
+    from scripts.lam_gateway_policy import CirculationPolicy, compiled_circulation
+    from scripts.lam_gateway_queue import (
+        FairSchedule,
+        QueueBackend,
+        job_class,
+        job_enqueued_epoch,
+        migrate_json_queue,
+        open_queue_backend,
+    )
+    from scripts.lam_gateway_rpc import RpcClient, RpcServer, RpcUnavailable
+    from scripts.lam_gateway_scrub import QUIET_MODES, RateLimiter, ScrubProgress, ScrubUnit, power_mode, run_scrub
+    from scripts.lam_gateway_stats import ProviderStats, score_provider, score_settings
+    from scripts.lam_gateway_transfer import (
+        configure_pool,
+        copy_and_hash,
+        copy_file_staged,
+        copy_tree_staged,
+        decompress_file,
+        estimate_encoded_size,
+        resolve_codec,
+        resume_key,
+        scan_source,
+        source_fingerprint,
+    )
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console import event_log, state_store
+    from scripts.lam_gateway_cache import ReadCache
+    from scripts.lam_gateway_health import LatencyRecorder, ProviderHealthCache
+    from scripts.lam_gateway_index import ObjectIndex, migrate_json_index, open_object_index
+    from scripts.lam_gateway_objects import (
+        ObjectCatalog,
+        ObjectStore,
+        encoded_blob_kind,
+        is_tree_path,
+        kind_codec,
+        object_rel_path,
+    )
+    from scripts.lam_gateway_policy import CirculationPolicy, compiled_circulation
+    from scripts.lam_gateway_queue import (
+        FairSchedule,
+        QueueBackend,
+        job_class,
+        job_enqueued_epoch,
+        migrate_json_queue,
+        open_queue_backend,
+    )
+    from scripts.lam_gateway_rpc import RpcClient, RpcServer, RpcUnavailable
+    from scripts.lam_gateway_scrub import QUIET_MODES, RateLimiter, ScrubProgress, ScrubUnit, power_mode, run_scrub
+    from scripts.lam_gateway_stats import ProviderStats, score_provider, score_settings
+    from scripts.lam_gateway_transfer import (
+        configure_pool,
+        copy_and_hash,
+        copy_file_staged,
+        copy_tree_staged,
+        decompress_file,
+        estimate_encoded_size,
+        resolve_codec,
+        resume_key,
+        scan_source,
+        source_fingerprint,
+    )
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -20,9 +102,27 @@ REPO_NAME = ROOT.name
 STATE_DIR = Path(os.getenv("LAM_GATEWAY_STATE_DIR", str(ROOT / ".gateway")))
 POLICY_FILE = Path(os.getenv("LAM_GATEWAY_POLICY_FILE", str(STATE_DIR / "routing_policy.json")))
 INDEX_FILE = Path(os.getenv("LAM_GATEWAY_INDEX_FILE", str(STATE_DIR / "index.json")))
+INDEX_DB_FILE = Path(os.getenv("LAM_GATEWAY_INDEX_DB_FILE", str(STATE_DIR / "index.sqlite3")))
+OBJECTS_DB_FILE = Path(os.getenv("LAM_GATEWAY_OBJECTS_DB_FILE", str(STATE_DIR / "objects.sqlite3")))
 QUEUE_FILE = Path(os.getenv("LAM_GATEWAY_QUEUE_FILE", str(STATE_DIR / "queue.json")))
+QUEUE_DB_FILE = Path(os.getenv("LAM_GATEWAY_QUEUE_DB_FILE", str(STATE_DIR / "queue.sqlite3")))
 BREAKER_FILE = Path(os.getenv("LAM_GATEWAY_BREAKER_FILE", str(STATE_DIR / "circuit_breakers.json")))
 EVENTS_FILE = Path(os.getenv("LAM_GATEWAY_EVENTS_FILE", str(STATE_DIR / "routing_events.jsonl")))
+HEALTH_FILE = Path(os.getenv("LAM_GATEWAY_HEALTH_FILE", str(STATE_DIR / "health_snapshot.json")))
+SOCKET_FILE = Path(os.getenv("LAM_GATEWAY_SOCKET", str(STATE_DIR / "gateway.sock")))
+PROVIDER_STATS_FILE = Path(os.getenv("LAM_GATEWAY_PROVIDER_STATS_FILE", str(STATE_DIR / "provider_stats.json")))
+CACHE_DIR = Path(os.getenv("LAM_GATEWAY_CACHE_DIR", str(STATE_DIR / "cache")))
+SCRUB_STATE_FILE = Path(os.getenv("LAM_GATEWAY_SCRUB_STATE_FILE", str(STATE_DIR / "scrub_state.json")))
+SCRUB_REPORT_FILE = Path(os.getenv("LAM_GATEWAY_SCRUB_REPORT_FILE", str(STATE_DIR / "scrub_report.json")))
+POWER_STATE_FILE = Path(os.getenv("LAM_HUB_ROOT", str(STATE_DIR / "hub"))) / "power_fabric_state.json"
+GITHUB_RAW_BASE = os.getenv("LAM_GATEWAY_GITHUB_RAW_BASE", "https://raw.githubusercontent.com")
+GITHUB_TIMEOUT_SEC = float(os.getenv("LAM_GATEWAY_GITHUB_TIMEOUT_SEC", "30"))
+GITHUB_CHUNK_BYTES = 1024 * 1024
+
+# Serializes read-modify-write of shared state files when queue workers run in threads.
+_STATE_LOCK = threading.RLock()
+_HEALTH_CACHE: ProviderHealthCache | None = None
+ROUTE_LATENCY = LatencyRecorder()
 
 
 def utc_now() -> str:
@@ -66,12 +166,49 @@ def default_policy() -> dict[str, Any]:
         "routing": {
             "local_hard_min_free_gb": int(os.getenv("LAM_GATEWAY_LOCAL_HARD_MIN_FREE_GB", "20")),
             "degraded_provider_cooldown_sec": int(os.getenv("LAM_GATEWAY_DEGRADED_COOLDOWN_SEC", "300")),
+            # ordered: first healthy provider in class order; score: lowest expected cost (see lam_gateway_stats).
+            "mode": "ordered",
+            "stats_alpha": 0.2,
+            "stats_min_throughput_bytes": 1024 * 1024,
+            "score": {
+                "prior_mbps": 50,
+                "prior_latency_ms": 20,
+                "default_size_bytes": 1024 * 1024,
+                "space_target_ratio": 4,
+                "weight_space_sec": 5,
+                "weight_error_sec": 30,
+                "weight_breaker_sec": 10,
+                "order_sec": 0.001,
+            },
+        },
+        "index": {"backend": "sqlite"},
+        "storage": {"layout": "cas", "gc_grace_sec": 3600, "delta_dirs": True},
+        "transfer": {"method": "auto", "chunk_kb": 1024, "buffers": 8, "resumable_min_mb": 64, "checkpoint_mb": 64},
+        "compression": {
+            "min_bytes": 512,
+            "classes": {"memory": {"codec": "zstd", "level": 6}, "archive": {"codec": "zstd", "level": 9}},
         },
         "queue": {
+            "backend": "sqlite",
             "max_attempts": 5,
             "backoff_base_sec": 5,
             "backoff_cap_sec": 300,
+            "lease_sec": 900,
+            "retain_finished_sec": 7 * 86400,
+            "provider_concurrency": {"gdrive": 2, "onedrive": 2},
+            # Merge a new enqueue into an identical pending job (same source, class, provider and fingerprint).
+            "coalesce": True,
+            # wfq: weighted fair share across classes, priority + aging inside a class; fifo: due order.
+            "scheduling": {
+                "mode": "wfq",
+                "class_weights": {"governance": 8, "sensitive": 8, "restricted": 8, "memory": 4, "generic": 2, "artifacts": 1},
+                "default_weight": 1,
+                "aging_sec": 300,
+            },
         },
+        "health": {"ttl_sec": 30, "max_stale_sec": 300, "probe_timeout_sec": 2.0},
+        "cache": {"enabled": True, "max_mb": 1024, "eviction": "lru"},
+        "scrub": {"workers": 4, "mb_per_sec": 0, "quiet_mb_per_sec": 8, "checkpoint_every": 64, "page_size": 500},
         "circuit_breaker": {
             "failure_threshold": 3,
             "cooldown_sec": 120,
@@ -124,7 +261,7 @@ def read_json(path: Path, fallback: Any) -> Any:
 
 def write_json(path: Path, payload: Any) -> None:
     safe_mkdir(path.parent)
-    path.write_text(json.dumps(payload, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+    state_store.write_json(path, payload)
 
 
 def ensure_state() -> None:
@@ -136,10 +273,6 @@ def ensure_state() -> None:
         local_cfg = policy.get("providers", {}).get("local", {})
         if local_cfg.get("root"):
             safe_mkdir(Path(local_cfg["root"]))
-    if not INDEX_FILE.exists():
-        write_json(INDEX_FILE, {"version": "v1", "entries": []})
-    if not QUEUE_FILE.exists():
-        write_json(QUEUE_FILE, {"version": "v1", "items": []})
     if not BREAKER_FILE.exists():
         write_json(BREAKER_FILE, {"version": "v1", "providers": {}})
 
@@ -161,52 +294,110 @@ def free_gb(path: Path) -> int:
 
 
 def path_size_bytes(path: Path) -> int:
-    if path.is_file():
-        return int(path.stat().st_size)
-    total = 0
-    for sub in path.rglob("*"):
-        if sub.is_file():
-            total += int(sub.stat().st_size)
-    return total
+    return scan_source(path).total_bytes
 
 
 def append_event(event: dict[str, Any]) -> None:
-    safe_mkdir(EVENTS_FILE.parent)
-    with EVENTS_FILE.open("a", encoding="utf-8") as fh:
-        fh.write(json.dumps(event, ensure_ascii=True) + "\n")
-
-
-def load_breakers() -> dict[str, Any]:
-    return read_json(BREAKER_FILE, {"version": "v1", "providers": {}})
-
+    with _STATE_LOCK:
+        safe_mkdir(EVENTS_FILE.parent)
+        event_log.append_jsonl(EVENTS_FILE, event)
 
-def save_breakers(payload: dict[str, Any]) -> None:
-    write_json(BREAKER_FILE, payload)
 
-
-def provider_breaker_state(provider: str) -> dict[str, Any]:
-    breakers = load_breakers()
-    return breakers.get("providers", {}).get(provider, {"consecutive_failures": 0, "open_until_epoch": 0})
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class BreakerStore:
+    """Circuit-breaker state kept in memory by one GatewayService until ``flush()``.
+
+    Each service owns its store, so two services in one process neither see
+    each other's unflushed failures nor drop each other's state on close.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._payload: dict[str, Any] = read_json(self.path, {"version": "v1", "providers": {}})
+        self._stamp = _file_stamp(self.path)
+        self._dirty = False
+
+    def load(self) -> dict[str, Any]:
+        return self._payload
+
+    def save(self, payload: dict[str, Any]) -> None:
+        self._payload = payload
+        self._dirty = True
+
+    def refresh(self) -> None:
+        """Re-read the file when another process updated it and nothing local is pending."""
+        with _STATE_LOCK:
+            if self._dirty:
+                return
+            stamp = _file_stamp(self.path)
+            if stamp != self._stamp:
+                self._payload = read_json(self.path, {"version": "v1", "providers": {}})
+                self._stamp = stamp
+
+    def flush(self) -> bool:
+        with _STATE_LOCK:
+            if not self._dirty:
+                return False
+            write_json(self.path, self._payload)
+            self._stamp = _file_stamp(self.path)
+            self._dirty = False
+            return True
+
+
+def load_breakers(breakers: BreakerStore | None = None) -> dict[str, Any]:
+    with _STATE_LOCK:
+        if breakers is not None:
+            return breakers.load()
+        return read_json(BREAKER_FILE, {"version": "v1", "providers": {}})
+
+
+def save_breakers(payload: dict[str, Any], breakers: BreakerStore | None = None) -> None:
+    with _STATE_LOCK:
+        if breakers is not None:
+            breakers.save(payload)
+            return
+        write_json(BREAKER_FILE, payload)
+
+
+def provider_breaker_state(provider: str, breakers: BreakerStore | None = None) -> dict[str, Any]:
+    payload = load_breakers(breakers)
+    return payload.get("providers", {}).get(provider, {"consecutive_failures": 0, "open_until_epoch": 0})
+
+
+def breaker_is_open(provider: str, breakers: BreakerStore | None = None) -> bool:
+    state = provider_breaker_state(provider, breakers)
+    return int(state.get("open_until_epoch", 0)) > epoch_now()
 
 
-def breaker_is_open(provider: str) -> bool:
-    state = provider_breaker_state(provider)
-    return int(state.get("open_until_epoch", 0)) > epoch_now()
+def open_breakers(breakers: BreakerStore | None = None) -> set[str]:
+    now = epoch_now()
+    providers = load_breakers(breakers).get("providers", {})
+    return {name for name, state in providers.items() if int(state.get("open_until_epoch", 0)) > now}
 
 
-def breaker_record_failure(policy: dict[str, Any], provider: str, reason: str) -> None:
+def breaker_record_failure(
+    policy: dict[str, Any], provider: str, reason: str, breakers: BreakerStore | None = None
+) -> None:
     cfg = policy.get("circuit_breaker", {})
     threshold = int(cfg.get("failure_threshold", 3))
     cooldown = int(cfg.get("cooldown_sec", 120))
 
-    payload = load_breakers()
-    providers = payload.setdefault("providers", {})
-    state = providers.setdefault(provider, {"consecutive_failures": 0, "open_until_epoch": 0})
-    state["consecutive_failures"] = int(state.get("consecutive_failures", 0)) + 1
-    if state["consecutive_failures"] >= threshold:
-        state["open_until_epoch"] = epoch_now() + cooldown
-    providers[provider] = state
-    save_breakers(payload)
+    with _STATE_LOCK:
+        payload = load_breakers(breakers)
+        providers = payload.setdefault("providers", {})
+        state = providers.setdefault(provider, {"consecutive_failures": 0, "open_until_epoch": 0})
+        state["consecutive_failures"] = int(state.get("consecutive_failures", 0)) + 1
+        if state["consecutive_failures"] >= threshold:
+            state["open_until_epoch"] = epoch_now() + cooldown
+        providers[provider] = state
+        save_breakers(payload, breakers)
     append_event(
         {
             "ts_utc": utc_now(),
@@ -218,11 +409,12 @@ def breaker_record_failure(policy: dict[str, Any], provider: str, reason: str) -
     )
 
 
-def breaker_record_success(provider: str) -> None:
-    payload = load_breakers()
-    providers = payload.setdefault("providers", {})
-    providers[provider] = {"consecutive_failures": 0, "open_until_epoch": 0}
-    save_breakers(payload)
+def breaker_record_success(provider: str, breakers: BreakerStore | None = None) -> None:
+    with _STATE_LOCK:
+        payload = load_breakers(breakers)
+        providers = payload.setdefault("providers", {})
+        providers[provider] = {"consecutive_failures": 0, "open_until_epoch": 0}
+        save_breakers(payload, breakers)
     append_event({"ts_utc": utc_now(), "event": "breaker_reset", "provider": provider})
 
 
@@ -249,36 +441,55 @@ def provider_accepts_local_hard_limit(
     return int(local.get("free_gb", 0)) >= hard_min
 
 
-def provider_health(policy: dict[str, Any]) -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    providers = policy.get("providers", {})
-    for name, cfg in providers.items():
-        root_str = str(cfg.get("root", "")).strip()
-        configured = bool(root_str)
-        root = Path(root_str) if root_str else Path("/")
-        reachable = False
-        free = 0
-        if configured:
-            # Non-blocking access check to prevent eternal hang on stale mounts
-            try:
-                reachable = True
-                if root.exists():
-                    reachable = root.is_dir()
-                if reachable:
-                    free = free_gb(root)
-            except (OSError, PermissionError):
-                reachable = False
-                free = 0
-        out.append(
-            {
-                "provider": name,
-                "configured": configured,
-                "reachable": reachable,
-                "free_gb": free,
-                "root": root_str,
-            }
+def health_cache(policy: dict[str, Any]) -> ProviderHealthCache:
+    global _HEALTH_CACHE
+    cfg = policy.get("health", {})
+    ttl = float(cfg.get("ttl_sec", 30))
+    max_stale = float(cfg.get("max_stale_sec", 300))
+    timeout = float(cfg.get("probe_timeout_sec", 2.0))
+    if _HEALTH_CACHE is None or _HEALTH_CACHE.snapshot_path != HEALTH_FILE:
+        _HEALTH_CACHE = ProviderHealthCache(
+            ttl_sec=ttl, max_stale_sec=max_stale, probe_timeout_sec=timeout, snapshot_path=HEALTH_FILE
+        )
+    else:
+        _HEALTH_CACHE.configure(ttl_sec=ttl, max_stale_sec=max_stale, probe_timeout_sec=timeout)
+    return _HEALTH_CACHE
+
+
+def provider_stats(policy: dict[str, Any] | None = None, stats: ProviderStats | None = None) -> ProviderStats:
+    """The service's held stats when given, else a write-through view of PROVIDER_STATS_FILE."""
+    stats = stats if stats is not None else ProviderStats(PROVIDER_STATS_FILE)
+    if policy is not None:
+        cfg = policy.get("routing", {})
+        stats.configure(
+            alpha=float(cfg.get("stats_alpha", 0.2)),
+            min_throughput_bytes=int(cfg.get("stats_min_throughput_bytes", 1024 * 1024)),
         )
-    return out
+    return stats
+
+
+def record_transfer(
+    policy: dict[str, Any],
+    provider: str,
+    op: str,
+    *,
+    ok: bool,
+    size_bytes: int,
+    seconds: float,
+    stats: ProviderStats | None = None,
+) -> None:
+    if provider not in policy.get("providers", {}):
+        return
+    provider_stats(policy, stats).record(provider, op, ok=ok, size_bytes=int(size_bytes), seconds=seconds)
+
+
+def provider_health(policy: dict[str, Any]) -> list[dict[str, Any]]:
+    # Always probes (each provider bounded by health.probe_timeout_sec) and refreshes the shared snapshot.
+    return list(health_cache(policy).refresh(policy.get("providers", {}))["providers"])
+
+
+def cached_provider_health(policy: dict[str, Any]) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    return health_cache(policy).get(policy.get("providers", {}))
 
 
 def class_policy(policy: dict[str, Any], data_class: str) -> dict[str, Any]:
@@ -288,23 +499,6 @@ def class_policy(policy: dict[str, Any], data_class: str) -> dict[str, Any]:
     return classes.get("generic", {"providers": ["local"], "min_free_gb": 1})
 
 
-def circulation_policy(policy: dict[str, Any]) -> dict[str, Any]:
-    raw = policy.get("data_circulation", {})
-    if not isinstance(raw, dict):
-        return {}
-    return raw
-
-
-def provider_org(policy: dict[str, Any], provider: str) -> str:
-    cfg = circulation_policy(policy)
-    mapping = cfg.get("provider_org", {})
-    if isinstance(mapping, dict):
-        org = str(mapping.get(provider, "")).strip()
-        if org:
-            return org
-    return "internal"
-
-
 def validate_circulation_controls(
     policy: dict[str, Any],
     *,
@@ -312,68 +506,88 @@ def validate_circulation_controls(
     provider: str,
     contract_id: str,
     approval_ref: str,
+    compiled: CirculationPolicy | None = None,
 ) -> None:
-    cfg = circulation_policy(policy)
-
-    def reject(reason: str) -> None:
-        append_event(
-            {
-                "ts_utc": utc_now(),
-                "event": "circulation_policy_denied",
-                "class": data_class,
-                "provider": provider,
-                "provider_org": provider_org(policy, provider),
-                "contract_id": contract_id,
-                "approval_ref": approval_ref,
-                "reason": reason,
-            }
-        )
-        raise RuntimeError(reason)
-
-    if not cfg:
-        return
-    if bool(cfg.get("kill_switch", False)):
-        reject("data circulation kill-switch is active")
-    if not bool(cfg.get("enforce", True)):
+    compiled = compiled or compiled_circulation(policy)
+    reason = compiled.decide(data_class, provider, contract_id=contract_id, approval_ref=approval_ref)
+    if not reason:
         return
+    append_event(
+        {
+            "ts_utc": utc_now(),
+            "event": "circulation_policy_denied",
+            "class": data_class,
+            "provider": provider,
+            "provider_org": compiled.org(provider),
+            "contract_id": contract_id,
+            "approval_ref": approval_ref,
+            "reason": reason,
+        }
+    )
+    raise RuntimeError(reason)
 
-    allow = cfg.get("class_provider_allowlist", {})
-    if isinstance(allow, dict):
-        allowed = allow.get(data_class) or allow.get("generic")
-        if isinstance(allowed, list) and provider not in [str(x) for x in allowed]:
-            reject(f"provider '{provider}' not allowed for class '{data_class}'")
 
-    org = provider_org(policy, provider)
-    allowed_orgs = cfg.get("cross_org_allowed", [])
-    if isinstance(allowed_orgs, list) and org not in [str(x) for x in allowed_orgs]:
-        reject(f"destination org '{org}' is not allowed by policy")
+def select_provider(
+    policy: dict[str, Any],
+    data_class: str,
+    *,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> dict[str, Any]:
+    return select_provider_for_object(
+        policy, data_class=data_class, object_size_bytes=None, breakers=breakers, stats=stats
+    )
 
-    need_contract = [str(x) for x in cfg.get("require_contract_for_classes", [])]
-    if data_class in need_contract and not contract_id.strip():
-        reject(f"contract_id required for class '{data_class}'")
 
-    need_approval = [str(x) for x in cfg.get("require_approval_for_classes", [])]
-    if data_class in need_approval and not approval_ref.strip():
-        reject(f"approval_ref required for class '{data_class}'")
+def select_provider_for_object(
+    policy: dict[str, Any],
+    data_class: str,
+    object_size_bytes: int | None,
+    *,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        return _select_provider_for_object(policy, data_class, object_size_bytes, breakers, stats)
+    finally:
+        ROUTE_LATENCY.record((time.perf_counter() - started) * 1000.0)
 
 
-def select_provider(policy: dict[str, Any], data_class: str) -> dict[str, Any]:
-    return select_provider_for_object(policy, data_class=data_class, object_size_bytes=None)
+def routing_mode(policy: dict[str, Any]) -> str:
+    override = os.getenv("LAM_GATEWAY_ROUTING_MODE", "").strip().lower()
+    if override:
+        return override
+    return str(policy.get("routing", {}).get("mode", "ordered")).strip().lower()
 
 
-def select_provider_for_object(
-    policy: dict[str, Any], data_class: str, object_size_bytes: int | None
+def _select_provider_for_object(
+    policy: dict[str, Any],
+    data_class: str,
+    object_size_bytes: int | None,
+    breakers: BreakerStore | None,
+    stats: ProviderStats | None,
 ) -> dict[str, Any]:
-    health = {h["provider"]: h for h in provider_health(policy)}
+    report, cache_info = cached_provider_health(policy)
+    health = {h["provider"]: h for h in report}
+    breakers_open = open_breakers(breakers)
     cls = class_policy(policy, data_class)
     providers = list(cls.get("providers", ["local"]))
     min_free = int(cls.get("min_free_gb", 1))
 
+    mode = routing_mode(policy)
+    if mode == "score":
+        return _score_select(
+            policy, data_class, object_size_bytes, providers, min_free, health, breakers_open, cache_info, breakers, stats
+        )
+    if mode != "ordered":
+        raise RuntimeError(f"unsupported routing mode: {mode}")
+
     for provider in providers:
         h = health.get(provider)
         if not h:
             continue
-        if breaker_is_open(provider):
+        if provider in breakers_open:
             continue
         if not provider_accepts_size(policy, provider, object_size_bytes):
             continue
@@ -387,13 +601,14 @@ def select_provider_for_object(
                 "required_free_gb": min_free,
                 "available_free_gb": h["free_gb"],
                 "object_size_bytes": object_size_bytes,
+                "health_cache": cache_info,
             }
 
     for provider in providers:
         h = health.get(provider)
         if not h:
             continue
-        if breaker_is_open(provider):
+        if provider in breakers_open:
             continue
         if not provider_accepts_size(policy, provider, object_size_bytes):
             continue
@@ -407,120 +622,347 @@ def select_provider_for_object(
                 "required_free_gb": min_free,
                 "available_free_gb": h["free_gb"],
                 "object_size_bytes": object_size_bytes,
+                "health_cache": cache_info,
             }
 
     raise RuntimeError(f"no reachable providers for class={data_class}")
 
 
-def index_add(entry: dict[str, Any]) -> None:
-    index = read_json(INDEX_FILE, {"version": "v1", "entries": []})
-    entries = index.setdefault("entries", [])
-    entries.append(entry)
-    write_json(INDEX_FILE, index)
+def _score_select(
+    policy: dict[str, Any],
+    data_class: str,
+    object_size_bytes: int | None,
+    providers: list[str],
+    min_free: int,
+    health: dict[str, dict[str, Any]],
+    breakers_open: set[str],
+    cache_info: dict[str, Any],
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> dict[str, Any]:
+    settings = score_settings(policy.get("routing", {}).get("score"))
+    stats = provider_stats(policy, stats)
+    failures = load_breakers(breakers).get("providers", {})
+    scores: list[dict[str, Any]] = []
+    for position, provider in enumerate(providers):
+        h = health.get(provider)
+        row: dict[str, Any] = {"provider": provider}
+        if not h or not (h["configured"] and h["reachable"]):
+            row["skipped"] = "unreachable"
+        elif provider in breakers_open:
+            row["skipped"] = "breaker_open"
+        elif not provider_accepts_size(policy, provider, object_size_bytes):
+            row["skipped"] = "size_limit"
+        elif not provider_accepts_local_hard_limit(policy, provider, health):
+            row["skipped"] = "local_hard_limit"
+        else:
+            row.update(
+                score_provider(
+                    stats.get(provider),
+                    size_bytes=object_size_bytes,
+                    free_gb=float(h["free_gb"]),
+                    min_free_gb=min_free,
+                    consecutive_failures=int(failures.get(provider, {}).get("consecutive_failures", 0)),
+                    position=position,
+                    settings=settings,
+                )
+            )
+            row["free_gb"] = h["free_gb"]
+            row["meets_min_free"] = h["free_gb"] >= min_free
+        scores.append(row)
+
+    eligible = [row for row in scores if "score" in row]
+    if not eligible:
+        raise RuntimeError(f"no reachable providers for class={data_class}")
+    roomy = [row for row in eligible if row["meets_min_free"]]
+    best = min(roomy or eligible, key=lambda row: row["score"])
+    return {
+        "provider": best["provider"],
+        "reason": "score_best" if roomy else "degraded_low_space",
+        "degraded": not roomy,
+        "required_free_gb": min_free,
+        "available_free_gb": best["free_gb"],
+        "object_size_bytes": object_size_bytes,
+        "health_cache": cache_info,
+        "mode": "score",
+        "scores": sorted(scores, key=lambda row: (row.get("score") is None, row.get("score", 0.0))),
+    }
 
 
-def cmd_init(_: argparse.Namespace) -> int:
-    ensure_state()
-    payload = {
-        "status": "ok",
-        "state_dir": str(STATE_DIR),
-        "policy_file": str(POLICY_FILE),
-        "index_file": str(INDEX_FILE),
-    }
-    print(json.dumps(payload, ensure_ascii=True, indent=2))
-    return 0
+def index_backend_name(policy: dict[str, Any]) -> str:
+    override = os.getenv("LAM_GATEWAY_INDEX_BACKEND", "").strip()
+    if override:
+        return override
+    return str(policy.get("index", {}).get("backend", "sqlite"))
 
 
-def cmd_health(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    report = provider_health(policy)
-    payload = {"ts_utc": utc_now(), "providers": report}
-    if args.json:
-        print(json.dumps(payload, ensure_ascii=True, indent=2))
-        return 0
-    for item in report:
-        print(
-            f"{item['provider']}: configured={item['configured']} "
-            f"reachable={item['reachable']} free_gb={item['free_gb']} root={item['root']}"
-        )
-    return 0
+def open_index(policy: dict[str, Any] | None = None) -> ObjectIndex:
+    if policy is None:
+        policy = read_json(POLICY_FILE, default_policy())
+    index = open_object_index(index_backend_name(policy), json_path=INDEX_FILE, db_path=INDEX_DB_FILE)
+    if index.name != "json" and INDEX_FILE.exists():
+        with _STATE_LOCK:
+            migrated = migrate_json_index(INDEX_FILE, index)
+        # None: another process claimed the legacy file first and logs the migration.
+        if migrated is not None:
+            append_event(
+                {
+                    "ts_utc": utc_now(),
+                    "event": "index_migrated",
+                    "from": str(INDEX_FILE),
+                    "to": index.location,
+                    "entries": migrated,
+                }
+            )
+    return index
 
 
-def cmd_route(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    object_size_bytes = int(args.size_bytes) if args.size_bytes is not None else None
-    decision = select_provider_for_object(policy, args.data_class, object_size_bytes=object_size_bytes)
-    payload = {"ts_utc": utc_now(), "class": args.data_class, "decision": decision}
-    print(json.dumps(payload, ensure_ascii=True, indent=2))
-    return 0
+def index_add(entry: dict[str, Any], policy: dict[str, Any] | None = None, index: ObjectIndex | None = None) -> None:
+    index = index or open_index(policy)
+    with _STATE_LOCK:
+        index.add(entry)
 
 
-def cmd_put(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    source = Path(args.src).resolve()
+def storage_layout(policy: dict[str, Any]) -> str:
+    return str(policy.get("storage", {}).get("layout", "cas")).strip().lower()
+
+
+def transfer_method(policy: dict[str, Any]) -> str:
+    override = os.getenv("LAM_GATEWAY_TRANSFER_METHOD", "").strip()
+    if override:
+        return override
+    cfg = policy.get("transfer", {})
+    configure_pool(int(cfg.get("buffers", 8)), int(cfg.get("chunk_kb", 1024)) * 1024)
+    return str(cfg.get("method", "auto"))
+
+
+def resume_settings(policy: dict[str, Any] | None) -> tuple[int, int]:
+    """(resumable_min_bytes, checkpoint_bytes); 0 disables chunked resumable copies."""
+    cfg = (policy or {}).get("transfer", {})
+    return int(float(cfg.get("resumable_min_mb", 64)) * 1024 * 1024), int(float(cfg.get("checkpoint_mb", 64)) * 1024 * 1024)
+
+
+def snapshot_pointer(target_root: Path, data_class: str, name: str) -> Path:
+    """Latest ``named`` directory snapshot of one logical name, with its per-file (size, mtime_ns, sha256)."""
+    return target_root / data_class / ".snapshots" / f"{name}.json"
+
+
+def snapshot_baseline(policy: dict[str, Any], target_root: Path, data_class: str, name: str) -> dict[str, Any]:
+    if not bool(policy.get("storage", {}).get("delta_dirs", True)):
+        return {}
+    doc = read_json(snapshot_pointer(target_root, data_class, name), {})
+    if not isinstance(doc, dict) or not isinstance(doc.get("files"), dict):
+        return {}
+    if not (target_root / str(doc.get("dest_rel", ""))).is_dir():
+        return {}  # previous snapshot was removed; hard links in later ones stay valid regardless
+    return doc
+
+
+def class_compression(policy: dict[str, Any] | None, data_class: str) -> tuple[str, int, int]:
+    """(codec, level, min_bytes) for a data class; zstd degrades to gzip without the zstandard module."""
+    cfg = (policy or {}).get("compression", {})
+    rule = cfg.get("classes", {}).get(data_class, {})
+    codec = resolve_codec(str(rule.get("codec", "none")))
+    return codec, int(rule.get("level", 6)), int(cfg.get("min_bytes", 512))
+
+
+def open_object_store(
+    provider: str, root: Path, policy: dict[str, Any] | None = None, data_class: str = ""
+) -> ObjectStore:
+    method = transfer_method(policy) if policy is not None else "auto"
+    resume_min, checkpoint = resume_settings(policy)
+    codec, level, min_bytes = class_compression(policy, data_class)
+    return ObjectStore(
+        root,
+        provider,
+        ObjectCatalog(OBJECTS_DB_FILE),
+        transfer_method=method,
+        resume_min_bytes=resume_min,
+        checkpoint_bytes=checkpoint,
+        codec=codec,
+        level=level,
+        compress_min_bytes=min_bytes,
+    )
+
+
+def put_object(
+    policy: dict[str, Any],
+    src: str,
+    *,
+    data_class: str = "generic",
+    provider: str = "",
+    name: str = "",
+    contract_id: str = "",
+    approval_ref: str = "",
+    index: ObjectIndex | None = None,
+    circulation: CirculationPolicy | None = None,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> dict[str, Any]:
+    source = Path(src).resolve()
     if not source.exists():
         raise FileNotFoundError(f"source not found: {source}")
 
-    object_size_bytes = path_size_bytes(source)
-    contract_id = str(getattr(args, "contract_id", "") or "").strip()
-    approval_ref = str(getattr(args, "approval_ref", "") or "").strip()
-
-    if args.provider:
-        provider_name = args.provider
+    # One scandir walk serves both size-aware routing and the tree put below.
+    scan = scan_source(source)
+    object_size_bytes = scan.total_bytes
+    # Compressed classes are routed and size-checked by what will land on the provider.
+    codec, level, min_bytes = class_compression(policy, data_class)
+    routed_size_bytes = object_size_bytes
+    if codec != "none" and storage_layout(policy) == "cas":
+        routed_size_bytes = estimate_encoded_size(scan, codec=codec, level=level, min_bytes=min_bytes)
+    contract_id = str(contract_id or "").strip()
+    approval_ref = str(approval_ref or "").strip()
+
+    if provider:
+        provider_name = provider
         providers = policy.get("providers", {})
         if provider_name not in providers:
             raise RuntimeError(f"unknown provider: {provider_name}")
-        if breaker_is_open(provider_name):
+        if breaker_is_open(provider_name, breakers):
             raise RuntimeError(f"provider breaker open: {provider_name}")
-        if not provider_accepts_size(policy, provider_name, object_size_bytes):
+        if not provider_accepts_size(policy, provider_name, routed_size_bytes):
             raise RuntimeError(f"provider size limit exceeded: provider={provider_name}")
         target_root = Path(str(providers[provider_name].get("root", "")))
         if not str(target_root).strip():
             raise RuntimeError(f"provider not configured: {provider_name}")
         safe_mkdir(target_root)
-        decision = {
+        decision: dict[str, Any] = {
             "provider": provider_name,
             "reason": "manual_override",
             "degraded": False,
             "required_free_gb": 0,
             "available_free_gb": free_gb(target_root),
-            "object_size_bytes": object_size_bytes,
+            "object_size_bytes": routed_size_bytes,
         }
     else:
-        decision = select_provider_for_object(policy, args.data_class, object_size_bytes=object_size_bytes)
+        decision = select_provider_for_object(
+            policy, data_class, object_size_bytes=routed_size_bytes, breakers=breakers, stats=stats
+        )
         target_root = Path(policy["providers"][decision["provider"]]["root"])
 
+    circulation = circulation or compiled_circulation(policy)
     validate_circulation_controls(
         policy,
-        data_class=args.data_class,
+        data_class=data_class,
         provider=decision["provider"],
         contract_id=contract_id,
         approval_ref=approval_ref,
+        compiled=circulation,
     )
 
-    safe_mkdir(target_root)
-    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-    name = args.name or source.name
-    rel_path = Path(args.data_class) / f"{stamp}_{name}"
+    transfer_started = time.perf_counter()
+    try:
+        safe_mkdir(target_root)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = name or source.name
+        kind = "dir" if source.is_dir() else "file"
+        layout = storage_layout(policy)
+        storage: dict[str, Any] = {"layout": layout}
+
+        if layout == "cas":
+            # Identical content is stored once per provider; the put returns holding the index entry's reference.
+            store = open_object_store(decision["provider"], target_root, policy, data_class)
+            stored = store.put_tree(source, scan) if kind == "dir" else store.put_file(source)
+            sha = str(stored["sha256"])
+            rel_path = object_rel_path(sha, str(stored["kind"]))
+            storage.update(
+                {
+                    "name": name,
+                    "object_kind": stored["kind"],
+                    "stored_bytes": int(stored["stored_bytes"]),
+                    "manifest_bytes": int(stored.get("manifest_bytes", 0)),
+                    "codec": str(stored.get("codec", "none")),
+                    "encoded_bytes": int(stored.get("encoded_bytes", stored["size_bytes"])),
+                    "resumed_bytes": int(stored.get("resumed_bytes", 0)),
+                    "dedup": int(stored["stored_bytes"]) + int(stored.get("manifest_bytes", 0)) == 0,
+                    "transfer_method": str(stored.get("method", "")),
+                }
+            )
+            if "codecs" in stored:
+                storage["codecs"] = list(stored["codecs"])
+        elif layout == "named":
+            rel_path = Path(data_class) / f"{stamp}_{name}"
+            # Staged under the provider root and renamed into place; large files resume from checkpoints.
+            staging_root = target_root / ".staging"
+            resume_min, checkpoint = resume_settings(policy)
+            if kind == "dir":
+                # Unchanged files are hard-linked from the previous snapshot of the same name.
+                base = snapshot_baseline(policy, target_root, data_class, name)
+                copied = copy_tree_staged(
+                    source,
+                    target_root / rel_path,
+                    staging_root,
+                    scan,
+                    method=transfer_method(policy),
+                    resume_min_bytes=resume_min,
+                    checkpoint_bytes=checkpoint,
+                    baseline=base.get("files"),
+                    baseline_root=target_root / str(base["dest_rel"]) if base else None,
+                )
+                write_json(
+                    snapshot_pointer(target_root, data_class, name),
+                    {"version": "v1", "name": name, "dest_rel": str(rel_path), "ts_utc": utc_now(), "files": copied["files"]},
+                )
+                storage.update(
+                    {
+                        "resumed_bytes": int(copied["resumed_bytes"]) + int(copied["skipped_bytes"]),
+                        "copied_bytes": int(copied["copied_bytes"]),
+                        "linked_bytes": int(copied["linked_bytes"]),
+                        "logical_bytes": int(copied["logical_bytes"]),
+                        "delta_base": str(base.get("dest_rel", "")),
+                    }
+                )
+                sha = ""
+            else:
+                copied_file = copy_file_staged(
+                    source,
+                    target_root / rel_path,
+                    staging_root / f"{resume_key(source, source.stat())}.part",
+                    method=transfer_method(policy),
+                    resume_min_bytes=resume_min,
+                    checkpoint_bytes=checkpoint,
+                )
+                storage["resumed_bytes"] = copied_file.resumed_bytes
+                sha = copied_file.sha256
+        else:
+            raise RuntimeError(f"unsupported storage layout: {layout}")
+    except Exception:
+        record_transfer(
+            policy,
+            decision["provider"],
+            "put",
+            ok=False,
+            size_bytes=0,
+            seconds=time.perf_counter() - transfer_started,
+            stats=stats,
+        )
+        raise
+    # A deduplicated CAS put moves no bytes, so it says nothing about provider speed.
+    if not storage.get("dedup"):
+        if "copied_bytes" in storage:
+            moved = int(storage["copied_bytes"])
+        else:
+            moved = (
+                int(storage.get("stored_bytes", object_size_bytes))
+                + int(storage.get("manifest_bytes", 0))
+                - int(storage.get("resumed_bytes", 0))
+            )
+        record_transfer(
+            policy,
+            decision["provider"],
+            "put",
+            ok=True,
+            size_bytes=moved,
+            seconds=time.perf_counter() - transfer_started,
+            stats=stats,
+        )
     dest = target_root / rel_path
 
-    if source.is_dir():
-        shutil.copytree(source, dest)
-        sha = ""
-        kind = "dir"
-    else:
-        safe_mkdir(dest.parent)
-        shutil.copy2(source, dest)
-        sha = file_sha256(dest)
-        kind = "file"
-
     entry = {
-        "id": f"entry_{stamp}",
+        "id": f"entry_{stamp}_{secrets.token_hex(3)}",
         "ts_utc": utc_now(),
-        "class": args.data_class,
+        "class": data_class,
         "provider": decision["provider"],
         "kind": kind,
         "source": str(source),
@@ -531,284 +973,425 @@ def cmd_put(args: argparse.Namespace) -> int:
         "size_bytes": object_size_bytes,
         "contract_id": contract_id,
         "approval_ref": approval_ref,
-        "provider_org": provider_org(policy, decision["provider"]),
+        "provider_org": circulation.org(decision["provider"]),
+        **storage,
     }
-    index_add(entry)
-    breaker_record_success(decision["provider"])
-    print(json.dumps({"status": "ok", "entry": entry, "decision": decision}, ensure_ascii=True, indent=2))
-    return 0
-
+    index_add(entry, policy, index)
+    breaker_record_success(decision["provider"], breakers)
+    return {"status": "ok", "entry": entry, "decision": decision}
+
+
+def read_cache(policy: dict[str, Any] | None) -> ReadCache | None:
+    cfg = (policy or {}).get("cache", {})
+    if not bool(cfg.get("enabled", True)) or float(cfg.get("max_mb", 1024)) <= 0:
+        return None
+    return ReadCache(
+        CACHE_DIR,
+        max_bytes=int(float(cfg.get("max_mb", 1024)) * 1024 * 1024),
+        eviction=str(cfg.get("eviction", "lru")).strip().lower(),
+    )
 
-import urllib.request
 
-def github_fetch(repo: str, path: str, dst: Path) -> bool:
-    """Fallback logic to fetch directly from public GitHub."""
-    url = f"https://raw.githubusercontent.com/{repo}/main/{path}"
+def read_through(cache: ReadCache, provider: str, path: str, source: Path, dst: Path) -> str:
+    """Serve a provider file from the local cache, filling it on a miss; returns hit|miss|bypass."""
+    kind = encoded_blob_kind(source)
+    validator = source_fingerprint(source)
+    entry = cache.lookup(provider, path)
+    if entry is not None and entry["validator"] == validator:
+        cache.serve(provider, path, entry, dst)
+        return "hit"
+    if not cache.admits(source.stat().st_size):
+        cache.record("bypass")
+        safe_mkdir(dst.parent)
+        shutil.copy2(source, dst)
+        return "bypass"
+    fill = cache.tmp_path()
     try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                safe_mkdir(dst.parent)
-                with open(dst, 'wb') as f:
-                    f.write(response.read())
-                return True
-    except Exception as e:
-        print(f"Fallback github_fetch failed for {url}: {e}", file=sys.stderr)
-    return False
+        if kind:
+            sha = source.name.split(".", 1)[0]  # compressed blobs are addressed by the raw-content digest
+            decompress_file(source, fill, codec=kind_codec(kind))
+        else:
+            sha = copy_and_hash(source, fill).sha256
+        stored = cache.store(provider, path, fill, sha256=sha, validator=validator)
+    except BaseException:
+        fill.unlink(missing_ok=True)
+        raise
+    safe_mkdir(dst.parent)
+    shutil.copyfile(cache.blob_path(str(stored["sha256"])), dst)
+    return "miss"
+
+
+def scrub_units(policy: dict[str, Any], entries: list[dict[str, Any]]) -> tuple[list[ScrubUnit], list[str]]:
+    """Stored objects behind index entries, one unit per (provider, object); returns (units, unverifiable entry ids).
+
+    CAS trees expand to their manifest plus every blob they reference; named
+    directories record no digest and cannot be verified.
+    """
+    units: dict[str, ScrubUnit] = {}
+    skipped: list[str] = []
+
+    def add(provider: str, root: Path, rel: Path, sha: str, codec: str, entry_id: str) -> None:
+        key = f"{provider}:{rel.as_posix()}"
+        known = units.get(key)
+        if known is None:
+            units[key] = ScrubUnit(provider, rel.as_posix(), root / rel, sha, codec, (entry_id,))
+        elif entry_id not in known.entry_ids:
+            units[key] = ScrubUnit(known.provider, known.rel, known.path, known.sha256, known.codec, (*known.entry_ids, entry_id))
 
-def cmd_get(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
     providers = policy.get("providers", {})
-    if args.provider not in providers:
-        if args.provider.startswith("github:"):
-            repo = args.provider.split(":", 1)[1]
-            dst = Path(args.dst).resolve()
-            if github_fetch(repo, args.path, dst):
-                print(json.dumps({"status": "ok", "provider": args.provider, "source": f"github://{repo}/{args.path}", "dst": str(dst), "fallback": True}, ensure_ascii=True, indent=2))
-                return 0
-            else:
-                raise RuntimeError(f"github fallback failed for {args.provider}")
-        raise RuntimeError(f"unknown provider: {args.provider}")
-    root = Path(str(providers[args.provider].get("root", "")))
-    if not str(root).strip():
-        raise RuntimeError(f"provider not configured: {args.provider}")
-    source = (root / args.path).resolve()
-    if not source.exists():
-        raise FileNotFoundError(f"path not found in provider={args.provider}: {args.path}")
-    dst = Path(args.dst).resolve()
-    if source.is_dir():
-        if dst.exists():
-            raise RuntimeError(f"destination exists: {dst}")
-        shutil.copytree(source, dst)
-    else:
-        safe_mkdir(dst.parent)
-        shutil.copy2(source, dst)
-    print(json.dumps({"status": "ok", "provider": args.provider, "source": str(source), "dst": str(dst)}, ensure_ascii=True, indent=2))
-    return 0
+    for entry in entries:
+        provider, entry_id, sha = str(entry.get("provider", "")), str(entry.get("id", "")), str(entry.get("sha256", ""))
+        root_raw = str(providers.get(provider, {}).get("root", "")).strip()
+        if not root_raw or not sha:
+            skipped.append(entry_id)
+            continue
+        root = Path(root_raw)
+        if entry.get("layout") != "cas" or entry.get("object_kind") != "tree":
+            add(provider, root, Path(str(entry.get("dest_rel", ""))), sha, kind_codec(str(entry.get("object_kind", "blob"))), entry_id)
+            continue
+        store = open_object_store(provider, root, policy)
+        stack = [sha]
+        while stack:
+            tree_sha = stack.pop()
+            add(provider, root, object_rel_path(tree_sha, "tree"), tree_sha, "none", entry_id)
+            try:
+                children = store.read_tree(tree_sha)
+            except (OSError, ValueError):
+                continue  # the manifest unit reports it
+            for child in children:
+                kind = str(child.get("kind", "blob"))
+                if kind == "tree":
+                    stack.append(str(child["sha256"]))
+                else:
+                    add(provider, root, object_rel_path(str(child["sha256"]), kind), str(child["sha256"]), kind_codec(kind), entry_id)
+    return list(units.values()), skipped
 
 
-def cmd_list(args: argparse.Namespace) -> int:
-    ensure_state()
-    index = read_json(INDEX_FILE, {"version": "v1", "entries": []})
-    entries = list(index.get("entries", []))
-    if args.provider:
-        entries = [e for e in entries if e.get("provider") == args.provider]
-    if args.data_class:
-        entries = [e for e in entries if e.get("class") == args.data_class]
-    payload = {"count": len(entries), "entries": entries[-args.limit :]}
-    print(json.dumps(payload, ensure_ascii=True, indent=2))
-    return 0
+def scrub_limiter(policy: dict[str, Any], mb_per_sec: float | None = None) -> RateLimiter:
+    """I/O budget for scrubbing: ``scrub.mb_per_sec`` (0 = unlimited), capped at ``quiet_mb_per_sec`` in power quiet mode."""
+    cfg = policy.get("scrub", {})
 
+    def rate() -> float:
+        normal = float(cfg.get("mb_per_sec", 0) if mb_per_sec is None else mb_per_sec)
+        if power_mode(POWER_STATE_FILE) in QUIET_MODES:
+            quiet = float(cfg.get("quiet_mb_per_sec", 8))
+            normal = min(normal, quiet) if normal > 0 else quiet
+        return normal * 1024 * 1024
 
-def queue_add(item: dict[str, Any]) -> dict[str, Any]:
-    queue = read_json(QUEUE_FILE, {"version": "v1", "items": []})
-    items = queue.setdefault("items", [])
-    items.append(item)
-    write_json(QUEUE_FILE, queue)
-    return item
+    return RateLimiter(rate)
 
 
-def cmd_enqueue_put(args: argparse.Namespace) -> int:
-    ensure_state()
-    item = {
-        "id": f"job_{epoch_now()}_{os.getpid()}",
-        "type": "put",
-        "status": "pending",
-        "attempts": 0,
-        "next_run_epoch": epoch_now(),
-        "created_utc": utc_now(),
-        "payload": {
-            "src": str(Path(args.src).resolve()),
-            "class": args.data_class,
-            "provider": args.provider,
-            "name": args.name,
-            "contract_id": str(getattr(args, "contract_id", "") or ""),
-            "approval_ref": str(getattr(args, "approval_ref", "") or ""),
-        },
-    }
-    print(json.dumps({"status": "ok", "job": queue_add(item)}, ensure_ascii=True, indent=2))
-    return 0
+def _stream_to(response: Any, dst: Path) -> str:
+    h = hashlib.sha256()
+    safe_mkdir(dst.parent)
+    with dst.open("wb") as fh:
+        while True:
+            chunk = response.read(GITHUB_CHUNK_BYTES)
+            if not chunk:
+                break
+            h.update(chunk)
+            fh.write(chunk)
+    return h.hexdigest()
 
 
-def cmd_enqueue_get(args: argparse.Namespace) -> int:
-    ensure_state()
-    item = {
-        "id": f"job_{epoch_now()}_{os.getpid()}",
-        "type": "get",
-        "status": "pending",
-        "attempts": 0,
-        "next_run_epoch": epoch_now(),
-        "created_utc": utc_now(),
-        "payload": {
-            "provider": args.provider,
-            "path": args.path,
-            "dst": str(Path(args.dst).resolve()),
-        },
-    }
-    print(json.dumps({"status": "ok", "job": queue_add(item)}, ensure_ascii=True, indent=2))
-    return 0
+def github_fetch(repo: str, path: str, dst: Path, *, cache: ReadCache | None = None) -> dict[str, Any] | None:
+    """Fallback fetch from public GitHub, streamed to disk.
+
+    With a cache the stored ETag/Last-Modified is sent as If-None-Match /
+    If-Modified-Since and a 304 serves the cached copy; when GitHub cannot be
+    reached a cached copy is served as ``stale``. Returns None on failure.
+    """
+    url = f"{GITHUB_RAW_BASE.rstrip('/')}/{repo}/main/{path}"
+    provider = f"github:{repo}"
+    entry = cache.lookup(provider, path) if cache is not None else None
+    headers: dict[str, str] = {}
+    if entry is not None:
+        validators = json.loads(entry["validator"] or "{}")
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    fill = cache.tmp_path() if cache is not None else dst.with_name(f".{dst.name}.part")
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=GITHUB_TIMEOUT_SEC) as response:
+            sha = _stream_to(response, fill)
+            validator = json.dumps(
+                {"etag": response.headers.get("ETag", ""), "last_modified": response.headers.get("Last-Modified", "")},
+                ensure_ascii=True,
+                sort_keys=True,
+            )
+    except urllib.error.HTTPError as exc:
+        fill.unlink(missing_ok=True)
+        if exc.code == 304 and cache is not None and entry is not None:
+            cache.serve(provider, path, entry, dst, outcome="revalidated")
+            return {"cache": "revalidated", "bytes": int(entry["size_bytes"])}
+        print(f"Fallback github_fetch failed for {url}: {exc}", file=sys.stderr)
+        return None
+    except (OSError, ValueError) as exc:
+        fill.unlink(missing_ok=True)
+        if cache is not None and entry is not None:
+            cache.serve(provider, path, entry, dst, outcome="stale")
+            return {"cache": "stale", "bytes": int(entry["size_bytes"])}
+        print(f"Fallback github_fetch failed for {url}: {exc}", file=sys.stderr)
+        return None
+    size = fill.stat().st_size
+    if cache is None or not cache.admits(size):
+        if cache is not None:
+            cache.record("bypass")
+        safe_mkdir(dst.parent)
+        shutil.move(str(fill), dst)
+        return {"cache": "bypass" if cache is not None else "off", "bytes": size}
+    stored = cache.store(provider, path, fill, sha256=sha, validator=validator)
+    safe_mkdir(dst.parent)
+    shutil.copyfile(cache.blob_path(str(stored["sha256"])), dst)
+    return {"cache": "miss", "bytes": size}
 
 
-def _process_one_job(policy: dict[str, Any], item: dict[str, Any]) -> tuple[bool, str]:
+def get_object(
+    policy: dict[str, Any], provider: str, path: str, dst: str, *, stats: ProviderStats | None = None
+) -> dict[str, Any]:
+    providers = policy.get("providers", {})
+    if provider not in providers:
+        if provider.startswith("github:"):
+            repo = provider.split(":", 1)[1]
+            dst_path = Path(dst).resolve()
+            fetched = github_fetch(repo, path, dst_path, cache=read_cache(policy))
+            if fetched is None:
+                raise RuntimeError(f"github fallback failed for {provider}")
+            return {
+                "status": "ok",
+                "provider": provider,
+                "source": f"github://{repo}/{path}",
+                "dst": str(dst_path),
+                "fallback": True,
+                **fetched,
+            }
+        raise RuntimeError(f"unknown provider: {provider}")
+    root = Path(str(providers[provider].get("root", "")))
+    if not str(root).strip():
+        raise RuntimeError(f"provider not configured: {provider}")
+    source = (root / path).resolve()
+    if not source.exists():
+        raise FileNotFoundError(f"path not found in provider={provider}: {path}")
+    dst_path = Path(dst).resolve()
+    if dst_path.exists() and (is_tree_path(source) or source.is_dir()):
+        raise RuntimeError(f"destination exists: {dst_path}")
+    started = time.perf_counter()
+    cache = read_cache(policy)
+    outcome = "off"
     try:
-        payload = item.get("payload", {})
-        if item["type"] == "put":
-            class PutArgs:
-                src = payload["src"]
-                data_class = payload.get("class", "generic")
-                provider = payload.get("provider", "")
-                name = payload.get("name", "")
-                contract_id = payload.get("contract_id", "")
-                approval_ref = payload.get("approval_ref", "")
-
-            with contextlib.redirect_stdout(io.StringIO()):
-                cmd_put(PutArgs())
-            provider_used = payload.get("provider", "") or select_provider(policy, PutArgs.data_class)["provider"]
-            breaker_record_success(provider_used)
-            return True, "ok"
+        if is_tree_path(source):
+            open_object_store(provider, root).materialize(source.name.removesuffix(".tree"), "tree", dst_path)
+        elif cache is not None and source.is_file():
+            outcome = read_through(cache, provider, path, source, dst_path)
+        elif encoded_blob_kind(source):
+            sha = source.name.split(".", 1)[0]
+            open_object_store(provider, root).materialize(sha, encoded_blob_kind(source), dst_path)
+        elif source.is_dir():
+            shutil.copytree(source, dst_path)
+        else:
+            safe_mkdir(dst_path.parent)
+            shutil.copy2(source, dst_path)
+    except Exception:
+        record_transfer(
+            policy, provider, "get", ok=False, size_bytes=0, seconds=time.perf_counter() - started, stats=stats
+        )
+        raise
+    elapsed = time.perf_counter() - started
+    size_bytes = path_size_bytes(dst_path)
+    # A cache hit never touched the provider, so it says nothing about provider speed.
+    if outcome != "hit":
+        record_transfer(policy, provider, "get", ok=True, size_bytes=size_bytes, seconds=elapsed, stats=stats)
+    return {
+        "status": "ok",
+        "provider": provider,
+        "source": str(source),
+        "dst": str(dst_path),
+        "bytes": size_bytes,
+        "cache": outcome,
+    }
 
-        if item["type"] == "get":
-            class GetArgs:
-                provider = payload["provider"]
-                path = payload["path"]
-                dst = payload["dst"]
 
-            with contextlib.redirect_stdout(io.StringIO()):
-                cmd_get(GetArgs())
-            breaker_record_success(GetArgs.provider)
-            return True, "ok"
+def queue_backend_name(policy: dict[str, Any]) -> str:
+    override = os.getenv("LAM_GATEWAY_QUEUE_BACKEND", "").strip()
+    if override:
+        return override
+    return str(policy.get("queue", {}).get("backend", "sqlite"))
 
-        return False, f"unknown job type={item.get('type')}"
-    except Exception as exc:  # noqa: BLE001
-        provider = str(item.get("payload", {}).get("provider", ""))
-        if provider:
-            breaker_record_failure(policy, provider, str(exc))
-        return False, str(exc)
 
+def open_queue(policy: dict[str, Any] | None = None) -> QueueBackend:
+    if policy is None:
+        policy = read_json(POLICY_FILE, default_policy())
+    kind = queue_backend_name(policy)
+    backend = open_queue_backend(kind, json_path=QUEUE_FILE, db_path=QUEUE_DB_FILE)
+    if backend.name != "json" and QUEUE_FILE.exists():
+        migrated = migrate_json_queue(QUEUE_FILE, backend)
+        append_event(
+            {
+                "ts_utc": utc_now(),
+                "event": "queue_migrated",
+                "from": str(QUEUE_FILE),
+                "to": backend.location,
+                "items": migrated,
+            }
+        )
+    return backend
 
-def cmd_policy_check(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    target_provider = str(args.provider).strip()
-    if not target_provider:
-        decision = select_provider_for_object(policy, args.data_class, object_size_bytes=args.size_bytes)
-        target_provider = str(decision["provider"])
-    validate_circulation_controls(
-        policy,
-        data_class=args.data_class,
-        provider=target_provider,
-        contract_id=str(args.contract_id or ""),
-        approval_ref=str(args.approval_ref or ""),
-    )
-    payload = {
-        "status": "ok",
-        "class": args.data_class,
-        "provider": target_provider,
-        "provider_org": provider_org(policy, target_provider),
-        "contract_id": str(args.contract_id or ""),
-        "approval_ref": str(args.approval_ref or ""),
-    }
-    print(json.dumps(payload, ensure_ascii=True, indent=2))
-    return 0
 
+def new_job_id() -> str:
+    return f"job_{epoch_now()}_{os.getpid()}_{secrets.token_hex(3)}"
 
-def cmd_circulation_kill_switch(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    circulation = policy.setdefault("data_circulation", {})
-    if not isinstance(circulation, dict):
-        circulation = {}
-        policy["data_circulation"] = circulation
-
-    action = str(args.action).lower().strip()
-    if action == "on":
-        circulation["kill_switch"] = True
-        write_json(POLICY_FILE, policy)
-        append_event({"ts_utc": utc_now(), "event": "circulation_kill_switch", "state": "on"})
-    elif action == "off":
-        circulation["kill_switch"] = False
-        write_json(POLICY_FILE, policy)
-        append_event({"ts_utc": utc_now(), "event": "circulation_kill_switch", "state": "off"})
-    elif action == "status":
-        pass
+
+def queue_add(item: dict[str, Any]) -> dict[str, Any]:
+    return open_queue().add(item)
+
+
+def coalesce_key(policy: dict[str, Any], item: dict[str, Any]) -> str:
+    """Identity of a queued transfer: (type, resolved src/path, class, provider, content fingerprint).
+
+    The destination-shaping fields (name, dst, contract/approval refs) are part
+    of the key too, so only requests that would produce the same result merge.
+    """
+    payload = item.get("payload", {})
+    provider = str(payload.get("provider", ""))
+    if item.get("type") == "put":
+        target = str(payload.get("src", ""))
+        fingerprint = source_fingerprint(Path(target))
+        extra = [payload.get("name", ""), payload.get("contract_id", ""), payload.get("approval_ref", "")]
     else:
-        raise RuntimeError(f"unsupported action: {action}")
+        target = str(payload.get("path", ""))
+        root = str(policy.get("providers", {}).get(provider, {}).get("root", "")).strip()
+        fingerprint = source_fingerprint((Path(root) / target).resolve()) if root else ""
+        extra = [payload.get("dst", "")]
+    raw = json.dumps([item.get("type"), target, job_class(item), provider, fingerprint, *extra], ensure_ascii=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def queue_enqueue(policy: dict[str, Any], queue: QueueBackend, item: dict[str, Any]) -> dict[str, Any]:
+    if bool(policy.get("queue", {}).get("coalesce", True)):
+        item["coalesce_key"] = coalesce_key(policy, item)
+    job, coalesced = queue.enqueue(item)
+    if coalesced:
+        append_event(
+            {"ts_utc": utc_now(), "event": "queue_coalesced", "job_id": job.get("id"), "coalesced": job.get("coalesced")}
+        )
+    return {"status": "ok", "job": job, "coalesced": coalesced}
 
-    payload = {
-        "status": "ok",
-        "action": action,
-        "kill_switch": bool(circulation.get("kill_switch", False)),
-        "policy_file": str(POLICY_FILE),
-    }
-    print(json.dumps(payload, ensure_ascii=True, indent=2))
-    return 0
 
+def _process_one_job(
+    policy: dict[str, Any],
+    item: dict[str, Any],
+    index: ObjectIndex | None = None,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> tuple[bool, str, dict[str, Any]]:
+    payload = item.get("payload", {})
+    try:
+        if item["type"] == "put":
+            result = put_object(
+                policy,
+                payload["src"],
+                data_class=payload.get("class", "generic"),
+                provider=payload.get("provider", ""),
+                name=payload.get("name", ""),
+                contract_id=payload.get("contract_id", ""),
+                approval_ref=payload.get("approval_ref", ""),
+                index=index,
+                breakers=breakers,
+                stats=stats,
+            )
+            entry = result["entry"]
+            return True, "ok", {"provider": entry["provider"], "bytes": int(entry.get("size_bytes", 0))}
 
-def cmd_run_queue(args: argparse.Namespace) -> int:
-    ensure_state()
-    policy = read_json(POLICY_FILE, default_policy())
-    queue = read_json(QUEUE_FILE, {"version": "v1", "items": []})
-    items = queue.get("items", [])
-    cfg = policy.get("queue", {})
-    max_attempts = int(cfg.get("max_attempts", 5))
-    backoff_base = int(cfg.get("backoff_base_sec", 5))
-    backoff_cap = int(cfg.get("backoff_cap_sec", 300))
-    now = epoch_now()
-    processed = 0
-    succeeded = 0
-    failed = 0
-
-    for item in items:
-        if processed >= args.max_jobs:
-            break
-        if item.get("status") in {"done", "dead"}:
-            continue
-        if int(item.get("next_run_epoch", 0)) > now:
-            continue
+        if item["type"] == "get":
+            fetched = get_object(policy, payload["provider"], payload["path"], payload["dst"], stats=stats)
+            breaker_record_success(payload["provider"], breakers)
+            return True, "ok", {"provider": payload["provider"], "bytes": int(fetched.get("bytes", 0))}
 
-        processed += 1
-        ok, reason = _process_one_job(policy, item)
-        if ok:
-            item["status"] = "done"
-            item["last_error"] = ""
-            item["finished_utc"] = utc_now()
-            succeeded += 1
-        else:
-            attempts = int(item.get("attempts", 0)) + 1
-            item["attempts"] = attempts
-            item["last_error"] = reason
-            if attempts >= max_attempts:
-                item["status"] = "dead"
-                item["finished_utc"] = utc_now()
-            else:
-                item["status"] = "pending"
-                delay = min(backoff_cap, backoff_base * (2 ** (attempts - 1)))
-                item["next_run_epoch"] = now + delay
-            failed += 1
-
-    write_json(QUEUE_FILE, queue)
-    print(
-        json.dumps(
-            {
-                "status": "ok",
-                "processed": processed,
-                "succeeded": succeeded,
-                "failed": failed,
-                "queue_file": str(QUEUE_FILE),
-            },
-            ensure_ascii=True,
-            indent=2,
+        return False, f"unknown job type={item.get('type')}", {"provider": "", "bytes": 0}
+    except Exception as exc:  # noqa: BLE001
+        provider = str(payload.get("provider", ""))
+        if provider:
+            breaker_record_failure(policy, provider, str(exc), breakers)
+        return False, str(exc), {"provider": provider, "bytes": 0}
+
+
+def job_provider(
+    policy: dict[str, Any],
+    item: dict[str, Any],
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> str:
+    payload = item.get("payload", {})
+    provider = str(payload.get("provider", "") or "")
+    if provider or item.get("type") != "put":
+        return provider
+    try:
+        return str(
+            select_provider(policy, str(payload.get("class", "generic")), breakers=breakers, stats=stats)["provider"]
         )
-    )
-    return 0
+    except RuntimeError:
+        return ""
 
 
-def cmd_queue_list(_: argparse.Namespace) -> int:
-    ensure_state()
-    queue = read_json(QUEUE_FILE, {"version": "v1", "items": []})
-    print(json.dumps(queue, ensure_ascii=True, indent=2))
-    return 0
+def _timed_job(
+    policy: dict[str, Any],
+    item: dict[str, Any],
+    index: ObjectIndex | None = None,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> tuple[bool, str, dict[str, Any]]:
+    started = time.perf_counter()
+    ok, reason, outcome = _process_one_job(policy, item, index, breakers, stats)
+    outcome["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return ok, reason, outcome
+
+
+def run_jobs(
+    policy: dict[str, Any],
+    items: list[dict[str, Any]],
+    workers: int,
+    index: ObjectIndex | None = None,
+    breakers: BreakerStore | None = None,
+    stats: ProviderStats | None = None,
+) -> list[tuple[dict[str, Any], bool, str, dict[str, Any]]]:
+    if workers <= 1:
+        return [(item, *_timed_job(policy, item, index, breakers, stats)) for item in items]
+
+    caps = {str(k): int(v) for k, v in policy.get("queue", {}).get("provider_concurrency", {}).items()}
+    pending = deque((item, job_provider(policy, item, breakers, stats)) for item in items)
+    active: Counter[str] = Counter()
+    in_flight: dict[Future[tuple[bool, str, dict[str, Any]]], tuple[dict[str, Any], str]] = {}
+    results: list[tuple[dict[str, Any], bool, str, dict[str, Any]]] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lam-gateway-job") as pool:
+        while pending or in_flight:
+            deferred: deque[tuple[dict[str, Any], str]] = deque()
+            while pending and len(in_flight) < workers:
+                item, provider = pending.popleft()
+                cap = caps.get(provider, 0)
+                if cap > 0 and active[provider] >= cap:
+                    deferred.append((item, provider))
+                    continue
+                active[provider] += 1
+                in_flight[pool.submit(_timed_job, policy, item, index, breakers, stats)] = (item, provider)
+            pending = deferred + pending
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, provider = in_flight.pop(future)
+                active[provider] -= 1
+                results.append((item, *future.result()))
+    return results
+
+
+def _latency_summary(latencies: list[float]) -> dict[str, float]:
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": ordered[-1]}
 
 
 def reorder_classes_by_health(policy: dict[str, Any]) -> dict[str, Any]:
@@ -843,25 +1426,768 @@ def reorder_classes_by_health(policy: dict[str, Any]) -> dict[str, Any]:
     return {"changed": changed, "classes": classes}
 
 
-def cmd_monitor(args: argparse.Namespace) -> int:
-    ensure_state()
-    rounds = 1 if args.once else int(args.iterations)
-    interval = int(args.interval_sec)
-    out: list[dict[str, Any]] = []
-    for i in range(rounds):
-        policy = read_json(POLICY_FILE, default_policy())
-        summary = {
+class GatewayService:
+    """In-process gateway API used by the CLI, the console core and queue workers.
+
+    Policy, the index/queue handles, circuit-breaker state and provider stats are
+    loaded once per service and kept in memory. The policy file is re-read only
+    when its (mtime_ns, size) stamp changes; breaker and stats updates accumulate
+    until ``flush()`` writes them.
+    """
+
+    def __init__(self) -> None:
+        ensure_state()
+        # Guards policy reload/flush when the daemon serves requests from several threads.
+        self._lock = threading.RLock()
+        self._policy_stamp: tuple[int, int] | None = None
+        self._policy_digest = ""
+        self._policy_dirty = False
+        self.policy: dict[str, Any] = {}
+        self.circulation: CirculationPolicy
+        self.index: ObjectIndex
+        self.queue: QueueBackend
+        self.breakers = BreakerStore(BREAKER_FILE)
+        self.stats = ProviderStats(PROVIDER_STATS_FILE)
+        self.stats.hold()
+        self._reload_policy()
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload_policy(self) -> None:
+        try:
+            raw = POLICY_FILE.read_bytes()
+        except FileNotFoundError:
+            raw = b""
+        self._policy_stamp = self._stamp(POLICY_FILE)
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == self._policy_digest:
+            return  # touched or rewritten with identical content
+        self._policy_digest = digest
+        self.policy = json.loads(raw) if raw else default_policy()
+        self.circulation = CirculationPolicy.compile(self.policy)
+        self.index = open_index(self.policy)
+        self.queue = open_queue(self.policy)
+        provider_stats(self.policy, self.stats)
+
+    def refresh(self) -> None:
+        """Pick up policy/breaker edits made by other processes since the last call."""
+        with self._lock:
+            if not self._policy_dirty and self._stamp(POLICY_FILE) != self._policy_stamp:
+                self._reload_policy()
+        self.breakers.refresh()
+        self.stats.refresh()
+
+    def save_policy(self) -> None:
+        self._policy_dirty = True
+        self.circulation = CirculationPolicy.compile(self.policy)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._policy_dirty:
+                write_json(POLICY_FILE, self.policy)
+                self._policy_stamp = self._stamp(POLICY_FILE)
+                self._policy_dirty = False
+        self.breakers.flush()
+        self.stats.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.stats.release()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def init(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "state_dir": str(STATE_DIR),
+            "policy_file": str(POLICY_FILE),
+            "index_file": self.index.location,
+            "queue_file": self.queue.location,
+        }
+
+    def health(self, *, cached: bool = False) -> dict[str, Any]:
+        self.refresh()
+        if cached:
+            report, cache_info = cached_provider_health(self.policy)
+        else:
+            report, cache_info = provider_health(self.policy), {"source": "probe", "age_sec": 0.0}
+        cache = read_cache(self.policy)
+        return {
             "ts_utc": utc_now(),
-            "iteration": i + 1,
-            "health": provider_health(policy),
-            "auto_switch": {},
+            "providers": report,
+            "health_cache": cache_info,
+            "route_latency_ms": ROUTE_LATENCY.summary(),
+            "provider_stats": self.stats.snapshot(),
+            "read_cache": cache.stats() if cache is not None else {"enabled": False},
+        }
+
+    def route(self, data_class: str, size_bytes: int | None = None) -> dict[str, Any]:
+        self.refresh()
+        object_size_bytes = int(size_bytes) if size_bytes is not None else None
+        started = time.perf_counter()
+        decision = select_provider_for_object(
+            self.policy, data_class, object_size_bytes=object_size_bytes, breakers=self.breakers, stats=self.stats
+        )
+        latency_ms = round((time.perf_counter() - started) * 1000.0, 3)
+        append_event(
+            {
+                "ts_utc": utc_now(),
+                "event": "route_decision",
+                "class": data_class,
+                "provider": decision["provider"],
+                "latency_ms": latency_ms,
+                "health_source": decision["health_cache"]["source"],
+                "mode": decision.get("mode", "ordered"),
+            }
+        )
+        return {"ts_utc": utc_now(), "class": data_class, "decision": decision, "latency_ms": latency_ms}
+
+    def put(
+        self,
+        src: str,
+        *,
+        data_class: str = "generic",
+        provider: str = "",
+        name: str = "",
+        contract_id: str = "",
+        approval_ref: str = "",
+    ) -> dict[str, Any]:
+        self.refresh()
+        return put_object(
+            self.policy,
+            src,
+            data_class=data_class,
+            provider=provider,
+            name=name,
+            contract_id=contract_id,
+            approval_ref=approval_ref,
+            index=self.index,
+            circulation=self.circulation,
+            breakers=self.breakers,
+            stats=self.stats,
+        )
+
+    def get(self, provider: str, path: str, dst: str) -> dict[str, Any]:
+        self.refresh()
+        return get_object(self.policy, provider, path, dst, stats=self.stats)
+
+    def list_entries(
+        self, *, provider: str = "", data_class: str = "", sha256: str = "", since: str = "", limit: int = 50
+    ) -> dict[str, Any]:
+        count, entries = self.index.query(
+            provider=provider, data_class=data_class, sha256=sha256, since_utc=since, limit=int(limit)
+        )
+        return {"count": count, "entries": entries}
+
+    def forget(self, entry_id: str) -> dict[str, Any]:
+        with _STATE_LOCK:
+            entry = self.index.remove(entry_id)
+        if entry is None:
+            raise RuntimeError(f"unknown index entry: {entry_id}")
+        refcount = None
+        if entry.get("layout") == "cas" and entry.get("sha256"):
+            refcount = ObjectCatalog(OBJECTS_DB_FILE).adjust(str(entry["provider"]), str(entry["sha256"]), -1)
+        append_event({"ts_utc": utc_now(), "event": "index_forget", "entry_id": entry.get("id"), "refcount": refcount})
+        return {"status": "ok", "entry": entry, "refcount": refcount}
+
+    def gc(self, *, provider: str = "", grace_sec: int | None = None, dry_run: bool = False) -> dict[str, Any]:
+        self.refresh()
+        grace = int(self.policy.get("storage", {}).get("gc_grace_sec", 3600)) if grace_sec is None else int(grace_sec)
+        results: list[dict[str, Any]] = []
+        for name, cfg in self.policy.get("providers", {}).items():
+            if provider and name != provider:
+                continue
+            root_str = str(cfg.get("root", "")).strip()
+            if not root_str or not Path(root_str).is_dir():
+                continue
+            results.append(open_object_store(name, Path(root_str)).collect(grace_sec=grace, dry_run=dry_run))
+        append_event({"ts_utc": utc_now(), "event": "object_gc", "results": results})
+        return {"status": "ok", "grace_sec": grace, "results": results}
+
+    def enqueue_put(
+        self,
+        src: str,
+        *,
+        data_class: str = "generic",
+        provider: str = "",
+        name: str = "",
+        contract_id: str = "",
+        approval_ref: str = "",
+        priority: int = 0,
+    ) -> dict[str, Any]:
+        now = epoch_now()
+        item = {
+            "id": new_job_id(),
+            "type": "put",
+            "status": "pending",
+            "attempts": 0,
+            "class": data_class,
+            "priority": int(priority),
+            "next_run_epoch": now,
+            "enqueued_epoch": now,
+            "created_utc": utc_now(),
+            "payload": {
+                "src": str(Path(src).resolve()),
+                "class": data_class,
+                "provider": provider,
+                "name": name,
+                "contract_id": contract_id,
+                "approval_ref": approval_ref,
+            },
+        }
+        return queue_enqueue(self.policy, self.queue, item)
+
+    def enqueue_get(
+        self, provider: str, path: str, dst: str, *, data_class: str = "generic", priority: int = 0
+    ) -> dict[str, Any]:
+        now = epoch_now()
+        item = {
+            "id": new_job_id(),
+            "type": "get",
+            "status": "pending",
+            "attempts": 0,
+            "class": data_class,
+            "priority": int(priority),
+            "next_run_epoch": now,
+            "enqueued_epoch": now,
+            "created_utc": utc_now(),
+            "payload": {"provider": provider, "path": path, "dst": str(Path(dst).resolve())},
         }
-        if args.auto_switch:
-            summary["auto_switch"] = reorder_classes_by_health(policy)
-        out.append(summary)
-        if i + 1 < rounds:
-            time.sleep(interval)
-    print(json.dumps({"status": "ok", "rounds": rounds, "results": out}, ensure_ascii=True, indent=2))
+        return queue_enqueue(self.policy, self.queue, item)
+
+    def run_queue(self, *, max_jobs: int = 20, workers: int = 1) -> dict[str, Any]:
+        self.refresh()
+        policy = self.policy
+        queue = self.queue
+        cfg = policy.get("queue", {})
+        max_attempts = int(cfg.get("max_attempts", 5))
+        backoff_base = int(cfg.get("backoff_base_sec", 5))
+        backoff_cap = int(cfg.get("backoff_cap_sec", 300))
+        lease_sec = int(cfg.get("lease_sec", 900))
+        retain_finished = int(cfg.get("retain_finished_sec", 7 * 86400))
+        workers = max(1, int(workers or 1))
+        now = epoch_now()
+        processed = 0
+        succeeded = 0
+        failed = 0
+        moved_bytes = 0
+        jobs: list[dict[str, Any]] = []
+
+        started = time.perf_counter()
+        schedule = FairSchedule.from_policy(dict(cfg.get("scheduling", {})))
+        claimed = queue.claim_due(
+            now=now, limit=int(max_jobs), lease_sec=lease_sec, owner=f"pid:{os.getpid()}", schedule=schedule
+        )
+        # Queueing delay since the job last became due (enqueue, or the end of its backoff).
+        waits: dict[str, list[float]] = {}
+        for item in claimed:
+            ready = max(job_enqueued_epoch(item), int(item.get("next_run_epoch", 0)))
+            item["last_wait_sec"] = max(0, now - ready)
+            waits.setdefault(job_class(item), []).append(float(item["last_wait_sec"]))
+        for item, ok, reason, stats in run_jobs(
+            policy, claimed, workers, index=self.index, breakers=self.breakers, stats=self.stats
+        ):
+            processed += 1
+            moved_bytes += int(stats.get("bytes", 0))
+            jobs.append(
+                {
+                    "id": item.get("id"),
+                    "type": item.get("type"),
+                    "class": job_class(item),
+                    "wait_sec": item["last_wait_sec"],
+                    "ok": ok,
+                    **stats,
+                }
+            )
+            item["last_latency_ms"] = stats["latency_ms"]
+            if ok:
+                item["status"] = "done"
+                item["last_error"] = ""
+                item["finished_utc"] = utc_now()
+                succeeded += 1
+            else:
+                attempts = int(item.get("attempts", 0)) + 1
+                item["attempts"] = attempts
+                item["last_error"] = reason
+                if attempts >= max_attempts:
+                    item["status"] = "dead"
+                    item["finished_utc"] = utc_now()
+                else:
+                    item["status"] = "pending"
+                    delay = min(backoff_cap, backoff_base * (2 ** (attempts - 1)))
+                    item["next_run_epoch"] = now + delay
+                failed += 1
+            queue.release(item)
+
+        elapsed_sec = max(time.perf_counter() - started, 1e-9)
+        purged = queue.purge_finished(now - retain_finished) if retain_finished > 0 else 0
+        return {
+            "status": "ok",
+            "processed": processed,
+            "succeeded": succeeded,
+            "failed": failed,
+            "purged": purged,
+            "workers": workers,
+            "elapsed_ms": round(elapsed_sec * 1000.0, 3),
+            "jobs_per_sec": round(processed / elapsed_sec, 3),
+            "bytes_per_sec": round(moved_bytes / elapsed_sec, 3),
+            "latency_ms": _latency_summary([float(j["latency_ms"]) for j in jobs]),
+            "scheduling": "wfq" if schedule is not None else "fifo",
+            "class_wait_sec": {cls: {"jobs": len(w), **_latency_summary(w)} for cls, w in sorted(waits.items())},
+            "jobs": jobs,
+            "queue_backend": queue.name,
+            "queue_file": queue.location,
+        }
+
+    def queue_list(self, status: str = "") -> dict[str, Any]:
+        return {"version": "v1", "items": self.queue.list_items(status), "counters": self.queue.counters()}
+
+    def policy_check(
+        self,
+        *,
+        data_class: str = "generic",
+        provider: str = "",
+        size_bytes: int | None = None,
+        contract_id: str = "",
+        approval_ref: str = "",
+    ) -> dict[str, Any]:
+        self.refresh()
+        target_provider = provider.strip()
+        if not target_provider:
+            decision = select_provider_for_object(
+                self.policy, data_class, object_size_bytes=size_bytes, breakers=self.breakers, stats=self.stats
+            )
+            target_provider = str(decision["provider"])
+        validate_circulation_controls(
+            self.policy,
+            data_class=data_class,
+            provider=target_provider,
+            contract_id=contract_id,
+            approval_ref=approval_ref,
+            compiled=self.circulation,
+        )
+        return {
+            "status": "ok",
+            "class": data_class,
+            "provider": target_provider,
+            "provider_org": self.circulation.org(target_provider),
+            "contract_id": contract_id,
+            "approval_ref": approval_ref,
+        }
+
+    def policy_check_batch(self, pairs: list[dict[str, Any]]) -> dict[str, Any]:
+        """Evaluate many (class, provider) pairs against the compiled policy for audits; denials are not logged as events."""
+        self.refresh()
+        compiled = self.circulation
+        started = time.perf_counter()
+        results: list[dict[str, Any]] = []
+        denied = 0
+        for pair in pairs:
+            data_class = str(pair.get("class", pair.get("data_class", "generic")))
+            provider = str(pair.get("provider", "")).strip()
+            if not provider:
+                raise RuntimeError(f"policy-check batch entry without provider: {pair}")
+            reason = compiled.decide(
+                data_class,
+                provider,
+                contract_id=str(pair.get("contract_id", "")),
+                approval_ref=str(pair.get("approval_ref", "")),
+            )
+            denied += bool(reason)
+            results.append(
+                {
+                    "class": data_class,
+                    "provider": provider,
+                    "provider_org": compiled.org(provider),
+                    "allowed": not reason,
+                    "reason": reason,
+                }
+            )
+        return {
+            "status": "ok",
+            "count": len(results),
+            "allowed": len(results) - denied,
+            "denied": denied,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+            "policy": compiled.memo_stats(),
+            "results": results,
+        }
+
+    def circulation_kill_switch(self, action: str) -> dict[str, Any]:
+        self.refresh()
+        circulation = self.policy.setdefault("data_circulation", {})
+        if not isinstance(circulation, dict):
+            circulation = {}
+            self.policy["data_circulation"] = circulation
+
+        action = str(action).lower().strip()
+        if action in ("on", "off"):
+            circulation["kill_switch"] = action == "on"
+            self.save_policy()
+            self.flush()
+            append_event({"ts_utc": utc_now(), "event": "circulation_kill_switch", "state": action})
+        elif action != "status":
+            raise RuntimeError(f"unsupported action: {action}")
+
+        return {
+            "status": "ok",
+            "action": action,
+            "kill_switch": bool(circulation.get("kill_switch", False)),
+            "policy_file": str(POLICY_FILE),
+        }
+
+    def monitor(self, *, rounds: int, interval_sec: int, auto_switch: bool) -> dict[str, Any]:
+        out: list[dict[str, Any]] = []
+        for i in range(rounds):
+            self.refresh()
+            summary: dict[str, Any] = {
+                "ts_utc": utc_now(),
+                "iteration": i + 1,
+                "health": provider_health(self.policy),
+                "auto_switch": {},
+            }
+            if auto_switch:
+                summary["auto_switch"] = reorder_classes_by_health(self.policy)
+                if summary["auto_switch"]["changed"]:
+                    self._policy_stamp = self._stamp(POLICY_FILE)
+            out.append(summary)
+            if i + 1 < rounds:
+                time.sleep(interval_sec)
+        return {"status": "ok", "rounds": rounds, "results": out}
+
+
+    def scrub(
+        self,
+        *,
+        provider: str = "",
+        workers: int | None = None,
+        mb_per_sec: float | None = None,
+        restart: bool = False,
+        max_units: int = 0,
+    ) -> dict[str, Any]:
+        """Re-hash stored objects against the index, resuming an unfinished run, and flag corrupt entries."""
+        self.refresh()
+        cfg = self.policy.get("scrub", {})
+        page_size = max(1, int(cfg.get("page_size", 500)))
+        unverifiable: set[str] = set()
+
+        def units() -> Iterator[ScrubUnit]:
+            # Index entries are read a page at a time, never all at once.
+            for entries in self.index.pages(provider=provider, size=page_size):
+                found, skipped = scrub_units(self.policy, entries)
+                unverifiable.update(skipped)
+                yield from found
+
+        progress = ScrubProgress(SCRUB_STATE_FILE)
+        resumed = progress.open(restart=restart)
+        limiter = scrub_limiter(self.policy, mb_per_sec)
+        report = run_scrub(
+            units(),
+            progress,
+            workers=int(cfg.get("workers", 4) if workers is None else workers),
+            limiter=limiter,
+            checkpoint_every=int(cfg.get("checkpoint_every", 64)),
+            max_units=int(max_units),
+        )
+        problems = {problem["key"]: problem for problem in report["problems"]}
+        flagged: set[str] = set()
+        if problems or report["complete"]:
+            # A second paged pass maps problem objects back to every entry that references them.
+            for entries in self.index.pages(provider=provider, size=page_size):
+                found, _ = scrub_units(self.policy, entries) if problems else ([], [])
+                for unit in found:
+                    problem = problems.get(unit.key)
+                    if problem is None:
+                        continue
+                    for entry_id in unit.entry_ids:
+                        flag = {
+                            "status": problem["status"],
+                            "object": problem["rel"],
+                            "expected": problem["expected"],
+                            "actual": problem.get("actual", ""),
+                            "run_id": report["run_id"],
+                            "checked_utc": utc_now(),
+                        }
+                        with _STATE_LOCK:
+                            self.index.annotate(entry_id, {"integrity": flag})
+                        flagged.add(entry_id)
+                if not report["complete"]:
+                    continue
+                # Entries flagged by an earlier run whose objects now all verify are cleared.
+                for entry in entries:
+                    status = str(entry.get("integrity", {}).get("status", "ok"))
+                    if status != "ok" and entry.get("id") not in flagged and entry.get("id") not in unverifiable:
+                        with _STATE_LOCK:
+                            self.index.annotate(
+                                str(entry["id"]), {"integrity": {"status": "ok", "run_id": report["run_id"], "checked_utc": utc_now()}}
+                            )
+        report.update(
+            {
+                "status": "ok",
+                "resumed": resumed,
+                "provider": provider,
+                "power_mode": power_mode(POWER_STATE_FILE),
+                "unverifiable_entries": len(unverifiable),
+                "flagged_entries": sorted(flagged),
+            }
+        )
+        write_json(SCRUB_REPORT_FILE, report)
+        append_event(
+            {
+                "ts_utc": utc_now(),
+                "event": "scrub_run",
+                "run_id": report["run_id"],
+                "complete": report["complete"],
+                "counts": report["counts"],
+                "flagged": len(flagged),
+            }
+        )
+        return report
+
+
+# GatewayService methods served over the daemon socket (monitor and scrub stay in-process: they run long).
+DAEMON_METHODS = (
+    "init",
+    "health",
+    "route",
+    "put",
+    "get",
+    "list",
+    "forget",
+    "gc",
+    "enqueue_put",
+    "enqueue_get",
+    "run_queue",
+    "queue_list",
+    "policy_check",
+    "policy_check_batch",
+    "circulation_kill_switch",
+)
+# RPC names that differ from the GatewayService attribute behind them.
+DAEMON_ALIASES = {"list": "list_entries"}
+
+
+def service_method(service: GatewayService, method: str) -> Callable[..., dict[str, Any]]:
+    return getattr(service, DAEMON_ALIASES.get(method, method))
+
+
+def daemon_client() -> RpcClient | None:
+    mode = os.getenv("LAM_GATEWAY_DAEMON", "auto").strip().lower()
+    if mode in ("0", "off", "no", "false") or not SOCKET_FILE.exists():
+        return None
+    return RpcClient(SOCKET_FILE, timeout=float(os.getenv("LAM_GATEWAY_DAEMON_TIMEOUT_SEC", "600")))
+
+
+def call_gateway(method: str, **params: Any) -> dict[str, Any]:
+    """Run a GatewayService method in the resident daemon when it is up, else in-process."""
+    client = daemon_client()
+    if client is not None:
+        try:
+            with client:
+                return client.call(method, **params)
+        except RpcUnavailable:
+            pass
+    service = GatewayService()
+    try:
+        return service_method(service, method)(**params)
+    finally:
+        service.close()
+
+
+def serve(socket_path: Path, *, ready: Callable[[RpcServer], None] | None = None) -> int:
+    service = GatewayService()
+    server = RpcServer(
+        socket_path,
+        {name: service_method(service, name) for name in DAEMON_METHODS},
+        after_call=service.flush,
+    )
+    cache = health_cache(service.policy)
+    cache.start_background(lambda: service.policy.get("providers", {}))
+
+    def stop(*_args: object) -> None:
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+    append_event({"ts_utc": utc_now(), "event": "gateway_daemon_start", "socket": str(socket_path), "pid": os.getpid()})
+    if ready is not None:
+        ready(server)
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        cache.stop_background()
+        server.server_close()
+        service.close()
+        append_event({"ts_utc": utc_now(), "event": "gateway_daemon_stop", "socket": str(socket_path), "pid": os.getpid()})
+    return 0
+
+
+def _emit(method: str, **params: Any) -> int:
+    print(json.dumps(call_gateway(method, **params), ensure_ascii=True, indent=2))
+    return 0
+
+
+def cmd_init(_: argparse.Namespace) -> int:
+    return _emit("init")
+
+
+def cmd_health(args: argparse.Namespace) -> int:
+    if args.json:
+        return _emit("health", cached=bool(getattr(args, "cached", False)))
+    report = call_gateway("health", cached=bool(getattr(args, "cached", False)))["providers"]
+    for item in report:
+        print(
+            f"{item['provider']}: configured={item['configured']} "
+            f"reachable={item['reachable']} free_gb={item['free_gb']} root={item['root']}"
+        )
+    return 0
+
+
+def cmd_route(args: argparse.Namespace) -> int:
+    return _emit("route", data_class=args.data_class, size_bytes=args.size_bytes)
+
+
+def cmd_put(args: argparse.Namespace) -> int:
+    return _emit(
+        "put",
+        src=str(Path(args.src).resolve()),
+        data_class=args.data_class,
+        provider=args.provider,
+        name=args.name,
+        contract_id=str(getattr(args, "contract_id", "") or ""),
+        approval_ref=str(getattr(args, "approval_ref", "") or ""),
+    )
+
+
+def cmd_get(args: argparse.Namespace) -> int:
+    return _emit("get", provider=args.provider, path=args.path, dst=str(Path(args.dst).resolve()))
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    return _emit(
+        "list",
+        provider=str(args.provider or ""),
+        data_class=str(args.data_class or ""),
+        sha256=str(getattr(args, "sha256", "") or ""),
+        since=str(getattr(args, "since", "") or ""),
+        limit=int(args.limit),
+    )
+
+
+def cmd_forget(args: argparse.Namespace) -> int:
+    return _emit("forget", entry_id=str(args.entry_id))
+
+
+def cmd_gc(args: argparse.Namespace) -> int:
+    return _emit("gc", provider=str(args.provider or ""), grace_sec=args.grace_sec, dry_run=bool(args.dry_run))
+
+
+def cmd_enqueue_put(args: argparse.Namespace) -> int:
+    return _emit(
+        "enqueue_put",
+        src=str(Path(args.src).resolve()),
+        data_class=args.data_class,
+        provider=args.provider,
+        name=args.name,
+        contract_id=str(getattr(args, "contract_id", "") or ""),
+        approval_ref=str(getattr(args, "approval_ref", "") or ""),
+        priority=int(getattr(args, "priority", 0) or 0),
+    )
+
+
+def cmd_enqueue_get(args: argparse.Namespace) -> int:
+    return _emit(
+        "enqueue_get",
+        provider=args.provider,
+        path=args.path,
+        dst=str(Path(args.dst).resolve()),
+        data_class=str(getattr(args, "data_class", "") or "generic"),
+        priority=int(getattr(args, "priority", 0) or 0),
+    )
+
+
+def cmd_run_queue(args: argparse.Namespace) -> int:
+    return _emit("run_queue", max_jobs=int(args.max_jobs), workers=int(getattr(args, "workers", 1) or 1))
+
+
+def cmd_queue_list(args: argparse.Namespace) -> int:
+    return _emit("queue_list", status=str(getattr(args, "status", "") or ""))
+
+
+def read_policy_pairs(source: str) -> list[dict[str, Any]]:
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    stripped = text.strip()
+    if stripped.startswith("["):
+        return [dict(pair) for pair in json.loads(stripped)]
+    return [json.loads(line) for line in stripped.splitlines() if line.strip()]
+
+
+def cmd_policy_check(args: argparse.Namespace) -> int:
+    if getattr(args, "batch", ""):
+        return _emit("policy_check_batch", pairs=read_policy_pairs(str(args.batch)))
+    return _emit(
+        "policy_check",
+        data_class=args.data_class,
+        provider=str(args.provider),
+        size_bytes=args.size_bytes,
+        contract_id=str(args.contract_id or ""),
+        approval_ref=str(args.approval_ref or ""),
+    )
+
+
+def cmd_circulation_kill_switch(args: argparse.Namespace) -> int:
+    return _emit("circulation_kill_switch", action=str(args.action))
+
+
+def cmd_scrub(args: argparse.Namespace) -> int:
+    with GatewayService() as service:
+        payload = service.scrub(
+            provider=str(args.provider or ""),
+            workers=args.workers,
+            mb_per_sec=args.mb_per_sec,
+            restart=bool(args.restart),
+            max_units=int(args.max_units),
+        )
+    print(json.dumps(payload, ensure_ascii=True, indent=2))
+    return 0 if not payload["problems"] else 3
+
+
+def cmd_monitor(args: argparse.Namespace) -> int:
+    rounds = 1 if args.once else int(args.iterations)
+    with GatewayService() as service:
+        payload = service.monitor(rounds=rounds, interval_sec=int(args.interval_sec), auto_switch=bool(args.auto_switch))
+    print(json.dumps(payload, ensure_ascii=True, indent=2))
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    socket_path = Path(args.socket) if args.socket else SOCKET_FILE
+
+    def announce(_server: RpcServer) -> None:
+        print(json.dumps({"status": "listening", "socket": str(socket_path), "pid": os.getpid()}, ensure_ascii=True), flush=True)
+
+    return serve(socket_path, ready=announce)
+
+
+def cmd_daemon_status(_: argparse.Namespace) -> int:
+    client = RpcClient(SOCKET_FILE, timeout=5.0)
+    try:
+        with client:
+            payload = client.call("stats")
+    except RpcUnavailable:
+        payload = {"status": "down", "socket": str(SOCKET_FILE)}
+    print(json.dumps(payload, ensure_ascii=True, indent=2))
     return 0
 
 
@@ -873,6 +2199,7 @@ def build_parser() -> argparse.ArgumentParser:
 
     health = sub.add_parser("health", help="Provider health and free-space report.")
     health.add_argument("--json", action="store_true", help="Print JSON report.")
+    health.add_argument("--cached", action="store_true", help="Serve from the health snapshot when within health.ttl_sec.")
     health.set_defaults(func=cmd_health)
 
     route = sub.add_parser("route", help="Resolve provider for a data class.")
@@ -898,9 +2225,21 @@ def build_parser() -> argparse.ArgumentParser:
     ls_cmd = sub.add_parser("list", help="List stored entries from local gateway index.")
     ls_cmd.add_argument("--provider", default="", help="Filter by provider ID.")
     ls_cmd.add_argument("--class", dest="data_class", default="", help="Filter by data class.")
+    ls_cmd.add_argument("--sha256", default="", help="Filter by content hash.")
+    ls_cmd.add_argument("--since", default="", help="Only entries with ts_utc >= this UTC timestamp.")
     ls_cmd.add_argument("--limit", type=int, default=50, help="Show last N entries.")
     ls_cmd.set_defaults(func=cmd_list)
 
+    forget = sub.add_parser("forget", help="Drop an index entry and release its object reference.")
+    forget.add_argument("entry_id", help="Index entry ID (see list).")
+    forget.set_defaults(func=cmd_forget)
+
+    gc = sub.add_parser("gc", help="Delete content-addressed objects that are no longer referenced.")
+    gc.add_argument("--provider", default="", help="Only collect this provider.")
+    gc.add_argument("--grace-sec", type=int, default=None, help="Keep unreferenced objects younger than this (default storage.gc_grace_sec).")
+    gc.add_argument("--dry-run", action="store_true", help="Report what would be freed without deleting.")
+    gc.set_defaults(func=cmd_gc)
+
     enqueue_put = sub.add_parser("enqueue-put", help="Queue put operation with retry/backoff.")
     enqueue_put.add_argument("src", help="Source file or directory.")
     enqueue_put.add_argument("--class", dest="data_class", default="generic", help="Data class for routing.")
@@ -908,19 +2247,24 @@ def build_parser() -> argparse.ArgumentParser:
     enqueue_put.add_argument("--name", default="", help="Optional destination object name.")
     enqueue_put.add_argument("--contract-id", default="", help="Contract ID for governed classes.")
     enqueue_put.add_argument("--approval-ref", default="", help="Operator/security approval reference.")
+    enqueue_put.add_argument("--priority", type=int, default=0, help="Priority within the class (higher runs first).")
     enqueue_put.set_defaults(func=cmd_enqueue_put)
 
     enqueue_get = sub.add_parser("enqueue-get", help="Queue get operation with retry/backoff.")
     enqueue_get.add_argument("--provider", required=True, help="Provider ID.")
     enqueue_get.add_argument("--path", required=True, help="Path relative to provider root.")
     enqueue_get.add_argument("--dst", required=True, help="Local destination path.")
+    enqueue_get.add_argument("--class", dest="data_class", default="generic", help="Data class for fair scheduling.")
+    enqueue_get.add_argument("--priority", type=int, default=0, help="Priority within the class (higher runs first).")
     enqueue_get.set_defaults(func=cmd_enqueue_get)
 
     run_queue = sub.add_parser("run-queue", help="Run queued jobs with retry/backoff.")
     run_queue.add_argument("--max-jobs", type=int, default=20, help="Max jobs to process in one run.")
+    run_queue.add_argument("--workers", type=int, default=1, help="Parallel job workers (per-provider caps from queue.provider_concurrency).")
     run_queue.set_defaults(func=cmd_run_queue)
 
     queue_list = sub.add_parser("queue-list", help="Print queue state.")
+    queue_list.add_argument("--status", default="", help="Filter by job status (pending|running|done|dead).")
     queue_list.set_defaults(func=cmd_queue_list)
 
     monitor = sub.add_parser("monitor", help="Background-like health monitor with optional auto-switch.")
@@ -930,12 +2274,25 @@ def build_parser() -> argparse.ArgumentParser:
     monitor.add_argument("--auto-switch", action="store_true", help="Auto reorder class provider preference by health.")
     monitor.set_defaults(func=cmd_monitor)
 
+    scrub = sub.add_parser("scrub", help="Re-hash stored objects against the index and flag corrupt replicas.")
+    scrub.add_argument("--provider", default="", help="Only scrub entries stored on this provider.")
+    scrub.add_argument("--workers", type=int, default=None, help="Parallel hash workers (default: scrub.workers).")
+    scrub.add_argument("--mb-per-sec", type=float, default=None, help="I/O rate limit; 0 = unlimited (quiet mode still caps).")
+    scrub.add_argument("--restart", action="store_true", help="Start a new run instead of resuming an unfinished one.")
+    scrub.add_argument("--max-units", type=int, default=0, help="Stop after N objects this call; the run stays resumable.")
+    scrub.set_defaults(func=cmd_scrub)
+
     policy_check = sub.add_parser("policy-check", help="Validate circulation policy for a transfer.")
     policy_check.add_argument("--class", dest="data_class", default="generic", help="Data class.")
     policy_check.add_argument("--provider", default="", help="Target provider (optional).")
     policy_check.add_argument("--size-bytes", type=int, default=None, help="Optional object size for auto route.")
     policy_check.add_argument("--contract-id", default="", help="Contract ID for governed classes.")
     policy_check.add_argument("--approval-ref", default="", help="Operator/security approval reference.")
+    policy_check.add_argument(
+        "--batch",
+        default="",
+        help="Evaluate (class, provider) pairs from a JSON list or JSON-lines file ('-' for stdin) in one call.",
+    )
     policy_check.set_defaults(func=cmd_policy_check)
 
     kill_switch = sub.add_parser(
@@ -945,6 +2302,14 @@ def build_parser() -> argparse.ArgumentParser:
     kill_switch.add_argument("action", choices=["on", "off", "status"], help="Kill-switch action.")
     kill_switch.set_defaults(func=cmd_circulation_kill_switch)
 
+    serve_cmd = sub.add_parser("serve", help="Run the resident gateway daemon on a Unix socket (JSON lines).")
+    serve_cmd.add_argument("--socket", default="", help="Socket path (default LAM_GATEWAY_SOCKET or <state>/gateway.sock).")
+    serve_cmd.set_defaults(func=cmd_serve)
+
+    sub.add_parser("daemon-status", help="Show resident daemon uptime and per-method latency.").set_defaults(
+        func=cmd_daemon_status
+    )
+
     return parser
 
 
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import os
+import secrets
+import shutil
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any
+
+DEFAULT_BUSY_TIMEOUT_SEC = 30.0
+EVICTION_POLICIES = ("lru", "lfu")
+COUNTERS = ("hits", "misses", "revalidated", "stale", "bypass", "evictions", "evicted_bytes", "served_bytes")
+
+
+class ReadCache:
+    """Size-bounded local read-through cache for gateway gets.
+
+    An entry maps ``(provider, path)`` to a blob named by the sha256 of its
+    content plus a ``validator`` (source stat fingerprint, or ETag /
+    Last-Modified for github fetches) that decides whether the entry is still
+    current. Paths with equal content share one blob. Once the blobs exceed
+    ``max_bytes`` the least recently (``lru``) or least frequently (``lfu``)
+    used entries are evicted. Hit/miss/eviction counters persist in the same
+    SQLite file so ratios survive restarts and are shared across processes.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        max_bytes: int,
+        eviction: str = "lru",
+        busy_timeout_sec: float = DEFAULT_BUSY_TIMEOUT_SEC,
+    ) -> None:
+        if eviction not in EVICTION_POLICIES:
+            raise RuntimeError(f"unsupported cache eviction policy: {eviction}")
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.eviction = eviction
+        self.busy_timeout_sec = busy_timeout_sec
+        self.path = self.root / "cache.sqlite3"
+        self.blob_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    provider TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    validator TEXT NOT NULL DEFAULT '',
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (provider, path)
+                );
+                CREATE INDEX IF NOT EXISTS entries_sha256 ON entries(sha256);
+                CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+                CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount),
+        )
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blob_dir / sha256[:2] / sha256
+
+    def tmp_path(self) -> Path:
+        return self.tmp_dir / f"fill_{os.getpid()}_{secrets.token_hex(6)}"
+
+    def admits(self, size_bytes: int) -> bool:
+        return 0 < self.max_bytes and int(size_bytes) <= self.max_bytes
+
+    def lookup(self, provider: str, path: str) -> dict[str, Any] | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT sha256, size_bytes, validator, hits FROM entries WHERE provider = ? AND path = ?",
+                (provider, path),
+            ).fetchone()
+        if row is None or not self.blob_path(str(row[0])).exists():
+            return None
+        return {"sha256": str(row[0]), "size_bytes": int(row[1]), "validator": str(row[2]), "hits": int(row[3])}
+
+    def serve(self, provider: str, path: str, entry: dict[str, Any], dst: Path, *, outcome: str = "hits") -> None:
+        """Copy a cached blob to ``dst`` and count it as a hit (or ``revalidated``/``stale``)."""
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self.blob_path(str(entry["sha256"])), dst)
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE entries SET hits = hits + 1, last_used = ? WHERE provider = ? AND path = ?",
+                (time.time(), provider, path),
+            )
+            self._count(conn, outcome)
+            self._count(conn, "served_bytes", int(entry["size_bytes"]))
+
+    def record(self, outcome: str) -> None:
+        with self._transaction() as conn:
+            self._count(conn, outcome)
+
+    def store(self, provider: str, path: str, filled: Path, *, sha256: str, validator: str) -> dict[str, Any]:
+        """Adopt ``filled`` (a file under ``tmp_path()``) as the entry for ``(provider, path)`` and evict to fit."""
+        size = filled.stat().st_size
+        blob = self.blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.exists():
+            filled.unlink(missing_ok=True)
+        else:
+            os.replace(filled, blob)
+        with self._transaction() as conn:
+            previous = conn.execute(
+                "SELECT sha256 FROM entries WHERE provider = ? AND path = ?", (provider, path)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (provider, path, sha256, size_bytes, validator, hits, last_used) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (provider, path, sha256, size, validator, time.time()),
+            )
+            self._count(conn, "misses")
+            if previous and str(previous[0]) != sha256:
+                self._drop_blob_if_unused(conn, str(previous[0]))
+            self._evict(conn, keep=(provider, path))
+        return {"sha256": sha256, "size_bytes": size, "validator": validator, "hits": 0}
+
+    def _drop_blob_if_unused(self, conn: sqlite3.Connection, sha256: str) -> int:
+        if conn.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            return 0
+        blob = self.blob_path(sha256)
+        try:
+            size = blob.stat().st_size
+            blob.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def _evict(self, conn: sqlite3.Connection, *, keep: tuple[str, str]) -> None:
+        order = "last_used" if self.eviction == "lru" else "hits, last_used"
+        while self._used_bytes(conn) > self.max_bytes:
+            row = conn.execute(
+                f"SELECT provider, path, sha256 FROM entries WHERE NOT (provider = ? AND path = ?) ORDER BY {order} LIMIT 1",
+                keep,
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM entries WHERE provider = ? AND path = ?", (row[0], row[1]))
+            self._count(conn, "evictions")
+            self._count(conn, "evicted_bytes", self._drop_blob_if_unused(conn, str(row[2])))
+
+    @staticmethod
+    def _used_bytes(conn: sqlite3.Connection) -> int:
+        # Paths with equal content share a blob, so each sha256 counts once.
+        row = conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM (SELECT MAX(size_bytes) AS size_bytes FROM entries GROUP BY sha256)"
+        ).fetchone()
+        return int(row[0])
+
+    def invalidate(self, provider: str, path: str) -> None:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT sha256 FROM entries WHERE provider = ? AND path = ?", (provider, path)).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM entries WHERE provider = ? AND path = ?", (provider, path))
+            self._drop_blob_if_unused(conn, str(row[0]))
+
+    def stats(self) -> dict[str, Any]:
+        with closing(self._connect()) as conn:
+            counters = {name: 0 for name in COUNTERS}
+            counters.update({str(name): int(value) for name, value in conn.execute("SELECT name, value FROM counters")})
+            entries = int(conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+            used = self._used_bytes(conn)
+        served = counters["hits"] + counters["revalidated"] + counters["stale"]
+        lookups = served + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": round(served / lookups, 6) if lookups else 0.0,
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "eviction": self.eviction,
+        }
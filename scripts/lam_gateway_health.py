@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console.state_store import atomic_write_text
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console.state_store import atomic_write_text
+
+
+DEFAULT_TTL_SEC = 30.0
+DEFAULT_MAX_STALE_SEC = 300.0
+DEFAULT_PROBE_TIMEOUT_SEC = 2.0
+
+
+def probe_provider(name: str, cfg: dict[str, Any]) -> dict[str, Any]:
+    root_str = str(cfg.get("root", "")).strip()
+    configured = bool(root_str)
+    reachable = False
+    free = 0
+    if configured:
+        root = Path(root_str)
+        try:
+            reachable = True
+            if root.exists():
+                reachable = root.is_dir()
+            if reachable:
+                target = root if root.exists() else root.parent
+                free = int(shutil.disk_usage(target).free // (1024**3))
+        except (OSError, PermissionError):
+            reachable = False
+            free = 0
+    return {"provider": name, "configured": configured, "reachable": reachable, "free_gb": free, "root": root_str}
+
+
+def providers_key(providers: dict[str, Any]) -> str:
+    return json.dumps({k: str(v.get("root", "")) for k, v in providers.items()}, sort_keys=True)
+
+
+class ProviderHealthCache:
+    """TTL cache of provider probes, shared across routing decisions.
+
+    Each provider is probed on its own daemon thread and abandoned after
+    ``probe_timeout_sec`` (a hung FUSE mount reports ``timed_out`` instead of
+    blocking routing); a provider whose previous probe is still stuck is not
+    probed again until that thread returns. Snapshots older than ``ttl_sec``
+    but younger than ``max_stale_sec`` are served immediately while a
+    background refresh runs. With ``snapshot_path`` set, the last snapshot is
+    shared with other CLI processes through a small JSON file.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_sec: float = DEFAULT_TTL_SEC,
+        max_stale_sec: float = DEFAULT_MAX_STALE_SEC,
+        probe_timeout_sec: float = DEFAULT_PROBE_TIMEOUT_SEC,
+        snapshot_path: Path | None = None,
+    ) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_stale_sec = max(float(max_stale_sec), self.ttl_sec)
+        self.probe_timeout_sec = float(probe_timeout_sec)
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._snapshot: dict[str, Any] | None = None
+        self._refreshing = False
+        self._stuck: dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+        self._background: threading.Thread | None = None
+
+    def configure(self, *, ttl_sec: float, max_stale_sec: float, probe_timeout_sec: float) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_stale_sec = max(float(max_stale_sec), self.ttl_sec)
+        self.probe_timeout_sec = float(probe_timeout_sec)
+
+    def _probe_all(self, providers: dict[str, Any]) -> list[dict[str, Any]]:
+        results: dict[str, dict[str, Any]] = {}
+        threads: dict[str, threading.Thread] = {}
+        for name, cfg in providers.items():
+            stuck = self._stuck.get(name)
+            if stuck is not None and stuck.is_alive():
+                continue
+
+            def run(name: str = name, cfg: dict[str, Any] = cfg) -> None:
+                results[name] = probe_provider(name, cfg)
+
+            thread = threading.Thread(target=run, name=f"lam-gateway-probe-{name}", daemon=True)
+            thread.start()
+            threads[name] = thread
+        deadline = time.monotonic() + self.probe_timeout_sec
+        for name, thread in threads.items():
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                self._stuck[name] = thread
+            else:
+                self._stuck.pop(name, None)
+
+        out: list[dict[str, Any]] = []
+        for name, cfg in providers.items():
+            report = results.get(name)
+            if report is None:
+                report = {
+                    "provider": name,
+                    "configured": bool(str(cfg.get("root", "")).strip()),
+                    "reachable": False,
+                    "free_gb": 0,
+                    "root": str(cfg.get("root", "")).strip(),
+                    "timed_out": True,
+                }
+            out.append(report)
+        return out
+
+    def refresh(self, providers: dict[str, Any]) -> dict[str, Any]:
+        report = self._probe_all(providers)
+        snapshot = {"version": "v1", "key": providers_key(providers), "epoch": time.time(), "providers": report}
+        with self._lock:
+            self._snapshot = snapshot
+            self._refreshing = False
+        if self.snapshot_path is not None:
+            try:
+                atomic_write_text(self.snapshot_path, json.dumps(snapshot, ensure_ascii=True) + "\n")
+            except OSError:
+                pass
+        return snapshot
+
+    def _load_snapshot(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.get("key") == key:
+                return self._snapshot
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return None
+        try:
+            snapshot = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("key") != key:
+            return None
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _refresh_async(self, providers: dict[str, Any]) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, args=(providers,), name="lam-gateway-health-refresh", daemon=True).start()
+
+    def get(self, providers: dict[str, Any]) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+        """Return (provider reports, cache info) for ``providers``."""
+        key = providers_key(providers)
+        snapshot = self._load_snapshot(key)
+        age = time.time() - float(snapshot["epoch"]) if snapshot else None
+        if snapshot is not None and age is not None and 0 <= age < self.ttl_sec:
+            return snapshot["providers"], {"source": "cache", "age_sec": round(age, 3)}
+        if snapshot is not None and age is not None and 0 <= age < self.max_stale_sec:
+            self._refresh_async(providers)
+            return snapshot["providers"], {"source": "stale", "age_sec": round(age, 3)}
+        snapshot = self.refresh(providers)
+        return snapshot["providers"], {"source": "probe", "age_sec": 0.0}
+
+    def start_background(self, providers_fn: Any, interval_sec: float | None = None) -> None:
+        """Keep the snapshot warm from a long-running process (monitor, daemon)."""
+        if self._background is not None and self._background.is_alive():
+            return
+        interval = float(interval_sec) if interval_sec else max(1.0, self.ttl_sec / 2.0)
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.is_set():
+                try:
+                    self.refresh(providers_fn())
+                except Exception as exc:  # noqa: BLE001
+                    # Keep the loop alive; callers fall back to a synchronous probe once the snapshot goes stale.
+                    print(f"lam-gateway health refresh failed: {exc}", file=sys.stderr)
+                self._stop.wait(interval)
+
+        self._background = threading.Thread(target=loop, name="lam-gateway-health-loop", daemon=True)
+        self._background.start()
+
+    def stop_background(self) -> None:
+        self._stop.set()
+
+
+class LatencyRecorder:
+    """Bounded ring of recent latencies for cheap in-process percentiles."""
+
+    def __init__(self, maxlen: int = 1024) -> None:
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, latency_ms: float) -> None:
+        with self._lock:
+            self._samples.append(float(latency_ms))
+            self.count += 1
+
+    def summary(self) -> dict[str, float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+            count = self.count
+        if not ordered:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        def pick(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))], 3)
+
+        return {"count": count, "p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 3)}
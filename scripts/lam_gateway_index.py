@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Protocol
+
+INDEX_VERSION = "v1"
+DEFAULT_BUSY_TIMEOUT_SEC = 30.0
+
+
+class ObjectIndex(Protocol):
+    name: str
+    location: str
+
+    def add(self, entry: dict[str, Any]) -> None: ...
+
+    def import_entries(self, entries: list[dict[str, Any]]) -> int: ...
+
+    def query(
+        self,
+        *,
+        provider: str = "",
+        data_class: str = "",
+        sha256: str = "",
+        since_utc: str = "",
+        limit: int = 50,
+    ) -> tuple[int, list[dict[str, Any]]]: ...
+
+    def pages(self, *, provider: str = "", size: int = 500) -> Iterator[list[dict[str, Any]]]: ...
+
+    def remove(self, entry_id: str) -> dict[str, Any] | None: ...
+
+    def annotate(self, entry_id: str, updates: dict[str, Any]) -> dict[str, Any] | None: ...
+
+
+def _matches(entry: dict[str, Any], *, provider: str, data_class: str, sha256: str, since_utc: str) -> bool:
+    if provider and entry.get("provider") != provider:
+        return False
+    if data_class and entry.get("class") != data_class:
+        return False
+    if sha256 and entry.get("sha256") != sha256:
+        return False
+    return not (since_utc and str(entry.get("ts_utc", "")) < since_utc)
+
+
+class JsonObjectIndex:
+    """Legacy index.json document; every put rewrites the full history."""
+
+    name = "json"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.location = str(path)
+
+    def _load(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {"version": INDEX_VERSION, "entries": []}
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def _save(self, doc: dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(doc, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+
+    def add(self, entry: dict[str, Any]) -> None:
+        doc = self._load()
+        doc.setdefault("entries", []).append(entry)
+        self._save(doc)
+
+    def import_entries(self, entries: list[dict[str, Any]]) -> int:
+        doc = self._load()
+        doc.setdefault("entries", []).extend(entries)
+        self._save(doc)
+        return len(entries)
+
+    def query(
+        self,
+        *,
+        provider: str = "",
+        data_class: str = "",
+        sha256: str = "",
+        since_utc: str = "",
+        limit: int = 50,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        entries = [
+            e
+            for e in self._load().get("entries", [])
+            if _matches(e, provider=provider, data_class=data_class, sha256=sha256, since_utc=since_utc)
+        ]
+        return len(entries), entries[-limit:] if limit > 0 else []
+
+    def pages(self, *, provider: str = "", size: int = 500) -> Iterator[list[dict[str, Any]]]:
+        entries = [
+            e
+            for e in self._load().get("entries", [])
+            if _matches(e, provider=provider, data_class="", sha256="", since_utc="")
+        ]
+        for start in range(0, len(entries), max(1, size)):
+            yield entries[start : start + max(1, size)]
+
+    def remove(self, entry_id: str) -> dict[str, Any] | None:
+        doc = self._load()
+        entries = doc.setdefault("entries", [])
+        for idx, entry in enumerate(entries):
+            if entry.get("id") == entry_id:
+                removed = entries.pop(idx)
+                self._save(doc)
+                return removed
+        return None
+
+    def annotate(self, entry_id: str, updates: dict[str, Any]) -> dict[str, Any] | None:
+        doc = self._load()
+        for entry in reversed(doc.setdefault("entries", [])):
+            if entry.get("id") == entry_id:
+                entry.update(updates)
+                self._save(doc)
+                return entry
+        return None
+
+
+class SqliteObjectIndex:
+    """Append-only SQLite index with secondary indexes on class, provider, sha256 and ts_utc.
+
+    Each secondary index is implicitly ordered by rowid, so a filtered tail
+    (``ORDER BY seq DESC LIMIT n``) walks only the last ``n`` matching rows.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Path, busy_timeout_sec: float = DEFAULT_BUSY_TIMEOUT_SEC) -> None:
+        self.path = path
+        self.location = str(path)
+        self.busy_timeout_sec = busy_timeout_sec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL,
+                    ts_utc TEXT NOT NULL,
+                    class TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    doc TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_class ON entries(class);
+                CREATE INDEX IF NOT EXISTS entries_provider ON entries(provider);
+                CREATE INDEX IF NOT EXISTS entries_sha256 ON entries(sha256);
+                CREATE INDEX IF NOT EXISTS entries_ts_utc ON entries(ts_utc);
+                CREATE INDEX IF NOT EXISTS entries_id ON entries(id);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(entry: dict[str, Any]) -> tuple[str, str, str, str, str, str]:
+        return (
+            str(entry.get("id", "")),
+            str(entry.get("ts_utc", "")),
+            str(entry.get("class", "")),
+            str(entry.get("provider", "")),
+            str(entry.get("sha256", "")),
+            json.dumps(entry, ensure_ascii=True),
+        )
+
+    def add(self, entry: dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO entries (id, ts_utc, class, provider, sha256, doc) VALUES (?, ?, ?, ?, ?, ?)",
+                self._row(entry),
+            )
+
+    def import_entries(self, entries: list[dict[str, Any]]) -> int:
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO entries (id, ts_utc, class, provider, sha256, doc) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(e) for e in entries],
+            )
+        return len(entries)
+
+    def query(
+        self,
+        *,
+        provider: str = "",
+        data_class: str = "",
+        sha256: str = "",
+        since_utc: str = "",
+        limit: int = 50,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        for column, value in (("provider", provider), ("class", data_class), ("sha256", sha256)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since_utc:
+            clauses.append("ts_utc >= ?")
+            params.append(since_utc)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            total = int(conn.execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0])
+            rows: list[tuple[str]] = []
+            if limit > 0:
+                rows = conn.execute(
+                    f"SELECT doc FROM entries{where} ORDER BY seq DESC LIMIT ?", (*params, limit)
+                ).fetchall()
+        return total, [json.loads(raw) for (raw,) in reversed(rows)]
+
+    def pages(self, *, provider: str = "", size: int = 500) -> Iterator[list[dict[str, Any]]]:
+        """Every matching entry oldest first, ``size`` at a time.
+
+        A keyset cursor (``seq > last``) makes each page one index seek however
+        deep the walk is, and entries annotated between pages are not skipped.
+        """
+        where = "provider = ? AND " if provider else ""
+        params: tuple[Any, ...] = (provider,) if provider else ()
+        after = 0
+        with closing(self._connect()) as conn:
+            while True:
+                rows = conn.execute(
+                    f"SELECT seq, doc FROM entries WHERE {where}seq > ? ORDER BY seq LIMIT ?",
+                    (*params, after, max(1, size)),
+                ).fetchall()
+                if not rows:
+                    return
+                after = int(rows[-1][0])
+                yield [json.loads(raw) for _, raw in rows]
+
+    def remove(self, entry_id: str) -> dict[str, Any] | None:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT seq, doc FROM entries WHERE id = ? ORDER BY seq DESC LIMIT 1", (entry_id,)).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM entries WHERE seq = ?", (row[0],))
+        return json.loads(row[1])
+
+    def annotate(self, entry_id: str, updates: dict[str, Any]) -> dict[str, Any] | None:
+        """Merge ``updates`` into an entry's document in place (used for integrity flags)."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT seq, doc FROM entries WHERE id = ? ORDER BY seq DESC LIMIT 1", (entry_id,)).fetchone()
+            if not row:
+                return None
+            entry = {**json.loads(row[1]), **updates}
+            conn.execute("UPDATE entries SET doc = ? WHERE seq = ?", (json.dumps(entry, ensure_ascii=True), row[0]))
+        return entry
+
+
+INDEX_BACKENDS = ("sqlite", "json")
+
+
+def open_object_index(kind: str, *, json_path: Path, db_path: Path) -> ObjectIndex:
+    kind = kind.strip().lower()
+    if kind == "sqlite":
+        return SqliteObjectIndex(db_path)
+    if kind == "json":
+        return JsonObjectIndex(json_path)
+    raise RuntimeError(f"unsupported index backend: {kind}")
+
+
+def migrate_json_index(json_path: Path, index: ObjectIndex) -> int | None:
+    """Import a legacy index.json into ``index`` once, then park it as ``index.json.migrated``.
+
+    The file is claimed first by renaming it to ``index.json.migrating``, so
+    when several processes start together only the one whose rename wins
+    imports it; the others get None. A claim left behind by a crash is not
+    retried, since its import may already have committed.
+    """
+    claimed = json_path.with_name(json_path.name + ".migrating")
+    try:
+        json_path.rename(claimed)
+    except FileNotFoundError:
+        return None
+    doc = json.loads(claimed.read_text(encoding="utf-8"))
+    imported = index.import_entries([e for e in doc.get("entries", []) if isinstance(e, dict)])
+    claimed.replace(json_path.with_name(json_path.name + ".migrated"))
+    return imported
@@ -0,0 +1,526 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import sqlite3
+import stat
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, TypeVar
+
+try:
+    from scripts.lam_gateway_transfer import (
+        CODEC_SUFFIX,
+        DEFAULT_CHECKPOINT_BYTES,
+        SourceScan,
+        compress_and_hash,
+        copy_and_hash,
+        copy_resumable,
+        decompress_file,
+        resume_key,
+        should_compress,
+    )
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from scripts.lam_gateway_transfer import (
+        CODEC_SUFFIX,
+        DEFAULT_CHECKPOINT_BYTES,
+        SourceScan,
+        compress_and_hash,
+        copy_and_hash,
+        copy_resumable,
+        decompress_file,
+        resume_key,
+        should_compress,
+    )
+
+
+TREE_SUFFIX = ".tree"
+DEFAULT_BUSY_TIMEOUT_SEC = 30.0
+# Blobs are addressed by the sha256 of their raw bytes; compressed ones carry the codec in kind and file suffix.
+BLOB_KINDS = ("blob", "blob+zstd", "blob+gzip")
+
+_T = TypeVar("_T")
+
+
+def blob_kind(codec: str) -> str:
+    return "blob" if codec in ("", "none") else f"blob+{codec}"
+
+
+def kind_codec(kind: str) -> str:
+    return kind.split("+", 1)[1] if kind.startswith("blob+") else "none"
+
+
+def object_rel_path(sha256: str, kind: str = "blob") -> Path:
+    suffix = TREE_SUFFIX if kind == "tree" else CODEC_SUFFIX.get(kind_codec(kind), "")
+    return Path("objects") / sha256[:2] / sha256[2:4] / f"{sha256}{suffix}"
+
+
+def is_tree_path(path: Path) -> bool:
+    return path.name.endswith(TREE_SUFFIX) and path.parent.parent.parent.name == "objects"
+
+
+def encoded_blob_kind(path: Path) -> str:
+    """Kind of a compressed CAS blob path (``objects/aa/bb/<sha>.zst``), or "" for anything else."""
+    if path.parent.parent.parent.name != "objects":
+        return ""
+    for kind in BLOB_KINDS[1:]:
+        if path.name.endswith(CODEC_SUFFIX[kind_codec(kind)]):
+            return kind
+    return ""
+
+
+def encode_tree(entries: list[dict[str, Any]]) -> bytes:
+    doc = {"version": "v1", "type": "tree", "entries": sorted(entries, key=lambda e: e["name"])}
+    return json.dumps(doc, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+class ObjectCatalog:
+    """Gateway-local bookkeeping for content-addressed objects.
+
+    ``refs`` counts references per (provider, sha256): one per index entry that
+    points at the object plus one per tree manifest that lists it. A reference
+    is taken (``claim``) and a file unlinked (``reclaim``) only under the write
+    lock, so collection never removes an object a put is about to reuse.
+    ``fingerprints``
+    maps a source file's (size, mtime_ns, inode) to its last known sha256 so
+    unchanged sources can be stored without being read.
+    """
+
+    def __init__(self, path: Path, busy_timeout_sec: float = DEFAULT_BUSY_TIMEOUT_SEC) -> None:
+        self.path = path
+        self.busy_timeout_sec = busy_timeout_sec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS refs (
+                    provider TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    updated_epoch INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (provider, sha256)
+                );
+                CREATE INDEX IF NOT EXISTS refs_refcount ON refs(provider, refcount);
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    path TEXT PRIMARY KEY,
+                    size_bytes INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def lookup_fingerprint(self, path: Path, st: os.stat_result) -> str:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM fingerprints WHERE path = ? AND size_bytes = ? AND mtime_ns = ? AND inode = ?",
+                (str(path), st.st_size, st.st_mtime_ns, st.st_ino),
+            ).fetchone()
+        return str(row[0]) if row else ""
+
+    def remember_fingerprint(self, path: Path, st: os.stat_result, sha256: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, size_bytes, mtime_ns, inode, sha256) VALUES (?, ?, ?, ?, ?)",
+                (str(path), st.st_size, st.st_mtime_ns, st.st_ino, sha256),
+            )
+
+    def claim(self, provider: str, sha256: str, kind: str, size_bytes: int, place: Callable[[], _T | None]) -> _T | None:
+        """Run ``place`` under the write lock and take one reference unless it returns None.
+
+        ``place`` checks that the object file exists or moves it into place.
+        """
+        with self._transaction() as conn:
+            placed = place()
+            if placed is None:
+                return None
+            conn.execute(
+                "INSERT INTO refs (provider, sha256, kind, size_bytes, refcount, updated_epoch) VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (provider, sha256) DO UPDATE SET refcount = refcount + 1, updated_epoch = excluded.updated_epoch",
+                (provider, sha256, kind, size_bytes, int(time.time())),
+            )
+        return placed
+
+    def adjust(self, provider: str, sha256: str, delta: int) -> int:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE refs SET refcount = MAX(0, refcount + ?), updated_epoch = ? WHERE provider = ? AND sha256 = ?",
+                (delta, int(time.time()), provider, sha256),
+            )
+            row = conn.execute("SELECT refcount FROM refs WHERE provider = ? AND sha256 = ?", (provider, sha256)).fetchone()
+        return int(row[0]) if row else 0
+
+    def refcount(self, provider: str, sha256: str) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT refcount FROM refs WHERE provider = ? AND sha256 = ?", (provider, sha256)).fetchone()
+        return int(row[0]) if row else 0
+
+    def unreferenced(self, provider: str, before_epoch: int) -> list[tuple[str, str, int]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT sha256, kind, size_bytes FROM refs WHERE provider = ? AND refcount = 0 AND updated_epoch <= ?",
+                (provider, before_epoch),
+            ).fetchall()
+        return [(str(sha), str(kind), int(size)) for sha, kind, size in rows]
+
+    def reclaim(self, provider: str, sha256: str, before_epoch: int, remove: Callable[[], Iterable[str]]) -> bool:
+        """Forget an object that is still unreferenced and run ``remove`` in the same transaction.
+
+        ``remove`` unlinks the file and returns the digests it referenced (a
+        tree's children), which lose one reference each. Returns False, and
+        leaves the file alone, when a reference was taken in the meantime.
+        """
+        with self._transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM refs WHERE provider = ? AND sha256 = ? AND refcount = 0 AND updated_epoch <= ?",
+                (provider, sha256, before_epoch),
+            ).rowcount
+            if not deleted:
+                return False
+            for child in remove():
+                # The parent manifest is gone, so an orphaned child skips the grace period.
+                conn.execute(
+                    "UPDATE refs SET refcount = MAX(0, refcount - 1), "
+                    "updated_epoch = CASE WHEN refcount <= 1 THEN 0 ELSE updated_epoch END "
+                    "WHERE provider = ? AND sha256 = ?",
+                    (provider, child),
+                )
+        return True
+
+
+class ObjectStore:
+    """Content-addressed layout under one provider root: ``objects/aa/bb/<sha256>``.
+
+    Blobs of at least ``resume_min_bytes`` that cross filesystems are staged as
+    ``objects/tmp/resume_<key>`` with a chunk checkpoint manifest; a failed put
+    leaves them in place so the retry resumes instead of starting over.
+
+    With ``codec`` set, files of at least ``compress_min_bytes`` (and not
+    already compressed formats) are compressed while streaming and stored as
+    ``<sha256>.zst``/``.gz``; the address stays the raw-content digest, so an
+    object already present in any encoding is reused rather than stored twice.
+    Compressed blobs are written in one pass and are not chunk-resumable.
+
+    ``put_file`` and ``put_tree`` return holding one reference on the object
+    for the caller, taken atomically with checking or writing its file.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        provider: str,
+        catalog: ObjectCatalog,
+        *,
+        transfer_method: str = "auto",
+        resume_min_bytes: int = 0,
+        checkpoint_bytes: int = DEFAULT_CHECKPOINT_BYTES,
+        codec: str = "none",
+        level: int = 6,
+        compress_min_bytes: int = 512,
+    ) -> None:
+        self.root = root
+        self.provider = provider
+        self.catalog = catalog
+        self.transfer_method = transfer_method
+        self.resume_min_bytes = int(resume_min_bytes)
+        self.checkpoint_bytes = int(checkpoint_bytes)
+        self.codec = codec
+        self.level = int(level)
+        self.compress_min_bytes = int(compress_min_bytes)
+        self.tmp_dir = root / "objects" / "tmp"
+
+    def path_for(self, sha256: str, kind: str = "blob") -> Path:
+        return self.root / object_rel_path(sha256, kind)
+
+    def _tmp_path(self) -> Path:
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        return self.tmp_dir / f"{os.getpid()}_{secrets.token_hex(8)}"
+
+    def _commit(self, tmp: Path, sha256: str, kind: str) -> bool:
+        final = self.path_for(sha256, kind)
+        if final.exists():
+            tmp.unlink(missing_ok=True)
+            return False
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, final)
+        return True
+
+    def existing_blob_kind(self, sha256: str) -> str:
+        for kind in BLOB_KINDS:
+            if self.path_for(sha256, kind).exists():
+                return kind
+        return ""
+
+    def _claim_existing(self, sha256: str, size: int) -> str:
+        """Take a reference on a stored encoding of ``sha256``; returns its kind, or "" when none is stored."""
+        kind = self.existing_blob_kind(sha256)
+        if not kind:
+            return ""
+        path = self.path_for(sha256, kind)
+        return self.catalog.claim(self.provider, sha256, kind, size, lambda: kind if path.exists() else None) or ""
+
+    def _claim_existing_tree(self, sha256: str, size: int) -> bool:
+        path = self.path_for(sha256, "tree")
+        if not path.exists():
+            return False
+        return bool(self.catalog.claim(self.provider, sha256, "tree", size, lambda: True if path.exists() else None))
+
+    def _claim_new(self, tmp: Path, sha256: str, kind: str, size: int) -> bool:
+        """Move a staged object into place and take a reference on it; returns whether the file is new."""
+        created = self.catalog.claim(self.provider, sha256, kind, size, lambda: self._commit(tmp, sha256, kind))
+        return bool(created)
+
+    def _reused(self, sha256: str, kind: str, size: int, method: str) -> dict[str, Any]:
+        return {
+            "sha256": sha256,
+            "kind": kind,
+            "codec": kind_codec(kind),
+            "size_bytes": size,
+            "encoded_bytes": self.path_for(sha256, kind).stat().st_size,
+            "stored_bytes": 0,
+            "created": False,
+            "method": method,
+        }
+
+    def put_file(self, src: Path, st: os.stat_result | None = None) -> dict[str, Any]:
+        st = st or src.stat()
+        known = self.catalog.lookup_fingerprint(src, st)
+        known_kind = self._claim_existing(known, int(st.st_size)) if known else ""
+        if known_kind:
+            return self._reused(known, known_kind, int(st.st_size), "fingerprint")
+
+        if self.codec != "none" and should_compress(src, int(st.st_size), self.compress_min_bytes):
+            return self._put_compressed(src, st)
+
+        resumable = self.resume_min_bytes > 0 and st.st_size >= self.resume_min_bytes
+        if resumable:
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
+            resumable = st.st_dev != os.stat(self.tmp_dir).st_dev or self.transfer_method == "buffered"
+        tmp = self.tmp_dir / f"resume_{resume_key(src, st)}" if resumable else self._tmp_path()
+        try:
+            if resumable:
+                result = copy_resumable(src, tmp, checkpoint_bytes=self.checkpoint_bytes)
+            else:
+                result = copy_and_hash(src, tmp, method=self.transfer_method)
+        except BaseException:
+            if not resumable:
+                tmp.unlink(missing_ok=True)  # resumable staging keeps its checkpoint for the retry
+            raise
+        sha, size = result.sha256, result.size_bytes
+        present = self._claim_existing(sha, size)
+        if present:
+            tmp.unlink(missing_ok=True)
+            self.catalog.remember_fingerprint(src, st, sha)
+            return self._reused(sha, present, size, result.method)
+        created = self._claim_new(tmp, sha, "blob", size)
+        self.catalog.remember_fingerprint(src, st, sha)
+        return {
+            "sha256": sha,
+            "kind": "blob",
+            "codec": "none",
+            "size_bytes": size,
+            "encoded_bytes": size,
+            "stored_bytes": size if created else 0,
+            "resumed_bytes": result.resumed_bytes,
+            "created": created,
+            "method": result.method,
+        }
+
+    def _put_compressed(self, src: Path, st: os.stat_result) -> dict[str, Any]:
+        tmp = self._tmp_path()
+        try:
+            result = compress_and_hash(src, tmp, codec=self.codec, level=self.level)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        sha = result.sha256
+        present = self._claim_existing(sha, result.size_bytes)
+        if present:
+            tmp.unlink(missing_ok=True)
+            self.catalog.remember_fingerprint(src, st, sha)
+            return self._reused(sha, present, result.size_bytes, self.codec)
+        kind = blob_kind(self.codec)
+        created = self._claim_new(tmp, sha, kind, result.size_bytes)
+        self.catalog.remember_fingerprint(src, st, sha)
+        return {
+            "sha256": sha,
+            "kind": kind,
+            "codec": self.codec,
+            "size_bytes": result.size_bytes,
+            "encoded_bytes": result.encoded_bytes,
+            "stored_bytes": result.encoded_bytes if created else 0,
+            "created": created,
+            "method": self.codec,
+        }
+
+    def _listing(self, src: Path, scan: SourceScan | None) -> list[tuple[str, os.stat_result]]:
+        if scan is not None and src in scan.children:
+            return scan.children[src]
+        listing: list[tuple[str, os.stat_result]] = []
+        for child in sorted(src.iterdir(), key=lambda p: p.name):
+            try:
+                listing.append((child.name, child.stat()))
+            except OSError:
+                continue
+        return listing
+
+    def put_tree(self, src: Path, scan: SourceScan | None = None) -> dict[str, Any]:
+        """Store a directory as a Merkle manifest over its children.
+
+        ``stored_bytes`` counts new payload blobs only; manifests written for
+        this tree and its subtrees are reported separately as ``manifest_bytes``.
+        ``codecs`` lists the encodings actually applied to the stored blobs.
+        """
+        entries: list[dict[str, Any]] = []
+        children: list[dict[str, Any]] = []
+        codecs: set[str] = set()
+        size_bytes = 0
+        encoded_bytes = 0
+        stored_bytes = 0
+        manifest_bytes = 0
+        resumed_bytes = 0
+        files = 0
+        for name, child_st in self._listing(src, scan):
+            child = src / name
+            mode = child_st.st_mode
+            if stat.S_ISDIR(mode):
+                result = self.put_tree(child, scan)
+                files += int(result["files"])
+            elif stat.S_ISREG(mode):
+                result = self.put_file(child, child_st)
+                files += 1
+            else:
+                continue
+            size_bytes += int(result["size_bytes"])
+            encoded_bytes += int(result["encoded_bytes"])
+            stored_bytes += int(result["stored_bytes"])
+            manifest_bytes += int(result.get("manifest_bytes", 0))
+            resumed_bytes += int(result.get("resumed_bytes", 0))
+            codecs.update(result.get("codecs", [result["codec"]]))
+            children.append(result)
+            entries.append(
+                {
+                    "name": name,
+                    "kind": result["kind"],
+                    "sha256": result["sha256"],
+                    "size_bytes": int(result["size_bytes"]),
+                    "mode": stat.S_IMODE(mode),
+                }
+            )
+
+        manifest = encode_tree(entries)
+        sha = hashlib.sha256(manifest).hexdigest()
+        created = False
+        if not self._claim_existing_tree(sha, size_bytes):
+            tmp = self._tmp_path()
+            tmp.write_bytes(manifest)
+            created = self._claim_new(tmp, sha, "tree", size_bytes)
+        if created:
+            # The references taken on the children pass to the new manifest.
+            manifest_bytes += len(manifest)
+        else:
+            # The stored manifest already holds its own references on the children.
+            for child_result in children:
+                self.catalog.adjust(self.provider, child_result["sha256"], -1)
+        applied = sorted(codecs)
+        return {
+            "sha256": sha,
+            "kind": "tree",
+            "codec": applied[0] if len(applied) == 1 else ("mixed" if applied else "none"),
+            "codecs": applied,
+            "size_bytes": size_bytes,
+            "encoded_bytes": encoded_bytes,
+            "stored_bytes": stored_bytes,
+            "manifest_bytes": manifest_bytes,
+            "resumed_bytes": resumed_bytes,
+            "created": created,
+            "files": files,
+        }
+
+    def read_tree(self, sha256: str) -> list[dict[str, Any]]:
+        doc = json.loads(self.path_for(sha256, "tree").read_text(encoding="utf-8"))
+        return list(doc.get("entries", []))
+
+    def materialize(self, sha256: str, kind: str, dst: Path) -> None:
+        if kind != "tree":
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            codec = kind_codec(kind)
+            if codec == "none":
+                shutil.copyfile(self.path_for(sha256), dst)
+            else:
+                decompress_file(self.path_for(sha256, kind), dst, codec=codec)
+            return
+        dst.mkdir(parents=True, exist_ok=False)
+        for entry in self.read_tree(sha256):
+            target = dst / str(entry["name"])
+            self.materialize(str(entry["sha256"]), str(entry["kind"]), target)
+            if entry["kind"] != "tree" and "mode" in entry:
+                os.chmod(target, int(entry["mode"]))
+
+    def collect(self, *, grace_sec: int, dry_run: bool = False) -> dict[str, Any]:
+        """Delete objects whose refcount reached zero, cascading through tree manifests."""
+        seen: set[str] = set()
+        removed = 0
+        freed = 0
+        before = int(time.time()) - max(0, grace_sec)
+        while True:
+            batch = [item for item in self.catalog.unreferenced(self.provider, before) if item[0] not in seen]
+            if not batch:
+                break
+            for sha, kind, _ in batch:
+                seen.add(sha)
+                path = self.path_for(sha, kind)
+                size = path.stat().st_size if path.exists() else 0
+                # The row is deleted first and the file unlinked only if that removed it; a put that
+                # claimed the object in the meantime keeps it.
+                if dry_run or self.catalog.reclaim(self.provider, sha, before, functools.partial(self._remove, path, kind, sha)):
+                    removed += 1
+                    freed += size
+            if dry_run:
+                break
+        if not dry_run:
+            self._sweep_tmp(before)
+        return {"provider": self.provider, "removed": removed, "freed_bytes": freed, "dry_run": dry_run}
+
+    def _remove(self, path: Path, kind: str, sha256: str) -> list[str]:
+        children = [str(entry["sha256"]) for entry in self.read_tree(sha256)] if kind == "tree" and path.exists() else []
+        path.unlink(missing_ok=True)
+        return children
+
+    def _sweep_tmp(self, before_epoch: int) -> None:
+        if not self.tmp_dir.exists():
+            return
+        for leftover in self.tmp_dir.iterdir():
+            try:
+                if leftover.stat().st_mtime < before_epoch:
+                    leftover.unlink()
+            except OSError:
+                continue
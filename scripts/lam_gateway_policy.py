@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any
+
+KILL_SWITCH_REASON = "data circulation kill-switch is active"
+
+
+def _names(raw: Any) -> frozenset[str]:
+    return frozenset(str(x) for x in raw) if isinstance(raw, list) else frozenset()
+
+
+def circulation_digest(policy: dict[str, Any]) -> str:
+    """Hash of everything a circulation decision depends on: the ``data_circulation`` section and provider names."""
+    raw = policy.get("data_circulation", {})
+    basis = [raw if isinstance(raw, dict) else {}, sorted(policy.get("providers", {}) or {})]
+    return hashlib.sha256(json.dumps(basis, ensure_ascii=True, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CirculationPolicy:
+    """``data_circulation`` compiled into frozensets plus a precomputed (class, provider) matrix.
+
+    ``matrix`` holds the contract/approval-independent verdict ("" = allowed)
+    for every class and provider named anywhere in the policy; pairs outside
+    it are evaluated on first use. Full decisions are memoized per
+    ``(class, provider, has_contract, has_approval)``. Instances never change:
+    a policy edit compiles a new one.
+    """
+
+    digest: str
+    active: bool = False
+    kill_switch: bool = False
+    enforce: bool = True
+    allowlist: Mapping[str, frozenset[str]] = field(default_factory=lambda: MappingProxyType({}))
+    provider_orgs: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    allowed_orgs: frozenset[str] | None = None
+    contract_classes: frozenset[str] = frozenset()
+    approval_classes: frozenset[str] = frozenset()
+    matrix: Mapping[tuple[str, str], str] = field(default_factory=lambda: MappingProxyType({}))
+    _memo: dict[tuple[str, str, bool, bool], str] = field(default_factory=dict, compare=False, repr=False)
+    _counts: dict[str, int] = field(default_factory=lambda: {"hits": 0, "misses": 0}, compare=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, compare=False, repr=False)
+
+    @classmethod
+    def compile(cls, policy: dict[str, Any], *, digest: str = "") -> CirculationPolicy:
+        raw = policy.get("data_circulation", {})
+        cfg = raw if isinstance(raw, dict) else {}
+        allow_raw = cfg.get("class_provider_allowlist", {})
+        allowlist = {
+            str(name): frozenset(str(x) for x in providers)
+            for name, providers in (allow_raw.items() if isinstance(allow_raw, dict) else [])
+            if isinstance(providers, list)
+        }
+        orgs_raw = cfg.get("provider_org", {})
+        provider_orgs = {
+            str(name): str(org).strip()
+            for name, org in (orgs_raw.items() if isinstance(orgs_raw, dict) else [])
+            if str(org).strip()
+        }
+        allowed_orgs = cfg.get("cross_org_allowed", [])
+        compiled = cls(
+            digest=digest or circulation_digest(policy),
+            active=bool(cfg),
+            kill_switch=bool(cfg.get("kill_switch", False)),
+            enforce=bool(cfg.get("enforce", True)),
+            allowlist=MappingProxyType(allowlist),
+            provider_orgs=MappingProxyType(provider_orgs),
+            allowed_orgs=_names(allowed_orgs) if isinstance(allowed_orgs, list) else None,
+            contract_classes=_names(cfg.get("require_contract_for_classes", [])),
+            approval_classes=_names(cfg.get("require_approval_for_classes", [])),
+        )
+        classes = set(policy.get("classes", {}) or {}) | set(allowlist) | compiled.contract_classes | compiled.approval_classes
+        providers = set(policy.get("providers", {}) or {}) | set(provider_orgs)
+        for allowed in allowlist.values():
+            providers |= allowed
+        matrix = {(c, p): compiled._route_verdict(c, p) for c in classes for p in providers}
+        object.__setattr__(compiled, "matrix", MappingProxyType(matrix))
+        return compiled
+
+    def org(self, provider: str) -> str:
+        return self.provider_orgs.get(provider, "internal")
+
+    def _route_verdict(self, data_class: str, provider: str) -> str:
+        allowed = self.allowlist.get(data_class) or self.allowlist.get("generic")
+        if allowed is not None and provider not in allowed:
+            return f"provider '{provider}' not allowed for class '{data_class}'"
+        org = self.org(provider)
+        if self.allowed_orgs is not None and org not in self.allowed_orgs:
+            return f"destination org '{org}' is not allowed by policy"
+        return ""
+
+    def _decide(self, data_class: str, provider: str, has_contract: bool, has_approval: bool) -> str:
+        if not self.active:
+            return ""
+        if self.kill_switch:
+            return KILL_SWITCH_REASON
+        if not self.enforce:
+            return ""
+        verdict = self.matrix.get((data_class, provider))
+        if verdict is None:
+            verdict = self._route_verdict(data_class, provider)
+        if verdict:
+            return verdict
+        if data_class in self.contract_classes and not has_contract:
+            return f"contract_id required for class '{data_class}'"
+        if data_class in self.approval_classes and not has_approval:
+            return f"approval_ref required for class '{data_class}'"
+        return ""
+
+    def decide(self, data_class: str, provider: str, *, contract_id: str = "", approval_ref: str = "") -> str:
+        """Denial reason for one transfer, or "" when it is allowed."""
+        key = (data_class, provider, bool(contract_id.strip()), bool(approval_ref.strip()))
+        reason = self._memo.get(key)
+        with self._lock:
+            if reason is None:
+                self._counts["misses"] += 1
+            else:
+                self._counts["hits"] += 1
+        if reason is None:
+            reason = self._decide(*key)
+            self._memo[key] = reason
+        return reason
+
+    def memo_stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._counts, "entries": len(self._memo), "matrix": len(self.matrix), "digest": self.digest}
+
+
+_COMPILED_LOCK = threading.Lock()
+_COMPILED: CirculationPolicy | None = None
+
+
+def compiled_circulation(policy: dict[str, Any]) -> CirculationPolicy:
+    """Compiled policy for callers without a long-lived service; recompiled only when the relevant sections change."""
+    global _COMPILED
+    digest = circulation_digest(policy)
+    with _COMPILED_LOCK:
+        if _COMPILED is None or _COMPILED.digest != digest:
+            _COMPILED = CirculationPolicy.compile(policy, digest=digest)
+        return _COMPILED
@@ -0,0 +1,539 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+QUEUE_VERSION = "v1"
+FINISHED_STATUSES = ("done", "dead")
+DEFAULT_BUSY_TIMEOUT_SEC = 30.0
+
+
+def _epoch_now() -> int:
+    return int(time.time())
+
+
+@dataclass(frozen=True)
+class FairSchedule:
+    """Weighted fair queueing across data classes with per-job priority and aging.
+
+    Classes are served by start-time fair queueing: each claim charges the
+    class ``1 / weight`` of virtual time, and the class with the smallest
+    start tag goes next, so a backlog of one class cannot starve another. The
+    class virtual clocks persist in the backend between ``run-queue`` calls, so
+    small ``max_jobs`` budgets stay fair too. Inside a class, jobs run by
+    effective priority ``priority + waited_sec / aging_sec`` (oldest first on
+    ties), so low-priority jobs eventually overtake fresh urgent ones.
+    """
+
+    weights: dict[str, float] = field(default_factory=dict)
+    default_weight: float = 1.0
+    aging_sec: float = 300.0
+
+    @classmethod
+    def from_policy(cls, cfg: dict[str, Any]) -> FairSchedule | None:
+        if str(cfg.get("mode", "wfq")).strip().lower() != "wfq":
+            return None
+        weights = {str(k): float(v) for k, v in dict(cfg.get("class_weights", {})).items()}
+        return cls(
+            weights=weights,
+            default_weight=float(cfg.get("default_weight", 1.0)),
+            aging_sec=float(cfg.get("aging_sec", 300.0)),
+        )
+
+    def weight(self, data_class: str) -> float:
+        return max(float(self.weights.get(data_class, self.default_weight)), 1e-6)
+
+    def sort_key(self, item: dict[str, Any]) -> tuple[float, int]:
+        # Descending priority + waited/aging == ascending enqueued/aging - priority.
+        enqueued = job_enqueued_epoch(item)
+        return (enqueued / max(self.aging_sec, 1e-6) - job_priority(item), enqueued)
+
+    def pick(
+        self, candidates: dict[str, list[dict[str, Any]]], vtime: dict[str, float], limit: int
+    ) -> list[dict[str, Any]]:
+        """Choose up to ``limit`` jobs from per-class candidate lists (each already in priority order).
+
+        ``vtime`` maps class -> finish tag and ``""`` -> system virtual time; it is updated in place.
+        """
+        heads = {cls: 0 for cls, items in candidates.items() if items}
+        system = float(vtime.get("", 0.0))
+        chosen: list[dict[str, Any]] = []
+        while heads and len(chosen) < limit:
+            # A class that sat idle restarts at the system clock instead of cashing in banked credit.
+            cls = min(heads, key=lambda c: (max(float(vtime.get(c, system)), system), c))
+            start = max(float(vtime.get(cls, system)), system)
+            chosen.append(candidates[cls][heads[cls]])
+            system = start
+            vtime[cls] = start + 1.0 / self.weight(cls)
+            heads[cls] += 1
+            if heads[cls] >= len(candidates[cls]):
+                del heads[cls]
+        vtime[""] = system
+        return chosen
+
+
+def job_class(item: dict[str, Any]) -> str:
+    payload = item.get("payload") or {}
+    return str(item.get("class") or payload.get("class") or "generic")
+
+
+def job_priority(item: dict[str, Any]) -> int:
+    return int(item.get("priority", 0) or 0)
+
+
+def job_enqueued_epoch(item: dict[str, Any]) -> int:
+    return int(item.get("enqueued_epoch", item.get("next_run_epoch", 0)) or 0)
+
+
+def _coalesce_into(existing: dict[str, Any], item: dict[str, Any]) -> dict[str, Any]:
+    # The pending job keeps its id, attempts and backoff; it inherits the more urgent priority.
+    existing["coalesced"] = int(existing.get("coalesced", 0)) + 1
+    existing["priority"] = max(job_priority(existing), job_priority(item))
+    existing["last_coalesced_utc"] = item.get("created_utc", "")
+    return existing
+
+
+class QueueBackend(Protocol):
+    name: str
+    location: str
+
+    def add(self, item: dict[str, Any]) -> dict[str, Any]: ...
+
+    def enqueue(self, item: dict[str, Any]) -> tuple[dict[str, Any], bool]: ...
+
+    def counters(self) -> dict[str, int]: ...
+
+    def import_items(self, items: list[dict[str, Any]]) -> int: ...
+
+    def claim_due(
+        self, *, now: int, limit: int, lease_sec: int, owner: str, schedule: FairSchedule | None = None
+    ) -> list[dict[str, Any]]: ...
+
+    def release(self, item: dict[str, Any]) -> None: ...
+
+    def list_items(self, status: str = "") -> list[dict[str, Any]]: ...
+
+    def count(self, status: str = "") -> int: ...
+
+    def purge_finished(self, before_epoch: int) -> int: ...
+
+
+def _lease(item: dict[str, Any], *, now: int, lease_sec: int, owner: str) -> dict[str, Any]:
+    item["status"] = "running"
+    item["lease_owner"] = owner
+    item["lease_until_epoch"] = now + max(1, int(lease_sec))
+    return item
+
+
+def _unlease(item: dict[str, Any]) -> dict[str, Any]:
+    item.pop("lease_owner", None)
+    item.pop("lease_until_epoch", None)
+    if item.get("status") == "running":
+        item["status"] = "pending"
+    return item
+
+
+class JsonQueueBackend:
+    """Legacy queue.json document; every mutation rewrites the whole file."""
+
+    name = "json"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.location = str(path)
+
+    def _load(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {"version": QUEUE_VERSION, "items": []}
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def _save(self, doc: dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(doc, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+
+    def add(self, item: dict[str, Any]) -> dict[str, Any]:
+        doc = self._load()
+        doc.setdefault("items", []).append(item)
+        self._save(doc)
+        return item
+
+    def enqueue(self, item: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+        """Add ``item`` unless a pending job with the same ``coalesce_key`` exists; then merge into it."""
+        doc = self._load()
+        items = doc.setdefault("items", [])
+        key = str(item.get("coalesce_key", ""))
+        if key:
+            for existing in items:
+                if existing.get("status") == "pending" and existing.get("coalesce_key") == key:
+                    _coalesce_into(existing, item)
+                    counters = doc.setdefault("counters", {})
+                    counters["coalesced"] = int(counters.get("coalesced", 0)) + 1
+                    self._save(doc)
+                    return dict(existing), True
+        items.append(item)
+        self._save(doc)
+        return item, False
+
+    def counters(self) -> dict[str, int]:
+        return {"coalesced": int(self._load().get("counters", {}).get("coalesced", 0))}
+
+    def import_items(self, items: list[dict[str, Any]]) -> int:
+        doc = self._load()
+        doc.setdefault("items", []).extend(items)
+        self._save(doc)
+        return len(items)
+
+    def claim_due(
+        self, *, now: int, limit: int, lease_sec: int, owner: str, schedule: FairSchedule | None = None
+    ) -> list[dict[str, Any]]:
+        doc = self._load()
+        expired: list[dict[str, Any]] = []
+        due: list[dict[str, Any]] = []
+        for item in doc.get("items", []):
+            status = item.get("status")
+            if status == "running":
+                if int(item.get("lease_until_epoch", 0)) <= now:
+                    expired.append(item)
+            elif status == "pending" and int(item.get("next_run_epoch", 0)) <= now:
+                due.append(item)
+        picked = expired[:limit]
+        remaining = limit - len(picked)
+        if schedule is None:
+            # Expired leases first, then insertion order.
+            picked += due[:remaining]
+        elif remaining > 0 and due:
+            candidates: dict[str, list[dict[str, Any]]] = {}
+            for item in due:
+                candidates.setdefault(job_class(item), []).append(item)
+            for items in candidates.values():
+                items.sort(key=schedule.sort_key)
+            vtime = {str(k): float(v) for k, v in doc.get("fair_vtime", {}).items()}
+            picked += schedule.pick(candidates, vtime, remaining)
+            doc["fair_vtime"] = vtime
+        claimed = [dict(_lease(item, now=now, lease_sec=lease_sec, owner=owner)) for item in picked]
+        if claimed:
+            self._save(doc)
+        return claimed
+
+    def release(self, item: dict[str, Any]) -> None:
+        doc = self._load()
+        items = doc.setdefault("items", [])
+        released = _unlease(dict(item))
+        for idx, existing in enumerate(items):
+            if existing.get("id") == released.get("id"):
+                items[idx] = released
+                break
+        else:
+            items.append(released)
+        self._save(doc)
+
+    def list_items(self, status: str = "") -> list[dict[str, Any]]:
+        items = list(self._load().get("items", []))
+        if status:
+            items = [i for i in items if i.get("status") == status]
+        return items
+
+    def count(self, status: str = "") -> int:
+        return len(self.list_items(status))
+
+    def purge_finished(self, before_epoch: int) -> int:
+        # queue.json never recorded a finish epoch, so legacy history is kept as-is.
+        return 0
+
+
+class SqliteQueueBackend:
+    """WAL-mode SQLite queue indexed on (status, next_run_epoch).
+
+    While a job is leased its ``next_run_epoch`` column holds the lease expiry,
+    so abandoned leases are reclaimed through the same index as due jobs.
+    ``class``/``priority``/``enqueued_epoch`` are mirrored into columns so fair
+    scheduling reads at most ``limit`` candidates per class.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Path, busy_timeout_sec: float = DEFAULT_BUSY_TIMEOUT_SEC) -> None:
+        self.path = path
+        self.location = str(path)
+        self.busy_timeout_sec = busy_timeout_sec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    next_run_epoch INTEGER NOT NULL DEFAULT 0,
+                    finished_epoch INTEGER NOT NULL DEFAULT 0,
+                    doc TEXT NOT NULL,
+                    class TEXT NOT NULL DEFAULT 'generic',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    enqueued_epoch INTEGER NOT NULL DEFAULT 0,
+                    coalesce_key TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status_next_run ON jobs(status, next_run_epoch);
+                CREATE TABLE IF NOT EXISTS fair_vtime (
+                    class TEXT PRIMARY KEY,
+                    vtime REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "class" not in columns:
+                # Queues created before fair scheduling: add the columns and backfill from the job documents.
+                conn.executescript(
+                    """
+                    BEGIN;
+                    ALTER TABLE jobs ADD COLUMN class TEXT NOT NULL DEFAULT 'generic';
+                    ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0;
+                    ALTER TABLE jobs ADD COLUMN enqueued_epoch INTEGER NOT NULL DEFAULT 0;
+                    UPDATE jobs SET
+                        class = COALESCE(NULLIF(json_extract(doc, '$.class'), ''), NULLIF(json_extract(doc, '$.payload.class'), ''), 'generic'),
+                        priority = COALESCE(json_extract(doc, '$.priority'), 0),
+                        enqueued_epoch = COALESCE(json_extract(doc, '$.enqueued_epoch'), next_run_epoch);
+                    COMMIT;
+                    """
+                )
+            if "coalesce_key" not in columns:
+                conn.executescript(
+                    """
+                    BEGIN;
+                    ALTER TABLE jobs ADD COLUMN coalesce_key TEXT NOT NULL DEFAULT '';
+                    UPDATE jobs SET coalesce_key = COALESCE(json_extract(doc, '$.coalesce_key'), '');
+                    COMMIT;
+                    """
+                )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_class_next_run ON jobs(status, class, next_run_epoch)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_coalesce ON jobs(coalesce_key, status) WHERE coalesce_key != ''")
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'jobs_count_insert'").fetchone():
+                # Row count kept in ``counters`` by triggers so count() never scans the table; seeded once from existing rows.
+                conn.executescript(
+                    """
+                    BEGIN IMMEDIATE;
+                    CREATE TRIGGER IF NOT EXISTS jobs_count_insert AFTER INSERT ON jobs BEGIN
+                        INSERT INTO counters (name, value) VALUES ('jobs', 1) ON CONFLICT(name) DO UPDATE SET value = value + 1;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS jobs_count_delete AFTER DELETE ON jobs BEGIN
+                        UPDATE counters SET value = value - 1 WHERE name = 'jobs';
+                    END;
+                    INSERT OR REPLACE INTO counters (name, value) SELECT 'jobs', COUNT(*) FROM jobs;
+                    COMMIT;
+                    """
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(item: dict[str, Any]) -> tuple[str, str, str, int, int, str, str, int, int, str]:
+        status = str(item.get("status", "pending"))
+        finished = _epoch_now() if status in FINISHED_STATUSES else 0
+        return (
+            str(item["id"]),
+            str(item.get("type", "")),
+            status,
+            int(item.get("next_run_epoch", 0)),
+            finished,
+            json.dumps(item, ensure_ascii=True),
+            job_class(item),
+            job_priority(item),
+            job_enqueued_epoch(item),
+            str(item.get("coalesce_key", "")),
+        )
+
+    def add(self, item: dict[str, Any]) -> dict[str, Any]:
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, type, status, next_run_epoch, finished_epoch, doc, class, priority, enqueued_epoch, "
+                    "coalesce_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._row(item),
+                )
+        except sqlite3.IntegrityError as exc:
+            raise RuntimeError(f"duplicate queue job id: {item.get('id')}") from exc
+        return item
+
+    def enqueue(self, item: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+        """Add ``item`` unless a pending job with the same ``coalesce_key`` exists; then merge into it."""
+        key = str(item.get("coalesce_key", ""))
+        with self._transaction() as conn:
+            if key:
+                row = conn.execute(
+                    "SELECT seq, doc FROM jobs WHERE coalesce_key = ? AND status = 'pending' ORDER BY seq LIMIT 1",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    existing = _coalesce_into(json.loads(row[1]), item)
+                    conn.execute(
+                        "UPDATE jobs SET doc = ?, priority = ? WHERE seq = ?",
+                        (json.dumps(existing, ensure_ascii=True), job_priority(existing), row[0]),
+                    )
+                    conn.execute(
+                        "INSERT INTO counters (name, value) VALUES ('coalesced', 1) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+                    )
+                    return existing, True
+            try:
+                conn.execute(
+                    "INSERT INTO jobs (id, type, status, next_run_epoch, finished_epoch, doc, class, priority, enqueued_epoch, "
+                    "coalesce_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._row(item),
+                )
+            except sqlite3.IntegrityError as exc:
+                raise RuntimeError(f"duplicate queue job id: {item.get('id')}") from exc
+        return item, False
+
+    def counters(self) -> dict[str, int]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM counters WHERE name = 'coalesced'").fetchone()
+        return {"coalesced": int(row[0]) if row else 0}
+
+    def import_items(self, items: list[dict[str, Any]]) -> int:
+        rows = [self._row(item) for item in items if item.get("id")]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, type, status, next_run_epoch, finished_epoch, doc, class, priority, "
+                "enqueued_epoch, coalesce_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def claim_due(
+        self, *, now: int, limit: int, lease_sec: int, owner: str, schedule: FairSchedule | None = None
+    ) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        with self._transaction() as conn:
+            # Expired leases are reclaimed first, whatever the schedule.
+            rows = conn.execute(
+                "SELECT seq, doc FROM jobs WHERE status = 'running' AND next_run_epoch <= ? "
+                "ORDER BY next_run_epoch, seq LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            remaining = limit - len(rows)
+            if remaining > 0 and schedule is None:
+                rows += conn.execute(
+                    "SELECT seq, doc FROM jobs WHERE status = 'pending' AND next_run_epoch <= ? "
+                    "ORDER BY next_run_epoch, seq LIMIT ?",
+                    (now, remaining),
+                ).fetchall()
+            elif remaining > 0 and schedule is not None:
+                rows += self._fair_rows(conn, now=now, limit=remaining, schedule=schedule)
+            claimed: list[dict[str, Any]] = []
+            for seq, raw in rows:
+                item = _lease(json.loads(raw), now=now, lease_sec=lease_sec, owner=owner)
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', next_run_epoch = ?, doc = ? WHERE seq = ?",
+                    (item["lease_until_epoch"], json.dumps(item, ensure_ascii=True), seq),
+                )
+                claimed.append(item)
+        return claimed
+
+    @staticmethod
+    def _fair_rows(
+        conn: sqlite3.Connection, *, now: int, limit: int, schedule: FairSchedule
+    ) -> list[tuple[int, str]]:
+        aging = max(float(schedule.aging_sec), 1e-6)
+        classes = [
+            str(row[0])
+            for row in conn.execute(
+                "SELECT DISTINCT class FROM jobs WHERE status = 'pending' AND next_run_epoch <= ?", (now,)
+            )
+        ]
+        candidates: dict[str, list[dict[str, Any]]] = {}
+        for data_class in classes:
+            rows = conn.execute(
+                "SELECT seq, doc FROM jobs WHERE status = 'pending' AND class = ? AND next_run_epoch <= ? "
+                "ORDER BY enqueued_epoch / ? - priority, enqueued_epoch, seq LIMIT ?",
+                (data_class, now, aging, limit),
+            ).fetchall()
+            candidates[data_class] = [{"seq": seq, "raw": raw} for seq, raw in rows]
+        vtime = {str(k): float(v) for k, v in conn.execute("SELECT class, vtime FROM fair_vtime")}
+        picked = schedule.pick(candidates, vtime, limit)
+        conn.executemany(
+            "INSERT INTO fair_vtime (class, vtime) VALUES (?, ?) ON CONFLICT(class) DO UPDATE SET vtime = excluded.vtime",
+            list(vtime.items()),
+        )
+        return [(int(row["seq"]), str(row["raw"])) for row in picked]
+
+    def release(self, item: dict[str, Any]) -> None:
+        job_id, _, status, next_run, finished, doc, _cls, priority, _enqueued, _key = self._row(_unlease(dict(item)))
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, next_run_epoch = ?, finished_epoch = ?, doc = ?, priority = ? WHERE id = ?",
+                (status, next_run, finished, doc, priority, job_id),
+            )
+
+    def list_items(self, status: str = "") -> list[dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            if status:
+                rows = conn.execute("SELECT doc FROM jobs WHERE status = ? ORDER BY seq", (status,)).fetchall()
+            else:
+                rows = conn.execute("SELECT doc FROM jobs ORDER BY seq").fetchall()
+        return [json.loads(raw) for (raw,) in rows]
+
+    def count(self, status: str = "") -> int:
+        with closing(self._connect()) as conn:
+            if status:
+                row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()
+            else:
+                row = conn.execute("SELECT value FROM counters WHERE name = 'jobs'").fetchone()
+        return int(row[0]) if row else 0
+
+    def purge_finished(self, before_epoch: int) -> int:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_epoch < ?",
+                (*FINISHED_STATUSES, before_epoch),
+            )
+            return int(cur.rowcount)
+
+
+QUEUE_BACKENDS = ("sqlite", "json")
+
+
+def open_queue_backend(kind: str, *, json_path: Path, db_path: Path) -> QueueBackend:
+    kind = kind.strip().lower()
+    if kind == "sqlite":
+        return SqliteQueueBackend(db_path)
+    if kind == "json":
+        return JsonQueueBackend(json_path)
+    raise RuntimeError(f"unsupported queue backend: {kind}")
+
+
+def migrate_json_queue(json_path: Path, backend: QueueBackend) -> int:
+    """Import a legacy queue.json into ``backend`` once, then park it as ``queue.json.migrated``."""
+    if not json_path.exists():
+        return 0
+    doc = json.loads(json_path.read_text(encoding="utf-8"))
+    items = [i for i in doc.get("items", []) if isinstance(i, dict)]
+    imported = backend.import_items(items)
+    json_path.replace(json_path.with_name(json_path.name + ".migrated"))
+    return imported
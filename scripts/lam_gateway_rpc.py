@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Self
+
+try:
+    from scripts.lam_gateway_health import LatencyRecorder
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from scripts.lam_gateway_health import LatencyRecorder
+
+
+MAX_LINE = 16 * 1024 * 1024
+
+
+class RpcUnavailable(RuntimeError):
+    """No daemon is listening on the socket; callers fall back to in-process execution."""
+
+
+class RpcClient:
+    """JSON-lines client for the resident gateway daemon.
+
+    One request per line: ``{"id": n, "method": str, "params": {...}}``; the
+    daemon answers ``{"id": n, "ok": true, "result": {...}}`` or
+    ``{"id": n, "ok": false, "error": str}``. The connection is kept open so
+    repeated calls from one process skip the connect.
+    """
+
+    def __init__(self, socket_path: Path, *, timeout: float = 30.0) -> None:
+        self.socket_path = Path(socket_path)
+        self.timeout = float(timeout)
+        self._sock: socket.socket | None = None
+        self._reader: Any = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        if self._sock is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except (FileNotFoundError, ConnectionRefusedError, OSError) as exc:
+            sock.close()
+            raise RpcUnavailable(f"gateway daemon not reachable at {self.socket_path}: {exc}") from exc
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def call(self, method: str, **params: Any) -> dict[str, Any]:
+        with self._lock:
+            self._connect()
+            assert self._sock is not None
+            self._next_id += 1
+            line = json.dumps({"id": self._next_id, "method": method, "params": params}, ensure_ascii=True) + "\n"
+            # Once the request is sent the daemon may have acted on it, so a lost
+            # connection is an error rather than a signal to retry in-process.
+            try:
+                self._sock.sendall(line.encode("utf-8"))
+                raw = self._reader.readline(MAX_LINE)
+            except OSError as exc:
+                self.close()
+                raise RuntimeError(f"gateway daemon connection failed: {exc}") from exc
+            if not raw:
+                self.close()
+                raise RuntimeError("gateway daemon closed the connection")
+        reply = json.loads(raw)
+        if not reply.get("ok"):
+            raise RuntimeError(str(reply.get("error", "gateway daemon error")))
+        return reply.get("result", {})
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: RpcServer
+
+    def handle(self) -> None:
+        while True:
+            raw = self.rfile.readline(MAX_LINE)
+            if not raw:
+                return
+            reply = self.server.dispatch(raw)
+            self.wfile.write((json.dumps(reply, ensure_ascii=True) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class RpcServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix-socket server mapping JSON-lines requests onto ``methods``.
+
+    ``after_call`` runs after every request (the gateway uses it to flush
+    breaker state). Per-method latency is recorded and served by the
+    built-in ``stats`` method; ``ping`` answers without touching state.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        methods: dict[str, Callable[..., dict[str, Any]]],
+        *,
+        after_call: Callable[[], None] | None = None,
+    ) -> None:
+        self.socket_path = Path(socket_path)
+        self.methods = dict(methods)
+        self.after_call = after_call
+        self.latency: dict[str, LatencyRecorder] = {}
+        self.started_epoch = time.time()
+        self._latency_lock = threading.Lock()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._clear_stale_socket()
+        super().__init__(str(self.socket_path), _Handler)
+        os.chmod(self.socket_path, 0o600)
+
+    def _clear_stale_socket(self) -> None:
+        if not self.socket_path.exists():
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self.socket_path))
+        except OSError:
+            self.socket_path.unlink(missing_ok=True)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"gateway daemon already listening on {self.socket_path}")
+
+    def _record(self, method: str, latency_ms: float) -> None:
+        with self._latency_lock:
+            recorder = self.latency.get(method)
+            if recorder is None:
+                recorder = self.latency[method] = LatencyRecorder()
+        recorder.record(latency_ms)
+
+    def stats(self) -> dict[str, Any]:
+        with self._latency_lock:
+            methods = {name: rec.summary() for name, rec in sorted(self.latency.items())}
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "socket": str(self.socket_path),
+            "uptime_sec": round(time.time() - self.started_epoch, 3),
+            "latency_ms": methods,
+        }
+
+    def dispatch(self, raw: bytes) -> dict[str, Any]:
+        started = time.perf_counter()
+        req_id: Any = None
+        method = ""
+        try:
+            request = json.loads(raw)
+            req_id = request.get("id")
+            method = str(request.get("method", ""))
+            params = request.get("params") or {}
+            if method == "ping":
+                result: dict[str, Any] = {"status": "ok", "pid": os.getpid()}
+            elif method == "stats":
+                result = self.stats()
+            elif method in self.methods:
+                try:
+                    result = self.methods[method](**params)
+                finally:
+                    if self.after_call is not None:
+                        self.after_call()
+            else:
+                raise RuntimeError(f"unknown method: {method}")
+            reply = {"id": req_id, "ok": True, "result": result}
+        except Exception as exc:  # noqa: BLE001
+            reply = {"id": req_id, "ok": False, "error": str(exc)}
+        if method and method != "stats":
+            self._record(method, (time.perf_counter() - started) * 1000.0)
+        return reply
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import secrets
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console import state_store
+    from scripts.lam_gateway_transfer import decompressor
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console import state_store
+    from scripts.lam_gateway_transfer import decompressor
+
+
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+STATUSES = ("ok", "corrupt", "missing", "error")
+# power_fabric_guard modes in which the scrubber drops to its quiet rate.
+QUIET_MODES = frozenset({"quiet_cooling"})
+
+
+def _utc_now() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass(frozen=True)
+class ScrubUnit:
+    """One stored object to re-hash; ``sha256`` is the digest of its raw (decoded) content."""
+
+    provider: str
+    rel: str
+    path: Path
+    sha256: str
+    codec: str = "none"
+    entry_ids: tuple[str, ...] = ()
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.rel}"
+
+
+def power_mode(state_file: Path) -> str:
+    try:
+        return str(json.loads(state_file.read_text(encoding="utf-8")).get("mode", ""))
+    except (OSError, ValueError, AttributeError):
+        return ""
+
+
+class RateLimiter:
+    """Token bucket shared by all scrub workers.
+
+    ``rate_fn`` returns the allowed bytes per second (0 = unlimited) and is
+    re-read every ``refresh_sec``, so a switch into quiet mode slows a scrub
+    that is already running.
+    """
+
+    def __init__(self, rate_fn: Callable[[], float], *, refresh_sec: float = 5.0) -> None:
+        self.rate_fn = rate_fn
+        self.refresh_sec = float(refresh_sec)
+        self._lock = threading.Lock()
+        self._rate = float(rate_fn())
+        self._checked = time.monotonic()
+        self._tokens = self._rate
+        self._stamp = self._checked
+        self.waited_sec = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def consume(self, amount: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= self.refresh_sec:
+                self._rate = float(self.rate_fn())
+                self._checked = now
+            if self._rate <= 0:
+                return
+            self._tokens = min(self._rate, self._tokens + (now - self._stamp) * self._rate)
+            self._stamp = now
+            self._tokens -= amount
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            self.waited_sec += delay
+        if delay > 0:
+            time.sleep(delay)
+
+
+def hash_unit(unit: ScrubUnit, limiter: RateLimiter | None = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> tuple[str, int]:
+    """Stream one object through sha256 (decoding compressed blobs) with one chunk of memory; returns (digest, bytes read)."""
+    h = hashlib.sha256()
+    dec = decompressor(unit.codec) if unit.codec not in ("", "none") else None
+    read = 0
+    with unit.path.open("rb") as fh:
+        while chunk := fh.read(chunk_bytes):
+            if limiter is not None:
+                limiter.consume(len(chunk))
+            read += len(chunk)
+            h.update(dec.decompress(chunk) if dec is not None else chunk)
+        if dec is not None and unit.codec == "gzip":
+            h.update(dec.flush())
+    return h.hexdigest(), read
+
+
+def check_unit(unit: ScrubUnit, limiter: RateLimiter | None = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> dict[str, Any]:
+    result: dict[str, Any] = {"key": unit.key, "provider": unit.provider, "rel": unit.rel, "expected": unit.sha256}
+    try:
+        actual, read = hash_unit(unit, limiter, chunk_bytes)
+    except FileNotFoundError:
+        return {**result, "status": "missing", "bytes": 0}
+    except Exception as exc:  # noqa: BLE001
+        return {**result, "status": "error", "error": str(exc), "bytes": 0}
+    return {**result, "status": "ok" if actual == unit.sha256 else "corrupt", "actual": actual, "bytes": read}
+
+
+class ScrubProgress:
+    """Resumable scrub state.
+
+    The JSON document at ``path`` holds only the run header and totals. Each
+    checked unit is appended as one line to a results log beside it
+    (``scrub_state.jsonl``; ok units as ``key``/``status``/``bytes``, problems
+    in full), so a checkpoint writes only what finished since the previous
+    one. The log's first line names the run it belongs to; a resumed run
+    replays it once to rebuild ``done`` and ``problems``.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.log_path = self.path.with_suffix(".jsonl")
+        self.doc: dict[str, Any] = {}
+        self.done: dict[str, str] = {}
+        self.problems: list[dict[str, Any]] = []
+        self._pending: list[dict[str, Any]] = []
+
+    def open(self, *, restart: bool) -> bool:
+        """Load an unfinished run (returns True) or start a new one."""
+        try:
+            doc = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            doc = {}
+        self.done, self.problems, self._pending = {}, [], []
+        if not restart and isinstance(doc, dict) and doc.get("run_id") and not doc.get("finished_utc"):
+            self.doc = doc
+            self._replay()
+            return True
+        self.doc = {
+            "version": "v2",
+            "run_id": f"scrub_{datetime.now(UTC).strftime('%Y%m%dT%H%M%SZ')}_{secrets.token_hex(3)}",
+            "started_utc": _utc_now(),
+            "finished_utc": "",
+            "bytes": 0,
+            "checked": 0,
+        }
+        self._start_log()
+        self.save()
+        return False
+
+    def _start_log(self) -> None:
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_path.write_text(json.dumps({"run_id": self.doc["run_id"]}) + "\n", encoding="utf-8")
+
+    def _replay(self) -> None:
+        try:
+            text = self.log_path.read_text(encoding="utf-8")
+        except OSError:
+            text = ""
+        lines = text.splitlines()
+        try:
+            owner = json.loads(lines[0]).get("run_id") if lines else None
+        except (ValueError, AttributeError):
+            owner = None
+        if owner != self.doc["run_id"]:
+            # No log for this run (or one left by another run): its units are checked again.
+            self._start_log()
+            text, lines = "", []
+        total = 0
+        for line in lines[1:]:
+            try:
+                result = json.loads(line)
+                key, status = str(result["key"]), str(result["status"])
+            except (ValueError, KeyError, TypeError):
+                continue  # a line torn by a crash mid-append; that unit is checked again
+            self.done[key] = status
+            total += int(result.get("bytes", 0))
+            if status != "ok":
+                self.problems.append(result)
+        if text and not text.endswith("\n"):
+            with self.log_path.open("a", encoding="utf-8") as fh:
+                fh.write("\n")
+        self.doc["bytes"] = total
+        self.doc["checked"] = len(self.done)
+
+    def record(self, result: dict[str, Any]) -> None:
+        self.done[result["key"]] = result["status"]
+        self.doc["bytes"] = int(self.doc.get("bytes", 0)) + int(result.get("bytes", 0))
+        if result["status"] != "ok":
+            self.problems.append(result)
+            self._pending.append(result)
+        else:
+            self._pending.append({"key": result["key"], "status": "ok", "bytes": int(result.get("bytes", 0))})
+
+    def save(self) -> None:
+        """Append the results recorded since the last save, then rewrite the small header."""
+        if self._pending:
+            with self.log_path.open("a", encoding="utf-8") as fh:
+                fh.writelines(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n" for result in self._pending)
+            self._pending = []
+        self.doc["checked"] = len(self.done)
+        state_store.write_json(self.path, self.doc)
+
+    def finish(self) -> None:
+        self.doc["finished_utc"] = _utc_now()
+        self.save()
+
+
+def run_scrub(
+    units: Iterable[ScrubUnit],
+    progress: ScrubProgress,
+    *,
+    workers: int = 4,
+    limiter: RateLimiter | None = None,
+    checkpoint_every: int = 64,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    max_units: int = 0,
+) -> dict[str, Any]:
+    """Hash every unit not yet done in ``progress`` on a thread pool; checkpoints so an interrupted run resumes.
+
+    ``units`` is consumed lazily and once, so the caller can produce it page
+    by page; a key seen twice is checked once. At most ``workers * 2`` units
+    are in flight, each holding one chunk, so memory stays bounded whatever
+    the object sizes. ``max_units`` stops checking after that many units this
+    call (the run stays open for the next call).
+    """
+    started = time.perf_counter()
+    counts = {status: 0 for status in STATUSES}
+    live: set[str] = set()
+    submitted = 0
+    checked = 0
+    bytes_read = 0
+    since_checkpoint = 0
+    queue = iter(units)
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scrub") as pool:
+        inflight: set[Future[dict[str, Any]]] = set()
+        while True:
+            while not exhausted and len(inflight) < max(1, workers) * 2:
+                unit = next(queue, None)
+                if unit is None:
+                    exhausted = True
+                    break
+                if unit.key in live:
+                    continue
+                live.add(unit.key)
+                status = progress.done.get(unit.key)
+                if status is not None:
+                    counts[status] = counts.get(status, 0) + 1
+                elif max_units <= 0 or submitted < max_units:
+                    inflight.add(pool.submit(check_unit, unit, limiter, chunk_bytes))
+                    submitted += 1
+            if not inflight:
+                break
+            finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                progress.record(result)
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+                checked += 1
+                bytes_read += int(result.get("bytes", 0))
+                since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                progress.save()
+                since_checkpoint = 0
+    complete = sum(counts.values()) == len(live)
+    if complete:
+        progress.finish()
+    else:
+        progress.save()
+    elapsed = time.perf_counter() - started
+    return {
+        "run_id": progress.doc["run_id"],
+        "started_utc": progress.doc["started_utc"],
+        "finished_utc": progress.doc.get("finished_utc", ""),
+        "complete": complete,
+        "units": len(live),
+        "remaining": len(live) - sum(counts.values()),
+        "checked_this_call": checked,
+        "counts": counts,
+        "bytes_this_call": bytes_read,
+        "bytes_total": int(progress.doc.get("bytes", 0)),
+        "elapsed_sec": round(elapsed, 3),
+        "mb_per_sec": round(bytes_read / (1024 * 1024) / elapsed, 3) if elapsed > 0 else 0.0,
+        "rate_limit_bytes_per_sec": limiter.rate if limiter is not None else 0.0,
+        "throttled_sec": round(limiter.waited_sec, 3) if limiter is not None else 0.0,
+        "problems": [p for p in progress.problems if p["key"] in live],
+    }
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console import state_store
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console import state_store
+
+
+DEFAULT_ALPHA = 0.2
+# Transfers smaller than this are dominated by per-operation overhead, so they
+# feed the latency average instead of the throughput average.
+DEFAULT_MIN_THROUGHPUT_BYTES = 1024 * 1024
+
+DEFAULT_SCORE = {
+    "prior_mbps": 50.0,
+    "prior_latency_ms": 20.0,
+    "default_size_bytes": 1024 * 1024,
+    "space_target_ratio": 4.0,
+    "weight_space_sec": 5.0,
+    "weight_error_sec": 30.0,
+    "weight_breaker_sec": 10.0,
+    "order_sec": 0.001,
+}
+
+
+def _utc_now() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _ewma(prev: float | None, sample: float, alpha: float) -> float:
+    if prev is None:
+        return sample
+    return prev + alpha * (sample - prev)
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ProviderStats:
+    """EWMA throughput/latency/error statistics per provider.
+
+    Every put/get reports ``(ok, bytes, seconds)``. Large successful transfers
+    update ``throughput_bps``, small ones update ``latency_ms``; every call
+    moves ``error_rate`` towards 0 or 1. State lives in one JSON file written
+    through the shared state store; ``hold()`` keeps updates in memory until
+    ``flush()`` (the long-lived GatewayService does this), otherwise each
+    record is written straight away.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        alpha: float = DEFAULT_ALPHA,
+        min_throughput_bytes: int = DEFAULT_MIN_THROUGHPUT_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.alpha = float(alpha)
+        self.min_throughput_bytes = int(min_throughput_bytes)
+        self._lock = threading.Lock()
+        self._held = False
+        self._dirty = False
+        self._stamp: tuple[int, int] | None = None
+        self._providers: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    def configure(self, *, alpha: float, min_throughput_bytes: int) -> None:
+        self.alpha = float(alpha)
+        self.min_throughput_bytes = int(min_throughput_bytes)
+
+    def _load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            payload = {}
+        providers = payload.get("providers", {}) if isinstance(payload, dict) else {}
+        self._providers = providers if isinstance(providers, dict) else {}
+        self._stamp = _stamp(self.path)
+
+    def _write_locked(self) -> None:
+        state_store.write_json(self.path, {"version": "v1", "alpha": self.alpha, "providers": self._providers})
+        self._stamp = _stamp(self.path)
+        self._dirty = False
+
+    def hold(self) -> None:
+        with self._lock:
+            self._held = True
+
+    def release(self) -> None:
+        self.flush()
+        with self._lock:
+            self._held = False
+
+    def _refresh_locked(self) -> None:
+        if not self._dirty and _stamp(self.path) != self._stamp:
+            self._load()
+
+    def refresh(self) -> None:
+        """Re-read the file when another process updated it and nothing local is pending."""
+        with self._lock:
+            self._refresh_locked()
+
+    def flush(self) -> bool:
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._write_locked()
+            return True
+
+    def record(self, provider: str, op: str, *, ok: bool, size_bytes: int, seconds: float) -> dict[str, Any]:
+        with self._lock:
+            if not self._held:
+                self._refresh_locked()
+            state = self._providers.setdefault(provider, {"samples": 0, "errors": 0, "error_rate": 0.0, "ops": {}})
+            state["samples"] = int(state.get("samples", 0)) + 1
+            ops = state.setdefault("ops", {})
+            ops[op] = int(ops.get(op, 0)) + 1
+            state["error_rate"] = round(_ewma(float(state.get("error_rate", 0.0)), 0.0 if ok else 1.0, self.alpha), 6)
+            if ok:
+                seconds = max(float(seconds), 1e-6)
+                if size_bytes >= self.min_throughput_bytes:
+                    prev = state.get("throughput_bps")
+                    state["throughput_bps"] = round(
+                        _ewma(None if prev is None else float(prev), size_bytes / seconds, self.alpha), 3
+                    )
+                else:
+                    prev = state.get("latency_ms")
+                    state["latency_ms"] = round(
+                        _ewma(None if prev is None else float(prev), seconds * 1000.0, self.alpha), 3
+                    )
+                state["bytes_total"] = int(state.get("bytes_total", 0)) + int(size_bytes)
+            else:
+                state["errors"] = int(state.get("errors", 0)) + 1
+            state["last_utc"] = _utc_now()
+            self._dirty = True
+            if not self._held:
+                self._write_locked()
+            return dict(state)
+
+    def get(self, provider: str) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._providers.get(provider, {}))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {name: dict(state) for name, state in sorted(self._providers.items())}
+
+
+def score_settings(raw: Any) -> dict[str, float]:
+    settings = dict(DEFAULT_SCORE)
+    if isinstance(raw, dict):
+        for key in settings:
+            if key in raw:
+                settings[key] = float(raw[key])
+    return settings
+
+
+def score_provider(
+    stats: dict[str, Any],
+    *,
+    size_bytes: int | None,
+    free_gb: float,
+    min_free_gb: float,
+    consecutive_failures: int,
+    position: int,
+    settings: dict[str, float],
+) -> dict[str, Any]:
+    """Expected cost in seconds of sending ``size_bytes`` to one provider (lower is better).
+
+    ``transfer_sec`` comes from the EWMA latency and throughput (priors until a
+    provider has samples); space, error-rate and breaker penalties are
+    expressed in the same seconds so the breakdown reads as one budget.
+    """
+    size = int(settings["default_size_bytes"]) if size_bytes is None else int(size_bytes)
+    throughput = stats.get("throughput_bps")
+    latency_ms = stats.get("latency_ms")
+    bps = float(throughput) if throughput else settings["prior_mbps"] * 1024 * 1024
+    latency_sec = (float(latency_ms) if latency_ms is not None else settings["prior_latency_ms"]) / 1000.0
+    transfer_sec = latency_sec + size / max(bps, 1.0)
+
+    headroom_gb = float(free_gb) - size / (1024**3)
+    target_gb = max(float(min_free_gb), 1.0) * settings["space_target_ratio"]
+    space_penalty_sec = settings["weight_space_sec"] * max(0.0, 1.0 - headroom_gb / target_gb)
+    error_rate = float(stats.get("error_rate", 0.0))
+    error_penalty_sec = settings["weight_error_sec"] * error_rate
+    breaker_penalty_sec = settings["weight_breaker_sec"] * int(consecutive_failures)
+    order_penalty_sec = settings["order_sec"] * position
+    total = transfer_sec + space_penalty_sec + error_penalty_sec + breaker_penalty_sec + order_penalty_sec
+    return {
+        "score": round(total, 6),
+        "transfer_sec": round(transfer_sec, 6),
+        "throughput_bps": round(bps, 3),
+        "latency_ms": round(latency_sec * 1000.0, 3),
+        "prior": not throughput,
+        "space_penalty_sec": round(space_penalty_sec, 6),
+        "headroom_gb": round(headroom_gb, 3),
+        "error_rate": round(error_rate, 6),
+        "error_penalty_sec": round(error_penalty_sec, 6),
+        "consecutive_failures": int(consecutive_failures),
+        "breaker_penalty_sec": round(breaker_penalty_sec, 6),
+        "order_penalty_sec": round(order_penalty_sec, 6),
+        "samples": int(stats.get("samples", 0)),
+    }
@@ -0,0 +1,619 @@
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import queue
+import shutil
+import stat
+import sys
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console.state_store import atomic_write_text
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console.state_store import atomic_write_text
+
+try:
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # optional; zstd policies fall back to gzip without it
+    zstandard = None  # type: ignore[assignment]
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_POOL_BUFFERS = 8
+# Linux _IOW(0x94, 9, int): clone src extents into dst (btrfs, xfs, bcachefs, ...).
+FICLONE = 0x40049409
+METHODS = ("auto", "reflink", "copy_file_range", "sendfile", "buffered")
+
+# errnos that mean "this fast path is unavailable here", not "the copy failed".
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY}
+
+
+class BufferPool:
+    """Fixed set of reusable chunk buffers; callers block when all are in use.
+
+    Bounds transfer memory to ``count * size`` bytes regardless of how many
+    queue workers copy at once.
+    """
+
+    def __init__(self, count: int = DEFAULT_POOL_BUFFERS, size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.count = max(1, int(count))
+        self.size = max(4096, int(size))
+        self._free: queue.SimpleQueue[bytearray] = queue.SimpleQueue()
+        for _ in range(self.count):
+            self._free.put(bytearray(self.size))
+
+    @contextmanager
+    def buffer(self) -> Iterator[memoryview]:
+        buf = self._free.get()
+        try:
+            yield memoryview(buf)
+        finally:
+            self._free.put(buf)
+
+
+_POOL = BufferPool()
+
+
+def configure_pool(count: int, chunk_size: int) -> BufferPool:
+    global _POOL
+    if count != _POOL.count or chunk_size != _POOL.size:
+        _POOL = BufferPool(count, chunk_size)
+    return _POOL
+
+
+@dataclass(frozen=True)
+class TransferResult:
+    sha256: str
+    size_bytes: int
+    method: str
+    # Bytes already staged by an earlier, interrupted attempt (not sent again).
+    resumed_bytes: int = 0
+
+
+def _hash_fd(fd: int, h: hashlib._Hash, size: int, pool: BufferPool) -> None:
+    # Hash what landed in dst (hot in page cache), so the digest matches the stored bytes.
+    offset = 0
+    with pool.buffer() as view:
+        while offset < size:
+            n = os.preadv(fd, [view[: min(len(view), size - offset)]], offset)
+            if n <= 0:
+                raise OSError(errno.EIO, "short read while hashing copy")
+            h.update(view[:n])
+            offset += n
+
+
+def _copy_reflink(fin: int, fout: int, size: int, pool: BufferPool) -> str:
+    import fcntl
+
+    fcntl.ioctl(fout, FICLONE, fin)
+    h = hashlib.sha256()
+    _hash_fd(fout, h, size, pool)
+    return h.hexdigest()
+
+
+def _copy_kernel(fin: int, fout: int, size: int, pool: BufferPool, method: str) -> str:
+    h = hashlib.sha256()
+    offset = 0
+    with pool.buffer() as view:
+        while offset < size:
+            want = min(len(view), size - offset)
+            if method == "copy_file_range":
+                n = os.copy_file_range(fin, fout, want, offset, offset)
+            else:
+                os.lseek(fout, offset, os.SEEK_SET)
+                n = os.sendfile(fout, fin, offset, want)
+            if n <= 0:
+                raise OSError(errno.EIO, f"{method} made no progress")
+            got = os.preadv(fout, [view[:n]], offset)
+            h.update(view[:got])
+            offset += n
+    return h.hexdigest()
+
+
+def _copy_buffered(fin: int, fout: int, pool: BufferPool) -> tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    with pool.buffer() as view:
+        while True:
+            n = os.readv(fin, [view])
+            if n == 0:
+                break
+            chunk = view[:n]
+            h.update(chunk)
+            written = 0
+            while written < n:
+                written += os.write(fout, chunk[written:])
+            size += n
+    return h.hexdigest(), size
+
+
+def _candidates(method: str, same_device: bool) -> list[str]:
+    if method != "auto":
+        return [method]
+    if not sys.platform.startswith("linux") or not same_device:
+        return ["buffered"]
+    return ["reflink", "copy_file_range", "sendfile", "buffered"]
+
+
+def copy_and_hash(src: Path, dst: Path, *, method: str = "auto", pool: BufferPool | None = None) -> TransferResult:
+    """Copy ``src`` to a new ``dst`` and return the sha256 of the bytes written.
+
+    Same-filesystem copies try FICLONE, then copy_file_range, then sendfile, and
+    hash the destination through one pooled buffer. Everything else (or any
+    fast path the kernel/filesystem refuses) streams through a single
+    read -> hash -> write loop, so each byte is read from userspace once.
+    """
+    if method not in METHODS:
+        raise RuntimeError(f"unsupported transfer method: {method}")
+    pool = pool or _POOL
+    with src.open("rb") as fsrc, dst.open("w+b") as fdst:
+        fin, fout = fsrc.fileno(), fdst.fileno()
+        st = os.fstat(fin)
+        same_device = st.st_dev == os.fstat(fout).st_dev
+        size = int(st.st_size)
+        for candidate in _candidates(method, same_device):
+            try:
+                if candidate == "reflink":
+                    return TransferResult(_copy_reflink(fin, fout, size, pool), size, candidate)
+                if candidate in ("copy_file_range", "sendfile"):
+                    return TransferResult(_copy_kernel(fin, fout, size, pool, candidate), size, candidate)
+                sha, copied = _copy_buffered(fin, fout, pool)
+                return TransferResult(sha, copied, candidate)
+            except (OSError, AttributeError) as exc:
+                if method != "auto" or (isinstance(exc, OSError) and exc.errno not in _UNSUPPORTED):
+                    raise
+                os.ftruncate(fout, 0)
+                os.lseek(fin, 0, os.SEEK_SET)
+                os.lseek(fout, 0, os.SEEK_SET)
+    raise RuntimeError(f"no transfer method succeeded for {src}")
+
+
+@dataclass
+class SourceScan:
+    """One ``os.scandir`` walk of a put source: stat results per directory plus the total size."""
+
+    root: Path
+    total_bytes: int = 0
+    files: int = 0
+    children: dict[Path, list[tuple[str, os.stat_result]]] = field(default_factory=dict)
+
+
+def scan_source(path: Path) -> SourceScan:
+    st = path.stat()
+    scan = SourceScan(root=path)
+    if not stat.S_ISDIR(st.st_mode):
+        scan.total_bytes = int(st.st_size)
+        scan.files = 1
+        return scan
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        listing: list[tuple[str, os.stat_result]] = []
+        with os.scandir(current) as it:
+            for entry in it:
+                try:
+                    entry_st = entry.stat()
+                except OSError:
+                    continue
+                listing.append((entry.name, entry_st))
+                if stat.S_ISDIR(entry_st.st_mode):
+                    stack.append(current / entry.name)
+                elif stat.S_ISREG(entry_st.st_mode):
+                    scan.total_bytes += int(entry_st.st_size)
+                    scan.files += 1
+        listing.sort(key=lambda item: item[0])
+        scan.children[current] = listing
+    return scan
+
+
+def source_fingerprint(path: Path) -> str:
+    """Metadata fingerprint of a put source: (size, mtime_ns, inode) of every regular file, no content reads.
+
+    Equal fingerprints mean the source was not modified in between, which is
+    what the queue needs to merge repeated enqueues. Missing sources give "".
+    """
+    try:
+        scan = scan_source(path)
+    except OSError:
+        return ""
+    h = hashlib.sha256()
+    if not scan.children:
+        st = path.stat()
+        h.update(f"f:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}".encode("ascii"))
+        return h.hexdigest()
+    for directory in sorted(scan.children):
+        rel = directory.relative_to(path).as_posix()
+        for name, st in scan.children[directory]:
+            kind = "d" if stat.S_ISDIR(st.st_mode) else "f" if stat.S_ISREG(st.st_mode) else "o"
+            h.update(f"{rel}/{name}\0{kind}:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+DEFAULT_CHECKPOINT_BYTES = 64 * 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def resume_key(src: Path, st: os.stat_result) -> str:
+    """Staging name for one version of ``src``: a modified source never resumes a stale partial copy."""
+    raw = f"{src.resolve()}:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+    return hashlib.sha256(raw.encode("utf-8", "surrogateescape")).hexdigest()[:32]
+
+
+def _read_manifest(path: Path) -> dict[str, Any]:
+    try:
+        doc = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return doc if isinstance(doc, dict) else {}
+
+
+def _write_manifest(path: Path, doc: dict[str, Any]) -> None:
+    atomic_write_text(path, json.dumps(doc, ensure_ascii=True, indent=2) + "\n")
+
+
+def copy_resumable(
+    src: Path,
+    staging: Path,
+    *,
+    checkpoint_bytes: int = DEFAULT_CHECKPOINT_BYTES,
+    pool: BufferPool | None = None,
+) -> TransferResult:
+    """Copy ``src`` into ``staging`` in chunks, checkpointing progress next to it.
+
+    Every ``checkpoint_bytes`` the staged data is fdatasync'ed and
+    ``<staging>.manifest.json`` records how many bytes are durable. A later
+    call for the same source (same size, mtime_ns and inode) re-hashes that
+    prefix from the local source and sends only the remainder, so a retry
+    costs what is left rather than the whole object. The caller renames
+    ``staging`` into place; the manifest is removed on success.
+    """
+    pool = pool or _POOL
+    manifest_path = staging.with_name(staging.name + MANIFEST_SUFFIX)
+    checkpoint_bytes = max(int(checkpoint_bytes), pool.size)
+    with src.open("rb") as fsrc:
+        fin = fsrc.fileno()
+        st = os.fstat(fin)
+        size = int(st.st_size)
+        identity = {"src": str(src), "size": size, "mtime_ns": int(st.st_mtime_ns), "ino": int(st.st_ino)}
+        manifest = _read_manifest(manifest_path)
+        done = 0
+        if all(manifest.get(k) == v for k, v in identity.items()) and staging.exists():
+            done = min(int(manifest.get("done_bytes", 0)), staging.stat().st_size, size)
+        h = hashlib.sha256()
+        staging.parent.mkdir(parents=True, exist_ok=True)
+        flags = os.O_RDWR | os.O_CREAT | (0 if done else os.O_TRUNC)
+        fout = os.open(staging, flags, 0o644)
+        try:
+            with pool.buffer() as view:
+                offset = 0
+                while offset < done:  # rebuild the hash state from the local source only
+                    n = os.preadv(fin, [view[: min(len(view), done - offset)]], offset)
+                    if n <= 0:
+                        raise OSError(errno.EIO, "short read while re-hashing resumed prefix")
+                    h.update(view[:n])
+                    offset += n
+                os.ftruncate(fout, done)
+                since_checkpoint = 0
+                while offset < size:
+                    n = os.preadv(fin, [view[: min(len(view), size - offset)]], offset)
+                    if n <= 0:
+                        raise OSError(errno.EIO, f"short read from {src}")
+                    chunk = view[:n]
+                    h.update(chunk)
+                    written = 0
+                    while written < n:
+                        written += os.pwrite(fout, chunk[written:], offset + written)
+                    offset += n
+                    since_checkpoint += n
+                    if since_checkpoint >= checkpoint_bytes and offset < size:
+                        os.fdatasync(fout)
+                        _write_manifest(manifest_path, {**identity, "version": "v1", "done_bytes": offset})
+                        since_checkpoint = 0
+            os.fsync(fout)
+        finally:
+            os.close(fout)
+    manifest_path.unlink(missing_ok=True)
+    return TransferResult(h.hexdigest(), size, "resumable", resumed_bytes=done)
+
+
+def copy_file_staged(
+    src: Path,
+    dst: Path,
+    staging: Path,
+    *,
+    method: str = "auto",
+    resume_min_bytes: int = 0,
+    checkpoint_bytes: int = DEFAULT_CHECKPOINT_BYTES,
+) -> TransferResult:
+    """Copy into ``staging`` and rename over ``dst``: resumable for large cross-device files."""
+    st = src.stat()
+    staging.parent.mkdir(parents=True, exist_ok=True)
+    cross_device = st.st_dev != os.stat(staging.parent).st_dev
+    if resume_min_bytes > 0 and st.st_size >= resume_min_bytes and (cross_device or method == "buffered"):
+        result = copy_resumable(src, staging, checkpoint_bytes=checkpoint_bytes)
+    else:
+        result = copy_and_hash(src, staging, method=method)
+    shutil.copystat(src, staging)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staging, dst)
+    return result
+
+
+def hash_file(path: Path, pool: BufferPool | None = None) -> str:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        h = hashlib.sha256()
+        _hash_fd(fd, h, os.fstat(fd).st_size, pool or _POOL)
+    finally:
+        os.close(fd)
+    return h.hexdigest()
+
+
+def _link_unchanged(src: Path, st: os.stat_result, prev: list[Any], base: Path, target: Path) -> str:
+    """Hard-link ``base`` as ``target`` if ``src`` still matches its recorded (size, mtime_ns, sha256).
+
+    A matching size and mtime_ns is trusted; otherwise the source is hashed and
+    compared with the recorded digest. Returns the digest, or "" when the file
+    changed or cannot be linked (the caller then copies it).
+    """
+    size, mtime_ns = int(prev[0]), int(prev[1])
+    sha = str(prev[2]) if len(prev) > 2 else ""
+    if size != st.st_size:
+        return ""
+    try:
+        if base.stat().st_size != size:
+            return ""
+    except OSError:
+        return ""
+    if mtime_ns != st.st_mtime_ns or not sha:
+        digest = hash_file(src)
+        if digest != (sha or hash_file(base)):
+            return ""
+        sha = digest
+    try:
+        target.unlink(missing_ok=True)
+        os.link(base, target)
+    except OSError:
+        return ""
+    return sha
+
+
+def copy_tree_staged(
+    src: Path,
+    dst: Path,
+    staging_root: Path,
+    scan: SourceScan | None = None,
+    *,
+    method: str = "auto",
+    resume_min_bytes: int = 0,
+    checkpoint_bytes: int = DEFAULT_CHECKPOINT_BYTES,
+    baseline: dict[str, list[Any]] | None = None,
+    baseline_root: Path | None = None,
+) -> dict[str, Any]:
+    """Copy a directory into a staging tree, then rename it to ``dst`` in one step.
+
+    ``<staging>.manifest.json`` lists the files already copied (with the source
+    size/mtime they were copied at), so a retry skips them and resumes the file
+    that was in flight from its own chunk checkpoint. ``staging_root`` must be
+    on the destination filesystem for the final rename to be atomic.
+
+    With ``baseline`` (``{rel: [size, mtime_ns, sha256]}`` of an earlier
+    snapshot stored at ``baseline_root``) unchanged files are hard-linked from
+    that snapshot instead of copied. The returned ``files`` map is the
+    baseline for the next snapshot.
+    """
+    if dst.exists():
+        raise FileExistsError(f"destination exists: {dst}")
+    scan = scan or scan_source(src)
+    key = resume_key(src, src.stat())
+    staging = staging_root / key
+    manifest_path = staging_root / f"{key}{MANIFEST_SUFFIX}"
+    manifest = _read_manifest(manifest_path)
+    if manifest.get("src") != str(src) and staging.exists():
+        shutil.rmtree(staging)  # no manifest: leftovers of unknown provenance
+    files_done: dict[str, list[Any]] = dict(manifest.get("files", {})) if manifest.get("src") == str(src) else {}
+    staging.mkdir(parents=True, exist_ok=True)
+    _write_manifest(manifest_path, {"version": "v1", "src": str(src), "files": files_done})
+    copied_bytes = 0
+    skipped_bytes = 0
+    resumed_bytes = 0
+    linked_bytes = 0
+    since_checkpoint = 0
+    for directory in sorted(scan.children):
+        rel_dir = directory.relative_to(src)
+        (staging / rel_dir).mkdir(parents=True, exist_ok=True)
+        for name, st in scan.children[directory]:
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            rel = (rel_dir / name).as_posix()
+            target = staging / rel_dir / name
+            done = files_done.get(rel, [])
+            if done[:2] == [int(st.st_size), int(st.st_mtime_ns)] and target.exists():
+                skipped_bytes += int(st.st_size)
+                continue
+            prev = baseline.get(rel) if baseline else None
+            if prev and baseline_root is not None:
+                linked = _link_unchanged(directory / name, st, prev, baseline_root / rel, target)
+                if linked:
+                    linked_bytes += int(st.st_size)
+                    files_done[rel] = [int(st.st_size), int(st.st_mtime_ns), linked]
+                    continue
+            part = target.with_name(f".{name}.part")
+            result = copy_file_staged(
+                directory / name,
+                target,
+                part,
+                method=method,
+                resume_min_bytes=resume_min_bytes,
+                checkpoint_bytes=checkpoint_bytes,
+            )
+            resumed_bytes += result.resumed_bytes
+            copied_bytes += result.size_bytes - result.resumed_bytes
+            files_done[rel] = [int(st.st_size), int(st.st_mtime_ns), result.sha256]
+            since_checkpoint += result.size_bytes
+            if since_checkpoint >= checkpoint_bytes:
+                _write_manifest(manifest_path, {"version": "v1", "src": str(src), "files": files_done})
+                since_checkpoint = 0
+    for directory in sorted(scan.children, reverse=True):
+        shutil.copystat(directory, staging / directory.relative_to(src))
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staging, dst)
+    manifest_path.unlink(missing_ok=True)
+    return {
+        "copied_bytes": copied_bytes,
+        "skipped_bytes": skipped_bytes,
+        "resumed_bytes": resumed_bytes,
+        "linked_bytes": linked_bytes,
+        "logical_bytes": scan.total_bytes,
+        "files": files_done,
+    }
+
+
+CODECS = ("none", "gzip", "zstd")
+CODEC_SUFFIX = {"gzip": ".gz", "zstd": ".zst"}
+# Formats that are already compressed; recompressing them only burns CPU.
+INCOMPRESSIBLE_SUFFIXES = frozenset(
+    {".gz", ".tgz", ".zst", ".xz", ".bz2", ".zip", ".7z", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp4", ".mp3", ".pdf"}
+)
+
+
+def resolve_codec(codec: str) -> str:
+    codec = str(codec or "none").strip().lower()
+    if codec not in CODECS:
+        raise RuntimeError(f"unsupported codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        return "gzip"
+    return codec
+
+
+def should_compress(path: Path, size: int, min_bytes: int) -> bool:
+    return size >= min_bytes and path.suffix.lower() not in INCOMPRESSIBLE_SUFFIXES
+
+
+def _compressor(codec: str, level: int) -> Any:
+    if codec == "gzip":
+        return zlib.compressobj(max(1, min(int(level), 9)), zlib.DEFLATED, 31)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=int(level)).compressobj()
+    raise RuntimeError(f"unsupported codec: {codec}")
+
+
+def decompressor(codec: str) -> Any:
+    if codec == "gzip":
+        return zlib.decompressobj(31)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd objects")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise RuntimeError(f"unsupported codec: {codec}")
+
+
+@dataclass(frozen=True)
+class EncodedResult:
+    sha256: str
+    size_bytes: int
+    encoded_bytes: int
+    codec: str
+
+
+def compress_and_hash(
+    src: Path, dst: Path, *, codec: str, level: int = 6, pool: BufferPool | None = None
+) -> EncodedResult:
+    """Stream ``src`` through ``codec`` into ``dst``; the digest is of the raw (uncompressed) bytes."""
+    pool = pool or _POOL
+    comp = _compressor(codec, level)
+    h = hashlib.sha256()
+    size = 0
+    encoded = 0
+    with src.open("rb") as fsrc, dst.open("wb") as fdst, pool.buffer() as view:
+        fin = fsrc.fileno()
+        while True:
+            n = os.readv(fin, [view])
+            if n == 0:
+                break
+            h.update(view[:n])
+            size += n
+            out = comp.compress(bytes(view[:n]))
+            if out:
+                fdst.write(out)
+                encoded += len(out)
+        tail = comp.flush()
+        fdst.write(tail)
+        encoded += len(tail)
+    return EncodedResult(h.hexdigest(), size, encoded, codec)
+
+
+def decompress_file(src: Path, dst: Path, *, codec: str, pool: BufferPool | None = None) -> int:
+    """Reverse ``compress_and_hash``: stream-decode ``src`` into ``dst`` and return the raw size."""
+    pool = pool or _POOL
+    dec = decompressor(codec)
+    size = 0
+    with src.open("rb") as fsrc, dst.open("wb") as fdst, pool.buffer() as view:
+        fin = fsrc.fileno()
+        while True:
+            n = os.readv(fin, [view])
+            if n == 0:
+                break
+            out = dec.decompress(bytes(view[:n]))
+            fdst.write(out)
+            size += len(out)
+        if codec == "gzip":
+            out = dec.flush()
+            fdst.write(out)
+            size += len(out)
+    return size
+
+
+def estimate_encoded_size(
+    scan: SourceScan,
+    *,
+    codec: str,
+    level: int = 6,
+    min_bytes: int = 0,
+    sample_bytes: int = 256 * 1024,
+    per_file_bytes: int = 64 * 1024,
+) -> int:
+    """Predict the stored size of a put by compressing a bounded sample of its files.
+
+    Reads at most ``sample_bytes`` in total (``per_file_bytes`` from the head of
+    each file); files that will be stored raw count at full size.
+    """
+    if codec == "none":
+        return scan.total_bytes
+    files: list[tuple[Path, int]] = []
+    if not scan.children:
+        files.append((scan.root, scan.total_bytes))
+    for directory, listing in scan.children.items():
+        files.extend((directory / name, int(st.st_size)) for name, st in listing if stat.S_ISREG(st.st_mode))
+    raw_total = 0
+    compressible_total = 0
+    sampled_raw = 0
+    sampled_encoded = 0
+    for path, size in files:
+        raw_total += size
+        if not should_compress(path, size, min_bytes):
+            continue
+        compressible_total += size
+        if sampled_raw >= sample_bytes:
+            continue
+        try:
+            with path.open("rb") as fh:
+                head = fh.read(min(per_file_bytes, sample_bytes - sampled_raw))
+        except OSError:
+            continue
+        comp = _compressor(codec, level)
+        sampled_encoded += len(comp.compress(head)) + len(comp.flush())
+        sampled_raw += len(head)
+    ratio = sampled_encoded / sampled_raw if sampled_raw else 1.0
+    return int(raw_total - compressible_total + compressible_total * min(ratio, 1.0))
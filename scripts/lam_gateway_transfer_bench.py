@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+try:
+    from scripts.lam_gateway_transfer import METHODS, BufferPool, copy_and_hash
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from scripts.lam_gateway_transfer import METHODS, BufferPool, copy_and_hash
+
+
+SIZE_UNITS = {"k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(raw: str) -> int:
+    raw = raw.strip().lower().rstrip("b")
+    if raw and raw[-1] in SIZE_UNITS:
+        return int(float(raw[:-1]) * SIZE_UNITS[raw[-1]])
+    return int(raw)
+
+
+def make_source(path: Path, size: int) -> None:
+    block = os.urandom(4 * 1024 * 1024)
+    with path.open("wb") as fh:
+        remaining = size
+        while remaining > 0:
+            n = min(remaining, len(block))
+            fh.write(block[:n])
+            remaining -= n
+
+
+def legacy_copy(src: Path, dst: Path) -> str:
+    # Pre-transfer-engine put path: copy, then read the destination back to hash it.
+    shutil.copy2(src, dst)
+    h = hashlib.sha256()
+    with dst.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def drop_page_cache(path: Path) -> None:
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def run_case(src: Path, work: Path, label: str, repeat: int, cold: bool, pool: BufferPool) -> dict[str, Any]:
+    timings: list[float] = []
+    used = label
+    digest = ""
+    for n in range(repeat):
+        dst = work / f"dst_{label}_{n}"
+        if cold:
+            drop_page_cache(src)
+        started = time.perf_counter()
+        if label == "legacy":
+            digest = legacy_copy(src, dst)
+        else:
+            result = copy_and_hash(src, dst, method=label, pool=pool)
+            digest, used = result.sha256, result.method
+        timings.append(time.perf_counter() - started)
+        dst.unlink(missing_ok=True)
+    best = min(timings)
+    size = src.stat().st_size
+    return {
+        "path": label,
+        "method_used": used,
+        "sha256": digest,
+        "best_sec": round(best, 4),
+        "mean_sec": round(sum(timings) / len(timings), 4),
+        "mb_per_sec": round(size / (1024**2) / max(best, 1e-9), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark lam_gateway copy+hash paths against the legacy copy2+rehash.")
+    parser.add_argument("--sizes", default="1M,100M,5G", help="Comma separated object sizes (k/M/G suffixes).")
+    parser.add_argument("--dir", default="", help="Scratch directory (default: system temp). Put it on the provider filesystem to exercise fast paths.")
+    parser.add_argument("--methods", default="legacy,auto,buffered,copy_file_range,sendfile,reflink", help="Paths to compare.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best is reported.")
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="Buffer pool chunk size.")
+    parser.add_argument("--cold", action="store_true", help="Drop the source from page cache before each run.")
+    args = parser.parse_args()
+
+    labels = [m.strip() for m in args.methods.split(",") if m.strip()]
+    for label in labels:
+        if label != "legacy" and label not in METHODS:
+            raise SystemExit(f"unknown method: {label}")
+    pool = BufferPool(count=2, size=args.chunk_kb * 1024)
+    base = Path(args.dir) if args.dir else None
+    report: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="lam_gateway_bench_", dir=base) as tmp:
+        work = Path(tmp)
+        for raw in args.sizes.split(","):
+            size = parse_size(raw)
+            free = shutil.disk_usage(work).free
+            if free < size * 2 + 64 * 1024 * 1024:
+                report.append({"size": raw, "size_bytes": size, "skipped": f"needs ~{2 * size} bytes free, have {free}"})
+                continue
+            src = work / f"src_{raw}"
+            make_source(src, size)
+            cases = []
+            for label in labels:
+                try:
+                    cases.append(run_case(src, work, label, max(1, args.repeat), args.cold, pool))
+                except OSError as exc:
+                    cases.append({"path": label, "error": str(exc)})
+            src.unlink()
+            report.append({"size": raw, "size_bytes": size, "cases": cases})
+    print(json.dumps({"status": "ok", "dir": str(base or tempfile.gettempdir()), "results": report}, ensure_ascii=True, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
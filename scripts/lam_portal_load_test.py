@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+try:
+    from apps.lam_console.portal_async import raise_nofile_limit
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from apps.lam_console.portal_async import raise_nofile_limit
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))], 3)
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, dict[str, str], bytes]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0") or 0)
+    body = await reader.readexactly(length) if length else b""
+    return int(status_line.split(" ")[1]), headers, body
+
+
+async def idle_client(host: str, port: int, ready: asyncio.Event, counts: dict[str, int], probe: str) -> None:
+    """Holds one SSE stream open and records when the probe bridge event reaches it."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        counts["connect_errors"] += 1
+        return
+    writer.write(f"GET /api/events HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode("ascii"))
+    try:
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        await reader.readuntil(b"event: status")
+        counts["streams"] += 1
+        if counts["streams"] >= counts["target"]:
+            ready.set()
+        while line := await reader.readline():
+            # The probe also shows up in the status delta (bridge_events_tail); count only the bridge event.
+            if line.startswith(b'data: {"event":') and probe.encode("ascii") in line:
+                counts["probe_received"] += 1
+                counts["probe_last_ns"] = time.monotonic_ns()
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        counts["stream_errors"] += 1
+    finally:
+        writer.close()
+
+
+async def poller(host: str, port: int, path: str, until: float, latencies: list[float], counts: dict[str, int]) -> None:
+    """Polls ``path`` on one keep-alive connection with If-None-Match, like a dashboard tab."""
+    reader, writer = await asyncio.open_connection(host, port)
+    etag = ""
+    try:
+        while time.monotonic() < until:
+            conditional = f"If-None-Match: {etag}\r\n" if etag else ""
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\n{conditional}\r\n".encode("latin-1"))
+            await writer.drain()
+            status, headers, _ = await read_response(reader)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            counts[str(status)] = counts.get(str(status), 0) + 1
+            etag = headers.get("etag", etag)
+    finally:
+        writer.close()
+
+
+async def fetch_json(host: str, port: int, path: str) -> dict[str, Any]:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    _, _, body = await read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def run(args: argparse.Namespace, host: str, port: int, events_file: Path | None) -> dict[str, Any]:
+    probe = f"load_probe_{os.getpid()}_{time.time_ns()}"
+    counts = {"target": args.idle, "streams": 0, "connect_errors": 0, "stream_errors": 0, "probe_received": 0, "probe_last_ns": 0}
+    ready = asyncio.Event()
+    if args.idle <= 0:
+        ready.set()
+    connect_started = time.perf_counter()
+    idle_tasks = []
+    for i in range(args.idle):
+        idle_tasks.append(asyncio.create_task(idle_client(host, port, ready, counts, probe)))
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(ready.wait(), args.connect_timeout_sec)
+    except TimeoutError:
+        pass
+    connect_sec = time.perf_counter() - connect_started
+
+    latencies: list[float] = []
+    poll_counts: dict[str, int] = {}
+    until = time.monotonic() + args.duration_sec
+    poll_started = time.perf_counter()
+    await asyncio.gather(*(poller(host, port, args.path, until, latencies, poll_counts) for _ in range(args.pollers)))
+    poll_sec = time.perf_counter() - poll_started
+
+    fanout_ms = None
+    if events_file is not None and counts["streams"]:
+        sent_ns = time.monotonic_ns()
+        with events_file.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"event": probe}) + "\n")
+        deadline = time.monotonic() + args.connect_timeout_sec
+        while counts["probe_received"] < counts["streams"] and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if counts["probe_received"]:
+            fanout_ms = round((counts["probe_last_ns"] - sent_ns) / 1e6, 3)
+    server_stats = (await fetch_json(host, port, "/api/portal/stats")).get("stats", {})
+    for task in idle_tasks:
+        task.cancel()
+    await asyncio.gather(*idle_tasks, return_exceptions=True)
+
+    ordered = sorted(latencies)
+    return {
+        "idle_streams": {
+            "requested": args.idle,
+            "established": counts["streams"],
+            "connect_errors": counts["connect_errors"],
+            "stream_errors": counts["stream_errors"],
+            "connect_sec": round(connect_sec, 3),
+            "probe_received": counts["probe_received"],
+            "probe_fanout_ms": fanout_ms,
+        },
+        "polling": {
+            "path": args.path,
+            "pollers": args.pollers,
+            "requests": len(latencies),
+            "req_per_sec": round(len(latencies) / poll_sec, 1) if poll_sec > 0 else 0.0,
+            "by_status": poll_counts,
+            "latency_ms": {
+                "p50": percentile(ordered, 0.5),
+                "p95": percentile(ordered, 0.95),
+                "p99": percentile(ordered, 0.99),
+                "max": round(ordered[-1], 3) if ordered else 0.0,
+            },
+        },
+        "server": server_stats,
+    }
+
+
+def spawn_portal(port: int, root: Path, interval_sec: int) -> subprocess.Popen[bytes]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "PYTHONPATH": str(REPO_ROOT),
+            "LAM_GATEWAY_STATE_DIR": str(root / ".gateway"),
+            "LAM_HUB_ROOT": str(root / ".gateway" / "hub"),
+            "LAM_CAPTAIN_BRIDGE_ROOT": str(root / ".gateway" / "bridge" / "captain"),
+        }
+    )
+    cmd = [
+        sys.executable,
+        str(REPO_ROOT / "apps" / "lam_console" / "portal_gateway.py"),
+        "--mode",
+        "async",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--interval-sec",
+        str(interval_sec),
+    ]
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"portal exited early: {proc.stderr.read().decode('utf-8', errors='replace') if proc.stderr else ''}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("portal did not start listening within 30s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the asyncio portal gateway: idle SSE clients plus conditional pollers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Target an already running portal (--mode async); 0 spawns a local one.")
+    parser.add_argument("--idle", type=int, default=1000, help="Idle /api/events streams held open for the whole run.")
+    parser.add_argument("--pollers", type=int, default=20, help="Concurrent keep-alive pollers.")
+    parser.add_argument("--path", default="/api/status", help="Path the pollers request.")
+    parser.add_argument("--duration-sec", type=float, default=10.0)
+    parser.add_argument("--connect-timeout-sec", type=float, default=30.0)
+    parser.add_argument("--interval-sec", type=int, default=1, help="Poll interval of a spawned portal.")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.idle + args.pollers + 256)
+    if args.port:
+        report = asyncio.run(run(args, args.host, args.port, None))
+        report["target"] = f"http://{args.host}:{args.port}"
+    else:
+        with tempfile.TemporaryDirectory(prefix="lam_portal_load_") as tmp:
+            port = free_port()
+            proc = spawn_portal(port, Path(tmp), args.interval_sec)
+            try:
+                events_file = Path(tmp) / ".gateway" / "bridge" / "captain" / "events.jsonl"
+                report = asyncio.run(run(args, "127.0.0.1", port, events_file))
+            finally:
+                proc.terminate()
+                proc.wait(10)
+            report["target"] = f"spawned http://127.0.0.1:{port}"
+    print(json.dumps(report, ensure_ascii=True, indent=2))
+    established = report["idle_streams"]["established"]
+    return 0 if established == args.idle else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
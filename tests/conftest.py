@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+import importlib.util
+import os
 from pathlib import Path
 import sys
+from types import ModuleType
 
 import pytest
 
@@ -27,3 +31,52 @@ def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item
     for item in items:
         if item.get_closest_marker("submodule_required"):
             item.add_marker(skip_marker)
+
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dirs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Default every runtime state root to ``tmp_path`` so no test writes ``.gateway/`` into the checkout.
+
+    Tests that care about a location still set their own value on top.
+    """
+    state_dir = tmp_path / ".gateway"
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(state_dir))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(state_dir / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(state_dir / "bridge" / "captain"))
+    monkeypatch.setenv("LAM_MEDIA_SYNC_ZONE_ROOT", str(state_dir / "sync_zones" / "media_sync"))
+
+
+@pytest.fixture()
+def load_gateway(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Callable[[], ModuleType]:
+    """Loader for a fresh ``scripts/lam_gateway.py`` whose state all lives under ``tmp_path/.gateway``.
+
+    The module derives every state path from ``LAM_GATEWAY_STATE_DIR`` at
+    import time, so the environment is pinned before loading; any ``*_FILE``
+    or ``*_DIR`` global that still points elsewhere fails the test instead of
+    writing into the checkout.
+    """
+    state_dir = tmp_path / ".gateway"
+    for name in [n for n in os.environ if n.startswith("LAM_GATEWAY_")]:
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(state_dir))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(state_dir / "hub"))
+
+    def load() -> ModuleType:
+        spec = importlib.util.spec_from_file_location("lam_gateway", ROOT / "scripts" / "lam_gateway.py")
+        assert spec and spec.loader
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        leaked = [
+            name
+            for name, value in vars(module).items()
+            if isinstance(value, Path) and name.endswith(("_FILE", "_DIR")) and not value.is_relative_to(tmp_path)
+        ]
+        assert not leaked, f"gateway state outside tmp_path: {leaked}"
+        module.ensure_state()
+        policy = module.read_json(module.POLICY_FILE, {})
+        policy["providers"]["local"]["root"] = str(tmp_path / "local")
+        module.write_json(module.POLICY_FILE, policy)
+        return module
+
+    return load
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import json
+from datetime import UTC, datetime, timedelta
+
+from apps.lam_console.activity_telemetry_daemon import ActivityTelemetry
+
+
+def _ts(delta_sec: float = 0.0) -> str:
+    return (datetime.now(UTC) + timedelta(seconds=delta_sec)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_recent_counts_are_incremental_and_persisted(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / "bridge"))
+    events = tmp_path / "bridge" / "events.jsonl"
+    events.parent.mkdir(parents=True)
+    with events.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"ts_utc": _ts(-1200), "event": "old"}) + "\n")
+        for _ in range(4):
+            fh.write(json.dumps({"ts_utc": _ts(), "event": "fresh"}) + "\n")
+
+    svc = ActivityTelemetry(tmp_path)
+    first = svc.collect()
+    assert first["activity"]["bridge_events_5m"] == 4
+    assert first["signals"]["lines_parsed_tick"] == 5
+
+    with events.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"ts_utc": _ts(), "event": "fresh"}) + "\n")
+    second = svc.collect()
+    assert second["activity"]["bridge_events_5m"] == 5
+    assert second["signals"]["lines_parsed_tick"] == 1
+
+    restarted = ActivityTelemetry(tmp_path).collect()
+    assert restarted["activity"]["bridge_events_5m"] == 5
+    assert restarted["signals"]["lines_parsed_tick"] == 0
+    assert (tmp_path / "hub" / "activity_telemetry_cursors.json").exists()
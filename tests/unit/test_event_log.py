@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from datetime import UTC, datetime, timedelta
+
+from apps.lam_console import event_log
+from apps.lam_console.event_log import EventLog
+
+
+def test_reverse_lines_crosses_block_boundaries(tmp_path) -> None:
+    path = tmp_path / "events.jsonl"
+    lines = [f"line-{n}-" + "x" * (n % 37) for n in range(500)]
+    path.write_text("\n".join(lines) + "\npartial", encoding="utf-8")
+
+    got = [line.decode() for line in event_log.reverse_lines(path, block_size=64)]
+
+    assert got == ["partial"] + lines[::-1]
+    assert event_log.tail_lines(path, 3) == [lines[-2], lines[-1], "partial"]
+    assert event_log.tail_lines(tmp_path / "missing.jsonl", 5) == []
+
+
+def test_size_rotation_compresses_and_prunes_sealed_segments(tmp_path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(path, max_bytes=400, compress="gzip", keep_segments=3)
+
+    for n in range(120):
+        log.append({"n": n, "pad": "y" * 20})
+
+    sealed = event_log.sealed_segments(path)
+    assert len(sealed) == 3
+    assert all(p.suffix == ".gz" for p in sealed[:-1])
+    assert sealed[-1].suffix != ".gz"
+    with gzip.open(sealed[0], "rt", encoding="utf-8") as fh:
+        assert json.loads(fh.readline())["pad"] == "y" * 20
+    assert not path.exists() or path.stat().st_size < 400
+
+    # Tail spans the active file and sealed (compressed) segments in order.
+    tail = [json.loads(line)["n"] for line in log.tail(25)]
+    assert tail == list(range(95, 120))
+
+
+def test_time_rotation_uses_first_record_age(tmp_path) -> None:
+    path = tmp_path / "routing_events.jsonl"
+    log = EventLog(path, max_bytes=0, max_age_sec=60, compress="none")
+    old = (datetime.now(UTC) - timedelta(minutes=5)).isoformat().replace("+00:00", "Z")
+
+    log.append({"ts_utc": old, "event": "old"})
+    log.append({"ts_utc": "2099-01-01T00:00:00Z", "event": "next"})
+
+    sealed = event_log.sealed_segments(path)
+    assert len(sealed) == 1
+    assert json.loads(sealed[0].read_text(encoding="utf-8"))["event"] == "old"
+    assert json.loads(path.read_text(encoding="utf-8"))["event"] == "next"
+    assert [row["event"] for row in event_log.tail_jsonl(path, 10)] == ["old", "next"]
+
+
+def test_concurrent_appends_survive_rotation(tmp_path) -> None:
+    path = tmp_path / "security_audit_stream.jsonl"
+    writers = [EventLog(path, max_bytes=2048, compress="none", keep_segments=0) for _ in range(4)]
+
+    def write(idx: int) -> None:
+        for n in range(200):
+            writers[idx].append({"w": idx, "n": n})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    rows = event_log.tail_jsonl(path, 10_000)
+    assert len(rows) == 800
+    assert len(event_log.sealed_segments(path)) > 1
+    for idx in range(4):
+        assert [r["n"] for r in rows if r["w"] == idx] == list(range(200))
+
+
+def test_stream_cursor_reads_only_new_lines_across_rotation(tmp_path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(path, max_bytes=0, compress="gzip")
+    for n in range(5):
+        log.append({"n": n})
+
+    cursor = event_log.StreamCursor(path)
+    assert [json.loads(line)["n"] for line in cursor.seek_tail(2)] == [3, 4]
+    assert cursor.read_new() == []
+
+    log.append({"n": 5})
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write('{"n": 6')  # writer mid-line
+    assert [json.loads(line)["n"] for line in cursor.read_new()] == [5]
+
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write("}\n")
+    log.rotate()
+    log.append({"n": 7})
+    resumed = event_log.StreamCursor.from_state(path, cursor.state())
+    assert [json.loads(line)["n"] for line in resumed.read_new()] == [6, 7]
+    assert resumed.rotations == 1
+
+    path.write_text('{"n":0}\n', encoding="utf-8")  # truncated in place
+    assert [json.loads(line)["n"] for line in resumed.read_new()] == [0]
@@ -37,3 +37,63 @@ def test_classify_domain_keyboard() -> None:
     m = load_module()
     event = {"event": "keypress", "source": "keyboard"}
     assert m.classify_domain(event) == "keyboard"
+
+
+def test_collect_parses_only_new_lines_and_resumes_from_cursor(tmp_path, monkeypatch) -> None:
+    import json
+    from datetime import UTC, datetime
+
+    m = load_module()
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / "bridge"))
+    events = tmp_path / "bridge" / "events.jsonl"
+    events.parent.mkdir(parents=True)
+    now = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def append(n: int, event: str) -> None:
+        with events.open("a", encoding="utf-8") as fh:
+            for _ in range(n):
+                fh.write(json.dumps({"ts_utc": now, "event": event, "latency_ms": 5}) + "\n")
+
+    append(10, "keypress")
+    svc = m.IOSpectralAnalyzer(tmp_path)
+    first = svc.collect()
+    assert first["counts"] == {"keyboard": 10}
+    assert first["signals"]["lines_parsed_tick"] == 10
+
+    append(3, "mouse_scroll")
+    second = svc.collect()
+    assert second["counts"] == {"keyboard": 10, "pointer": 3}
+    assert second["signals"]["lines_parsed_tick"] == 3
+    assert second["latency"]["sample_count"] == 13
+
+    restarted = m.IOSpectralAnalyzer(tmp_path).collect()
+    assert restarted["counts"] == second["counts"]
+    assert restarted["latency"] == second["latency"]
+    assert restarted["signals"]["lines_parsed_tick"] == 0
+
+
+def test_window_state_holds_per_second_aggregates_not_rows(tmp_path) -> None:
+    import json
+
+    m = load_module()
+    events = tmp_path / "events.jsonl"
+    base = 1_700_000_000
+    with events.open("w", encoding="utf-8") as fh:
+        for i in range(400):
+            # 400 keypresses 0.25 s apart (4 Hz) spread over 100 seconds.
+            ts = m.datetime.fromtimestamp(base + i * 0.25, m.timezone.utc).isoformat()
+            fh.write(json.dumps({"ts_utc": ts, "event": "keypress", "latency_ms": i % 50}) + "\n")
+
+    window = m.SpectralWindow([events], max_samples=64)
+    window.update(base - 1)
+    state = window.state()
+
+    assert "rows" not in state and len(state["buckets"]) == 100 and len(state["samples"]) == 64
+    assert window.counts() == {"keyboard": 400}
+    assert window.frequency_bands()["mid_2_8hz"] == 399
+    assert window.latency_summary()["sample_count"] == 400 and window.latency_summary()["max_ms"] == 49
+
+    restored = m.SpectralWindow([events], json.loads(json.dumps(state)))
+    restored.update(base + 50)
+    assert restored.parsed_lines == 0 and restored.counts() == {"keyboard": 200}
@@ -118,3 +118,52 @@ def test_bridge_status_exposes_security_fields(tmp_path, monkeypatch) -> None:
     assert "rootkey_gate" in status.payload
     assert "failsafe_guard" in status.payload
     assert "feedback_gateway" in status.payload
+
+
+def test_gateway_commands_use_in_process_service(tmp_path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(tmp_path / ".gateway"))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / ".gateway" / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / ".gateway" / "bridge" / "captain"))
+    core = LocalHubCore(Path(__file__).resolve().parents[2])
+    source = tmp_path / "artifact.txt"
+    source.write_text("payload", encoding="utf-8")
+
+    route = core.route("generic")
+    queued = core.enqueue_put(str(source))
+    status = core.execute("bridge-status")
+
+    assert capsys.readouterr().out == ""
+    assert route.payload["decision"]["provider"] == "local"
+    assert queued.ok is True
+    assert status.payload["queue_items"] == 1
+
+
+def test_bridge_status_reparses_only_changed_sources(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(tmp_path / ".gateway"))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / ".gateway" / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / ".gateway" / "bridge" / "captain"))
+    core = LocalHubCore(Path(__file__).resolve().parents[2])
+    core.power_fabric_state_file.write_text(json.dumps({"mode": "balanced"}), encoding="utf-8")
+
+    first = core.bridge_status().payload
+    written = core.bridge_status_file.stat().st_mtime_ns
+    second = core.bridge_status().payload
+
+    assert second["power_fabric"] == {"mode": "balanced"}
+    assert second["status_cache"]["misses"] == first["status_cache"]["misses"]
+    assert second["status_cache"]["hit_ratio"] > 0
+    assert second["status_cache"]["writes"] == {"written": 1, "skipped": 1}
+    assert core.bridge_status_file.stat().st_mtime_ns == written
+    assert second["status_latency_ms"]["count"] == 2
+
+    core.power_fabric_state_file.write_text(json.dumps({"mode": "quiet_cooling", "x": 1}), encoding="utf-8")
+    (core.gates_dir / "linux.json").write_text(json.dumps({"target_os": "linux"}), encoding="utf-8")
+    third = core.bridge_status().payload
+
+    assert third["power_fabric"]["mode"] == "quiet_cooling"
+    assert third["gates"] == [{"target_os": "linux"}]
+    assert third["status_cache"]["misses"] == second["status_cache"]["misses"] + 3  # state file, gates listing, gate
+    assert third["status_cache"]["writes"]["written"] == 2
+    on_disk = json.loads(core.bridge_status_file.read_text(encoding="utf-8"))
+    assert on_disk["power_fabric"]["mode"] == "quiet_cooling"
+    assert "status_cache" not in on_disk
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+from scripts.lam_gateway_cache import ReadCache
+
+
+def fill(cache: ReadCache, provider: str, path: str, data: bytes) -> None:
+    tmp = cache.tmp_path()
+    tmp.write_bytes(data)
+    cache.store(provider, path, tmp, sha256=hashlib.sha256(data).hexdigest(), validator="v")
+
+
+def serve(cache: ReadCache, provider: str, path: str, dst: Path) -> None:
+    entry = cache.lookup(provider, path)
+    assert entry is not None
+    cache.serve(provider, path, entry, dst)
+
+
+def test_lru_and_lfu_evict_to_the_size_bound(tmp_path) -> None:
+    lru = ReadCache(tmp_path / "lru", max_bytes=250)
+    fill(lru, "p", "a", b"a" * 100)
+    fill(lru, "p", "b", b"b" * 100)
+    serve(lru, "p", "a", tmp_path / "out")
+    fill(lru, "p", "c", b"c" * 100)
+
+    assert lru.lookup("p", "b") is None
+    assert lru.lookup("p", "a") and lru.lookup("p", "c")
+    stats = lru.stats()
+    assert (stats["evictions"], stats["evicted_bytes"], stats["bytes"]) == (1, 100, 200)
+    assert stats["hits"] == 1 and stats["misses"] == 3 and stats["hit_ratio"] == 0.25
+
+    lfu = ReadCache(tmp_path / "lfu", max_bytes=250, eviction="lfu")
+    fill(lfu, "p", "a", b"a" * 100)
+    fill(lfu, "p", "b", b"b" * 100)
+    for _ in range(2):
+        serve(lfu, "p", "b", tmp_path / "out")
+    serve(lfu, "p", "a", tmp_path / "out")
+    fill(lfu, "p", "c", b"c" * 100)
+    assert lfu.lookup("p", "a") is None and lfu.lookup("p", "b") is not None
+
+    # Equal content under two paths shares one blob and counts once.
+    fill(lfu, "q", "same-as-c", b"c" * 100)
+    assert lfu.stats()["bytes"] == 200
+
+
+def test_provider_get_reads_through_and_revalidates_on_change(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["compression"]["classes"]["generic"] = {"codec": "gzip"}
+    module.write_json(module.POLICY_FILE, policy)
+    provider_root = tmp_path / "local"
+    (provider_root / "notes").mkdir(parents=True)
+    plain = provider_root / "notes" / "a.txt"
+    plain.write_text("first", encoding="utf-8")
+    source = tmp_path / "doc.json"
+    source.write_text('{"k": "' + "v" * 4000 + '"}', encoding="utf-8")
+    entry = module.put_object(policy, str(source), data_class="generic", provider="local")["entry"]
+
+    outcomes = [module.get_object(policy, "local", "notes/a.txt", str(tmp_path / f"out{n}.txt"))["cache"] for n in range(3)]
+    plain.write_text("second!", encoding="utf-8")
+    changed = module.get_object(policy, "local", "notes/a.txt", str(tmp_path / "out3.txt"))
+    blob = [module.get_object(policy, "local", entry["dest_rel"], str(tmp_path / f"doc{n}.json"))["cache"] for n in range(2)]
+
+    assert outcomes == ["miss", "hit", "hit"]
+    assert changed["cache"] == "miss"
+    assert (tmp_path / "out3.txt").read_text(encoding="utf-8") == "second!"
+    assert blob == ["miss", "hit"]
+    assert (tmp_path / "doc1.json").read_bytes() == source.read_bytes()
+    stats = module.read_cache(policy).stats()
+    assert (stats["hits"], stats["misses"]) == (3, 3)
+    assert stats["hit_ratio"] == 0.5
+    assert module.provider_stats(policy).get("local")["ops"]["get"] == 3
+
+
+class _RawGithub(BaseHTTPRequestHandler):
+    body = b"print('hello')\n" * 1000
+    etag = '"v1"'
+    requests: ClassVar[list[str]] = []
+
+    def do_GET(self) -> None:
+        self.requests.append(self.headers.get("If-None-Match", ""))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+def test_github_fallback_is_conditional_and_serves_stale_when_offline(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RawGithub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    module.GITHUB_RAW_BASE = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        first = module.get_object(policy, "github:org/repo", "src/app.py", str(tmp_path / "a.py"))
+        second = module.get_object(policy, "github:org/repo", "src/app.py", str(tmp_path / "b.py"))
+        _RawGithub.etag = '"v2"'
+        _RawGithub.body = b"print('changed')\n"
+        third = module.get_object(policy, "github:org/repo", "src/app.py", str(tmp_path / "c.py"))
+    finally:
+        server.shutdown()
+        server.server_close()
+    offline = module.get_object(policy, "github:org/repo", "src/app.py", str(tmp_path / "d.py"))
+
+    assert [first["cache"], second["cache"], third["cache"], offline["cache"]] == ["miss", "revalidated", "miss", "stale"]
+    assert _RawGithub.requests == ["", '"v1"', '"v1"']
+    assert (tmp_path / "b.py").read_bytes() == b"print('hello')\n" * 1000
+    assert (tmp_path / "d.py").read_bytes() == b"print('changed')\n"
+    stats = module.read_cache(policy).stats()
+    assert (stats["misses"], stats["revalidated"], stats["stale"], stats["entries"]) == (2, 1, 1, 1)
+    assert not any(module.CACHE_DIR.joinpath("tmp").iterdir())
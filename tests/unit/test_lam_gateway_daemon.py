@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def daemon(load_gateway):
+    # Unix socket paths are limited to ~100 bytes, so keep state under a short /tmp dir.
+    tmp_path = Path(tempfile.mkdtemp(prefix="lgw", dir="/tmp"))
+    module = load_gateway()
+    ready = threading.Event()
+    servers: list = []
+
+    def on_ready(server) -> None:
+        servers.append(server)
+        ready.set()
+
+    thread = threading.Thread(target=module.serve, args=(module.SOCKET_FILE,), kwargs={"ready": on_ready}, daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    try:
+        yield module, tmp_path, servers[0]
+    finally:
+        servers[0].shutdown()
+        thread.join(10)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def test_cli_commands_are_served_by_the_daemon(daemon, capsys) -> None:
+    module, tmp_path, server = daemon
+    source = tmp_path / "notes.txt"
+    source.write_text("daemon", encoding="utf-8")
+
+    class RouteArgs:
+        data_class = "generic"
+        size_bytes = None
+
+    class EnqueueArgs:
+        src = str(source)
+        data_class = "generic"
+        provider = ""
+        name = ""
+
+    capsys.readouterr()
+    assert module.cmd_route(RouteArgs()) == 0
+    assert json.loads(capsys.readouterr().out)["decision"]["provider"] == "local"
+    assert module.cmd_enqueue_put(EnqueueArgs()) == 0
+    job = json.loads(capsys.readouterr().out)["job"]
+
+    stats = server.stats()["latency_ms"]
+    assert stats["route"]["count"] == 1
+    assert stats["enqueue_put"]["count"] == 1
+    assert module.call_gateway("queue_list", status="pending")["items"][0]["id"] == job["id"]
+
+
+def test_persistent_client_keeps_route_latency_low(daemon) -> None:
+    module, _tmp_path, _server = daemon
+    with module.RpcClient(module.SOCKET_FILE) as client:
+        for _ in range(200):
+            assert client.call("route", data_class="generic")["decision"]["provider"] == "local"
+        stats = client.call("stats")
+        with pytest.raises(RuntimeError, match="unknown method"):
+            client.call("monitor", rounds=1)
+
+    route = stats["latency_ms"]["route"]
+    assert route["count"] == 200
+    assert route["p50"] < 50
+
+
+def test_cli_falls_back_in_process_without_daemon(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    module.SOCKET_FILE.write_text("", encoding="utf-8")  # stale socket file, nobody listening
+
+    class RouteArgs:
+        data_class = "generic"
+        size_bytes = None
+
+    capsys.readouterr()
+    assert module.cmd_route(RouteArgs()) == 0
+    assert json.loads(capsys.readouterr().out)["decision"]["provider"] == "local"
+    assert module.ROUTE_LATENCY.summary()["count"] == 1
+    assert module.cmd_daemon_status(None) == 0
+    assert json.loads(capsys.readouterr().out)["status"] == "down"
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+
+
+def counting_probe(monkeypatch, calls: list[str], hang: set[str] | None = None):
+    health = sys.modules["scripts.lam_gateway_health"]
+    original = health.probe_provider
+    release = threading.Event()
+
+    def probe(name, cfg):
+        calls.append(name)
+        if hang and name in hang:
+            release.wait(5)
+        return original(name, cfg)
+
+    monkeypatch.setattr(health, "probe_provider", probe)
+    return release
+
+
+def test_routing_reuses_health_snapshot_within_ttl(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    calls: list[str] = []
+    counting_probe(monkeypatch, calls)
+    policy = module.read_json(module.POLICY_FILE, {})
+
+    first = module.select_provider(policy, "generic")
+    probes_after_first = len(calls)
+    second = module.select_provider(policy, "generic")
+
+    assert first["provider"] == second["provider"] == "local"
+    assert first["health_cache"]["source"] == "probe"
+    assert second["health_cache"]["source"] == "cache"
+    assert len(calls) == probes_after_first == len(policy["providers"])
+    assert module.HEALTH_FILE.exists()
+
+    # A fresh process picks the snapshot up from disk instead of probing again.
+    other = load_gateway()
+    assert other.select_provider(policy, "generic")["health_cache"]["source"] == "cache"
+    assert len(calls) == probes_after_first
+
+
+def test_stale_snapshot_is_served_while_refreshing_in_background(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    calls: list[str] = []
+    counting_probe(monkeypatch, calls)
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["health"] = {"ttl_sec": 0.05, "max_stale_sec": 60, "probe_timeout_sec": 1.0}
+
+    module.select_provider(policy, "generic")
+    time.sleep(0.1)
+    decision = module.select_provider(policy, "generic")
+
+    assert decision["health_cache"]["source"] == "stale"
+    deadline = time.time() + 2
+    while len(calls) < 2 * len(policy["providers"]) and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2 * len(policy["providers"])
+
+
+def test_hung_provider_probe_times_out_without_blocking_routing(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    calls: list[str] = []
+    release = counting_probe(monkeypatch, calls, hang={"gdrive"})
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["providers"]["gdrive"]["root"] = str(tmp_path / "gdrive")
+    policy["classes"]["generic"]["providers"] = ["gdrive", "local"]
+    policy["health"] = {"ttl_sec": 30, "max_stale_sec": 30, "probe_timeout_sec": 0.2}
+    try:
+        started = time.perf_counter()
+        report = {h["provider"]: h for h in module.provider_health(policy)}
+        assert time.perf_counter() - started < 2
+        assert report["gdrive"]["timed_out"] is True
+        assert report["gdrive"]["reachable"] is False
+        assert module.select_provider(policy, "generic")["provider"] == "local"
+
+        # The stuck probe is not duplicated on the next refresh.
+        module.provider_health(policy)
+        assert calls.count("gdrive") == 1
+    finally:
+        release.set()
+
+
+def test_route_loads_breakers_once_and_reports_latency(tmp_path, monkeypatch, capsys, load_gateway) -> None:
+    module = load_gateway()
+    loads: list[int] = []
+    original = module.load_breakers
+
+    def counted(breakers=None):
+        loads.append(1)
+        return original(breakers)
+
+    monkeypatch.setattr(module, "load_breakers", counted)
+
+    class RouteArgs:
+        data_class = "generic"
+        size_bytes = None
+
+    capsys.readouterr()
+    assert module.cmd_route(RouteArgs()) == 0
+    payload = json.loads(capsys.readouterr().out)
+    assert payload["decision"]["provider"] == "local"
+    assert payload["latency_ms"] >= 0
+    assert len(loads) == 1
+    assert module.ROUTE_LATENCY.summary()["count"] == 1
+
+    events = [json.loads(line) for line in module.EVENTS_FILE.read_text(encoding="utf-8").splitlines()]
+    assert events[-1]["event"] == "route_decision"
+    assert events[-1]["health_source"] == "probe"
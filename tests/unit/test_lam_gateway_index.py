@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+
+
+def entry(n: int, data_class: str, provider: str = "local") -> dict:
+    return {
+        "id": f"entry_{n}",
+        "ts_utc": f"2026-01-01T00:00:{n:02d}Z",
+        "class": data_class,
+        "provider": provider,
+        "sha256": f"sha{n}",
+    }
+
+
+def test_list_reads_filtered_tail_from_sqlite_index(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    index = module.open_index()
+    for n in range(10):
+        index.add(entry(n, "memory" if n % 2 else "governance", "archive" if n >= 8 else "local"))
+
+    class ListArgs:
+        provider = ""
+        data_class = "memory"
+        sha256 = ""
+        since = ""
+        limit = 2
+
+    capsys.readouterr()
+    assert module.cmd_list(ListArgs()) == 0
+    payload = json.loads(capsys.readouterr().out)
+    assert payload["count"] == 5
+    assert [e["id"] for e in payload["entries"]] == ["entry_7", "entry_9"]
+
+    count, rows = index.query(provider="archive", data_class="governance")
+    assert count == 1 and rows[0]["id"] == "entry_8"
+    count, rows = index.query(sha256="sha3")
+    assert count == 1 and rows[0]["class"] == "memory"
+    count, rows = index.query(since_utc="2026-01-01T00:00:07Z", limit=10)
+    assert [e["id"] for e in rows] == ["entry_7", "entry_8", "entry_9"]
+
+
+def test_put_appends_to_index_with_content_hash(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    source = tmp_path / "doc.md"
+    source.write_text("# index me", encoding="utf-8")
+    policy = module.read_json(module.POLICY_FILE, {})
+
+    result = module.put_object(policy, str(source), data_class="generic", provider="local")
+
+    count, rows = module.open_index().query(sha256=result["entry"]["sha256"])
+    assert count == 1
+    assert rows[0]["dest_rel"] == result["entry"]["dest_rel"]
+    assert not module.INDEX_FILE.exists()
+
+
+def test_legacy_index_json_is_migrated_once(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    module.write_json(module.INDEX_FILE, {"version": "v1", "entries": [entry(1, "memory"), entry(2, "generic")]})
+
+    count, rows = module.open_index().query(limit=10)
+    assert count == 2
+    assert [e["id"] for e in rows] == ["entry_1", "entry_2"]
+    assert module.INDEX_FILE.with_name("index.json.migrated").exists()
+    assert module.open_index().query()[0] == 2
+
+
+def test_index_migration_claims_the_legacy_file_before_importing(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    module.write_json(module.INDEX_FILE, {"version": "v1", "entries": [entry(1, "memory")]})
+    index = module.open_object_index("sqlite", json_path=module.INDEX_FILE, db_path=module.INDEX_DB_FILE)
+    seen: list[bool] = []
+    real_import = index.import_entries
+
+    def import_entries(entries):
+        # Meanwhile a second process finds nothing left to claim.
+        seen.append(module.INDEX_FILE.exists())
+        assert module.migrate_json_index(module.INDEX_FILE, index) is None
+        return real_import(entries)
+
+    index.import_entries = import_entries
+    assert module.migrate_json_index(module.INDEX_FILE, index) == 1
+    assert seen == [False]
+    assert index.query()[0] == 1
+    assert module.INDEX_FILE.with_name("index.json.migrated").exists()
+    assert not module.INDEX_FILE.with_name("index.json.migrating").exists()
+
+
+def test_pages_walk_the_index_with_a_keyset_cursor(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    index = module.open_index()
+    for n in range(7):
+        index.add(entry(n, "memory", "archive" if n % 3 == 0 else "local"))
+
+    pages = index.pages(size=3)
+    first = next(pages)
+    index.annotate("entry_1", {"integrity": {"status": "corrupt"}})
+    rest = list(pages)
+
+    assert [[e["id"] for e in page] for page in [first, *rest]] == [
+        ["entry_0", "entry_1", "entry_2"],
+        ["entry_3", "entry_4", "entry_5"],
+        ["entry_6"],
+    ]
+    assert [[e["id"] for e in page] for page in index.pages(provider="archive", size=2)] == [
+        ["entry_0", "entry_3"],
+        ["entry_6"],
+    ]
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+
+def put(module, src: Path) -> dict:
+    policy = module.read_json(module.POLICY_FILE, {})
+    return module.put_object(policy, str(src), data_class="generic", provider="local")["entry"]
+
+
+def test_repeated_file_put_is_deduplicated(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    source = tmp_path / "report.bin"
+    source.write_bytes(b"x" * 4096)
+    copy = tmp_path / "copy.bin"
+    copy.write_bytes(b"x" * 4096)
+
+    first = put(module, source)
+    again = put(module, source)
+    other = put(module, copy)
+
+    assert first["layout"] == "cas"
+    assert first["stored_bytes"] == 4096 and not first["dedup"]
+    assert again["stored_bytes"] == 0 and again["dedup"]
+    assert other["stored_bytes"] == 0
+    assert first["dest_rel"] == again["dest_rel"] == other["dest_rel"]
+    assert first["id"] != again["id"]
+    assert Path(first["dest_abs"]).read_bytes() == b"x" * 4096
+    catalog = module.ObjectCatalog(module.OBJECTS_DB_FILE)
+    assert catalog.refcount("local", first["sha256"]) == 3
+
+
+def test_directory_put_stores_only_changed_files(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    src = tmp_path / "tree"
+    (src / "nested").mkdir(parents=True)
+    (src / "a.txt").write_text("alpha", encoding="utf-8")
+    (src / "nested" / "b.txt").write_text("bravo", encoding="utf-8")
+
+    first = put(module, src)
+    assert first["kind"] == "dir" and first["object_kind"] == "tree"
+    assert first["dest_rel"].endswith(".tree")
+    assert put(module, src)["stored_bytes"] == 0
+
+    (src / "a.txt").write_text("alpha-2", encoding="utf-8")
+    changed = put(module, src)
+    assert changed["sha256"] != first["sha256"]
+    # Only the edited blob and the new root manifest are written; nested/ is reused.
+    root_manifest = Path(changed["dest_abs"]).stat().st_size
+    assert changed["stored_bytes"] == len("alpha-2")
+    assert changed["manifest_bytes"] == root_manifest and not changed["dedup"]
+
+    dst = tmp_path / "restored"
+    policy = module.read_json(module.POLICY_FILE, {})
+    module.get_object(policy, "local", changed["dest_rel"], str(dst))
+    assert (dst / "a.txt").read_text(encoding="utf-8") == "alpha-2"
+    assert (dst / "nested" / "b.txt").read_text(encoding="utf-8") == "bravo"
+
+
+def test_forget_then_gc_frees_unreferenced_objects(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    src = tmp_path / "tree"
+    src.mkdir()
+    (src / "only.txt").write_text("payload", encoding="utf-8")
+    shared = tmp_path / "shared.txt"
+    shared.write_text("payload", encoding="utf-8")
+    tree_entry = put(module, src)
+    blob_entry = put(module, shared)
+    blob_path = Path(blob_entry["dest_abs"])
+
+    class ForgetArgs:
+        entry_id = tree_entry["id"]
+
+    class GcArgs:
+        provider = "local"
+        grace_sec = 0
+        dry_run = False
+
+    capsys.readouterr()
+    assert module.cmd_forget(ForgetArgs()) == 0
+    assert json.loads(capsys.readouterr().out)["refcount"] == 0
+    assert module.open_index().query(limit=10)[0] == 1
+
+    assert module.cmd_gc(GcArgs()) == 0
+    (result,) = json.loads(capsys.readouterr().out)["results"]
+    assert result["removed"] == 1
+    assert not Path(tree_entry["dest_abs"]).exists()
+    assert blob_path.exists()
+
+    ForgetArgs.entry_id = blob_entry["id"]
+    assert module.cmd_forget(ForgetArgs()) == 0
+    capsys.readouterr()
+    assert module.cmd_gc(GcArgs()) == 0
+    (result,) = json.loads(capsys.readouterr().out)["results"]
+    assert result["removed"] == 1 and result["freed_bytes"] == len("payload")
+    assert not blob_path.exists()
+
+
+def test_reused_object_is_claimed_before_gc_can_reclaim_it(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    src = tmp_path / "tree"
+    src.mkdir()
+    (src / "only.txt").write_text("payload", encoding="utf-8")
+    store = module.open_object_store("local", tmp_path / "local")
+    catalog = store.catalog
+    tree = store.put_tree(src)
+    blob = store.read_tree(tree["sha256"])[0]["sha256"]
+    # The put returns holding the caller's reference; the new manifest holds the child's.
+    assert catalog.refcount("local", tree["sha256"]) == 1 and catalog.refcount("local", blob) == 1
+
+    loose = tmp_path / "loose.txt"
+    loose.write_text("loose", encoding="utf-8")
+    sha = store.put_file(loose)["sha256"]
+    catalog.adjust("local", sha, -1)
+    before = int(module.time.time()) + 1
+    assert (sha, "blob", len("loose")) in catalog.unreferenced("local", before)
+
+    # A put reuses the blob after gc listed it as unreferenced: the claim wins and the file stays.
+    reused = store.put_file(loose)
+    assert reused["sha256"] == sha and not reused["created"]
+    assert not catalog.reclaim("local", sha, before, lambda: store._remove(store.path_for(sha), "blob", sha))
+    assert store.path_for(sha).exists() and catalog.refcount("local", sha) == 1
+
+
+def test_named_layout_keeps_legacy_paths(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["storage"]["layout"] = "named"
+    module.write_json(module.POLICY_FILE, policy)
+    source = tmp_path / "doc.md"
+    source.write_text("# legacy", encoding="utf-8")
+
+    entry = put(module, source)
+
+    assert entry["dest_rel"].startswith("generic" + os.sep)
+    assert entry["dest_rel"].endswith("_doc.md")
+    assert not module.OBJECTS_DB_FILE.exists()
+
+
+def test_interrupted_large_put_resumes_on_retry(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["transfer"].update({"method": "buffered", "chunk_kb": 64, "resumable_min_mb": 0.25, "checkpoint_mb": 0.125})
+    payload = os.urandom(1024 * 1024)
+    source = tmp_path / "big.bin"
+    source.write_bytes(payload)
+
+    transfer = sys.modules["scripts.lam_gateway_transfer"]
+    real_pwrite = transfer.os.pwrite
+    sent = {"bytes": 0, "limit": 600 * 1024}
+
+    def pwrite(fd, data, offset):
+        if sent["bytes"] >= sent["limit"]:
+            raise OSError(5, "mount dropped")
+        n = real_pwrite(fd, data, offset)
+        sent["bytes"] += n
+        return n
+
+    monkeypatch.setattr(transfer.os, "pwrite", pwrite)
+    try:
+        module.put_object(policy, str(source), data_class="generic", provider="local")
+    except OSError:
+        pass
+    else:
+        raise AssertionError("expected the first put to fail")
+
+    sent.update({"bytes": 0, "limit": 1 << 40})
+    entry = module.put_object(policy, str(source), data_class="generic", provider="local")["entry"]
+
+    assert entry["resumed_bytes"] == 640 * 1024  # last 128 KiB checkpoint before the drop
+    assert sent["bytes"] == len(payload) - 640 * 1024
+    assert Path(entry["dest_abs"]).read_bytes() == payload
+    assert [p.name for p in (tmp_path / "local" / "objects" / "tmp").iterdir()] == []
+
+
+def test_compressed_class_round_trips_and_routes_by_encoded_size(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["compression"]["classes"]["generic"] = {"codec": "gzip", "level": 6}
+    policy["provider_limits"] = {"local": {"max_object_mb": 1}}
+    module.write_json(module.POLICY_FILE, policy)
+    rows = [{"n": n, "text": "lorem ipsum dolor sit amet"} for n in range(60_000)]
+    source = tmp_path / "events.json"
+    source.write_text(json.dumps(rows), encoding="utf-8")
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    (tree / "a.txt").write_text("alpha " * 500, encoding="utf-8")
+    (tree / "sub" / "tiny.txt").write_text("b", encoding="utf-8")
+    assert source.stat().st_size > 1024 * 1024
+
+    entry = put(module, source)
+    tree_entry = put(module, tree)
+
+    assert entry["codec"] == "gzip"
+    assert entry["dest_rel"].endswith(".gz")
+    assert entry["size_bytes"] == source.stat().st_size
+    assert entry["encoded_bytes"] == entry["stored_bytes"] < entry["size_bytes"] // 5
+    restored = tmp_path / "restored.json"
+    got = module.get_object(policy, "local", entry["dest_rel"], str(restored))
+    assert restored.read_bytes() == source.read_bytes()
+    assert got["bytes"] == entry["size_bytes"]
+
+    module.get_object(policy, "local", tree_entry["dest_rel"], str(tmp_path / "tree_out"))
+    assert (tmp_path / "tree_out" / "a.txt").read_text(encoding="utf-8") == "alpha " * 500
+    assert (tmp_path / "tree_out" / "sub" / "tiny.txt").read_text(encoding="utf-8") == "b"
+    assert tree_entry["encoded_bytes"] < tree_entry["size_bytes"]
+    # Only a.txt is big enough to compress; the manifests are not payload.
+    assert tree_entry["codec"] == "mixed" and tree_entry["codecs"] == ["gzip", "none"]
+    assert tree_entry["stored_bytes"] == tree_entry["encoded_bytes"]
+    assert tree_entry["manifest_bytes"] > 0
+
+    # The same bytes under an uncompressed class reuse the gzip blob instead of storing a raw copy.
+    policy["compression"]["classes"]["generic"] = {"codec": "none"}
+    policy["provider_limits"] = {}
+    module.write_json(module.POLICY_FILE, policy)
+    again = put(module, source)
+    assert again["dedup"] and again["dest_rel"] == entry["dest_rel"]
+
+
+def test_named_directory_put_links_unchanged_files_from_previous_snapshot(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["storage"]["layout"] = "named"
+    module.write_json(module.POLICY_FILE, policy)
+    ticks = iter(range(10))
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 1, 1, 0, 0, next(ticks), tzinfo=tz)
+
+    monkeypatch.setattr(module, "datetime", Clock)
+    tree = tmp_path / "governance"
+    (tree / "sub").mkdir(parents=True)
+    (tree / "big.bin").write_bytes(b"b" * 300_000)
+    (tree / "sub" / "touched.txt").write_text("same content", encoding="utf-8")
+    (tree / "edited.txt").write_text("v1", encoding="utf-8")
+
+    first = put(module, tree)
+    os.utime(tree / "sub" / "touched.txt", ns=(1_000_000_000, 1_000_000_000))
+    (tree / "edited.txt").write_text("v2!", encoding="utf-8")
+    (tree / "new.txt").write_text("n", encoding="utf-8")
+    second = put(module, tree)
+
+    assert first["delta_base"] == "" and first["copied_bytes"] == first["logical_bytes"]
+    assert second["delta_base"] == first["dest_rel"]
+    assert second["logical_bytes"] == 300_000 + 12 + 3 + 1
+    assert second["copied_bytes"] == 3 + 1
+    assert second["linked_bytes"] == 300_000 + 12
+    old, new = Path(first["dest_abs"]), Path(second["dest_abs"])
+    assert os.path.samefile(old / "big.bin", new / "big.bin")
+    assert os.path.samefile(old / "sub" / "touched.txt", new / "sub" / "touched.txt")
+    assert (old / "edited.txt").read_text(encoding="utf-8") == "v1"
+
+    restored = tmp_path / "restored"
+    module.get_object(policy, "local", second["dest_rel"], str(restored))
+    assert sorted(p.relative_to(restored).as_posix() for p in restored.rglob("*") if p.is_file()) == [
+        "big.bin",
+        "edited.txt",
+        "new.txt",
+        "sub/touched.txt",
+    ]
+    assert (restored / "edited.txt").read_text(encoding="utf-8") == "v2!"
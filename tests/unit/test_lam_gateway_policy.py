@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from scripts.lam_gateway_policy import CirculationPolicy, compiled_circulation
+
+
+def test_compiled_policy_matches_the_circulation_rules_and_memoizes(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.default_policy()
+    policy["data_circulation"]["provider_org"]["partner"] = "acme"
+    policy["data_circulation"]["class_provider_allowlist"]["public"].append("partner")
+    compiled = CirculationPolicy.compile(policy)
+
+    assert compiled.decide("public", "gdrive") == ""
+    assert compiled.decide("restricted", "gdrive") == "provider 'gdrive' not allowed for class 'restricted'"
+    assert compiled.decide("unlisted", "onedrive") == ""  # falls back to the generic allowlist
+    assert compiled.decide("unlisted", "partner") == "provider 'partner' not allowed for class 'unlisted'"
+    assert compiled.decide("public", "partner") == "destination org 'acme' is not allowed by policy"
+    assert compiled.decide("sensitive", "local") == "contract_id required for class 'sensitive'"
+    assert compiled.decide("sensitive", "local", contract_id="c-1") == "approval_ref required for class 'sensitive'"
+    assert compiled.decide("sensitive", "local", contract_id="c-1", approval_ref="a-1") == ""
+    assert isinstance(compiled.allowlist["restricted"], frozenset)
+    assert compiled.matrix[("restricted", "onedrive")].startswith("provider 'onedrive'")
+    with pytest.raises(TypeError):
+        compiled.allowlist["public"] = frozenset()  # type: ignore[index]
+
+    for _ in range(3):
+        compiled.decide("public", "gdrive")
+    assert compiled.memo_stats()["hits"] == 3
+
+    policy["data_circulation"]["kill_switch"] = True
+    assert compiled_circulation(policy).decide("public", "local") == "data circulation kill-switch is active"
+    policy["data_circulation"] = {"enforce": False}
+    assert compiled_circulation(policy).decide("restricted", "gdrive") == ""
+    assert compiled_circulation(policy) is compiled_circulation(policy)
+
+
+def test_service_recompiles_only_when_policy_content_changes(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    with module.GatewayService() as service:
+        first = service.circulation
+        os.utime(module.POLICY_FILE, ns=(1, 1))
+        service.refresh()
+        assert service.circulation is first
+
+        policy = json.loads(module.POLICY_FILE.read_text(encoding="utf-8"))
+        policy["data_circulation"]["class_provider_allowlist"]["public"] = ["local"]
+        module.write_json(module.POLICY_FILE, policy)
+        service.refresh()
+        assert service.circulation is not first
+        with pytest.raises(RuntimeError, match="not allowed for class 'public'"):
+            service.policy_check(data_class="public", provider="gdrive")
+
+        service.circulation_kill_switch("on")
+        with pytest.raises(RuntimeError, match="kill-switch"):
+            service.policy_check(data_class="public", provider="local")
+    events = [json.loads(line)["event"] for line in module.EVENTS_FILE.read_text(encoding="utf-8").splitlines()]
+    assert events.count("circulation_policy_denied") == 2
+
+
+def test_policy_check_batch_evaluates_many_pairs_in_one_call(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    classes = ["public", "restricted", "sensitive", "memory"] * 500
+    pairs = [{"class": c, "provider": p} for c in classes[:1000] for p in ("local", "gdrive")]
+    batch = tmp_path / "pairs.jsonl"
+    batch.write_text("\n".join(json.dumps(p) for p in pairs) + "\n", encoding="utf-8")
+    events_before = module.EVENTS_FILE.read_text(encoding="utf-8") if module.EVENTS_FILE.exists() else ""
+
+    parser = module.build_parser()
+    args = parser.parse_args(["policy-check", "--batch", str(batch)])
+    assert args.func(args) == 0
+    report = json.loads(capsys.readouterr().out)
+
+    assert report["count"] == 2000
+    by_pair = {(r["class"], r["provider"]): r for r in report["results"]}
+    assert by_pair[("public", "gdrive")]["allowed"] is True
+    assert by_pair[("restricted", "gdrive")]["reason"] == "provider 'gdrive' not allowed for class 'restricted'"
+    assert by_pair[("sensitive", "local")]["reason"] == "contract_id required for class 'sensitive'"
+    assert report["denied"] == 1000  # restricted and sensitive need a contract on every provider
+    assert report["policy"]["misses"] == 8 and report["policy"]["hits"] == 1992
+    events_after = module.EVENTS_FILE.read_text(encoding="utf-8") if module.EVENTS_FILE.exists() else ""
+    assert events_after == events_before
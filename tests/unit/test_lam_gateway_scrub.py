@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from scripts.lam_gateway_scrub import RateLimiter
+
+
+def gzip_memory_class(module) -> None:
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["compression"]["classes"]["memory"] = {"codec": "gzip"}
+    module.write_json(module.POLICY_FILE, policy)
+
+
+def put(module, src: Path, data_class: str = "generic") -> dict:
+    policy = module.read_json(module.POLICY_FILE, {})
+    return module.put_object(policy, str(src), data_class=data_class, provider="local")["entry"]
+
+
+def stored_objects(tmp_path: Path) -> list[Path]:
+    return sorted(p for p in (tmp_path / "local" / "objects").rglob("*") if p.is_file() and p.parent.name != "tmp")
+
+
+def test_scrub_flags_corrupt_and_missing_objects_and_clears_after_repair(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    gzip_memory_class(module)
+    raw = tmp_path / "raw.bin"
+    raw.write_bytes(b"r" * 5000)
+    notes = tmp_path / "notes.json"
+    notes.write_text(json.dumps({"n": "x" * 5000}), encoding="utf-8")
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    (tree / "a.txt").write_text("alpha", encoding="utf-8")
+    (tree / "b.txt").write_text("beta", encoding="utf-8")
+    raw_entry = put(module, raw)
+    notes_entry = put(module, notes, "memory")
+    tree_entry = put(module, tree)
+    blob_a = tmp_path / "local" / module.object_rel_path(module.hashlib.sha256(b"alpha").hexdigest())
+    objects = len(stored_objects(tmp_path))
+
+    with module.GatewayService() as service:
+        clean = service.scrub()
+        original = Path(raw_entry["dest_abs"]).read_bytes()
+        Path(raw_entry["dest_abs"]).write_bytes(b"R" + original[1:])
+        blob_a.unlink()
+        broken = service.scrub()
+        listed = {e["id"]: e for e in service.list_entries(limit=10)["entries"]}
+
+        assert clean["complete"] and clean["counts"]["ok"] == clean["units"] == objects == 5
+        assert broken["counts"]["corrupt"] == 1 and broken["counts"]["missing"] == 1
+        assert listed[raw_entry["id"]]["integrity"]["status"] == "corrupt"
+        assert listed[raw_entry["id"]]["integrity"]["actual"] != raw_entry["sha256"]
+        assert listed[tree_entry["id"]]["integrity"]["status"] == "missing"
+        assert "integrity" not in listed[notes_entry["id"]]  # gzip blob verifies against its raw digest
+        assert json.loads(module.SCRUB_REPORT_FILE.read_text(encoding="utf-8"))["run_id"] == broken["run_id"]
+
+        Path(raw_entry["dest_abs"]).write_bytes(original)
+        blob_a.parent.mkdir(parents=True, exist_ok=True)
+        blob_a.write_bytes(b"alpha")
+        repaired = service.scrub()
+        listed = {e["id"]: e for e in service.list_entries(limit=10)["entries"]}
+
+    assert repaired["counts"]["ok"] == repaired["units"]
+    assert listed[raw_entry["id"]]["integrity"]["status"] == "ok"
+    assert listed[tree_entry["id"]]["integrity"]["status"] == "ok"
+
+
+def test_interrupted_scrub_resumes_where_it_stopped(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    gzip_memory_class(module)
+    for n in range(6):
+        src = tmp_path / f"f{n}.bin"
+        src.write_bytes(bytes([n]) * 2048)
+        put(module, src)
+
+    with module.GatewayService() as service:
+        first = service.scrub(max_units=4, workers=2)
+    state = json.loads(module.SCRUB_STATE_FILE.read_text(encoding="utf-8"))
+    log = module.SCRUB_STATE_FILE.with_suffix(".jsonl")
+    first_log = log.read_text(encoding="utf-8").splitlines()
+    parser = module.build_parser()
+    args = parser.parse_args(["scrub", "--workers", "3"])
+    assert args.func(args) == 0
+    second = json.loads(capsys.readouterr().out)
+
+    assert not first["complete"] and first["remaining"] == 2
+    assert state["checked"] == 4 and "done" not in state and not state["finished_utc"]
+    assert json.loads(first_log[0]) == {"run_id": first["run_id"]} and len(first_log) == 1 + 4
+    assert second["resumed"] and second["run_id"] == first["run_id"]
+    # The resumed run appends its two results after the first four instead of rewriting them.
+    assert log.read_text(encoding="utf-8").splitlines()[: len(first_log)] == first_log
+    assert len(log.read_text(encoding="utf-8").splitlines()) == 1 + 6
+    assert second["checked_this_call"] == 2 and second["complete"]
+    assert second["bytes_total"] == 6 * 2048
+
+
+def test_scrub_pages_the_index_and_flags_every_entry_sharing_an_object(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["scrub"]["page_size"] = 1
+    module.write_json(module.POLICY_FILE, policy)
+    src = tmp_path / "same.bin"
+    src.write_bytes(b"s" * 4096)
+    entries = [put(module, src) for _ in range(3)]
+    stored = Path(entries[0]["dest_abs"])
+
+    with module.GatewayService() as service:
+        stored.write_bytes(b"S" * 4096)
+        broken = service.scrub()
+        flagged = {e["id"]: e["integrity"]["status"] for e in service.list_entries(limit=10)["entries"]}
+        stored.write_bytes(b"s" * 4096)
+        repaired = service.scrub()
+        cleared = {e["id"]: e["integrity"]["status"] for e in service.list_entries(limit=10)["entries"]}
+
+    assert broken["units"] == 1 and broken["counts"]["corrupt"] == 1
+    assert sorted(broken["flagged_entries"]) == sorted(e["id"] for e in entries)
+    assert set(flagged.values()) == {"corrupt"}
+    assert repaired["complete"] and set(cleared.values()) == {"ok"}
+
+
+def test_rate_limit_throttles_and_drops_to_quiet_rate(tmp_path, load_gateway) -> None:
+    limiter = RateLimiter(lambda: 100 * 1024)
+    started = time.monotonic()
+    limiter.consume(100 * 1024)
+    limiter.consume(50 * 1024)
+    assert time.monotonic() - started >= 0.4
+    assert limiter.waited_sec >= 0.4
+
+    module = load_gateway()
+    gzip_memory_class(module)
+    policy = module.read_json(module.POLICY_FILE, {})
+    assert module.scrub_limiter(policy).rate == 0
+    module.POWER_STATE_FILE.parent.mkdir(parents=True)
+    module.POWER_STATE_FILE.write_text(json.dumps({"mode": "quiet_cooling"}), encoding="utf-8")
+    assert module.scrub_limiter(policy).rate == 8 * 1024 * 1024
+    assert module.scrub_limiter(policy, mb_per_sec=2).rate == 2 * 1024 * 1024
+
+
+def test_progress_log_skips_a_torn_tail_line_on_resume(tmp_path) -> None:
+    from scripts.lam_gateway_scrub import ScrubProgress
+
+    progress = ScrubProgress(tmp_path / "scrub_state.json")
+    progress.open(restart=False)
+    progress.record({"key": "local:a", "status": "ok", "bytes": 3})
+    progress.record({"key": "local:b", "status": "corrupt", "rel": "b", "expected": "x", "bytes": 5})
+    progress.save()
+    with progress.log_path.open("a", encoding="utf-8") as fh:
+        fh.write('{"key":"local:c","sta')
+
+    resumed = ScrubProgress(tmp_path / "scrub_state.json")
+    assert resumed.open(restart=False)
+    resumed.record({"key": "local:c", "status": "ok", "bytes": 7})
+    resumed.save()
+    again = ScrubProgress(tmp_path / "scrub_state.json")
+    again.open(restart=False)
+
+    assert resumed.doc["run_id"] == progress.doc["run_id"]
+    assert again.done == {"local:a": "ok", "local:b": "corrupt", "local:c": "ok"}
+    assert [p["key"] for p in again.problems] == ["local:b"] and again.doc["bytes"] == 15
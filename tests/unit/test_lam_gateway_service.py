@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+
+def test_service_calls_return_payloads_without_printing(tmp_path, capsys, load_gateway) -> None:
+    module = load_gateway()
+    source = tmp_path / "notes.txt"
+    source.write_text("service", encoding="utf-8")
+
+    with module.GatewayService() as service:
+        route = service.route("generic")
+        put = service.put(str(source), data_class="generic")
+        listing = service.list_entries(sha256=put["entry"]["sha256"])
+        got = service.get("local", put["entry"]["dest_rel"], str(tmp_path / "restored.txt"))
+        job = service.enqueue_put(str(source))
+        summary = service.run_queue(max_jobs=5)
+
+    assert capsys.readouterr().out == ""
+    assert route["decision"]["provider"] == "local"
+    assert listing["count"] == 1
+    assert Path(got["dst"]).read_text(encoding="utf-8") == "service"
+    assert job["job"]["status"] == "pending"
+    assert summary["succeeded"] == 1
+    assert service.queue_list("done")["items"][0]["id"] == job["job"]["id"]
+
+
+def test_breaker_updates_stay_in_memory_until_flush(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    service = module.GatewayService()
+    before = module.BREAKER_FILE.read_text(encoding="utf-8")
+
+    for _ in range(3):
+        module.breaker_record_failure(service.policy, "gdrive", "unreachable", service.breakers)
+
+    assert module.breaker_is_open("gdrive", service.breakers)
+    assert module.BREAKER_FILE.read_text(encoding="utf-8") == before
+
+    service.flush()
+    on_disk = module.read_json(module.BREAKER_FILE, {})
+    assert on_disk["providers"]["gdrive"]["consecutive_failures"] == 3
+    service.close()
+    assert module.load_breakers()["providers"]["gdrive"]["consecutive_failures"] == 3
+
+
+def test_services_in_one_process_keep_their_own_breakers(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    first = module.GatewayService()
+    second = module.GatewayService()
+
+    for _ in range(3):
+        module.breaker_record_failure(first.policy, "gdrive", "unreachable", first.breakers)
+    second.close()
+
+    assert module.breaker_is_open("gdrive", first.breakers)
+    assert not module.breaker_is_open("gdrive", second.breakers)
+    assert "gdrive" not in module.load_breakers()["providers"]
+    first.close()
+    assert module.load_breakers()["providers"]["gdrive"]["consecutive_failures"] == 3
+
+
+def test_service_reloads_policy_changed_by_another_process(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    service = module.GatewayService()
+    assert service.circulation_kill_switch("status")["kill_switch"] is False
+
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["data_circulation"]["kill_switch"] = True
+    policy["note"] = "edited elsewhere"
+    module.write_json(module.POLICY_FILE, policy)
+
+    assert service.circulation_kill_switch("status")["kill_switch"] is True
+    service.close()
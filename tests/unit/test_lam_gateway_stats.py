@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from scripts.lam_gateway_stats import ProviderStats
+
+
+def two_mounts(module, tmp_path: Path) -> None:
+    policy = module.read_json(module.POLICY_FILE, {})
+    policy["providers"] = {
+        "slow": {"kind": "fs", "root": str(tmp_path / "slow")},
+        "fast": {"kind": "fs", "root": str(tmp_path / "fast")},
+    }
+    policy["provider_limits"] = {}
+    policy["classes"]["artifacts"] = {"providers": ["slow", "fast"], "min_free_gb": 0}
+    policy["data_circulation"]["enforce"] = False
+    module.write_json(module.POLICY_FILE, policy)
+
+
+def test_ewma_splits_throughput_latency_and_errors(tmp_path) -> None:
+    stats = ProviderStats(tmp_path / "provider_stats.json", alpha=0.5, min_throughput_bytes=1024)
+
+    stats.record("gdrive", "put", ok=True, size_bytes=4096, seconds=2.0)
+    stats.record("gdrive", "put", ok=True, size_bytes=4096, seconds=1.0)
+    stats.record("gdrive", "get", ok=True, size_bytes=10, seconds=0.1)
+    state = stats.record("gdrive", "get", ok=False, size_bytes=0, seconds=0.5)
+
+    assert state["throughput_bps"] == 3072.0  # 2048 -> 4096 at alpha 0.5
+    assert state["latency_ms"] == 100.0
+    assert state["error_rate"] == 0.5
+    assert state["ops"] == {"put": 2, "get": 2}
+    on_disk = json.loads((tmp_path / "provider_stats.json").read_text(encoding="utf-8"))
+    assert on_disk["providers"]["gdrive"]["errors"] == 1
+
+    held = ProviderStats(tmp_path / "provider_stats.json")
+    held.hold()
+    held.record("gdrive", "put", ok=True, size_bytes=10, seconds=0.1)
+    assert json.loads((tmp_path / "provider_stats.json").read_text(encoding="utf-8"))["providers"]["gdrive"]["samples"] == 4
+    assert held.flush() is True
+    assert json.loads((tmp_path / "provider_stats.json").read_text(encoding="utf-8"))["providers"]["gdrive"]["samples"] == 5
+
+
+def test_score_mode_sends_large_objects_to_the_faster_mount(tmp_path, monkeypatch, load_gateway) -> None:
+    module = load_gateway()
+    two_mounts(module, tmp_path)
+    stats = module.provider_stats()
+    for _ in range(3):
+        stats.record("slow", "put", ok=True, size_bytes=8 * 1024 * 1024, seconds=4.0)
+        stats.record("fast", "put", ok=True, size_bytes=8 * 1024 * 1024, seconds=0.1)
+
+    with module.GatewayService() as service:
+        ordered = service.route("artifacts", size_bytes=256 * 1024 * 1024)
+        assert ordered["decision"]["provider"] == "slow"
+
+        monkeypatch.setenv("LAM_GATEWAY_ROUTING_MODE", "score")
+        scored = service.route("artifacts", size_bytes=256 * 1024 * 1024)
+
+    decision = scored["decision"]
+    assert decision["provider"] == "fast"
+    assert decision["reason"] == "score_best"
+    breakdown = {row["provider"]: row for row in decision["scores"]}
+    assert breakdown["slow"]["transfer_sec"] > 30 * breakdown["fast"]["transfer_sec"]
+    assert breakdown["fast"]["prior"] is False
+    assert {"space_penalty_sec", "error_penalty_sec", "breaker_penalty_sec"} <= set(breakdown["fast"])
+
+
+def test_put_and_get_feed_provider_stats(tmp_path, load_gateway) -> None:
+    module = load_gateway()
+    two_mounts(module, tmp_path)
+    src = tmp_path / "blob.bin"
+    src.write_bytes(b"x" * (2 * 1024 * 1024))
+
+    with module.GatewayService() as service:
+        put = service.put(str(src), data_class="artifacts", provider="fast")
+        service.get("fast", put["entry"]["dest_rel"], str(tmp_path / "restored.bin"))
+        try:
+            service.get("fast", "objects/missing", str(tmp_path / "missing.bin"))
+        except FileNotFoundError:
+            pass
+        health = service.health(cached=True)
+
+    fast = health["provider_stats"]["fast"]
+    assert fast["ops"] == {"put": 1, "get": 1}
+    assert fast["throughput_bps"] > 0
+    assert fast["bytes_total"] == 4 * 1024 * 1024
+    on_disk = json.loads(module.PROVIDER_STATS_FILE.read_text(encoding="utf-8"))
+    assert on_disk["providers"]["fast"]["samples"] == 2
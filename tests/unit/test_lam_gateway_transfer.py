@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import errno
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+
+def load_transfer_module():
+    repo_root = Path(__file__).resolve().parents[2]
+    script = repo_root / "scripts" / "lam_gateway_transfer.py"
+    spec = importlib.util.spec_from_file_location("lam_gateway_transfer", script)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("method", ["auto", "copy_file_range", "sendfile", "buffered"])
+def test_copy_and_hash_matches_source_digest(tmp_path, method) -> None:
+    module = load_transfer_module()
+    if method == "copy_file_range" and not hasattr(os, "copy_file_range"):
+        pytest.skip("copy_file_range unavailable")
+    payload = os.urandom(3 * 65536 + 123)
+    src = tmp_path / "src.bin"
+    src.write_bytes(payload)
+    pool = module.BufferPool(count=1, size=65536)
+
+    result = module.copy_and_hash(src, tmp_path / "dst.bin", method=method, pool=pool)
+
+    assert result.sha256 == hashlib.sha256(payload).hexdigest()
+    assert result.size_bytes == len(payload)
+    assert (tmp_path / "dst.bin").read_bytes() == payload
+    if method != "auto":
+        assert result.method == method
+
+
+def test_auto_falls_back_when_fast_paths_are_refused(tmp_path, monkeypatch) -> None:
+    module = load_transfer_module()
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"abc" * 50000)
+
+    def refuse(*_args, **_kwargs):
+        raise OSError(errno.EXDEV, "cross-device")
+
+    monkeypatch.setattr(module, "_copy_reflink", refuse)
+    monkeypatch.setattr(module, "_copy_kernel", refuse)
+
+    result = module.copy_and_hash(src, tmp_path / "dst.bin", method="auto")
+
+    assert result.method == "buffered"
+    assert (tmp_path / "dst.bin").read_bytes() == src.read_bytes()
+
+
+def test_buffer_pool_bounds_concurrent_copies(tmp_path) -> None:
+    module = load_transfer_module()
+    pool = module.BufferPool(count=2, size=4096)
+    lock = threading.Lock()
+    in_use = {"now": 0, "peak": 0}
+    original = pool.buffer
+
+    def tracked():
+        ctx = original()
+
+        class Wrapper:
+            def __enter__(self):
+                view = ctx.__enter__()
+                with lock:
+                    in_use["now"] += 1
+                    in_use["peak"] = max(in_use["peak"], in_use["now"])
+                return view
+
+            def __exit__(self, *exc):
+                with lock:
+                    in_use["now"] -= 1
+                return ctx.__exit__(*exc)
+
+        return Wrapper()
+
+    pool.buffer = tracked
+    sources = []
+    for n in range(6):
+        src = tmp_path / f"src{n}.bin"
+        src.write_bytes(os.urandom(50000))
+        sources.append(src)
+    threads = [
+        threading.Thread(target=module.copy_and_hash, args=(src, src.with_suffix(".out")), kwargs={"method": "buffered", "pool": pool})
+        for src in sources
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert in_use["peak"] <= 2
+    assert all(src.with_suffix(".out").read_bytes() == src.read_bytes() for src in sources)
+
+
+def test_scan_source_walks_tree_once(tmp_path) -> None:
+    module = load_transfer_module()
+    (tmp_path / "d" / "sub").mkdir(parents=True)
+    (tmp_path / "d" / "b.txt").write_bytes(b"12345")
+    (tmp_path / "d" / "a.txt").write_bytes(b"1")
+    (tmp_path / "d" / "sub" / "c.txt").write_bytes(b"123")
+
+    scan = module.scan_source(tmp_path / "d")
+
+    assert scan.total_bytes == 9
+    assert scan.files == 3
+    assert [name for name, _ in scan.children[tmp_path / "d"]] == ["a.txt", "b.txt", "sub"]
+    assert module.scan_source(tmp_path / "d" / "b.txt").total_bytes == 5
+
+
+def _fail_writes_after(monkeypatch, module, limit: int) -> dict[str, int]:
+    written = {"bytes": 0}
+    real_pwrite = module.os.pwrite
+
+    def pwrite(fd, data, offset):
+        if written["bytes"] >= limit:
+            raise OSError(errno.EIO, "mount dropped")
+        n = real_pwrite(fd, data, offset)
+        written["bytes"] += n
+        return n
+
+    monkeypatch.setattr(module.os, "pwrite", pwrite)
+    return written
+
+
+def test_resumable_copy_continues_from_last_checkpoint(tmp_path, monkeypatch) -> None:
+    module = load_transfer_module()
+    payload = os.urandom(10 * 65536 + 77)
+    src = tmp_path / "src.bin"
+    src.write_bytes(payload)
+    staging = tmp_path / "stage" / "resume_x"
+    pool = module.BufferPool(count=1, size=65536)
+
+    with monkeypatch.context() as patch:
+        _fail_writes_after(patch, module, 7 * 65536)
+        with pytest.raises(OSError):
+            module.copy_resumable(src, staging, checkpoint_bytes=2 * 65536, pool=pool)
+    manifest = staging.with_name(staging.name + module.MANIFEST_SUFFIX)
+    assert '"done_bytes": 393216' in manifest.read_text(encoding="utf-8")  # 6 chunks checkpointed
+
+    written = _fail_writes_after(monkeypatch, module, 1 << 40)
+    result = module.copy_resumable(src, staging, checkpoint_bytes=2 * 65536, pool=pool)
+
+    assert result.resumed_bytes == 6 * 65536
+    assert written["bytes"] == len(payload) - result.resumed_bytes
+    assert result.sha256 == hashlib.sha256(payload).hexdigest()
+    assert staging.read_bytes() == payload
+    assert not manifest.exists()
+
+    # A modified source does not resume someone else's partial copy.
+    src.write_bytes(payload[::-1])
+    assert module.copy_resumable(src, staging, pool=pool).resumed_bytes == 0
+    assert staging.read_bytes() == payload[::-1]
+
+
+def test_staged_tree_copy_skips_finished_files_and_renames_at_the_end(tmp_path, monkeypatch) -> None:
+    module = load_transfer_module()
+    src = tmp_path / "bundle"
+    (src / "sub").mkdir(parents=True)
+    for n in range(4):
+        (src / f"f{n}.bin").write_bytes(bytes([n]) * 5000)
+    (src / "sub" / "deep.bin").write_bytes(b"d" * 3000)
+    dst = tmp_path / "provider" / "artifacts" / "bundle"
+    staging_root = tmp_path / "provider" / ".staging"
+    real_copy = module.copy_file_staged
+    calls: list[str] = []
+    dropped: list[str] = []
+
+    def flaky(file_src, *args, **kwargs):
+        calls.append(file_src.name)
+        if file_src.name == "f2.bin" and not dropped:
+            dropped.append(file_src.name)
+            raise OSError(errno.EIO, "mount dropped")
+        return real_copy(file_src, *args, **kwargs)
+
+    monkeypatch.setattr(module, "copy_file_staged", flaky)
+    with pytest.raises(OSError):
+        module.copy_tree_staged(src, dst, staging_root, checkpoint_bytes=1)
+    assert not dst.exists()
+
+    calls.clear()
+    report = module.copy_tree_staged(src, dst, staging_root, checkpoint_bytes=1)
+
+    assert calls == ["f2.bin", "f3.bin", "deep.bin"]
+    assert report["skipped_bytes"] == 10000
+    assert report["copied_bytes"] == 13000
+    assert sorted(p.relative_to(dst).as_posix() for p in dst.rglob("*.bin")) == [
+        "f0.bin", "f1.bin", "f2.bin", "f3.bin", "sub/deep.bin"
+    ]
+    assert (dst / "f2.bin").read_bytes() == bytes([2]) * 5000
+    assert list(staging_root.iterdir()) == []
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from typing import Self
 
+from apps.lam_console import model_worker
+from apps.lam_console.model_spool import ModelSpool
 from apps.lam_console.model_worker import ModelDeliveryWorker
 
 
@@ -23,3 +29,155 @@ def test_worker_keeps_spooled_records_when_endpoint_missing(tmp_path, monkeypatc
     remaining = spool.read_text(encoding="utf-8").strip().splitlines()
     assert len(remaining) == 1
 
+
+
+class StubModelServer:
+    """Local model endpoint with injectable per-request latency, failing ids and a request hook."""
+
+    def __init__(self, *, latency_sec: float = 0.0, fail_ids: set[str] | None = None, on_request=None) -> None:
+        self.latency_sec = latency_sec
+        self.fail_ids = fail_ids or set()
+        self.on_request = on_request
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.peers: set[tuple[str, int]] = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, fmt: str, *args) -> None:
+                return
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.inflight += 1
+                    stub.peak_inflight = max(stub.peak_inflight, stub.inflight)
+                    stub.peers.add(self.client_address)
+                if stub.on_request is not None:
+                    stub.on_request(body)
+                time.sleep(stub.latency_sec)
+                with stub.lock:
+                    stub.inflight -= 1
+                status = 503 if body["id"] in stub.fail_ids else 200
+                raw = json.dumps({"id": body["id"], "echo": body["input"]}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1/deliver"
+
+    def __enter__(self) -> Self:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_worker(tmp_path, monkeypatch, endpoint: str, **env: str) -> ModelDeliveryWorker:
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / ".gateway" / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / ".gateway" / "bridge" / "captain"))
+    monkeypatch.setenv("LAM_CODEX_ENDPOINT", endpoint)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return ModelDeliveryWorker(Path(__file__).resolve().parents[2])
+
+
+def spool_records(worker: ModelDeliveryWorker, count: int) -> Path:
+    spool = worker.spool_dir / "codex.jsonl"
+    spool.write_text(
+        "".join(json.dumps({"id": f"m{i:03d}", "provider": "codex", "message": f"hello {i}"}) + "\n" for i in range(count)),
+        encoding="utf-8",
+    )
+    return spool
+
+
+def test_backlog_drains_concurrently_over_pooled_connections(tmp_path, monkeypatch) -> None:
+    with StubModelServer(latency_sec=0.01) as stub:
+        worker = make_worker(tmp_path, monkeypatch, stub.url, LAM_MODEL_WORKER_PROVIDER_CONCURRENCY="codex=8")
+        spool = spool_records(worker, 200)
+        try:
+            result = worker.run_once()
+        finally:
+            worker.close()
+
+    assert result["sent"] == 200 and result["failed"] == 0
+    assert not spool.exists()  # drained active segment is sealed, never rewritten
+    assert result["spool"]["codex"] == {"pending": 0, "retrying": 0, "unread_bytes": 0, "segments": 1}
+    outbox = (worker.outbox_dir / "codex_model_outbox.jsonl").read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(line)["request_id"] for line in outbox) == [f"m{i:03d}" for i in range(200)]
+    assert 1 < stub.peak_inflight <= 8
+    assert len(stub.peers) <= 8  # keep-alive: at most one connection per in-flight slot
+    assert result["connections"][stub.url]["reused"] >= 190
+    assert result["delivery"]["codex"]["concurrency"] == 8
+    assert result["msgs_per_sec"] > 0
+
+
+def test_failures_keep_backoff_breaker_and_dead_letter(tmp_path, monkeypatch) -> None:
+    fail = {f"m{i:03d}" for i in range(20)}
+    with StubModelServer(fail_ids=fail) as stub:
+        worker = make_worker(
+            tmp_path,
+            monkeypatch,
+            stub.url,
+            LAM_MODEL_WORKER_CONCURRENCY="1",
+            LAM_MODEL_WORKER_BREAKER_THRESHOLD="3",
+            LAM_MODEL_WORKER_MAX_ATTEMPTS="2",
+        )
+        spool = spool_records(worker, 20)
+        try:
+            first = worker.run_once()
+            state = worker.load_state()
+            assert worker.spool.backlog()["codex"]["retrying"] == 20
+            # Jump past every backoff and close the breaker: the second failure dead-letters.
+            later = model_worker.epoch_now() + 3600
+            monkeypatch.setattr(model_worker, "epoch_now", lambda: later)
+            worker.save_state({**state, "breakers": {}})
+            second = worker.run_once()
+        finally:
+            worker.close()
+
+    assert (first["processed"], first["failed"], first["skipped"], first["sent"]) == (20, 3, 17, 0)
+    assert state["breakers"]["codex"]["open_until_epoch"] > 0
+    assert stub.requests == 6
+    assert (second["failed"], second["dead"]) == (3, 3)
+    dead = (worker.dead_letter_file).read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["record"]["id"] for line in dead] == ["m000", "m001", "m002"]
+    assert worker.spool.backlog()["codex"]["pending"] == 17
+    assert len(spool.read_text(encoding="utf-8").splitlines()) == 20  # acks never rewrite the segment
+
+
+def test_records_appended_during_a_drain_are_delivered(tmp_path, monkeypatch) -> None:
+    producer = ModelSpool(tmp_path / ".gateway" / "hub" / "model_spool")
+
+    def enqueue_more(body: dict) -> None:
+        if body["id"] == "m000":
+            producer.append("codex", {"id": "late", "provider": "codex", "message": "appended mid-drain"})
+
+    with StubModelServer(on_request=enqueue_more) as stub:
+        worker = make_worker(tmp_path, monkeypatch, stub.url, LAM_MODEL_WORKER_CONCURRENCY="2")
+        spool_records(worker, 5)
+        try:
+            result = worker.run_once()
+        finally:
+            worker.close()
+
+    assert result["sent"] == 6
+    outbox = (worker.outbox_dir / "codex_model_outbox.jsonl").read_text(encoding="utf-8").splitlines()
+    assert "late" in {json.loads(line)["request_id"] for line in outbox}
+    assert result["spool"]["codex"]["pending"] == 0
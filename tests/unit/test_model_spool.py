@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+
+from apps.lam_console.model_spool import ModelSpool
+
+
+def test_drain_reads_only_a_window_and_never_rewrites_segments(tmp_path) -> None:
+    spool = ModelSpool(tmp_path, window=10)
+    for i in range(100):
+        spool.append("codex", {"id": f"m{i:03d}", "message": "hi"})
+    active = spool.active_path("codex")
+    before = active.read_bytes(), active.stat().st_ino
+
+    assert spool.ingest("codex") == 10
+    batch = spool.due("codex", now=0)
+    assert [rec["id"] for _, rec in batch] == [f"m{i:03d}" for i in range(10)]
+    assert spool.ingest("codex") == 0  # window full until something is acknowledged
+
+    spool.settle("codex", acked=[entry for entry, _ in batch[:6]], retries=[(batch[6][0], 1, 50, "boom")])
+    assert spool.ingest("codex") == 6
+    assert [rec["id"] for _, rec in spool.due("codex", now=0)][:3] == ["m007", "m008", "m009"]
+    assert [rec["id"] for _, rec in spool.due("codex", now=50)][:2] == ["m006", "m007"]
+    backlog = spool.backlog()["codex"]
+    assert (backlog["pending"], backlog["retrying"]) == (10, 1)
+    assert (active.read_bytes(), active.stat().st_ino) == before
+
+
+def test_fully_acknowledged_segments_are_sealed_then_retired(tmp_path) -> None:
+    spool = ModelSpool(tmp_path, retire_grace_sec=0)
+    spool.append("codex", {"id": "a"})
+    (tmp_path / "codex.jsonl").open("a").write("not json\n")
+    spool.ingest("codex")
+    assert spool.retire("codex") == 0  # "a" is still unacknowledged
+    assert spool.active_path("codex").exists()
+
+    spool.settle("codex", acked=[entry for entry, _ in spool.due("codex", now=0)])
+    assert spool.retire("codex") == 0
+    assert not spool.active_path("codex").exists()
+    sealed = sorted(tmp_path.glob("codex.jsonl.*"))
+    assert len(sealed) == 1
+
+    spool.append("codex", {"id": "b"})  # producers simply start a fresh active segment
+    assert spool.retire("codex") == 1
+    assert not sealed[0].exists()
+    spool.ingest("codex")
+    assert [rec["id"] for _, rec in spool.due("codex", now=0)] == ["b"]
+
+
+def test_legacy_spool_lines_keep_their_retry_time(tmp_path) -> None:
+    (tmp_path / "gemini.jsonl").write_text(
+        json.dumps({"id": "old", "next_retry_epoch": 500}) + "\n" + json.dumps({"id": "new"}) + "\n" + '{"id": "torn"',
+        encoding="utf-8",
+    )
+    spool = ModelSpool(tmp_path)
+    assert spool.ingest("gemini") == 2
+    assert [rec["id"] for _, rec in spool.due("gemini", now=100)] == ["new"]
+    assert [rec["id"] for _, rec in spool.due("gemini", now=500)] == ["old", "new"]
+    assert spool.backlog()["gemini"]["unread_bytes"] == len('{"id": "torn"')
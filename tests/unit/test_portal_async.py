@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import http.client
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from apps.lam_console import event_log
+from apps.lam_console.core import LocalHubCore
+from apps.lam_console.portal_async import AsyncPortal
+
+
+@pytest.fixture()
+def portal(tmp_path, monkeypatch):
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(tmp_path / ".gateway"))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / ".gateway" / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / ".gateway" / "bridge" / "captain"))
+    monkeypatch.setenv("LAM_CONSOLE_AGENTS", ",".join(f"agent-{i:03d}" for i in range(200)))
+    hub = LocalHubCore(Path(__file__).resolve().parents[2])
+    server = AsyncPortal(hub, interval_sec=0.05, status_ttl_sec=0.0)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address: list[int] = []
+
+    async def boot() -> None:
+        address.append((await server.start("127.0.0.1", 0))[1])
+        started.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(boot()), loop.run_forever()), daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield hub, server, address[0]
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+def test_status_etag_and_gzip_panes_over_one_keepalive_connection(portal) -> None:
+    hub, server, port = portal
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+    conn.request("GET", "/api/status")
+    first = conn.getresponse()
+    body = json.loads(first.read())
+    etag = first.getheader("ETag")
+    assert first.status == 200 and etag == f'W/"{hub.status_version}"'
+    assert "power_fabric" in body["payload"]
+
+    conn.request("GET", "/api/status", headers={"If-None-Match": etag})
+    cached = conn.getresponse()
+    assert cached.status == 304 and cached.read() == b""
+
+    hub.power_fabric_state_file.write_text(json.dumps({"mode": "quiet_cooling"}), encoding="utf-8")
+    conn.request("GET", "/api/status", headers={"If-None-Match": etag})
+    changed = conn.getresponse()
+    assert changed.status == 200
+    assert json.loads(changed.read())["payload"]["power_fabric"] == {"mode": "quiet_cooling"}
+    assert changed.getheader("ETag") != etag
+
+    conn.request("GET", "/api/pane/agents", headers={"Accept-Encoding": "gzip"})
+    pane = conn.getresponse()
+    raw = pane.read()
+    assert pane.getheader("Content-Encoding") == "gzip"
+    assert len(json.loads(gzip.decompress(raw))["lines"]) == 200
+    pane_etag = pane.getheader("ETag")
+    assert pane_etag
+    conn.request("GET", "/api/pane/agents", headers={"If-None-Match": pane_etag})
+    assert conn.getresponse().status == 304
+
+    stats = server.stats()
+    assert stats["connections"] == 1
+    assert stats["not_modified"] == 2
+    conn.close()
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_gets_400_and_the_server_keeps_serving(portal, length) -> None:
+    _hub, _server, port = portal
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.putrequest("POST", "/api/command")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    resp = conn.getresponse()
+    assert resp.status == 400 and json.loads(resp.read())["error"] == "bad_content_length"
+    conn.close()
+
+    again = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    again.request("GET", "/api/status")
+    assert again.getresponse().status == 200
+    again.close()
+
+
+def test_event_stream_pushes_bridge_events_and_status_deltas(portal) -> None:
+    hub, server, port = portal
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/api/events")
+    resp = conn.getresponse()
+    assert resp.getheader("Content-Type") == "text/event-stream"
+
+    def next_event() -> tuple[str, dict]:
+        name, data = "", ""
+        while True:
+            line = resp.fp.readline().decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = line[len("data: "):]
+            elif not line and name:
+                return name, json.loads(data)
+
+    name, snapshot = next_event()
+    assert name == "status" and "queue_items" in snapshot
+    deadline = time.monotonic() + 5
+    while not server.subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    event_log.append_jsonl(hub.bridge_events, {"event": "portal_probe"})
+    hub.power_fabric_state_file.write_text(json.dumps({"mode": "balanced"}), encoding="utf-8")
+    bridge: list[dict] = []
+    changed: dict = {}
+    while not (bridge and "power_fabric" in changed) and time.monotonic() < deadline:
+        name, data = next_event()
+        if name == "bridge":
+            bridge.append(data)
+        elif name == "delta":
+            changed.update(data["changed"])
+
+    assert bridge[0]["event"] == "portal_probe"
+    assert changed["power_fabric"] == {"mode": "balanced"}
+    assert "ts_utc" not in changed
+    conn.close()
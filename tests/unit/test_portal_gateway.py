@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from apps.lam_console.core import LocalHubCore
+from apps.lam_console.file_watch import DirWatcher
+from apps.lam_console.portal_gateway import FileGateway
+
+
+@pytest.fixture()
+def hub(tmp_path, monkeypatch) -> LocalHubCore:
+    monkeypatch.setenv("LAM_GATEWAY_STATE_DIR", str(tmp_path / ".gateway"))
+    monkeypatch.setenv("LAM_HUB_ROOT", str(tmp_path / ".gateway" / "hub"))
+    monkeypatch.setenv("LAM_CAPTAIN_BRIDGE_ROOT", str(tmp_path / ".gateway" / "bridge" / "captain"))
+    return LocalHubCore(Path(__file__).resolve().parents[2])
+
+
+def read_results(gateway: FileGateway) -> list[dict]:
+    return [json.loads(line) for line in gateway.results_file.read_text(encoding="utf-8").splitlines()]
+
+
+def test_commands_run_once_from_a_persisted_cursor(hub) -> None:
+    gateway = FileGateway(hub, force_poll=True)
+    with gateway.commands_file.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"command": "help"}) + "\n")
+        fh.write("not json\n")
+        fh.write(json.dumps({"command": "list-gates"}) + "\n")
+        fh.write('{"command": "agents"')  # writer still mid-line
+
+    assert gateway.consume() == 2
+    assert [r["command"] for r in read_results(gateway)] == ["help", "list-gates"]
+    assert gateway.consume() == 0
+
+    with gateway.commands_file.open("a", encoding="utf-8") as fh:
+        fh.write("}\n")
+    restarted = FileGateway(hub, force_poll=True)
+    assert restarted.consume() == 1
+    assert [r["command"] for r in read_results(restarted)] == ["help", "list-gates", "agents"]
+    saved = json.loads(restarted.cursor_file.read_text(encoding="utf-8"))
+    assert saved["cursor"]["offset"] == restarted.commands_file.stat().st_size
+    assert saved["stats"]["batches"] == 1
+
+
+def test_status_is_rebuilt_only_for_dependency_changes(hub) -> None:
+    gateway = FileGateway(hub, status_max_age_sec=3600, force_poll=True)
+    assert gateway.step(None)["status_written"] is True
+    rebuilds = gateway.stats["status_rebuilds"]
+
+    gateway.step({gateway.status_file, gateway.cursor_file, hub.bridge_root / ".status.json.1.tmp"})
+    assert gateway.stats["status_rebuilds"] == rebuilds
+
+    gateway.step({hub.hub_root / "mcp_watchdog_state.json"})
+    assert gateway.stats["status_rebuilds"] == rebuilds + 1
+    assert gateway.stats["status_writes"] == 1  # nothing in the aggregate moved
+
+    hub.power_fabric_state_file.write_text(json.dumps({"mode": "quiet_cooling"}), encoding="utf-8")
+    assert gateway.step({hub.power_fabric_state_file})["status_written"] is True
+    status = json.loads(gateway.status_file.read_text(encoding="utf-8"))
+    assert status["power_fabric"] == {"mode": "quiet_cooling"}
+
+
+def test_poll_watcher_reports_changed_paths(tmp_path) -> None:
+    watcher = DirWatcher([tmp_path], poll_sec=0.01, force_poll=True)
+    assert watcher.mode == "poll"
+    (tmp_path / "portal_commands.jsonl").write_text("{}\n", encoding="utf-8")
+    assert watcher.wait(1.0) == {tmp_path / "portal_commands.jsonl"}
+    assert watcher.wait(0.02) == set()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from apps.lam_console.state_store import StateStore
+
+
+def test_write_is_atomic_and_skips_unchanged_documents(tmp_path) -> None:
+    store = StateStore()
+    target = tmp_path / "hub" / "state.json"
+
+    assert store.write_json(target, {"n": 1}) is True
+    mtime = target.stat().st_mtime_ns
+    assert store.write_json(target, {"n": 1}) is False
+    assert target.stat().st_mtime_ns == mtime
+    assert store.write_json(target, {"n": 2}) is True
+
+    assert json.loads(target.read_text(encoding="utf-8")) == {"n": 2}
+    assert store.stats["written"] == 2
+    assert store.stats["unchanged"] == 1
+    assert [p.name for p in target.parent.iterdir()] == ["state.json"]
+
+
+def test_external_edit_is_not_mistaken_for_unchanged(tmp_path) -> None:
+    store = StateStore()
+    target = tmp_path / "state.json"
+    store.write_json(target, {"owner": "daemon"})
+    target.write_text(json.dumps({"owner": "other"}, ensure_ascii=True, indent=2) + "\n", encoding="utf-8")
+
+    assert store.write_json(target, {"owner": "daemon"}) is True
+    assert json.loads(target.read_text(encoding="utf-8")) == {"owner": "daemon"}
+
+
+def test_coalescing_keeps_latest_until_flush(tmp_path) -> None:
+    store = StateStore(coalesce_sec=60.0)
+    target = tmp_path / "state.json"
+
+    store.write_json(target, {"tick": 0})
+    for tick in range(1, 5):
+        assert store.write_json(target, {"tick": tick}) is False
+    assert json.loads(target.read_text(encoding="utf-8")) == {"tick": 0}
+
+    assert store.flush() == 1
+    assert json.loads(target.read_text(encoding="utf-8")) == {"tick": 4}
+    assert store.stats["coalesced"] == 4
+    assert store.stats["written"] == 2
+
+
+def test_batch_fsync_groups_writes(tmp_path) -> None:
+    store = StateStore(fsync="batch", fsync_interval_sec=3600)
+    for n in range(5):
+        store.write_json(tmp_path / f"s{n}.json", {"n": n})
+    assert store.stats["fsyncs"] == 0
+
+    store.flush()
+    assert store.stats["fsyncs"] == 1
+
+    always = StateStore(fsync="always")
+    always.write_json(tmp_path / "a.json", {"n": 1})
+    always.write_json(tmp_path / "a.json", {"n": 2})
+    assert always.stats["fsyncs"] == 2
+
+
+def test_concurrent_reader_never_sees_torn_state(tmp_path) -> None:
+    store = StateStore()
+    target = tmp_path / "state.json"
+    store.write_json(target, {"seq": 0, "pad": ""})
+    stop = threading.Event()
+    errors: list[str] = []
+
+    def reader() -> None:
+        while not stop.is_set():
+            try:
+                json.loads(target.read_text(encoding="utf-8"))
+            except ValueError as exc:
+                errors.append(str(exc))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        seq = 0
+        while time.monotonic() < deadline:
+            seq += 1
+            store.write_json(target, {"seq": seq, "pad": "x" * (seq % 4096)})
+    finally:
+        stop.set()
+        thread.join()
+
+    assert errors == []
+    assert sorted(p.name for p in Path(tmp_path).iterdir()) == ["state.json"]